@@ -1,6 +1,11 @@
 import sys
 
 if __name__ == "__main__":
+    # Needed for the worker processes of the show compiler in frozen builds
+    from multiprocessing import freeze_support
+
+    freeze_support()
+
     # Do not use relative imports here; it will confuse PyInstaller
     from flockwave.server.launcher import start
 
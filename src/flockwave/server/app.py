@@ -6,10 +6,13 @@ from inspect import isawaitable, isasyncgen
 from os import environ
 from trio import (
     BrokenResourceError,
+    CancelScope,
     move_on_after,
 )
 from typing import (
     Any,
+    AsyncGenerator,
+    Awaitable,
     Iterable,
     Optional,
     Sequence,
@@ -18,6 +21,7 @@ from typing import (
 
 from flockwave.app_framework import DaemonApp
 from flockwave.app_framework.configurator import AppConfigurator, Configuration
+from flockwave.concurrency import aclosing, Future
 from flockwave.connections.base import ConnectionState
 from flockwave.gps.vectors import GPSCoordinate
 from flockwave.server.ports import set_base_port
@@ -35,9 +39,9 @@ from .logger import log
 from .message_hub import (
     BatchMessageRateLimiter,
     ConnectionStatusMessageRateLimiter,
+    DeltaUAVMessageRateLimiter,
     MessageHub,
     RateLimiters,
-    UAVMessageRateLimiter,
 )
 from .message_handlers import MessageBodyTransformationSpec, transform_message_body
 from .model.client import Client
@@ -622,7 +626,10 @@ class SkybrushServer(DaemonApp):
         # to the driver method
         parameters = transform_message_body(transformer, parameters)
 
-        # Ask each affected driver to send the message to the UAV
+        # Ask each affected driver to send the message to the UAV. Drivers
+        # that return an awaitable get one receipt per UAV; the awaitables
+        # of different drivers are evaluated concurrently in the background
+        # so the response can be sent right now
         for driver, uavs in uavs_by_drivers.items():
             # Look up the method in the driver
             common_error, results = None, None
@@ -650,20 +657,22 @@ class SkybrushServer(DaemonApp):
                     response.add_error(uav.id, common_error)
             else:
                 if isawaitable(results):
-                    # Results are produced by an async function; we have to wait
-                    # for it
-                    # TODO(ntamas): no, we don't have to wait for it; we have
-                    # to create a receipt for each UAV and then send a response
-                    # now
-                    try:
-                        results = await results
-                    except RuntimeError as ex:
-                        # this is probably okay
-                        results = ex
-                    except Exception as ex:
-                        # this is unexpected; let's log it
-                        results = ex
-                        log.exception(ex)
+                    # Results are produced by an async function. Start it in
+                    # the background and create a receipt for each UAV that
+                    # resolves when the part of the result corresponding to
+                    # the UAV becomes available
+                    call = _SharedDriverCall(results, num_consumers=len(uavs))
+                    self.run_in_background(call.run)
+                    cmd_manager = self.command_execution_manager
+                    for uav in uavs:
+                        receipt = cmd_manager.new(client_to_notify=sender.id)
+                        response.add_receipt(uav.id, receipt)
+                        response.when_sent(
+                            cmd_manager.mark_as_clients_notified,
+                            receipt.id,
+                            _wait_for_result_of_uav(call, uav),
+                        )
+                    continue
 
                 if isinstance(results, Exception):
                     # Received an exception; send it back for all UAVs
@@ -810,6 +819,22 @@ class SkybrushServer(DaemonApp):
         self.run_in_background(self.rate_limiters.run)
         return await super().run()
 
+    def set_UAV_INF_delta_mode_for(self, client: Client, enabled: bool) -> None:
+        """Enables or disables delta-encoded UAV-INF notifications for the
+        given client.
+
+        Clients in delta mode receive UAV-INF notifications that contain
+        only those fields of the status of each UAV that changed since the
+        last notification sent to the same client. These notifications have
+        a ``delta`` key set to ``True`` in their body. Full snapshots are
+        sent periodically so the client can re-synchronize its state.
+
+        Parameters:
+            client: the client to configure
+            enabled: whether delta-encoded notifications should be enabled
+        """
+        self._uav_inf_rate_limiter.set_delta_mode_for(client, enabled)
+
     def sort_uavs_by_drivers(
         self, uav_ids: Iterable[str], response: Optional[FlockwaveResponse] = None
     ) -> dict[UAVDriver, list[UAV]]:
@@ -908,9 +933,10 @@ class SkybrushServer(DaemonApp):
         self.rate_limiters.register(
             "SYS-MSG", BatchMessageRateLimiter(self.create_SYS_MSG_message_from)
         )
-        self.rate_limiters.register(
-            "UAV-INF", UAVMessageRateLimiter(self.create_UAV_INF_message_for)
+        self._uav_inf_rate_limiter = DeltaUAVMessageRateLimiter(
+            self.create_UAV_INF_message_for, hub=self.message_hub
         )
+        self.rate_limiters.register("UAV-INF", self._uav_inf_rate_limiter)
 
         # Create an object to hold information about all the objects that
         # the server knows about
@@ -1186,6 +1212,112 @@ class SkybrushServer(DaemonApp):
         configurator.safe = is_packaged()
 
 
+############################################################################
+
+
+class _SharedDriverCall:
+    """Asynchronous driver method that was invoked for multiple UAVs at the
+    same time, and whose result is shared between the receipts of the UAVs.
+
+    The call is cancelled when all the receipts waiting for its result are
+    finished, timed out or cancelled.
+    """
+
+    future: Future[Any]
+    """Future that resolves to the result of the call, or to the exception
+    that the call raised. It is resolved with an exception if the call is
+    cancelled.
+    """
+
+    def __init__(self, value: Awaitable[Any], num_consumers: int):
+        """Constructor.
+
+        Parameters:
+            value: the awaitable returned by the driver method
+            num_consumers: the number of receipts that wait for the result
+        """
+        self.future = Future()
+
+        self._cancel_scope = CancelScope()
+        self._num_consumers = num_consumers
+        self._value = value
+
+    def release(self) -> None:
+        """Notifies the call that one of the receipts waiting for its result
+        has finished. Cancels the call when there are no more receipts
+        waiting for it.
+        """
+        self._num_consumers -= 1
+        if self._num_consumers <= 0:
+            self._cancel_scope.cancel()
+
+    async def run(self) -> None:
+        """Awaits the driver method and resolves the future with its result.
+        Exceptions are not propagated; they become the result of the future
+        instead.
+        """
+        result: Any = RuntimeError("Operation cancelled")
+        try:
+            with self._cancel_scope:
+                try:
+                    result = await self._value
+                except RuntimeError as ex:
+                    # this is probably okay
+                    result = ex
+                except Exception as ex:
+                    # this is unexpected; let's log it
+                    result = ex
+                    log.exception(ex)
+        finally:
+            if not self.future.done():
+                self.future.set_result(result)
+
+
+async def _wait_for_result_of_uav(
+    call: _SharedDriverCall, uav: UAV
+) -> AsyncGenerator[Any, Any]:
+    """Waits for the result of an asynchronous driver method that was invoked
+    for multiple UAVs at the same time, and then extracts the result
+    corresponding to a single UAV.
+
+    The function is an async generator so it can forward the progress reports
+    and suspension requests of the per-UAV result if the result itself is an
+    async generator.
+
+    Parameters:
+        call: the shared call of the driver method
+        uav: the UAV whose result we are interested in
+    """
+    try:
+        results = await call.future.wait()
+    finally:
+        call.release()
+
+    if isinstance(results, dict):
+        if uav not in results:
+            raise RuntimeError("No result was returned for this UAV")
+        result = results[uav]
+    else:
+        result = results
+
+    if isinstance(result, Exception):
+        raise result
+
+    if isasyncgen(result):
+        async with aclosing(result) as gen:
+            data_from_client: Any = None
+            while True:
+                try:
+                    item = await gen.asend(data_from_client)
+                except StopAsyncIteration:
+                    break
+                data_from_client = yield item
+    elif isawaitable(result):
+        yield await result
+    else:
+        yield result
+
+
 ############################################################################
 
 app = SkybrushServer("skybrush", PACKAGE_NAME)
@@ -1303,6 +1435,18 @@ def handle_UAV_INF(message: FlockwaveMessage, sender: Client, hub: MessageHub):
     return app.create_UAV_INF_message_for(message.get_ids(), in_response_to=message)
 
 
+@app.message_hub.on("X-UAV-INF-DELTA")
+def handle_UAV_INF_DELTA(message: FlockwaveMessage, sender: Client, hub: MessageHub):
+    enabled = message.body.get("enabled", True)
+    if not isinstance(enabled, bool):
+        return hub.acknowledge(
+            message, outcome=False, reason="'enabled' must be a boolean"
+        )
+
+    app.set_UAV_INF_delta_mode_for(sender, enabled)
+    return hub.acknowledge(message)
+
+
 @app.message_hub.on("UAV-LIST")
 def handle_UAV_LIST(message: FlockwaveMessage, sender: Client, hub: MessageHub):
     return {"ids": list(app.object_registry.ids_by_type(UAV))}
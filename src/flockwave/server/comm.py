@@ -3,13 +3,21 @@ communication between UAVs and a ground station via some communication
 link (e.g., standard 802.11 wifi).
 """
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from contextlib import contextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from errno import ENETDOWN, ENETUNREACH
 from functools import partial
 from logging import Logger
-from trio import BrokenResourceError, open_memory_channel, sleep, WouldBlock
+from trio import (
+    BrokenResourceError,
+    current_time,
+    open_memory_channel,
+    open_nursery,
+    sleep,
+    sleep_forever,
+)
+from trio.lowlevel import ParkingLot, checkpoint
 from trio_util import wait_all
 from typing import (
     Any,
@@ -20,6 +28,7 @@ from typing import (
     Generic,
     Iterable,
     Iterator,
+    Mapping,
     Optional,
     TypeVar,
 )
@@ -30,7 +39,13 @@ from flockwave.connections import Connection
 from .types import Disposer
 
 
-__all__ = ("BROADCAST", "CommunicationManager")
+__all__ = (
+    "BROADCAST",
+    "CommunicationManager",
+    "DEFAULT_OUTBOUND_TRAFFIC_CLASSES",
+    "OutboundQueue",
+    "OutboundTrafficClass",
+)
 
 
 #: Type variable representing the type of addresses used by a CommunicationManager
@@ -52,6 +67,210 @@ WSAENETUNREACH = 10051
 WSAESERVERUNREACH = 10065
 
 
+@dataclass(frozen=True)
+class OutboundTrafficClass:
+    """Queueing policy of a class of outbound packets in a communication
+    manager.
+
+    Each outbound link of a communication manager has a separate queue for
+    each traffic class. Packets in classes with a lower priority value are
+    always sent before packets in classes with a higher priority value.
+    """
+
+    priority: int
+    """Priority of the traffic class; lower values are sent first."""
+
+    capacity: int = 128
+    """Maximum number of packets of this class waiting in the queue of a
+    single link.
+    """
+
+    max_age: Optional[float] = None
+    """Maximum number of seconds that a packet of this class may spend in the
+    queue; older packets are considered stale and are dropped instead of
+    being sent. `None` means that packets never become stale.
+    """
+
+    drop_oldest: bool = False
+    """Whether to drop the oldest packet of this class when a new packet is
+    enqueued and the queue of the class is full. When `False`, the new packet
+    is dropped instead (or the sender is blocked if it is willing to wait).
+    """
+
+    @classmethod
+    def from_json(
+        cls, obj: Mapping[str, Any], default: "OutboundTrafficClass"
+    ) -> "OutboundTrafficClass":
+        """Creates a traffic class from its JSON representation, taking the
+        missing keys from the given default traffic class.
+        """
+        changes: dict[str, Any] = {}
+        if "priority" in obj:
+            changes["priority"] = int(obj["priority"])
+        if "capacity" in obj:
+            changes["capacity"] = max(int(obj["capacity"]), 1)
+        if "max_age" in obj:
+            max_age = obj["max_age"]
+            changes["max_age"] = float(max_age) if max_age is not None else None
+        if "drop_oldest" in obj:
+            changes["drop_oldest"] = bool(obj["drop_oldest"])
+        return replace(default, **changes)
+
+    @property
+    def json(self) -> dict[str, Any]:
+        """Returns the JSON representation of the traffic class."""
+        return {
+            "priority": self.priority,
+            "capacity": self.capacity,
+            "max_age": self.max_age,
+            "drop_oldest": self.drop_oldest,
+        }
+
+
+DEFAULT_OUTBOUND_TRAFFIC_CLASSES: dict[str, OutboundTrafficClass] = {
+    # RC overrides are sent at a high rate and only the latest ones matter
+    "rc": OutboundTrafficClass(priority=0, capacity=16, max_age=1, drop_oldest=True),
+    # Commands and other unicast requests that a client is waiting for
+    "command": OutboundTrafficClass(priority=1),
+    # Heartbeats and everything else
+    "default": OutboundTrafficClass(priority=2),
+    # RTK corrections arrive in bursts; old corrections are useless
+    "rtk": OutboundTrafficClass(priority=3, capacity=128, max_age=5, drop_oldest=True),
+    # Bulk transfers (e.g., file uploads) that can wait
+    "bulk": OutboundTrafficClass(priority=4),
+}
+"""Default traffic classes of the outbound queues of a communication manager.
+Packets of unknown traffic classes are treated as packets of the ``default``
+class.
+"""
+
+
+class OutboundQueue:
+    """Outbound queue of a single link in a communication manager, with
+    separate sub-queues for the different traffic classes.
+
+    The queue also counts the packets that were dropped because the
+    sub-queue of their class was full (``dropped``), or because they became
+    stale before they could have been sent (``expired``).
+    """
+
+    _classes: dict[str, OutboundTrafficClass]
+    """The traffic classes of the queue, in the order of their priorities."""
+
+    _items: dict[str, deque[tuple[float, Any]]]
+    """The queued items of each traffic class, along with the times when they
+    were enqueued.
+    """
+
+    _readers: ParkingLot
+    """Parking lot for the tasks waiting for an item to arrive."""
+
+    _writers: ParkingLot
+    """Parking lot for the tasks waiting for a free slot in the queue."""
+
+    def __init__(self, classes: Mapping[str, OutboundTrafficClass]):
+        """Constructor.
+
+        Parameters:
+            classes: the traffic classes of the queue
+        """
+        self._classes = dict(sorted(classes.items(), key=lambda x: x[1].priority))
+        self._items = {name: deque() for name in self._classes}
+        self._readers = ParkingLot()
+        self._writers = ParkingLot()
+
+        self.dropped = dict.fromkeys(self._classes, 0)
+        self.expired = dict.fromkeys(self._classes, 0)
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._items.values())
+
+    async def get(self) -> Any:
+        """Waits for the next item to send from the queue and returns it.
+
+        Items of classes with lower priority values are returned first; items
+        within the same class are returned in the order they were enqueued.
+        Stale items are dropped.
+        """
+        await checkpoint()
+        while True:
+            now = current_time()
+            for name, items in self._items.items():
+                max_age = self._classes[name].max_age
+                while items:
+                    timestamp, item = items.popleft()
+                    self._writers.unpark()
+                    if max_age is not None and now - timestamp > max_age:
+                        self.expired[name] += 1
+                    else:
+                        return item
+            await self._readers.park()
+
+    async def put(self, item: Any, traffic_class: str = "default") -> None:
+        """Puts an item in the queue, waiting for a free slot if the sub-queue
+        of the traffic class of the item is full and the class is not allowed
+        to drop its oldest items.
+
+        Parameters:
+            item: the item to enqueue
+            traffic_class: the traffic class of the item
+        """
+        traffic_class = self._resolve(traffic_class)
+        policy = self._classes[traffic_class]
+        items = self._items[traffic_class]
+
+        if not policy.drop_oldest:
+            while len(items) >= policy.capacity:
+                await self._writers.park()
+
+        self.put_nowait(item, traffic_class)
+        await checkpoint()
+
+    def put_nowait(self, item: Any, traffic_class: str = "default") -> bool:
+        """Puts an item in the queue without waiting.
+
+        Parameters:
+            item: the item to enqueue
+            traffic_class: the traffic class of the item
+
+        Returns:
+            whether the item was enqueued. It is not enqueued if the sub-queue
+            of the traffic class of the item is full and the class is not
+            allowed to drop its oldest items.
+        """
+        traffic_class = self._resolve(traffic_class)
+        policy = self._classes[traffic_class]
+        items = self._items[traffic_class]
+
+        if len(items) >= policy.capacity:
+            self.dropped[traffic_class] += 1
+            if not policy.drop_oldest:
+                return False
+            items.popleft()
+
+        items.append((current_time(), item))
+        self._readers.unpark()
+        return True
+
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Returns the current depth of each sub-queue and the number of
+        packets dropped so far from each sub-queue, keyed by traffic class
+        names.
+        """
+        return {
+            name: {
+                "depth": len(items),
+                "dropped": self.dropped[name],
+                "expired": self.expired[name],
+            }
+            for name, items in self._items.items()
+        }
+
+    def _resolve(self, traffic_class: str) -> str:
+        return traffic_class if traffic_class in self._classes else "default"
+
+
 class CommunicationManager(Generic[PacketType, AddressType]):
     """Reusable communication manager class for drone driver extensions, with
     multiple responsibilities:
@@ -63,7 +282,9 @@ class CommunicationManager(Generic[PacketType, AddressType]):
       tasks, and forwards them to a central queue
 
     - provides a method that can be used to send a message on any of the
-      currently open connections
+      currently open connections. Each connection name has its own outbound
+      queue and task so a slow link does not hold up the others, and packets
+      are prioritized within the queue based on their traffic classes
 
     - provides facilities for adding aliases to connections and for mapping
       a single alias to multiple connections
@@ -127,10 +348,19 @@ class CommunicationManager(Generic[PacketType, AddressType]):
     _entries_by_name: dict[str, list[Entry]]
     """Mapping from channel identifiers to the corresponding Entry_ object."""
 
+    _outbound_queues: Optional[dict[str, OutboundQueue]]
+    """Mapping from channel identifiers to the corresponding outbound queues;
+    `None` if the outbound links are not running.
+    """
+
+    _traffic_classes: dict[str, OutboundTrafficClass]
+    """The traffic classes of the outbound queues, keyed by their names."""
+
     def __init__(
         self,
         channel_factory: Callable[[Connection, Logger], MessageChannel],
         format_address: Callable[[AddressType], str] = str,
+        traffic_classes: Optional[Mapping[str, OutboundTrafficClass]] = None,
     ):
         """Constructor.
 
@@ -139,6 +369,11 @@ class CommunicationManager(Generic[PacketType, AddressType]):
                 object and a logger instance and that creates a new message
                 channel instance that reads messages from and writes messages
                 to the given connection
+            format_address: a callable that formats an address used by this
+                communication manager into a string
+            traffic_classes: traffic classes of the outbound queues that
+                override or extend the default traffic classes in
+                `DEFAULT_OUTBOUND_TRAFFIC_CLASSES`
         """
         self.channel_factory = channel_factory
         self.format_address = format_address
@@ -146,7 +381,11 @@ class CommunicationManager(Generic[PacketType, AddressType]):
         self._aliases = {}
         self._entries_by_name = defaultdict(list)
         self._running = False
-        self._outbound_tx_queue = None
+        self._outbound_queues = None
+        self._traffic_classes = {
+            **DEFAULT_OUTBOUND_TRAFFIC_CLASSES,
+            **(traffic_classes or {}),
+        }
 
     def add(self, connection, *, name: str, can_send: Optional[bool] = None):
         """Adds the given connection to the list of connections managed by
@@ -191,19 +430,20 @@ class CommunicationManager(Generic[PacketType, AddressType]):
         *,
         destination: Optional[str] = None,
         allow_failure: bool = False,
+        traffic_class: str = "default",
     ) -> None:
         """Requests the communication manager to broadcast the given message
         packet to all destinations, or to the broadcast address of a single
         destination.
 
-        Blocks until the packet is enqueued in the outbound queue, allowing
+        Blocks until the packet is enqueued in the outbound queues, allowing
         other tasks to run.
 
         Parameters:
             packet: the packet to send
+            traffic_class: the traffic class of the packet
         """
-        queue = self._outbound_tx_queue
-        if not queue:
+        if self._outbound_queues is None:
             if not allow_failure:
                 raise BrokenResourceError("Outbound message queue is closed")
             else:
@@ -211,7 +451,8 @@ class CommunicationManager(Generic[PacketType, AddressType]):
 
         address = BROADCAST if destination is None else (destination, BROADCAST)
 
-        await queue.send((packet, address))
+        for queue, item in self._get_outbound_queues_for(packet, address):
+            await queue.put(item, traffic_class)
 
     def enqueue_broadcast_packet(
         self,
@@ -219,6 +460,7 @@ class CommunicationManager(Generic[PacketType, AddressType]):
         *,
         destination: Optional[str] = None,
         allow_failure: bool = False,
+        traffic_class: str = "default",
     ) -> None:
         """Requests the communication manager to broadcast the given message
         packet to all destinations and return immediately.
@@ -227,9 +469,9 @@ class CommunicationManager(Generic[PacketType, AddressType]):
 
         Parameters:
             packet: the packet to send
+            traffic_class: the traffic class of the packet
         """
-        queue = self._outbound_tx_queue
-        if not queue:
+        if self._outbound_queues is None:
             if not allow_failure:
                 raise BrokenResourceError("Outbound message queue is closed")
             else:
@@ -237,15 +479,18 @@ class CommunicationManager(Generic[PacketType, AddressType]):
 
         address = BROADCAST if destination is None else (destination, BROADCAST)
 
-        try:
-            queue.send_nowait((packet, address))
-        except WouldBlock:
-            if self.log:
+        for queue, item in self._get_outbound_queues_for(packet, address):
+            if not queue.put_nowait(item, traffic_class) and self.log:
                 self.log.warning(
                     "Dropping outbound broadcast packet; outbound message queue is full"
                 )
 
-    def enqueue_packet(self, packet: PacketType, destination: tuple[str, AddressType]):
+    def enqueue_packet(
+        self,
+        packet: PacketType,
+        destination: tuple[str, AddressType],
+        traffic_class: str = "default",
+    ):
         """Requests the communication manager to send the given message packet
         to the given destination and return immediately.
 
@@ -255,19 +500,32 @@ class CommunicationManager(Generic[PacketType, AddressType]):
             packet: the packet to send
             destination: the name of the communication channel and the address
                 on that communication channel to send the packet to.
+            traffic_class: the traffic class of the packet
         """
-        queue = self._outbound_tx_queue
-        if not queue:
+        if self._outbound_queues is None:
             raise BrokenResourceError("Outbound message queue is closed")
 
-        try:
-            queue.send_nowait((packet, destination))
-        except WouldBlock:
-            if self.log:
+        for queue, item in self._get_outbound_queues_for(packet, destination):
+            if not queue.put_nowait(item, traffic_class) and self.log:
                 self.log.warning(
                     "Dropping outbound packet; outbound message queue is full"
                 )
 
+    def get_outbound_queue_stats(self) -> dict[str, dict[str, dict[str, int]]]:
+        """Returns the current depth of the outbound queue of each link and
+        the number of packets dropped from them, broken down by traffic
+        classes.
+
+        Returns:
+            a dictionary mapping channel identifiers to dictionaries that map
+            traffic class names to the ``depth``, ``dropped`` and ``expired``
+            counters of the corresponding sub-queue. ``dropped`` counts the
+            packets dropped due to a full queue, ``expired`` counts the packets
+            that became stale while waiting in the queue.
+        """
+        queues = self._outbound_queues or {}
+        return {name: queue.stats for name, queue in queues.items()}
+
     def is_channel_open(self, name: str) -> bool:
         """Returns whether the channel with the given name is currently up and
         running.
@@ -323,7 +581,10 @@ class CommunicationManager(Generic[PacketType, AddressType]):
         del self._aliases[alias]
 
     async def send_packet(
-        self, packet: PacketType, destination: tuple[str, AddressType]
+        self,
+        packet: PacketType,
+        destination: tuple[str, AddressType],
+        traffic_class: str = "default",
     ) -> None:
         """Requests the communication manager to send the given message packet
         to the given destination.
@@ -335,12 +596,13 @@ class CommunicationManager(Generic[PacketType, AddressType]):
             packet: the packet to send
             destination: the name of the communication channel and the address
                 on that communication channel to send the packet to.
+            traffic_class: the traffic class of the packet
         """
-        queue = self._outbound_tx_queue
-        if not queue:
+        if self._outbound_queues is None:
             raise BrokenResourceError("Outbound message queue is closed")
 
-        await queue.send((packet, destination))
+        for queue, item in self._get_outbound_queues_for(packet, destination):
+            await queue.put(item, traffic_class)
 
     @contextmanager
     def with_alias(self, alias: str, *, targets: Iterable[str]):
@@ -353,6 +615,42 @@ class CommunicationManager(Generic[PacketType, AddressType]):
         finally:
             disposer()
 
+    def _get_outbound_queues_for(
+        self, packet: PacketType, destination: Any
+    ) -> list[tuple[OutboundQueue, Any]]:
+        """Returns the outbound queues where the given packet should be placed
+        in order to send it to the given destination, along with the items to
+        place in the queues. Aliases in the destination are resolved here.
+        """
+        queues = self._outbound_queues
+        if not queues:
+            return []
+
+        if destination is BROADCAST:
+            return [(queue, (packet, BROADCAST)) for queue in queues.values()]
+
+        name, address = destination
+        queue = queues.get(name)
+        if queue is not None:
+            return [(queue, (packet, address))]
+
+        # try with an alias
+        targets = self._aliases.get(name)
+        if not targets:
+            return []
+        elif len(targets) == 1 and targets[0] not in queues:
+            if self.log:
+                self.log.warning(
+                    f"Dropping outbound message, no such channel: {targets[0]!r}"
+                )
+            return []
+        else:
+            return [
+                (queues[target], (packet, address))
+                for target in targets
+                if target in queues
+            ]
+
     def _iter_entries(self) -> Generator["Entry", None, None]:
         for _, entries in self._entries_by_name.items():
             yield from entries
@@ -432,58 +730,45 @@ class CommunicationManager(Generic[PacketType, AddressType]):
                     self.log.info("Connection closed", extra=log_extra)
 
     async def _run_outbound_links(self):
-        # ephemeris RTK streams send messages in bursts so it's better to have
-        # a relatively large queue here
-        tx_queue, rx_queue = open_memory_channel(128)
-        async with tx_queue, rx_queue:
-            try:
-                self._outbound_tx_queue = tx_queue
-                await self._run_outbound_links_inner(rx_queue)
-            finally:
-                self._outbound_tx_queue = None
-
-    async def _run_outbound_links_inner(self, queue):
-        # TODO(ntamas): a slow outbound link may block sending messages on other
-        # outbound links; revise if this causes a problem
-        async for message, destination in queue:
-            if destination is BROADCAST:
-                await self._send_message_to_all_channels(message)
-            else:
-                await self._send_message_to_single_channel(message, destination)
+        # Each link gets its own queue and task so a slow outbound link does
+        # not block sending messages on the other links
+        queues = {
+            name: OutboundQueue(self._traffic_classes)
+            for name in self._entries_by_name
+        }
+        try:
+            self._outbound_queues = queues
+            async with open_nursery() as nursery:
+                for name, queue in queues.items():
+                    nursery.start_soon(self._run_outbound_link, name, queue)
+                await sleep_forever()
+        finally:
+            self._outbound_queues = None
 
-    async def _send_message_to_all_channels(self, message):
-        for entries in self._entries_by_name.values():
-            for _index, entry in enumerate(entries):
-                channel = entry.channel
-                address = getattr(channel, "broadcast_address", NO_BROADCAST_ADDRESS)
-                if address is not NO_BROADCAST_ADDRESS:
-                    assert channel is not None
-                    try:
-                        await channel.send((message, address))
-                    except Exception:
-                        # we are going to try all channels so it does not matter
-                        # if a few of them fail for whatever reason
-                        pass
+    async def _run_outbound_link(self, name: str, queue: OutboundQueue) -> None:
+        while True:
+            message, address = await queue.get()
+            if address is BROADCAST:
+                await self._broadcast_message_on_channel(message, name)
+            else:
+                await self._send_message_to_single_channel(message, (name, address))
+
+    async def _broadcast_message_on_channel(self, message, name: str):
+        for entry in self._entries_by_name.get(name, ()):
+            channel = entry.channel
+            address = getattr(channel, "broadcast_address", NO_BROADCAST_ADDRESS)
+            if address is not NO_BROADCAST_ADDRESS:
+                assert channel is not None
+                try:
+                    await channel.send((message, address))
+                except Exception:
+                    # we are going to try all channels so it does not matter
+                    # if a few of them fail for whatever reason
+                    pass
 
     async def _send_message_to_single_channel(self, message, destination):
         name, address = destination
-
         entries = self._entries_by_name.get(name)
-        if not entries:
-            # try with an alias
-            targets = self._aliases.get(name)
-            if not targets:
-                return
-            elif len(targets) == 1:
-                name = targets[0]
-                entries = self._entries_by_name.get(name)
-            else:
-                for target in targets:
-                    if target in self._entries_by_name:
-                        await self._send_message_to_single_channel(
-                            message, (target, address)
-                        )
-                return
 
         sent = False
         is_broadcast = address is BROADCAST
@@ -100,6 +100,7 @@ EXTENSIONS = {
     "virtual_uavs": {
         "arm_after_boot": True,
         "add_noise": False,
+        "batched_simulation": False,
         "count": 5,
         "delay": 0.2,
         "enabled": False,
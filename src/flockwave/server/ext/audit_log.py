@@ -39,7 +39,13 @@ if TYPE_CHECKING:
 
 MAX_BUFFER_SIZE = 1024
 """Maximum number of entries that the extension may buffer without flushing them
-to the underlying data store before it starts to drop entries.
+to the underlying data store before it starts to drop entries. Not used in
+high-throughput mode, which has its own limit.
+"""
+
+PRUNE_BATCH_SIZE = 10000
+"""Maximum number of entries to delete from the SQLite database in a single
+transaction when pruning the audit log in high-throughput mode.
 """
 
 
@@ -53,6 +59,19 @@ def days_ago(age: float) -> float:
 T = TypeVar("T")
 
 
+def to_matcher(value: Union[str, Iterable[str], None]) -> Callable[[str], bool]:
+    """Converts a single string, an iterable of strings or `None` into a
+    function that decides whether a string matches the given value(s). `None`
+    matches everything.
+    """
+    if value is None:
+        return constant(True)
+    elif isinstance(value, str):
+        return value.__eq__
+    else:
+        return frozenset(value).__contains__
+
+
 def to_timestamp(
     value: Union[float, datetime, None], *, default: T = None
 ) -> Union[float, T]:
@@ -105,6 +124,7 @@ class Storage(ABC):
         self,
         component: Union[str, Iterable[str], None] = None,
         *,
+        type: Union[str, Iterable[str], None] = None,
         min_date: Union[datetime, float, None] = None,
         max_date: Union[datetime, float, None] = None,
     ) -> Iterable[Entry]:
@@ -129,6 +149,7 @@ class NullStorage(Storage):
         self,
         component: Union[str, Iterable[str], None] = None,
         *,
+        type: Union[str, Iterable[str], None] = None,
         min_date: Union[datetime, float, None] = None,
         max_date: Union[datetime, float, None] = None,
     ) -> Iterable[Entry]:
@@ -160,20 +181,14 @@ class InMemoryStorage(Storage):
         self,
         component: Union[str, Iterable[str], None] = None,
         *,
+        type: Union[str, Iterable[str], None] = None,
         min_date: Union[datetime, float, None] = None,
         max_date: Union[datetime, float, None] = None,
     ) -> Iterable[Entry]:
         min_timestamp = to_timestamp(min_date, default=-inf)
         max_timestamp = to_timestamp(max_date, default=inf)
-
-        if component is None:
-            component_matcher = constant(True)
-        else:
-            if isinstance(component, str):
-                component = (component,)
-            else:
-                component = tuple(component)
-            component_matcher = component.__contains__
+        component_matcher = to_matcher(component)
+        type_matcher = to_matcher(type)
 
         return [
             entry
@@ -182,6 +197,7 @@ class InMemoryStorage(Storage):
                 entry.timestamp >= min_timestamp
                 and entry.timestamp < max_timestamp
                 and component_matcher(entry.component)
+                and type_matcher(entry.type)
             )
         ]
 
@@ -194,16 +210,33 @@ class InMemoryStorage(Storage):
 
 
 class DbStorage(Storage):
-    """Storage backend backed by an on-disk SQLite database."""
+    """Storage backend backed by an on-disk SQLite database.
+
+    In high-throughput mode, the database is switched to write-ahead logging
+    so readers do not block the writer, and the entries are indexed by
+    component, type and timestamp so queries and pruning remain fast even on
+    large databases.
+    """
 
     _conn: Optional[Connection] = None
     """Connection to the underlying SQLite database."""
 
+    _high_throughput: bool
+    """Whether the backend operates in high-throughput mode."""
+
     _path: Path
     """Path to the SQLite database that the backend writes to."""
 
-    def __init__(self, path: Union[str, Path]):
+    def __init__(self, path: Union[str, Path], *, high_throughput: bool = False):
+        """Constructor.
+
+        Parameters:
+            path: path to the SQLite database that the backend writes to
+            high_throughput: whether to use write-ahead logging and indexes
+                in the database
+        """
         self._path = Path(path)
+        self._high_throughput = bool(high_throughput)
 
     async def prune(self, threshold: float) -> int:
         return await to_thread.run_sync(self._prune_sync, threshold)
@@ -215,13 +248,19 @@ class DbStorage(Storage):
         self,
         component: Union[str, Iterable[str], None] = None,
         *,
+        type: Union[str, Iterable[str], None] = None,
         min_date: Union[datetime, float, None] = None,
         max_date: Union[datetime, float, None] = None,
     ) -> Iterable[Entry]:
-        return await to_thread.run_sync(self._query_sync, component, min_date, max_date)
+        return await to_thread.run_sync(
+            self._query_sync, component, type, min_date, max_date
+        )
 
     def _prune_sync(self, threshold: float) -> int:
-        if self._conn:
+        if not self._conn:
+            return 0
+
+        if not self._high_throughput:
             with self._conn:
                 with closing(self._conn.cursor()) as cur:
                     cur.execute(
@@ -233,8 +272,28 @@ class DbStorage(Storage):
                         "DELETE FROM entries WHERE timestamp < ?", (threshold,)
                     )
             return count
-        else:
-            return 0
+
+        # Delete the entries in smaller transactions so we never hold the
+        # write lock for too long and the write-ahead log stays small
+        count = 0
+        while True:
+            with self._conn:
+                with closing(self._conn.cursor()) as cur:
+                    cur.execute(
+                        "DELETE FROM entries WHERE id IN ("
+                        "SELECT id FROM entries WHERE timestamp < ? LIMIT ?"
+                        ")",
+                        (threshold, PRUNE_BATCH_SIZE),
+                    )
+                    deleted = cur.rowcount
+            count += deleted
+            if deleted < PRUNE_BATCH_SIZE:
+                break
+
+        if count > 0:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        return count
 
     def _put_sync(self, entries: Sequence[Entry]) -> None:
         if self._conn:
@@ -248,6 +307,7 @@ class DbStorage(Storage):
     def _query_sync(
         self,
         component: Union[str, Iterable[str], None] = None,
+        type: Union[str, Iterable[str], None] = None,
         min_date: Union[datetime, float, None] = None,
         max_date: Union[datetime, float, None] = None,
     ) -> Iterable[Entry]:
@@ -258,21 +318,8 @@ class DbStorage(Storage):
             conditions: list[str] = []
             args: list[Any] = []
 
-            if component is not None:
-                components = (
-                    (component,) if isinstance(component, str) else list(component)
-                )
-
-                if len(components) == 0:
-                    condition = "FALSE"
-                elif len(components) == 1:
-                    condition = "component = ?"
-                else:
-                    qmarks = ", ".join("?" for _ in components)
-                    condition = f"component IN ({qmarks})"
-
-                conditions.append(condition)
-                args.extend(components)
+            _add_membership_condition("component", component, conditions, args)
+            _add_membership_condition("type", type, conditions, args)
 
             min_timestamp = to_timestamp(min_date)
             max_timestamp = to_timestamp(max_date)
@@ -314,9 +361,18 @@ class DbStorage(Storage):
     def _prepare_schema(self) -> None:
         """Prepares the schema of the audit log database."""
         assert self._conn is not None
+
+        if self._high_throughput:
+            # Write-ahead logging lets readers proceed concurrently with the
+            # writer, and synchronous=NORMAL is safe in WAL mode; we may lose
+            # the last few transactions on power loss but the database will
+            # not be corrupted
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+
         with self._conn:
-            # No indexing as we assume frequent inserts and only occasional
-            # SELECT() queries for reporting purposes
+            # No indexing in the default mode as we assume frequent inserts
+            # and only occasional SELECT() queries for reporting purposes
             self._conn.executescript(
                 dedent(
                     """\
@@ -339,6 +395,48 @@ class DbStorage(Storage):
                 )
             )
 
+            if self._high_throughput:
+                self._conn.executescript(
+                    dedent(
+                        """\
+                        CREATE INDEX IF NOT EXISTS entries_timestamp
+                        ON entries (timestamp);
+
+                        CREATE INDEX IF NOT EXISTS entries_component_timestamp
+                        ON entries (component, timestamp);
+
+                        CREATE INDEX IF NOT EXISTS entries_type_timestamp
+                        ON entries (type, timestamp);
+                        """
+                    )
+                )
+
+
+def _add_membership_condition(
+    column: str,
+    value: Union[str, Iterable[str], None],
+    conditions: list[str],
+    args: list[Any],
+) -> None:
+    """Adds an SQL condition to the given list of conditions that restricts
+    the given column to the given value or values, unless the value is `None`.
+    """
+    if value is None:
+        return
+
+    values = (value,) if isinstance(value, str) else list(value)
+
+    if len(values) == 0:
+        condition = "FALSE"
+    elif len(values) == 1:
+        condition = f"{column} = ?"
+    else:
+        qmarks = ", ".join("?" for _ in values)
+        condition = f"{column} IN ({qmarks})"
+
+    conditions.append(condition)
+    args.extend(values)
+
 
 class AuditLogExtension(Extension):
     """Extension that provides other extensions with an append-only audit log
@@ -350,23 +448,66 @@ class AuditLogExtension(Extension):
     As an end user, you typically won't need to enable this extension directly.
     Other extensions relying on the audit log will declare it as a dependency so
     it gets enabled automatically if needed.
+
+    In high-throughput mode, pending entries are written to the database in
+    batched transactions whenever a full batch has accumulated or the flush
+    interval has passed, and producers that use `append_async()` are suspended
+    while too many entries are waiting to be written. Entries added with
+    `append()` cannot wait; they are dropped only if the number of pending
+    entries reaches a much larger hard limit.
+    """
+
+    batch_size: int = MAX_BUFFER_SIZE
+    """Maximum number of entries to write to the storage backend in a single
+    transaction.
     """
 
+    flush_interval: float = 0.5
+    """Maximum number of seconds that an entry may wait in the buffer before
+    it is written to the storage backend in high-throughput mode.
+    """
+
+    high_throughput: bool = False
+    """Whether the extension operates in high-throughput mode."""
+
     max_age_days: float
     """Maximum age of entries in the audit log, in days."""
 
+    max_buffered: int = MAX_BUFFER_SIZE
+    """Maximum number of pending entries; the oldest pending entry is dropped
+    when a new entry is appended to a full buffer.
+    """
+
+    max_pending: int = MAX_BUFFER_SIZE
+    """Number of pending entries above which `append_async()` suspends the
+    caller until the entries are written, in high-throughput mode.
+    """
+
+    num_dropped: int = 0
+    """Number of entries dropped because the buffer was full."""
+
     _entries: deque[Entry]
     """The entries waiting to be flushed to the storage backend."""
 
+    _num_dropped_reported: int = 0
+    """Number of dropped entries that were already reported in the log."""
+
     _storage: Storage
     """Storage backend used by the extension."""
 
     _parking_lot: ParkingLot
+    """Parking lot where the writer task waits for new entries."""
+
+    _producers: ParkingLot
+    """Parking lot where producers wait for free space in the buffer in
+    high-throughput mode.
+    """
 
     def __init__(self):
         super().__init__()
         self._entries = deque(maxlen=MAX_BUFFER_SIZE)
         self._parking_lot = ParkingLot()
+        self._producers = ParkingLot()
         self._storage = NullStorage()
         self.max_age = 0
 
@@ -380,9 +521,26 @@ class AuditLogExtension(Extension):
         if isinstance(data, str):
             data = data.encode("utf-8")
 
+        if len(self._entries) >= self.max_buffered:
+            # The deque will drop the oldest entry
+            self.num_dropped += 1
+
         self._entries.append(Entry(time(), component, type, data))
         self._parking_lot.unpark()
 
+    async def append_async(
+        self, component: str, type: str, data: Union[str, bytes] = b""
+    ) -> None:
+        """Appends a new entry to the audit log, waiting for the pending entries
+        to be written first if there are too many of them.
+
+        In the default mode, this function is equivalent to `append()`.
+        """
+        if self.high_throughput:
+            while len(self._entries) >= self.max_pending:
+                await self._producers.park()
+        self.append(component, type, data)
+
     def configure(self, configuration: dict[str, Any]) -> None:
         db_path = self.get_data_dir() / "log.db"
         db_path.parent.mkdir(parents=True, exist_ok=True)
@@ -399,17 +557,52 @@ class AuditLogExtension(Extension):
         else:
             self.max_age_days = 0  # unlimited
 
-        self._storage = DbStorage(db_path)
+        self.high_throughput = bool(configuration.get("high_throughput", False))
+        if self.high_throughput:
+            self.batch_size = max(int(configuration.get("batch_size", 1024)), 1)
+            self.flush_interval = max(
+                float(configuration.get("flush_interval", 0.5)), 0.0
+            )
+            self.max_pending = max(
+                int(configuration.get("max_pending", 16384)), self.batch_size
+            )
+            self.max_buffered = max(
+                int(configuration.get("max_buffered", 262144)), self.max_pending
+            )
+        else:
+            self.batch_size = self.max_pending = MAX_BUFFER_SIZE
+            self.max_buffered = MAX_BUFFER_SIZE
+
+        self._entries = deque(maxlen=self.max_buffered)
+
+        self._storage = DbStorage(db_path, high_throughput=self.high_throughput)
 
     def exports(self) -> dict[str, Any]:
-        return {"append": self.append, "flush": self.flush, "query": self.query}
+        return {
+            "append": self.append,
+            "append_async": self.append_async,
+            "flush": self.flush,
+            "query": self.query,
+        }
 
     async def flush(self) -> None:
         """Flushes all pending entries to the audit log."""
-        if self._entries:
-            entries = list(self._entries)
-            self._entries.clear()
-            await self._storage.put(entries)
+        num_dropped = self.num_dropped - self._num_dropped_reported
+        if num_dropped > 0 and self.log:
+            self.log.warning(
+                f"Dropped {num_dropped} audit log entries because the buffer "
+                f"was full"
+            )
+            self._num_dropped_reported = self.num_dropped
+
+        entries = self._entries
+        while entries:
+            count = min(len(entries), self.batch_size)
+            batch = [entries.popleft() for _ in range(count)]
+            try:
+                await self._storage.put(batch)
+            finally:
+                self._producers.unpark_all()
 
     def get_logger(self, component: str) -> Callable[[str, Union[str, bytes]], None]:
         """Returns a logger function that can be called with a message type and
@@ -422,6 +615,7 @@ class AuditLogExtension(Extension):
         self,
         component: Union[str, Iterable[str], None] = None,
         *,
+        type: Union[str, Iterable[str], None] = None,
         min_date: Union[datetime, float, None] = None,
         max_date: Union[datetime, float, None] = None,
     ) -> Iterable[Entry]:
@@ -431,11 +625,12 @@ class AuditLogExtension(Extension):
         Args:
             component: the component or components that the log entries must
                 belong to
+            type: the type or types of the log entries
             min_date: the earliest date of the matched log entries, inclusive
             max_date: the latest date of the matched log entries, _exclusive_
         """
         return await self._storage.query(
-            component, min_date=min_date, max_date=max_date
+            component, type=type, min_date=min_date, max_date=max_date
         )
 
     async def run(self):
@@ -456,15 +651,10 @@ class AuditLogExtension(Extension):
                         elif count == 1:
                             self.log.info("Pruned one entry from the audit log")
 
-                while True:
-                    while self._entries:
-                        await self.flush()
-                        await sleep(0.5)
-
-                    # At this point there are no more entries waiting in the queue,
-                    # so suspend ourselves and wait until some more entries appear
-                    # in the queue
-                    await self._parking_lot.park()
+                if self.high_throughput:
+                    await self._run_batched_writer()
+                else:
+                    await self._run_writer()
             finally:
                 # Make sure that self.flush() still goes through even though
                 # the nursery is cancelled
@@ -474,6 +664,33 @@ class AuditLogExtension(Extension):
                     await self.flush()
                     self.log.info("Audit log closed")
 
+    async def _run_batched_writer(self) -> None:
+        """Writes the pending entries to the storage backend in batches,
+        whenever a full batch has accumulated or the flush interval has passed
+        since the arrival of the first pending entry.
+        """
+        while True:
+            if not self._entries:
+                await self._parking_lot.park()
+
+            with move_on_after(self.flush_interval):
+                while len(self._entries) < self.batch_size:
+                    await self._parking_lot.park()
+
+            await self.flush()
+
+    async def _run_writer(self) -> None:
+        """Writes the pending entries to the storage backend periodically."""
+        while True:
+            while self._entries:
+                await self.flush()
+                await sleep(0.5)
+
+            # At this point there are no more entries waiting in the queue,
+            # so suspend ourselves and wait until some more entries appear
+            # in the queue
+            await self._parking_lot.park()
+
 
 construct = AuditLogExtension
 description = "Audit log provider for other extensions"
@@ -489,6 +706,58 @@ schema = {
             "type": "number",
             "minimum": 0,
             "default": 365,
-        }
+        },
+        "high_throughput": {
+            "title": "High-throughput mode",
+            "description": (
+                "Use write-ahead logging, indexes and batched transactions in "
+                "the audit log database, and allow many more log entries to "
+                "wait for the database under heavy load."
+            ),
+            "type": "boolean",
+            "format": "checkbox",
+            "default": False,
+        },
+        "batch_size": {
+            "title": "Batch size",
+            "description": (
+                "Maximum number of log entries written in a single transaction "
+                "in high-throughput mode."
+            ),
+            "type": "integer",
+            "minimum": 1,
+            "default": 1024,
+        },
+        "flush_interval": {
+            "title": "Flush interval (seconds)",
+            "description": (
+                "Maximum time that a log entry may wait before it is written to "
+                "the database in high-throughput mode."
+            ),
+            "type": "number",
+            "minimum": 0,
+            "default": 0.5,
+        },
+        "max_pending": {
+            "title": "Max pending entries",
+            "description": (
+                "Number of pending log entries above which producers that "
+                "support it are suspended until the entries are written, in "
+                "high-throughput mode."
+            ),
+            "type": "integer",
+            "minimum": 1,
+            "default": 16384,
+        },
+        "max_buffered": {
+            "title": "Max buffered entries",
+            "description": (
+                "Maximum number of pending log entries in high-throughput mode. "
+                "The oldest pending entries are dropped above this limit."
+            ),
+            "type": "integer",
+            "minimum": 1,
+            "default": 262144,
+        },
     }
 }
@@ -16,6 +16,7 @@ from trio import Nursery, open_nursery, sleep
 from trio_util import periodic
 from typing import (
     Any,
+    AsyncContextManager,
     AsyncIterator,
     Callable,
     Iterable,
@@ -40,17 +41,17 @@ from flockwave.server.command_handlers import (
     create_version_command_handler,
 )
 from flockwave.server.errors import NotSupportedError
+from flockwave.server.model.devices import (
+    ChannelNode,
+    DeviceClass,
+    DeviceTreeMutator,
+    ObjectNode,
+)
 from flockwave.server.model.preflight import PreflightCheckInfo, PreflightCheckResult
 from flockwave.server.model.transport import TransportOptions
 from flockwave.server.model.uav import BatteryInfo, UAVBase, UAVDriver, VersionInfo
 from flockwave.server.registries.errors import RegistryFull
-from flockwave.server.show import (
-    get_group_index_from_show_specification,
-    get_home_position_from_show_specification,
-    get_light_program_from_show_specification,
-    get_trajectory_from_show_specification,
-    TrajectorySpecification,
-)
+from flockwave.server.show import TrajectorySpecification
 from flockwave.server.utils import color_to_rgb8_triplet, nop, optional_float
 from flockwave.spec.errors import FlockwaveErrorCode
 from flockwave.spec.ids import make_valid_object_id
@@ -65,9 +66,12 @@ from .crtp_extensions import (
     LightProgramType,
     PreflightCheckStatus,
 )
+from .connection import CrazyradioConnection
 from .fence import Fence, FenceConfiguration
+from .scanning import AddressScanStatistics
 from .trajectory import encode_trajectory, TrajectoryEncoding
 from .types import ControllerType
+from .upload import PreparedShow, PreparedShowCache, ShowUploadScheduler
 
 if TYPE_CHECKING:
     from flockwave.server.app import SkybrushServer
@@ -93,6 +97,8 @@ class CrazyflieDriver(UAVDriver["CrazyflieUAV"]):
             status requests sent to a drone
         takeoff_altitude: altitude that a UAV should take off to when receiving
             a takeoff command
+        upload_scheduler: scheduler that queues show uploads that go through
+            the same Crazyradio
     """
 
     app: "SkybrushServer"
@@ -103,11 +109,25 @@ class CrazyflieDriver(UAVDriver["CrazyflieUAV"]):
     preferred_controller: Optional[ControllerType]
     status_interval: float = 0.5
     takeoff_altitude: float = 1
+    upload_scheduler: ShowUploadScheduler
     use_test_mode: bool = False
 
     _cache_folder: Optional[str]
+    _prepared_shows: PreparedShowCache
     _address_space_by_uav_id: dict[str, Any]
     _uav_ids_by_address_space: dict[Any, dict[int, str]]
+    _uav_ids_by_uri: dict[str, str]
+
+    _uav_ids_by_uri_version: int = -1
+    """Value of the UAV address map version counter when the mapping from
+    Crazyradio URIs to UAV IDs was last rebuilt.
+    """
+
+    _uav_address_map_version: int = 0
+    """Counter that is incremented every time a new UAV ID is assigned to an
+    address in an address space. Can be used by other objects to invalidate
+    caches that depend on the mapping between UAV IDs and addresses.
+    """
 
     def __init__(
         self,
@@ -133,11 +153,14 @@ class CrazyflieDriver(UAVDriver["CrazyflieUAV"]):
         self.fence_config = FenceConfiguration()
         self.id_format = id_format
         self.preferred_controller = None
+        self.upload_scheduler = ShowUploadScheduler()
         self.use_test_mode = False
 
         self._cache_folder = str(cache.resolve()) if cache else None
+        self._prepared_shows = PreparedShowCache()
         self._address_space_by_uav_id = {}
         self._uav_ids_by_address_space = defaultdict(dict)
+        self._uav_ids_by_uri = {}
 
     def _create_uav(self, formatted_id: str) -> "CrazyflieUAV":
         """Creates a new UAV that is to be managed by this driver.
@@ -165,6 +188,13 @@ class CrazyflieDriver(UAVDriver["CrazyflieUAV"]):
         """
         return self._cache_folder
 
+    @property
+    def uav_address_map_version(self) -> int:
+        """Counter that is incremented every time the driver assigns a new UAV
+        ID to an address in an address space.
+        """
+        return self._uav_address_map_version
+
     def get_or_create_uav(self, address_space, index: int) -> Optional["CrazyflieUAV"]:
         """Retrieves the UAV with the given index in the given address space
         or creates one if the driver has not seen a UAV with the given index in
@@ -186,6 +216,7 @@ class CrazyflieDriver(UAVDriver["CrazyflieUAV"]):
             )
             self._uav_ids_by_address_space[address_space][index] = formatted_id
             self._address_space_by_uav_id[formatted_id] = address_space
+            self._uav_address_map_version += 1
 
         try:
             uav = cast(
@@ -417,6 +448,62 @@ class CrazyflieDriver(UAVDriver["CrazyflieUAV"]):
     handle_command_test = create_test_command_handler(("battery", "motor", "led"))
     handle_command_version = create_version_command_handler()
 
+    def iter_uav_addresses(self) -> Iterable[tuple[str, Any, int]]:
+        """Iterates over the UAV IDs that the driver has assigned to addresses
+        in the address spaces of the radios.
+
+        Yields:
+            triplets consisting of a UAV ID, the address space of the UAV and
+            the index of the UAV within the address space
+        """
+        for address_space, uav_ids in self._uav_ids_by_address_space.items():
+            for index, uav_id in uav_ids.items():
+                yield uav_id, address_space, index
+
+    def find_uav_by_uri(self, uri: str) -> Optional["CrazyflieUAV"]:
+        """Returns the UAV that the driver has assigned to the given Crazyradio
+        URI, or `None` if there is no such UAV.
+        """
+        if self._uav_ids_by_uri_version != self._uav_address_map_version:
+            self._uav_ids_by_uri = {
+                address_space[index]: uav_id
+                for uav_id, address_space, index in self.iter_uav_addresses()
+            }
+            self._uav_ids_by_uri_version = self._uav_address_map_version
+
+        uav_id = self._uav_ids_by_uri.get(uri)
+        if uav_id is None:
+            return None
+
+        try:
+            return cast(Any, self.app.object_registry.find_by_id(uav_id))
+        except KeyError:
+            return None
+
+    def prepare_show(self, show) -> PreparedShow:
+        """Validates the given show specification of a single drone and
+        encodes it into the payloads to upload to the drone. Encoded shows
+        are cached so retries and repeated uploads of the same show are not
+        encoded again.
+
+        Raises:
+            RuntimeError: if the show cannot be uploaded to a Crazyflie drone
+        """
+        return self._prepared_shows.get(show)
+
+    def use_upload_slot(self, uav: "CrazyflieUAV") -> AsyncContextManager[None]:
+        """Returns an async context manager that waits until a show upload may
+        start to the given UAV, based on the Crazyradio and the address space
+        of the UAV, and that lets the next upload start on the same radio when
+        the context is exited.
+        """
+        uri = uav.uri or ""
+        radio = CrazyradioConnection.parse_radio_index_from_uri(uri)
+        address_space = self._address_space_by_uav_id.get(uav.id)
+        return self.upload_scheduler.use_radio(
+            uri if radio is None else radio, address_space
+        )
+
     def sort_uav_ids_by_address_spaces(
         self, ids: Iterable[str]
     ) -> dict[Any, list[str]]:
@@ -549,6 +636,7 @@ class CrazyflieUAV(UAVBase):
     _fence: Optional[Fence]
     _fence_breached: bool
     _log_session: Optional[LogSession]
+    _scan_channels: dict[str, ChannelNode]
 
     def __init__(self, *args, **kwds):
         super().__init__(*args, **kwds)
@@ -580,6 +668,22 @@ class CrazyflieUAV(UAVBase):
     def fence(self) -> Optional[Fence]:
         return self._fence
 
+    def update_scan_statistics(
+        self, stats: AddressScanStatistics, mutator: DeviceTreeMutator
+    ) -> None:
+        """Updates the channels of the device tree of the UAV that show the
+        response statistics of its address during Crazyradio scans.
+
+        Parameters:
+            stats: the response statistics of the address of the UAV
+            mutator: the mutator to use for updating the device tree
+        """
+        channels = self._scan_channels
+        mutator.update(channels["scans"], stats.num_scans)
+        mutator.update(channels["responses"], stats.num_responses)
+        mutator.update(channels["misses"], stats.num_consecutive_misses)
+        mutator.update(channels["delay"], stats.delay)
+
     async def arm(self, force: bool = False) -> None:
         """Arms the motors of the Crazyflie."""
         await self._get_crazyflie().run_command(
@@ -1028,46 +1132,53 @@ class CrazyflieUAV(UAVBase):
             raise NotSupportedError
 
     async def upload_show(self, show, *, remember: bool = True) -> None:
-        home = get_home_position_from_show_specification(show)
-        trajectory = get_trajectory_from_show_specification(show)
-        group_index = get_group_index_from_show_specification(show)
-        if group_index > 7:
-            raise RuntimeError("Crazyflie drones support at most 8 groups only")
+        """Uploads the given show to the UAV.
 
-        scale = trajectory.propose_scaling_factor()
-        if scale > 1:
-            raise RuntimeError("Trajectory covers too large an area for a Crazyflie")
+        The upload waits until the scheduler of the driver lets it start on
+        the Crazyradio of the UAV.
 
-        light_program = get_light_program_from_show_specification(show)
-        try:
-            await self._upload_light_program(light_program)
-        except OSError as ex:
-            if ex.errno == EIO:
-                raise RuntimeError(
-                    "IO error while uploading light program; is it too large?"
-                ) from None
-            else:
-                raise
+        Parameters:
+            show: the show specification
+            remember: whether to remember the show so it can be uploaded
+                again if the UAV is rebooted
+        """
+        prepared = self.driver.prepare_show(show)
 
-        # TODO: support yaw control for Crazyflie drones as well
-        # yaw_setpoints = get_yaw_setpoints_from_show_specification(show)
+        async with self.driver.use_upload_slot(self):
+            try:
+                await self._upload_light_program(prepared.light_program)
+            except OSError as ex:
+                if ex.errno == EIO:
+                    raise RuntimeError(
+                        "IO error while uploading light program; is it too large?"
+                    ) from None
+                else:
+                    raise
 
-        try:
-            await self._upload_trajectory_and_fence(
-                trajectory, home, fence_config=self.driver.fence_config
-            )
-        except OSError as ex:
-            if ex.errno == EIO:
-                raise RuntimeError(
-                    "IO error while uploading trajectory; is it too large?"
-                ) from None
-            else:
-                raise
+            # TODO: support yaw control for Crazyflie drones as well
+            # yaw_setpoints = get_yaw_setpoints_from_show_specification(show)
 
-        assert self._crazyflie is not None
-        await self._crazyflie.high_level_commander.set_group_mask(1 << group_index)
+            try:
+                await self._upload_trajectory_and_fence(
+                    prepared.trajectory,
+                    prepared.home,
+                    fence_config=self.driver.fence_config,
+                    data=prepared.trajectory_data,
+                )
+            except OSError as ex:
+                if ex.errno == EIO:
+                    raise RuntimeError(
+                        "IO error while uploading trajectory; is it too large?"
+                    ) from None
+                else:
+                    raise
 
-        await self._enable_show_mode()
+            assert self._crazyflie is not None
+            await self._crazyflie.high_level_commander.set_group_mask(
+                1 << prepared.group_index
+            )
+
+            await self._enable_show_mode()
 
         self._last_uploaded_show = show if remember else None
 
@@ -1181,6 +1292,15 @@ class CrazyflieUAV(UAVBase):
 
         self.notify_updated()
 
+    def _initialize_device_tree_node(self, node: ObjectNode) -> None:
+        device = node.add_device("scanner", DeviceClass.RADIO)
+        self._scan_channels = {
+            "scans": device.add_channel("scans", type=int),
+            "responses": device.add_channel("responses", type=int),
+            "misses": device.add_channel("misses", type=int),
+            "delay": device.add_channel("delay", type=float, unit="s"),
+        }
+
     def _reset_status_variables(self) -> None:
         """Resets the status variables of the UAV, typically after connecting
         to the UAV or after re-establishing a connection.
@@ -1324,9 +1444,18 @@ class CrazyflieUAV(UAVBase):
         trajectory: TrajectorySpecification,
         home: Optional[tuple[float, float, float]],
         fence_config: FenceConfiguration,
+        data: Optional[bytes] = None,
     ) -> None:
         """Uploads the given trajectory data to the Crazyflie drone and applies
         the given safety fence configuration.
+
+        Parameters:
+            trajectory: the trajectory to upload
+            home: the home position of the drone; `None` means to use the
+                home position of the trajectory
+            fence_config: the safety fence configuration to apply
+            data: the trajectory in the compressed Crazyflie encoding, if it
+                has been encoded already
         """
         cf = self._get_crazyflie()
 
@@ -1350,7 +1479,10 @@ class CrazyflieUAV(UAVBase):
         await self.set_parameter("show.landingHeight", trajectory.landing_height)
 
         # Encode the trajectory and write it to the Crazyflie memory
-        data = encode_trajectory(trajectory, encoding=TrajectoryEncoding.COMPRESSED)
+        if data is None:
+            data = encode_trajectory(
+                trajectory, encoding=TrajectoryEncoding.COMPRESSED
+            )
         addr = await write_with_checksum(
             trajectory_memory, 0, data, only_if_changed=True
         )
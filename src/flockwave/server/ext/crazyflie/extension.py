@@ -19,8 +19,14 @@ from .driver import CrazyflieDriver
 from .fence import FenceConfiguration
 from .led_lights import CrazyflieLEDLightConfigurationManager, LightConfiguration
 from .mocap import CrazyflieMocapFrameHandler
-from .scanning import CrazyradioScannerTask, ScannerTaskEvent
+from .scanning import (
+    AdaptiveScheduler,
+    AddressScanStatistics,
+    CrazyradioScannerTask,
+    ScannerTaskEvent,
+)
 from .types import ControllerType
+from .upload import ShowUploadScheduler
 
 if TYPE_CHECKING:
     from flockwave.server.ext.motion_capture import MotionCaptureFrame
@@ -36,6 +42,15 @@ class CrazyflieDronesExtension(UAVExtension[CrazyflieDriver]):
 
     _driver: CrazyflieDriver
 
+    _scan_schedulers: dict[str, AdaptiveScheduler]
+    """The adaptive scanning schedules of the radio connections, keyed by the
+    IDs of the connections in the connection registry.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._scan_schedulers = {}
+
     def _create_driver(self) -> CrazyflieDriver:
         assert self.app is not None
         return CrazyflieDriver(cache=self.get_cache_dir())
@@ -56,6 +71,9 @@ class CrazyflieDronesExtension(UAVExtension[CrazyflieDriver]):
         driver.log = self.log
         driver.status_interval = float(configuration.get("status_interval", 0.5))
         driver.takeoff_altitude = float(configuration.get("takeoff_altitude", 1.0))
+        driver.upload_scheduler = ShowUploadScheduler(
+            int(configuration.get("max_uploads_per_radio", 2))
+        )
         driver.use_test_mode = bool(configuration.get("testing", False))
 
         controller_spec = configuration.get("controller")
@@ -68,6 +86,9 @@ class CrazyflieDronesExtension(UAVExtension[CrazyflieDriver]):
         else:
             driver.preferred_controller = preferred_controller
 
+    def exports(self) -> dict[str, Any]:
+        return {"get_scan_statistics": self._get_scan_statistics}
+
     async def run(self, app, configuration):
         from aiocflib.crtp.drivers import init_drivers
         from aiocflib.crtp.drivers.radio import SharedCrazyradio
@@ -156,14 +177,17 @@ class CrazyflieDronesExtension(UAVExtension[CrazyflieDriver]):
 
                     # Create a dedicated mocap frame handler for the connection
                     mocap_frame_handler = CrazyflieMocapFrameHandler(
-                        self._driver, broadcaster
+                        self._driver,
+                        broadcaster,
+                        address_space=getattr(connection, "address_space", None),
                     )
 
                     # Register the radio connection in the connection registry
+                    connection_id = f"Crazyradio{index}"
                     stack.enter_context(
                         app.connection_registry.use(
                             connection,
-                            f"Crazyradio{index}",
+                            connection_id,
                             description=f"Crazyradio connection {index}",
                             purpose=ConnectionPurpose.uavRadioLink,  # type: ignore
                         )
@@ -194,6 +218,16 @@ class CrazyflieDronesExtension(UAVExtension[CrazyflieDriver]):
                     # connected drones
                     nursery.start_soon(led_manager.run)
 
+                    # Create the scanning schedule of the radio connection. It is
+                    # shared between restarts of the scanner task so the
+                    # response statistics of the addresses are kept
+                    scheduler = self._create_scan_scheduler(configuration)
+                    if scheduler is not None:
+                        self._scan_schedulers[connection_id] = scheduler
+                        stack.callback(
+                            self._scan_schedulers.pop, connection_id, None
+                        )
+
                     # Run a background task that scans the radio connection and
                     # attempts to find newly booted Crazyflie drones
                     task = partial(
@@ -201,6 +235,7 @@ class CrazyflieDronesExtension(UAVExtension[CrazyflieDriver]):
                         log=self.log,
                         channel=new_uav_tx_channel,
                         initial_delay=(index / num_connections),
+                        scheduler=scheduler,
                     )
                     nursery.start_soon(partial(app.supervise, connection, task=task))
 
@@ -219,6 +254,52 @@ class CrazyflieDronesExtension(UAVExtension[CrazyflieDriver]):
                         if uav:
                             nursery.start_soon(uav.run, disposer)
 
+    def _create_scan_scheduler(
+        self, configuration: dict[str, Any]
+    ) -> Optional[AdaptiveScheduler]:
+        """Creates the scanning schedule of a single radio connection based on
+        the configuration of the extension.
+
+        Returns:
+            the scheduler to use, or `None` if the default, fixed scanning
+            schedule should be used
+        """
+        if not configuration.get("adaptive_scanning", True):
+            return None
+
+        scheduler = AdaptiveScheduler(
+            max_delay=float(configuration.get("max_scan_delay", 10)),
+            airtime_budget=float(configuration.get("scan_airtime_budget", 0.25)),
+        )
+        scheduler.on_statistics_updated = self._on_scan_statistics_updated
+        return scheduler
+
+    def _get_scan_statistics(self) -> dict[str, dict[str, Any]]:
+        """Returns the statistics of the adaptive scanning schedule of each
+        radio connection, keyed by the IDs of the connections.
+
+        The statistics of a connection contain the total airtime spent on
+        scanning, the number of scanned batches and the response statistics
+        of each scanned address, including addresses without drones.
+        """
+        return {
+            connection_id: scheduler.json
+            for connection_id, scheduler in self._scan_schedulers.items()
+        }
+
+    def _on_scan_statistics_updated(
+        self, statistics: list[AddressScanStatistics]
+    ) -> None:
+        """Handler that is called when the adaptive scanning schedule of a
+        radio connection updates the response statistics of some addresses.
+        Forwards the statistics to the device trees of the corresponding UAVs.
+        """
+        with self.create_device_tree_mutation_context() as mutator:
+            for stats in statistics:
+                uav = self._driver.find_uav_by_uri(stats.address)
+                if uav:
+                    uav.update_scan_statistics(stats, mutator)
+
     def _on_motion_capture_frame_received(
         self,
         sender,
@@ -302,6 +383,56 @@ schema = {
             "format": "checkbox",
             "propertyOrder": 2000,
         },
+        "adaptive_scanning": {
+            "type": "boolean",
+            "title": "Adaptive scanning",
+            "format": "checkbox",
+            "default": True,
+            "description": (
+                "Scan addresses that never respond less and less frequently, "
+                "and scan the addresses of recently lost drones first. When "
+                "disabled, the whole address space is scanned at fixed "
+                "intervals."
+            ),
+            "propertyOrder": 2000,
+        },
+        "max_scan_delay": {
+            "type": "number",
+            "title": "Maximum delay between scans of an address",
+            "description": (
+                "Maximum number of seconds between consecutive scans of an "
+                "address that does not respond, when adaptive scanning is "
+                "enabled. Newly booted drones may take this long to appear."
+            ),
+            "minimum": 1,
+            "default": 10,
+            "propertyOrder": 2000,
+        },
+        "scan_airtime_budget": {
+            "type": "number",
+            "title": "Scanning airtime budget",
+            "description": (
+                "Maximum fraction of the time that a Crazyradio may spend on "
+                "scanning for drones when adaptive scanning is enabled, "
+                "leaving the rest for motion capture and command traffic."
+            ),
+            "minimum": 0.01,
+            "maximum": 1,
+            "default": 0.25,
+            "propertyOrder": 2000,
+        },
+        "max_uploads_per_radio": {
+            "type": "integer",
+            "title": "Concurrent show uploads per radio",
+            "description": (
+                "Maximum number of drones that may receive their shows at the "
+                "same time through the same Crazyradio. Uploads through "
+                "different radios always run concurrently."
+            ),
+            "minimum": 1,
+            "default": 2,
+            "propertyOrder": 2000,
+        },
         "fence": {
             "type": "object",
             "title": "Safety fence",
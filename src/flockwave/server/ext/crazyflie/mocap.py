@@ -1,14 +1,12 @@
-from typing import TYPE_CHECKING
+from struct import Struct
+from typing import Any, ClassVar, Optional, TYPE_CHECKING
 
 from aiocflib.crtp.crtpstack import CRTPPort
 from aiocflib.crazyflie.localization import (
     GenericLocalizationCommand,
-    Localization,
     LocalizationChannel,
 )
-from aiocflib.utils.quaternion import QuaternionXYZW
-
-from flockwave.server.utils import chunks
+from aiocflib.utils.quaternion import compress_unit_quaternion
 
 from .connection import BroadcasterFunction
 
@@ -19,14 +17,59 @@ if TYPE_CHECKING:
 __all__ = ("CrazyflieMocapFrameHandler",)
 
 
+_UNRESOLVED = object()
+"""Marker object used in the target cache of the mocap frame handler for
+rigid body names that were not resolved yet.
+"""
+
+
+def _get_numeric_id(address_space, index: int) -> int:
+    """Returns the numeric ID of the Crazyflie with the given index in the
+    given address space, as used in localization packets, i.e. the last byte
+    of the radio address of the Crazyflie.
+    """
+    get_address_for = getattr(address_space, "get_address_for", None)
+    return get_address_for(index)[-1] if get_address_for else index & 0xFF
+
+
 class CrazyflieMocapFrameHandler:
     """Handler task that receives frames from mocap systems and dispatches
     the appropriate packets to the corresponding Crazyflie drones.
+
+    Each handler belongs to a single radio connection and forwards only the
+    localization packets of those Crazyflies that are accessible through the
+    address space of the connection.
+    """
+
+    _position_packet_struct: ClassVar[Struct] = Struct("<Bhhh")
+    _pose_packet_struct: ClassVar[Struct] = Struct("<BhhhL")
+
+    _address_space: Any
+    """The address space of the radio connection that the handler belongs to;
+    `None` if the handler should forward the packets of all the Crazyflies.
     """
 
     _broadcaster: BroadcasterFunction
     _driver: "CrazyflieDriver"
 
+    _pose_buffer: bytearray
+    """Reusable buffer for assembling packed external pose packets."""
+
+    _position_buffer: bytearray
+    """Reusable buffer for assembling packed external position packets."""
+
+    _targets: dict[str, Optional[int]]
+    """Cache that maps the names of rigid bodies in mocap frames to the
+    numeric IDs of the corresponding Crazyflies in the address space of the
+    handler, or to `None` if the rigid body does not belong to a Crazyflie in
+    the address space of the handler.
+    """
+
+    _targets_version: int = -1
+    """Version number of the UAV address map of the driver when the target
+    cache was last validated.
+    """
+
     send_pose: bool
     """Whether to send full pose information if it is available."""
 
@@ -35,69 +78,157 @@ class CrazyflieMocapFrameHandler:
         driver: "CrazyflieDriver",
         broadcaster: BroadcasterFunction,
         *,
+        address_space: Any = None,
         send_pose: bool = True,
     ):
-        """Constructor."""
+        """Constructor.
+
+        Parameters:
+            driver: the Crazyflie driver
+            broadcaster: function to call to broadcast a packet over the
+                radio connection of the handler
+            address_space: the address space of the radio connection of the
+                handler; `None` means to forward the packets of all the
+                Crazyflies
+            send_pose: whether to send full pose information if it is
+                available
+        """
+        self._address_space = address_space
         self._broadcaster = broadcaster
         self._driver = driver
         self.send_pose = bool(send_pose)
 
+        # Crazyflie broadcast localization packets can accommodate coordinates
+        # for 4 drones when we send only position information, or for 2 drones
+        # when pose is also needed
+        self._position_buffer = bytearray(self._position_packet_struct.size * 4)
+        self._pose_buffer = bytearray(1 + self._pose_packet_struct.size * 2)
+        self._pose_buffer[0] = GenericLocalizationCommand.EXT_POSE_PACKED
+
+        self._targets = {}
+
     def notify_frame(self, frame: "MotionCaptureFrame") -> None:
         # In theory, the signal that calls this function is rate-limited by the
         # mocap extension, so this function is not called "too often" -- that's
         # why there's no rate limiting here. Add rate limiting if this becomes
         # a problem.
 
-        # TODO(ntamas): broadcast only those that match the address space of
-        # the broadcaster; the current solution does not work for multiple
-        # Crazyradios in different address spaces yet
+        if self._targets_version != self._driver.uav_address_map_version:
+            self._targets.clear()
+            self._targets_version = self._driver.uav_address_map_version
+
+        targets = self._targets
+        send_pose = self.send_pose
+
+        pack_position = self._position_packet_struct.pack_into
+        position_buffer = self._position_buffer
+        position_size = self._position_packet_struct.size
+        num_positions = 0
 
-        positions: list[tuple[int, tuple[float, float, float]]] = []
-        poses: list[tuple[int, tuple[float, float, float], QuaternionXYZW]] = []
+        pack_pose = self._pose_packet_struct.pack_into
+        pose_buffer = self._pose_buffer
+        pose_size = self._pose_packet_struct.size
+        num_poses = 0
 
         for item in frame.items:
-            # TODO(ntamas): currently we assume that the numeric ID of the
-            # Crazyflie that we need to send in the localization packet is
-            # equal to the numeric ID in Skybrush. This is a hack, but we do not
-            # have a better mechanism yet; the other option would be to take the
-            # Crazyflie URI, assume that it ends with the radio address in hex,
-            # and then convert the last two characters back to a numeric ID.
-            try:
-                numeric_id = int(item.name)
-            except ValueError:
-                continue
+            numeric_id = targets.get(item.name, _UNRESOLVED)
+            if numeric_id is _UNRESOLVED:
+                numeric_id = targets[item.name] = self._resolve(item.name)
 
-            if item.position is None:
-                # No position, we cannot do anything with this item
+            if numeric_id is None or item.position is None:
+                # Not one of our drones or no position; we cannot do anything
+                # with this item
                 continue
 
-            if item.attitude is None or not self.send_pose:
+            x, y, z = item.position
+
+            if item.attitude is None or not send_pose:
                 # This item only has position information but no attitude
-                positions.append((numeric_id, item.position))
+                pack_position(
+                    position_buffer,
+                    num_positions * position_size,
+                    numeric_id,
+                    int(x * 1000),
+                    int(y * 1000),
+                    int(z * 1000),
+                )
+                num_positions += 1
+                if num_positions == 4:
+                    self._send_positions(num_positions)
+                    num_positions = 0
             else:
-                # This item has both position and attitude info, but we need to
-                # convert the attitude to a QuaternionXYZW
-                w, x, y, z = item.attitude
-                poses.append((numeric_id, item.position, QuaternionXYZW(x, y, z, w)))
-
-        # Crazyflie broadcast localization packets can accommodate coordinates
-        # for 4 drones when we send only position information
-        for chunk in chunks(positions, 4):
-            packet = Localization.encode_external_position_packed(chunk)
-            self._broadcaster(
-                CRTPPort.LOCALIZATION,
-                LocalizationChannel.POSITION_PACKED,
-                packet,
-            )
-
-        # Crazyflie broadcast localization packets can accommodate coordinates
-        # for 2 drones when pose is also needed
-        for chunk in chunks(poses, 2):
-            packet = bytes(
-                [GenericLocalizationCommand.EXT_POSE_PACKED]
-            ) + Localization.encode_external_pose_packed(chunk)
-            self._broadcaster(
-                CRTPPort.LOCALIZATION,
-                LocalizationChannel.GENERIC,
-                packet,
-            )
+                # This item has both position and attitude info; the attitude
+                # needs to be compressed in XYZW order
+                qw, qx, qy, qz = item.attitude
+                pack_pose(
+                    pose_buffer,
+                    1 + num_poses * pose_size,
+                    numeric_id,
+                    int(x * 1000),
+                    int(y * 1000),
+                    int(z * 1000),
+                    compress_unit_quaternion((qx, qy, qz, qw)),  # type: ignore
+                )
+                num_poses += 1
+                if num_poses == 2:
+                    self._send_poses(num_poses)
+                    num_poses = 0
+
+        if num_positions:
+            self._send_positions(num_positions)
+        if num_poses:
+            self._send_poses(num_poses)
+
+    def _resolve(self, name: str) -> Optional[int]:
+        """Resolves the name of a rigid body in a mocap frame to the numeric ID
+        of the corresponding Crazyflie in the address space of the handler.
+
+        The name is matched against the UAV IDs of the Crazyflies known to the
+        driver first. If there is no such UAV, the name is assumed to be the
+        numeric ID of the Crazyflie, i.e. the index of the Crazyflie in its
+        address space. Rigid bodies with a numeric name that do not match a
+        known Crazyflie in any of the address spaces are forwarded everywhere.
+
+        Returns:
+            the numeric ID of the Crazyflie, or `None` if the rigid body does
+            not belong to a Crazyflie in the address space of the handler
+        """
+        index: Optional[int]
+        try:
+            index = int(name)
+        except ValueError:
+            index = None
+
+        addresses = [
+            (address_space, uav_index)
+            for uav_id, address_space, uav_index in self._driver.iter_uav_addresses()
+            if uav_id == name
+        ]
+        if not addresses and index is not None:
+            addresses = [
+                (address_space, uav_index)
+                for _, address_space, uav_index in self._driver.iter_uav_addresses()
+                if uav_index == index
+            ]
+
+        if not addresses:
+            # Not a known drone yet; assume that the name is the numeric ID
+            return index if index is not None and 0 <= index < 256 else None
+
+        for address_space, uav_index in addresses:
+            if self._address_space is None or address_space is self._address_space:
+                return _get_numeric_id(address_space, uav_index)
+
+        return None
+
+    def _send_poses(self, count: int) -> None:
+        length = 1 + count * self._pose_packet_struct.size
+        packet = bytes(memoryview(self._pose_buffer)[:length])
+        self._broadcaster(CRTPPort.LOCALIZATION, LocalizationChannel.GENERIC, packet)
+
+    def _send_positions(self, count: int) -> None:
+        length = count * self._position_packet_struct.size
+        packet = bytes(memoryview(self._position_buffer)[:length])
+        self._broadcaster(
+            CRTPPort.LOCALIZATION, LocalizationChannel.POSITION_PACKED, packet
+        )
@@ -2,13 +2,16 @@
 of a Crazyflie address space for Crazyflie drones.
 """
 
+from dataclasses import dataclass
 from errno import ENODEV
 from functools import partial
+from math import inf
 from time import monotonic
-from trio import Event, move_on_after, sleep
+from trio import current_time, Event, move_on_after, sleep
 from trio.abc import ReceiveChannel, SendChannel
 from typing import (
     TYPE_CHECKING,
+    Any,
     AsyncIterable,
     Callable,
     ClassVar,
@@ -25,7 +28,12 @@ from .connection import CrazyradioConnection
 if TYPE_CHECKING:
     from aiocflib.utils.addressing import RadioAddressSpace
 
-__all__ = ("CrazyradioScannerTask",)
+__all__ = (
+    "AdaptiveScheduler",
+    "AddressScanStatistics",
+    "CrazyradioScannerTask",
+    "DefaultScheduler",
+)
 
 
 #: Typing for address list getters, i.e. functions that can be called with
@@ -69,6 +77,28 @@ class Scheduler:
     def _run(self, addresses: AddressListGetter) -> AsyncIterable[Optional[list[str]]]:
         raise NotImplementedError
 
+    def notify_lost(self, address: str) -> None:
+        """Notifies the scheduler that we have lost contact with the drone at
+        the given address and the address should be scanned again.
+        """
+        pass
+
+    def notify_scanned(
+        self,
+        targets: Iterable[str],
+        found: Iterable[str],
+        duration: Optional[float] = None,
+    ) -> None:
+        """Notifies the scheduler about the result of a scan.
+
+        Parameters:
+            targets: the addresses that were scanned
+            found: the addresses where a drone responded to the scan
+            duration: the time that the radio spent on the scan, in seconds;
+                `None` if it is not known
+        """
+        pass
+
     def wake_up(self) -> None:
         """Wakes up the scheduler and asks it to do the next scan as soon as
         possible.
@@ -151,6 +181,239 @@ class DefaultScheduler(Scheduler):
         self._speedup_counter = 10
 
 
+@dataclass
+class AddressScanStatistics:
+    """Response statistics of a single Crazyradio address, collected by the
+    adaptive scheduler.
+    """
+
+    address: str
+    """The address that the statistics belong to."""
+
+    num_scans: int = 0
+    """Number of scans that included the address."""
+
+    num_responses: int = 0
+    """Number of scans in which a drone responded at the address."""
+
+    num_consecutive_misses: int = 0
+    """Number of consecutive scans in which no drone responded at the address."""
+
+    delay: float = 0.0
+    """Current delay between consecutive scans of the address, in seconds."""
+
+    next_scan_at: float = -inf
+    """Time when the address is due to be scanned again, according to the
+    Trio clock.
+    """
+
+    prioritized_until: float = -inf
+    """Time until the address is scanned with priority because we have lost
+    contact with the drone at the address recently, according to the Trio
+    clock.
+    """
+
+    @property
+    def json(self) -> dict[str, Any]:
+        """Returns the JSON representation of the statistics."""
+        return {
+            "scans": self.num_scans,
+            "responses": self.num_responses,
+            "misses": self.num_consecutive_misses,
+            "delay": round(self.delay, 3),
+        }
+
+
+class AdaptiveScheduler(Scheduler):
+    """Scanning schedule for a Crazyradio connection that adapts to the
+    responses received from the individual addresses.
+
+    Each address is scanned again after a delay that starts from a minimum
+    value and doubles with every further consecutive scan in which no drone
+    responded at the address, up to a maximum value. Addresses where we have
+    lost contact with a drone recently are scanned first and at the minimum
+    delay for a while.
+    Due addresses are scanned in batches; the time that the radio spends on
+    scanning a batch is reported to the scheduler and the scheduler waits
+    after each batch such that scanning takes up at most a given fraction of
+    the airtime of the radio.
+    """
+
+    airtime: float
+    """Total time spent on scanning so far, in seconds."""
+
+    num_batches: int
+    """Total number of batches scanned so far."""
+
+    on_statistics_updated: Optional[Callable[[list[AddressScanStatistics]], None]]
+    """Function to call with the statistics of the addresses that were updated
+    after a scan or after losing contact with a drone.
+    """
+
+    statistics: dict[str, AddressScanStatistics]
+    """Response statistics of the addresses that were scanned so far, keyed by
+    the addresses.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 8,
+        *,
+        min_delay: float = 1,
+        max_delay: float = 10,
+        airtime_budget: float = 0.25,
+        lost_priority_period: float = 30,
+    ):
+        """Constructor.
+
+        Parameters:
+            batch_size: maximum number of addresses to scan in a single batch
+            min_delay: minimum number of seconds between consecutive scans of
+                the same address
+            max_delay: maximum number of seconds between consecutive scans of
+                the same address
+            airtime_budget: maximum fraction of the time that the radio may
+                spend on scanning, between 0 (exclusive) and 1 (inclusive)
+            lost_priority_period: number of seconds for which an address is
+                prioritized after losing contact with the drone at the address
+        """
+        self._batch_size = max(1, batch_size)
+        self._min_delay = min_delay
+        self._max_delay = max(min_delay, max_delay)
+        self._airtime_budget = min(max(airtime_budget, 0.01), 1)
+        self._lost_priority_period = lost_priority_period
+        self._wakeup_event = Event()
+        self._scan_duration = None
+
+        self.airtime = 0.0
+        self.num_batches = 0
+        self.on_statistics_updated = None
+        self.statistics = {}
+
+    @property
+    def json(self) -> dict[str, Any]:
+        """Returns the JSON representation of the scanning statistics of the
+        radio connection that this scheduler belongs to, including the
+        addresses where no drone has responded so far.
+        """
+        return {
+            "airtime": round(self.airtime, 3),
+            "batches": self.num_batches,
+            "addresses": {
+                address: stats.json for address, stats in self.statistics.items()
+            },
+        }
+
+    def get_statistics(self, address: str) -> AddressScanStatistics:
+        """Returns the response statistics of the given address, creating a
+        new entry if needed.
+        """
+        stats = self.statistics.get(address)
+        if stats is None:
+            stats = self.statistics[address] = AddressScanStatistics(
+                address=address, delay=self._min_delay
+            )
+        return stats
+
+    def notify_lost(self, address: str) -> None:
+        now = current_time()
+
+        stats = self.get_statistics(address)
+        stats.num_consecutive_misses = 0
+        stats.delay = self._min_delay
+        stats.next_scan_at = now
+        stats.prioritized_until = now + self._lost_priority_period
+
+        self._notify_statistics_updated([stats])
+
+    def notify_scanned(
+        self,
+        targets: Iterable[str],
+        found: Iterable[str],
+        duration: Optional[float] = None,
+    ) -> None:
+        now = current_time()
+        self._scan_duration = duration
+        found = set(found)
+        updated: list[AddressScanStatistics] = []
+
+        for address in targets:
+            stats = self.get_statistics(address)
+            stats.num_scans += 1
+
+            if address in found:
+                stats.num_responses += 1
+                stats.num_consecutive_misses = 0
+                stats.delay = self._min_delay
+                stats.prioritized_until = -inf
+            else:
+                stats.num_consecutive_misses += 1
+                if stats.prioritized_until > now:
+                    stats.delay = self._min_delay
+                else:
+                    exponent = min(stats.num_consecutive_misses - 1, 32)
+                    stats.delay = min(self._min_delay * 2**exponent, self._max_delay)
+
+            stats.next_scan_at = now + stats.delay
+            updated.append(stats)
+
+        self._notify_statistics_updated(updated)
+
+    def wake_up(self) -> None:
+        """Wakes up the scheduler and asks it to check for due addresses as
+        soon as possible.
+        """
+        self._wakeup_event.set()
+
+    async def _run(self, addresses: AddressListGetter):
+        while True:
+            now = current_time()
+            candidates = [self.get_statistics(address) for address in addresses(0)]
+            due = [stats for stats in candidates if stats.next_scan_at <= now]
+
+            if not due:
+                # Wait until the next address becomes due, or until we are
+                # woken up explicitly
+                if candidates:
+                    delay = min(stats.next_scan_at for stats in candidates) - now
+                else:
+                    delay = self._max_delay
+
+                with move_on_after(max(delay, 0)):
+                    await self._wakeup_event.wait()
+                self._wakeup_event = Event()
+                continue
+
+            # Prioritized addresses come first, then the ones that have been
+            # waiting for the longest time
+            due.sort(
+                key=lambda stats: (stats.prioritized_until <= now, stats.next_scan_at)
+            )
+            targets = [stats.address for stats in due[: self._batch_size]]
+
+            self._scan_duration = None
+            started_at = current_time()
+            yield targets
+
+            # Count only the time spent by the radio on the scan if the caller
+            # reported it, not the time spent on processing the results
+            elapsed = self._scan_duration
+            if elapsed is None:
+                elapsed = current_time() - started_at
+
+            self.airtime += elapsed
+            self.num_batches += 1
+
+            # Stay silent for a while to keep within the airtime budget
+            cooldown = elapsed * (1 - self._airtime_budget) / self._airtime_budget
+            if cooldown > 0:
+                await sleep(cooldown)
+
+    def _notify_statistics_updated(self, updated: list[AddressScanStatistics]):
+        if updated and self.on_statistics_updated:
+            self.on_statistics_updated(updated)
+
+
 ScannerTaskEvent = tuple["RadioAddressSpace", int, Callable[[], None]]
 ScannerTaskSendChannel = SendChannel[ScannerTaskEvent]
 ScannerTaskReceiveChannel = ReceiveChannel[ScannerTaskEvent]
@@ -186,16 +449,25 @@ class CrazyradioScannerTask:
             conn.notify_error()
             await conn.wait_until_disconnected()
 
-    def __init__(self, conn: CrazyradioConnection, log=None):
+    def __init__(
+        self,
+        conn: CrazyradioConnection,
+        log=None,
+        scheduler: Optional[Scheduler] = None,
+    ):
         """Constructor.
 
         Parameters:
             conn: the connection that the task handles
+            scheduler: the scheduler that decides which addresses to scan and
+                when. `None` means to use a new DefaultScheduler_ instance
+                every time the task is started.
         """
         self._conn = conn
         self._excluded = set()
         self._priorities = {}
         self._log = log
+        self._scheduler = scheduler
 
     def _get_priority_of_address(self, address: str) -> int:
         """Returns the priority of an address in the order in which they are
@@ -234,6 +506,7 @@ class CrazyradioScannerTask:
 
         # Prioritize scanning for this URI for the next 10 full scans
         self._priorities[uri] = 10
+        scheduler.notify_lost(uri)
         scheduler.wake_up()
 
     def _update_priorities(self) -> None:
@@ -300,7 +573,7 @@ class CrazyradioScannerTask:
     async def _run(self, channel: ScannerTaskSendChannel) -> None:
         self._excluded = set()
 
-        scheduler = DefaultScheduler()
+        scheduler = self._scheduler or DefaultScheduler()
         gen = scheduler.run(self._get_scannable_addresses)
 
         async with aclosing(gen):
@@ -310,11 +583,22 @@ class CrazyradioScannerTask:
                 # immediately with a communication timeout when we try to
                 # initialize the connection. This should be fixed so we handle
                 # suspended drones gracefully.
+                started_at = current_time()
                 result = await self._conn.scan(targets)
+                duration = current_time() - started_at
                 self.__class__.last_invocation_failed = False
 
-                for target in result:
-                    target = target.to_uri(index=self._conn.crazyradio_index)
+                found = [
+                    target.to_uri(index=self._conn.crazyradio_index)
+                    for target in result
+                ]
+                scheduler.notify_scanned(
+                    targets if targets is not None else self._conn.address_space,
+                    found,
+                    duration,
+                )
+
+                for target in found:
                     address_space = self._conn.address_space
 
                     try:
@@ -5,7 +5,12 @@ understood by the Crazyflies.
 from dataclasses import dataclass
 from enum import IntEnum
 from struct import Struct
-from typing import Sequence
+from typing import Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from flockwave.server.show.formats import SegmentEncoder
 from flockwave.server.show.trajectory import TrajectorySpecification
@@ -183,14 +188,21 @@ def encode_trajectory(
         the encoded trajectory
     """
     if encoding is TrajectoryEncoding.POLY4D:
-        polynomials = to_poly4d_sequence(trajectory)
-        result = b"".join(polynomial.encode() for polynomial in polynomials)
+        result = None
+        if np is not None:
+            arrays = _to_poly4d_arrays(trajectory)
+            if arrays is not None and len(arrays[0]) >= _batch_threshold:
+                result = _encode_poly4d_arrays(*arrays)
+
+        if result is None:
+            polynomials = to_poly4d_sequence(trajectory)
+            result = b"".join(polynomial.encode() for polynomial in polynomials)
     else:
         encoder = SegmentEncoder(scale=1)
-        encoded = encoder.iter_encode_multiple_segments(
+        encoded = encoder.encode_multiple_segments(
             trajectory.iter_segments(max_length=65)
         )
-        result = b"".join(encoded) + b"\x00\x00\x00"
+        result = encoded + b"\x00\x00\x00"
 
     return result
 
@@ -213,3 +225,68 @@ def to_poly4d_sequence(trajectory: TrajectorySpecification) -> Sequence[Poly4D]:
         result.append(Poly4D(duration=dt, xs=xs, ys=ys, zs=zs))
 
     return result
+
+
+_batch_threshold = 16
+"""Minimum number of segments for which the vectorized encoder is used."""
+
+
+def _to_poly4d_arrays(trajectory: TrajectorySpecification):
+    """Vectorized implementation of to_poly4d_sequence() with NumPy.
+
+    Returns:
+        the durations of the segments in a one-dimensional array, and the
+        coefficients of the polynomials of the segments in an array of shape
+        (segments, 4, 8), in the same order as in the Poly4D instances; `None`
+        if the trajectory cannot be converted. In this case the caller should
+        fall back to to_poly4d_sequence() so the user receives the same
+        exception as with the non-vectorized version.
+    """
+    assert np is not None
+
+    segments = list(trajectory.iter_segments(max_length=65))
+    if any(segment.has_control_points for segment in segments):
+        return None
+
+    durations = np.array([segment.duration for segment in segments], dtype=float)
+    if not (durations != 0).all():
+        return None
+    starts = np.array([segment.start[:3] for segment in segments], dtype=float)
+    ends = np.array([segment.end[:3] for segment in segments], dtype=float)
+
+    coeffs = np.zeros((len(segments), 4, 8), dtype=float)
+    if segments:
+        coeffs[:, :3, 0] = starts
+        coeffs[:, :3, 1] = (ends - starts) / durations[:, None]
+
+    return durations, coeffs
+
+
+def _encode_poly4d_arrays(durations, coeffs) -> Optional[bytes]:
+    """Vectorized implementation of Poly4D.encode() for multiple segments.
+
+    Parameters:
+        durations: the durations of the segments in a one-dimensional array
+        coeffs: the coefficients of the polynomials of the segments in an
+            array of shape (segments, 4, 8)
+
+    Returns:
+        the concatenated uncompressed representations of the segments, or
+        `None` if at least one of the segments cannot be encoded. In this
+        case the caller should fall back to the segment-by-segment encoder so
+        the user receives the same exception as with the non-vectorized
+        version.
+    """
+    assert np is not None
+
+    values = np.concatenate(
+        (coeffs.reshape(len(durations), 32), durations[:, None]), axis=1
+    )
+    with np.errstate(over="ignore"):
+        result = values.astype("<f4")
+
+    # struct.pack() refuses to pack finite values that do not fit in a float
+    if (np.isinf(result) & np.isfinite(values)).any():
+        return None
+
+    return result.tobytes()
@@ -0,0 +1,248 @@
+"""Scheduling and caching of show uploads to Crazyflie drones."""
+
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from trio import Event
+from typing import Any, AsyncIterator, Hashable, Optional
+
+from flockwave.server.show import (
+    get_group_index_from_show_specification,
+    get_home_position_from_show_specification,
+    get_light_program_from_show_specification,
+    get_trajectory_from_show_specification,
+    TrajectorySpecification,
+)
+from flockwave.server.show.compiler import get_show_specification_hash
+
+from .trajectory import encode_trajectory, TrajectoryEncoding
+
+__all__ = ("PreparedShow", "PreparedShowCache", "ShowUploadScheduler")
+
+
+@dataclass(frozen=True)
+class PreparedShow:
+    """The show of a single Crazyflie drone, validated and encoded into the
+    payloads that are uploaded to the drone.
+    """
+
+    group_index: int
+    """Index of the group that the drone belongs to in the show."""
+
+    home: Optional[tuple[float, float, float]]
+    """The home position of the drone, if specified in the show."""
+
+    light_program: bytes
+    """The encoded light program of the drone."""
+
+    trajectory: TrajectorySpecification
+    """The trajectory of the drone."""
+
+    trajectory_data: bytes
+    """The trajectory of the drone in the compressed Crazyflie encoding."""
+
+    @classmethod
+    def from_show_specification(cls, show: Any):
+        """Validates and encodes the given show specification of a single
+        drone.
+
+        Raises:
+            RuntimeError: if the show cannot be uploaded to a Crazyflie drone
+        """
+        home = get_home_position_from_show_specification(show)
+        trajectory = get_trajectory_from_show_specification(show)
+        group_index = get_group_index_from_show_specification(show)
+        if group_index > 7:
+            raise RuntimeError("Crazyflie drones support at most 8 groups only")
+
+        scale = trajectory.propose_scaling_factor()
+        if scale > 1:
+            raise RuntimeError("Trajectory covers too large an area for a Crazyflie")
+
+        return cls(
+            group_index=group_index,
+            home=home,
+            light_program=get_light_program_from_show_specification(show),
+            trajectory=trajectory,
+            trajectory_data=encode_trajectory(
+                trajectory, encoding=TrajectoryEncoding.COMPRESSED
+            ),
+        )
+
+
+class PreparedShowCache:
+    """Cache of prepared shows, keyed by the content hashes of the show
+    specifications, so repeated uploads and retries of the same show do not
+    need to encode the show again.
+    """
+
+    _items: OrderedDict[str, PreparedShow]
+    """The cached shows, in least-recently-used order."""
+
+    def __init__(self, size: int = 256):
+        """Constructor.
+
+        Parameters:
+            size: the maximum number of shows to keep in the cache
+        """
+        self._items = OrderedDict()
+        self._size = size
+
+    def clear(self) -> None:
+        """Removes all the shows from the cache."""
+        self._items.clear()
+
+    def get(self, show: Any) -> PreparedShow:
+        """Returns the prepared form of the given show specification, preparing
+        it if it is not in the cache yet.
+
+        Raises:
+            RuntimeError: if the show cannot be uploaded to a Crazyflie drone
+        """
+        key = get_show_specification_hash(show)
+
+        prepared = self._items.get(key)
+        if prepared is None:
+            prepared = PreparedShow.from_show_specification(show)
+            self._items[key] = prepared
+            while len(self._items) > self._size:
+                self._items.popitem(last=False)
+        else:
+            self._items.move_to_end(key)
+
+        return prepared
+
+
+class _RadioQueue:
+    """Queue of the uploads waiting for a single radio."""
+
+    address_space: Any = None
+    """The address space of the uploads currently running on the radio."""
+
+    capacity: int
+    """The maximum number of uploads running on the radio at the same time."""
+
+    num_active: int
+    """The number of uploads currently running on the radio."""
+
+    waiting: dict[Any, deque[Event]]
+    """Events of the waiting uploads, grouped by address spaces, in the order
+    the address spaces got their first waiting upload.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.num_active = 0
+        self.waiting = {}
+
+    async def acquire(self, address_space: Any) -> None:
+        if not self.waiting:
+            if self.num_active == 0:
+                self.address_space = address_space
+                self.num_active = 1
+                return
+            elif (
+                self.num_active < self.capacity
+                and self.address_space == address_space
+            ):
+                self.num_active += 1
+                return
+
+        event = Event()
+        queue = self.waiting.setdefault(address_space, deque())
+        queue.append(event)
+        try:
+            await event.wait()
+        except BaseException:
+            if event.is_set():
+                # The slot was handed over to us already
+                self.release()
+            else:
+                queue.remove(event)
+                if not queue:
+                    del self.waiting[address_space]
+            raise
+
+    def release(self) -> None:
+        self.num_active -= 1
+
+        while self.num_active < self.capacity and self.waiting:
+            if self.address_space in self.waiting:
+                address_space = self.address_space
+            elif self.num_active == 0:
+                address_space = next(iter(self.waiting))
+                self.address_space = address_space
+            else:
+                break
+
+            queue = self.waiting[address_space]
+            event = queue.popleft()
+            if not queue:
+                del self.waiting[address_space]
+
+            self.num_active += 1
+            event.set()
+
+
+class ShowUploadScheduler:
+    """Scheduler that lets show uploads through different Crazyradios run
+    concurrently while queueing the uploads that share the same Crazyradio.
+
+    A radio can run a limited number of uploads at the same time, and only if
+    they all target the same address space; the radio would need to switch
+    channels or data rates otherwise. When a radio becomes free, uploads
+    waiting for the address space that the radio is currently serving are
+    started first. The other address spaces are served in the order they got
+    their first waiting upload.
+    """
+
+    max_uploads_per_radio: int
+    """The maximum number of uploads running on the same radio at the same
+    time.
+    """
+
+    _queues: dict[Hashable, _RadioQueue]
+    """The upload queues of the radios."""
+
+    def __init__(self, max_uploads_per_radio: int = 2):
+        """Constructor.
+
+        Parameters:
+            max_uploads_per_radio: the maximum number of uploads running on the
+                same radio at the same time
+        """
+        self.max_uploads_per_radio = max(1, max_uploads_per_radio)
+        self._queues = {}
+
+    def get_queue_length(self, radio: Hashable) -> int:
+        """Returns the number of uploads running or waiting on the given
+        radio.
+        """
+        queue = self._queues.get(radio)
+        if queue is None:
+            return 0
+        return queue.num_active + sum(len(events) for events in queue.waiting.values())
+
+    @asynccontextmanager
+    async def use_radio(
+        self, radio: Hashable, address_space: Any = None
+    ) -> AsyncIterator[None]:
+        """Async context manager that waits until an upload may start on the
+        given radio, and that releases the radio when the context is exited.
+
+        Parameters:
+            radio: the radio that the upload uses
+            address_space: the address space of the drone that the upload
+                targets
+        """
+        queue = self._queues.get(radio)
+        if queue is None:
+            queue = self._queues[radio] = _RadioQueue(self.max_uploads_per_radio)
+
+        await queue.acquire(address_space)
+        try:
+            yield
+        finally:
+            queue.release()
+            if queue.num_active == 0 and not queue.waiting:
+                del self._queues[radio]
@@ -58,12 +58,14 @@ class FDChannel(CommunicationChannel):
 
     async def send(self, message):
         """Inherited."""
+        data = app.message_hub.encoding_cache.encode(message, "json", encoder)
+
         async with self._lock:
             # Locking is needed, otherwise we could be running into problems
             # if a message was sent only partially but the message hub is
             # already trying to send another one (since the message hub
             # dispatches each message in a separate task)
-            await self.out_fp.write(encoder(message))
+            await self.out_fp.write(data)
             await self.out_fp.flush()
 
     async def serve(self, handler):
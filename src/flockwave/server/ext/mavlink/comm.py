@@ -14,7 +14,11 @@ from flockwave.connections import Connection, StreamConnectionBase
 from flockwave.logger import Logger
 from flockwave.networking import format_socket_address
 
-from flockwave.server.comm import NO_BROADCAST_ADDRESS, CommunicationManager
+from flockwave.server.comm import (
+    NO_BROADCAST_ADDRESS,
+    CommunicationManager,
+    OutboundTrafficClass,
+)
 
 from .enums import MAVComponent
 from .signing import MAVLinkSigningConfiguration
@@ -59,6 +63,18 @@ def _get_timestamp_for_signing() -> int:
 
 MAVLinkFactory = Callable[[], Any]
 
+MAVLinkMessageFilter = Callable[[str, int, int], bool]
+"""Type specification for functions that receive the type, the source system ID
+and the source component ID of a raw MAVLink frame and return whether the frame
+should be decoded. Frames for which the function returns `False` are dropped
+without unpacking their payload.
+"""
+
+_SKIPPED = object()
+"""Marker object returned from the decoder of a MAVLink parser for frames that
+were rejected by the message filter of the parser.
+"""
+
 
 def _allow_all_unsigned_messages(self, msg_id: int) -> bool:
     """Callback function for MAVLink connections that allow them to accept
@@ -82,6 +98,7 @@ def get_mavlink_factory(
     *,
     link_id: int = 0,
     signing: MAVLinkSigningConfiguration = MAVLinkSigningConfiguration.DISABLED,
+    message_filter: Optional[MAVLinkMessageFilter] = None,
 ) -> MAVLinkFactory:
     """Constructs a function that can be called with no arguments and that will
     construct a new MAVLink parser and message factory.
@@ -96,6 +113,9 @@ def get_mavlink_factory(
             channels.
         signing: whether outbound messages should be signed and inbound messages
             should be rejectd when unsigned
+        message_filter: optional function that decides, based on the header
+            of a raw MAVLink frame, whether the frame should be decoded.
+            Ignored when the dialect is a callable.
     """
     if callable(dialect):
         return dialect
@@ -120,6 +140,9 @@ def get_mavlink_factory(
                 else _allow_only_basic_unsigned_messages
             )
 
+        if message_filter is not None:
+            _install_message_filter(link, module.mavlink_map, message_filter)
+
         return link
 
     return factory
@@ -131,6 +154,8 @@ def create_communication_manager(
     system_id: int = 255,
     signing: MAVLinkSigningConfiguration = MAVLinkSigningConfiguration.DISABLED,
     use_broadcast_rate_limiting: bool = False,
+    message_filter: Optional[MAVLinkMessageFilter] = None,
+    traffic_classes: Optional[dict[str, OutboundTrafficClass]] = None,
 ) -> CommunicationManager[MAVLinkMessageSpecification, Any]:
     """Creates a communication manager instance for a single network managed
     by the extension.
@@ -147,6 +172,12 @@ def create_communication_manager(
             rate limiting problems if there are any. Typically you can leave
             this setting at `False` unless you see lots of lost broadcast
             packets.
+        message_filter: optional function that is called with the type, the
+            source system ID and the source component ID of each inbound
+            MAVLink frame and that returns whether the frame should be decoded
+            and forwarded to the consumer of the communication manager
+        traffic_classes: traffic classes of the outbound queues of the
+            communication manager that override the default ones
     """
     # Create a dictionary to cache link IDs to existing connections so we can
     # keep on using the same link ID for the same connection even if it is
@@ -157,6 +188,7 @@ def create_communication_manager(
         signing=signing,
         link_ids=link_ids,
         system_id=system_id,
+        message_filter=message_filter,
     )
 
     if packet_loss > 0:
@@ -167,6 +199,7 @@ def create_communication_manager(
     manager = CommunicationManager(
         channel_factory=channel_factory,
         format_address=format_mavlink_channel_address,
+        traffic_classes=traffic_classes,
     )
 
     if use_broadcast_rate_limiting:
@@ -206,6 +239,7 @@ def create_mavlink_message_channel(
     system_id: int = 255,
     link_ids: Optional[dict[Connection, int]] = None,
     signing: MAVLinkSigningConfiguration = MAVLinkSigningConfiguration.DISABLED,
+    message_filter: Optional[MAVLinkMessageFilter] = None,
 ) -> MessageChannel[tuple[MAVLinkMessage, str]]:
     """Creates a bidirectional Trio-style channel that reads data from and
     writes data to the given connection, and does the parsing of MAVLink
@@ -224,6 +258,9 @@ def create_mavlink_message_channel(
             unsigned links
         signing: specifies whether outbound messages should be signed and
             inbound messages should be checked for a valid signature
+        message_filter: optional function that decides, based on the header
+            of a raw inbound MAVLink frame, whether the frame should be decoded
+            and yielded by the channel
     """
     if link_ids is not None:
         link_id = link_ids.get(connection, -1)
@@ -233,7 +270,11 @@ def create_mavlink_message_channel(
         link_id = 0
 
     mavlink_factory: MAVLinkFactory = get_mavlink_factory(
-        dialect, system_id, link_id=link_id, signing=signing
+        dialect,
+        system_id,
+        link_id=link_id,
+        signing=signing,
+        message_filter=message_filter,
     )
 
     if isinstance(connection, StreamConnectionBase):
@@ -287,7 +328,7 @@ def _create_stream_based_mavlink_message_channel(
         # Parse the MAVLink messages from the buffer. mavlink.parse_buffer()
         # may occasionally return None so make sure we handle that gracefully.
         messages = mavlink.parse_buffer(data) or ()
-        return [(message, "") for message in messages]
+        return [(message, "") for message in messages if message is not _SKIPPED]
 
     def encoder(spec_and_address: tuple[MAVLinkMessageSpecification, Any]) -> bytes:
         spec, _ = spec_and_address
@@ -343,7 +384,9 @@ def _create_datagram_based_mavlink_message_channel(
         mavlink = mavlink_by_address[address]
         messages = mavlink.parse_buffer(data) or ()
 
-        return [(message, address) for message in messages]
+        return [
+            (message, address) for message in messages if message is not _SKIPPED
+        ]
 
     def encoder(
         spec_and_address: tuple[MAVLinkMessageSpecification, Any],
@@ -370,6 +413,47 @@ def _create_datagram_based_mavlink_message_channel(
     return channel
 
 
+def _install_message_filter(
+    link, mavlink_map: dict[int, Any], message_filter: MAVLinkMessageFilter
+) -> None:
+    """Wraps the decoder of the given low-level MAVLink object such that it
+    looks at the header of each raw MAVLink frame first and skips the frame
+    without checking its CRC and unpacking its payload if the message filter
+    rejects it.
+
+    Skipped frames are returned from the parser as the `_SKIPPED` marker object;
+    the parsers of the MAVLink channels remove these from the parsed messages.
+
+    Parameters:
+        link: the low-level MAVLink object
+        mavlink_map: dictionary mapping MAVLink message IDs to the corresponding
+            message classes of the dialect of the MAVLink object
+        message_filter: the filter function to call with the type, the source
+            system ID and the source component ID of each frame
+    """
+    decode = link.decode
+    types = {msg_id: cls.msgname for msg_id, cls in mavlink_map.items()}
+
+    def filtered_decode(msgbuf):
+        # pymavlink guarantees that the buffer contains at least a full header
+        if msgbuf[0] == 0xFD:
+            # MAVLink 2: magic, len, incompat, compat, seq, sysid, compid, msgid[3]
+            msg_id = msgbuf[7] | (msgbuf[8] << 8) | (msgbuf[9] << 16)
+            system_id, component_id = msgbuf[5], msgbuf[6]
+        else:
+            # MAVLink 1: magic, len, seq, sysid, compid, msgid
+            msg_id = msgbuf[5]
+            system_id, component_id = msgbuf[3], msgbuf[4]
+
+        type = types.get(msg_id)
+        if type is not None and not message_filter(type, system_id, component_id):
+            return _SKIPPED
+
+        return decode(msgbuf)
+
+    link.decode = filtered_decode
+
+
 def _notify_mavlink_packet_sent(mavlink, packet: bytes) -> None:
     # Bookkeeping copied from the MAVLink.send() method
     mavlink.seq = (mavlink.seq + 1) % 256
@@ -8,6 +8,7 @@ from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from functools import partial
+from hashlib import sha256
 from logging import Logger
 from math import inf, isfinite
 from time import monotonic
@@ -43,12 +44,9 @@ from flockwave.server.show import (
     get_altitude_reference_from_show_specification,
     get_coordinate_system_from_show_specification,
     get_geofence_configuration_from_show_specification,
-    get_light_program_from_show_specification,
-    get_rth_plan_from_show_specification,
-    get_trajectory_from_show_specification,
-    get_yaw_setpoints_from_show_specification,
 )
-from flockwave.server.show.formats import SkybrushBinaryShowFile
+from flockwave.server.show.compiler import ShowCompiler
+from flockwave.server.show.utils import crc32_mavftp as crc32
 
 from .accelerometer import AccelerometerCalibration
 from .autopilots import ArduPilot, Autopilot, UnknownAutopilot
@@ -71,9 +69,10 @@ from .enums import (
     MotorTestThrottleType,
     PositionTargetTypemask,
 )
-from .ftp import MAVFTP
-from .log_download import MAVLinkLogDownloader
+from .ftp import MAVFTP, OperationNotAcknowledgedError
+from .log_download import FleetLogDownloader, MAVLinkLogDownloader
 from .packets import create_led_control_packet, DroneShowExecutionStage, DroneShowStatus
+from .tasks import UAVLivenessTracker
 from .types import MAVLinkMessage, PacketBroadcasterFn, PacketSenderFn, spec
 from .utils import (
     can_communicate_infer_from_heartbeat,
@@ -135,9 +134,32 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
     run_in_background: Callable[[Callable], None]
     send_packet: PacketSenderFn
 
+    ftp_burst_read: bool = False
+    """Whether to download files from the drones with MAVFTP burst reads."""
+
+    ftp_window: int = 1
+    """Maximum number of MAVFTP write requests that may be in flight at the
+    same time during file uploads to a single drone.
+    """
+
     gps_fix_hysteresis: float = 0.0
     """GPS fix hysteresis time, in seconds."""
 
+    liveness_tracker: UAVLivenessTracker
+    """Object that keeps track of the heartbeats of the UAVs managed by the
+    driver and the status summaries of the networks of the UAVs.
+    """
+
+    log_download_scheduler: FleetLogDownloader
+    """Object that downloads logs from many UAVs of the driver concurrently,
+    directly to the disk.
+    """
+
+    show_compiler: ShowCompiler
+    """Object that compiles show specifications into Skybrush binary show
+    files before they are uploaded to the drones.
+    """
+
     def __init__(self, app=None):
         """Constructor.
 
@@ -154,6 +176,9 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
         self.mandatory_custom_mode = None
         self.run_in_background = None  # type: ignore
         self.send_packet = None  # type: ignore
+        self.liveness_tracker = UAVLivenessTracker()
+        self.log_download_scheduler = FleetLogDownloader()
+        self.show_compiler = ShowCompiler()
 
         self._default_timeout = 2
         self._default_retries = 5
@@ -274,7 +299,16 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
         assert self.app is not None
 
         uav = MAVLinkUAV(id, driver=self)
-        uav.notify_updated = partial(self.app.request_to_send_UAV_INF_message_for, [id])
+        request_uav_inf = partial(self.app.request_to_send_UAV_INF_message_for, [id])
+        notify_status_changed = partial(
+            self.liveness_tracker.notify_status_changed, uav
+        )
+
+        def notify_updated() -> None:
+            request_uav_inf()
+            notify_status_changed()
+
+        uav.notify_updated = notify_updated
         uav.send_log_message_to_gcs = partial(
             self.app.request_to_send_SYS_MSG_message, sender=id
         )
@@ -945,6 +979,10 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
             value_as_float = float(value)
         except ValueError:
             raise RuntimeError("parameter value must be numeric") from None
+
+        # The parameter may affect the show configuration of the UAV so the
+        # next show upload should not rely on what we have uploaded earlier
+        uav.invalidate_upload_cache()
         await uav.set_parameter(name, value_as_float)
 
 
@@ -1072,6 +1110,12 @@ class MAVLinkUAV(UAVBase):
         #: in seconds
         self._scheduled_takeoff_time_gps_time_of_week = None
 
+        #: Stores what we have uploaded to the drone with the last show upload,
+        #: keyed by the type of the uploaded item (remote path of the show
+        #: file, ``"origin"`` or ``"geofence"``); each value is a checksum or
+        #: a digest of the uploaded content. Used to skip redundant uploads.
+        self._upload_cache: dict[str, str] = {}
+
         #: Current velocity of the drone in NED coordinate system, m/sec
         self._velocity = VelocityNED()
 
@@ -1398,6 +1442,12 @@ class MAVLinkUAV(UAVBase):
         """
         return self._scheduled_takeoff_time_gps_time_of_week
 
+    def invalidate_upload_cache(self) -> None:
+        """Forgets what we have uploaded to the UAV with the last show upload
+        such that the next show upload sends everything to the UAV again.
+        """
+        self._upload_cache.clear()
+
     async def set_parameter(self, name: str, value: float) -> None:
         """Sets the value of a parameter on the UAV."""
         # Basic sanity check on the value
@@ -1531,8 +1581,10 @@ class MAVLinkUAV(UAVBase):
         # Get the age of the _last_ heartbeat, will be used later
         age_of_last_heartbeat = self.get_age_of_message(MAVMessageType.HEARTBEAT)
 
-        # Store a copy of the heartbeat
+        # Store a copy of the heartbeat and postpone the deadline after which
+        # the UAV is considered disconnected. This also handles reconnections
         self._store_message(message)
+        self.driver.liveness_tracker.notify_heartbeat(self, message)
 
         # Determine whether the heartbeat indicates that it makes sense trying
         # to initiate communication with the UAV. Heartbeats that indicate that
@@ -1729,6 +1781,8 @@ class MAVLinkUAV(UAVBase):
         disconnected from the network. In other words, the heartbeats from the
         drone have ceased arriving.
         """
+        # We cannot know what happened to the drone while it was away
+        self.invalidate_upload_cache()
         self._set_connection_state(ConnectionState.DISCONNECTED, None)
 
     def _notify_rebooted_by_us(self) -> None:
@@ -1996,25 +2050,15 @@ class MAVLinkUAV(UAVBase):
             raise RuntimeError("Only NWU coordinate systems are supported")
 
         altitude_reference = get_altitude_reference_from_show_specification(show)
-        light_program = get_light_program_from_show_specification(show)
-        trajectory = get_trajectory_from_show_specification(show)
         geofence = get_geofence_configuration_from_show_specification(show)
-        rth_plan = get_rth_plan_from_show_specification(show)
-        yaw_setpoints = get_yaw_setpoints_from_show_specification(show)
-
-        async with SkybrushBinaryShowFile.create_in_memory() as show_file:
-            await show_file.add_trajectory(trajectory)
-            await show_file.add_light_program(light_program)
-            if rth_plan:
-                await show_file.add_rth_plan(rth_plan)
-            if yaw_setpoints:
-                await show_file.add_yaw_setpoints(yaw_setpoints)
-            await show_file.finalize()
-            data = show_file.get_contents()
-
-        # Upload show file
+
+        # Compile the show file in a worker process; the result is cached so
+        # retries do not need to encode the show again
+        data = await self.driver.show_compiler.compile(show)
+
+        # Upload show file unless the drone has an identical copy already
         async with aclosing(MAVFTP.for_uav(self)) as ftp:
-            await ftp.put(data, "/collmot/show.skyb")
+            await self._upload_file_if_changed(ftp, data, "/collmot/show.skyb")
 
         # We give some time for the filesystem to flush caches etc before
         # asking the drone to reload the show file. There were some reports
@@ -2035,41 +2079,26 @@ class MAVLinkUAV(UAVBase):
             else -32768000
         )
 
-        # Try configuring with a single USER_2 command first, falling back to
-        # the old parameter-based configuration if USER_2 is not supported.
-        try:
-            success = await self.driver.send_command_int(
-                self,
-                MAVCommand.USER_2,
-                0,  # command code
-                0,  # unused
-                0,  # unused
+        origin_key = repr(
+            (coordinate_system.orientation, encoded_lat, encoded_lon, encoded_amsl)
+        )
+        if self._upload_cache.get("origin") != origin_key:
+            self._upload_cache.pop("origin", None)
+            await self._configure_show_origin(
                 coordinate_system.orientation,
                 encoded_lat,
                 encoded_lon,
                 encoded_amsl,
+                has_altitude_reference=altitude_reference is not None,
             )
-        except NotSupportedError:
-            success = False
-
-        if not success:
-            # Configure show origin, orientation and altitude reference using
-            # the old method. There is no version of the firmware that would
-            # support SHOW_ORIGIN_AMSL but does not support the new-style
-            # configuration method so we raise an error if the user tries to
-            # set an AMSL value
-            if altitude_reference is not None:
-                raise NotSupportedError(
-                    "AMSL-based control is not supported in this firmware"
-                )
-
-            orientation = coordinate_system.orientation % 360
-            await self.set_parameter("SHOW_ORIGIN_LAT", encoded_lat)
-            await self.set_parameter("SHOW_ORIGIN_LNG", encoded_lon)
-            await self.set_parameter("SHOW_ORIENTATION", orientation)
+            self._upload_cache["origin"] = origin_key
 
         # Configure and enable geofence
-        await self.configure_geofence(geofence)
+        geofence_key = sha256(repr(geofence).encode("utf-8")).hexdigest()
+        if self._upload_cache.get("geofence") != geofence_key:
+            self._upload_cache.pop("geofence", None)
+            await self.configure_geofence(geofence)
+            self._upload_cache["geofence"] = geofence_key
 
         # Ask drone to reload show file now that we are done with everything
         # else
@@ -2200,6 +2229,50 @@ class MAVLinkUAV(UAVBase):
                 "Failed to configure custom mode", extra={"id": log_id_for_uav(self)}
             )
 
+    async def _configure_show_origin(
+        self,
+        orientation: float,
+        encoded_lat: int,
+        encoded_lon: int,
+        encoded_amsl: int,
+        *,
+        has_altitude_reference: bool,
+    ) -> None:
+        """Configures the origin, the orientation and the altitude reference
+        of the show on the drone.
+        """
+        # Try configuring with a single USER_2 command first, falling back to
+        # the old parameter-based configuration if USER_2 is not supported.
+        try:
+            success = await self.driver.send_command_int(
+                self,
+                MAVCommand.USER_2,
+                0,  # command code
+                0,  # unused
+                0,  # unused
+                orientation,
+                encoded_lat,
+                encoded_lon,
+                encoded_amsl,
+            )
+        except NotSupportedError:
+            success = False
+
+        if not success:
+            # Configure show origin, orientation and altitude reference using
+            # the old method. There is no version of the firmware that would
+            # support SHOW_ORIGIN_AMSL but does not support the new-style
+            # configuration method so we raise an error if the user tries to
+            # set an AMSL value
+            if has_altitude_reference:
+                raise NotSupportedError(
+                    "AMSL-based control is not supported in this firmware"
+                )
+
+            await self.set_parameter("SHOW_ORIGIN_LAT", encoded_lat)
+            await self.set_parameter("SHOW_ORIGIN_LNG", encoded_lon)
+            await self.set_parameter("SHOW_ORIENTATION", orientation % 360)
+
     def _handle_reboot(self) -> None:
         """Handles a reboot event on the autopilot and attempts to re-initialize
         the data streams.
@@ -2218,6 +2291,9 @@ class MAVLinkUAV(UAVBase):
         # Reset our internal state object of the compass calibration procedure
         self.compass_calibration.reset()
 
+        # The show configuration may not survive the reboot
+        self.invalidate_upload_cache()
+
     async def _request_autopilot_capabilities(self) -> None:
         """Sends a request to the autopilot to send its capabilities via MAVLink
         in a separate packet.
@@ -2271,6 +2347,7 @@ class MAVLinkUAV(UAVBase):
             return
 
         self._connection_state = value
+        self.driver.liveness_tracker.notify_status_changed(self)
 
         if value is ConnectionState.DISCONNECTED:
             # Revert to the lowest MAVLink version that we support in case the UAV
@@ -2524,6 +2601,49 @@ class MAVLinkUAV(UAVBase):
 
         self._gps_fix.num_satellites = num_satellites
 
+    async def _upload_file_if_changed(
+        self, ftp: MAVFTP, data: bytes, remote_path: str
+    ) -> bool:
+        """Uploads the given file to the drone over MAVFTP unless the drone
+        already has a file with the same contents at the given path.
+
+        The remote file is considered identical to the local one if its CRC32
+        checksum matches the checksum of the local file. When the remote file
+        is different from the last one that we have uploaded to this drone,
+        the other entries of the upload cache are invalidated as well because
+        the drone has apparently been reconfigured behind our back.
+
+        Parameters:
+            ftp: the MAVFTP connection to use
+            data: the contents of the file
+            remote_path: the path of the file on the drone
+
+        Returns:
+            whether the file was uploaded
+        """
+        local_crc = crc32(data, 0)
+
+        try:
+            remote_crc = await ftp.crc32(remote_path)
+        except OperationNotAcknowledgedError:
+            # Typically the file does not exist yet
+            remote_crc = None
+
+        cached_crc = self._upload_cache.get(remote_path)
+        if cached_crc is not None and (
+            remote_crc is None or cached_crc != f"{remote_crc:08x}"
+        ):
+            # Someone else has modified the file on the drone so we cannot
+            # trust the rest of the cache either
+            self._upload_cache.clear()
+
+        if remote_crc != local_crc:
+            self._upload_cache.pop(remote_path, None)
+            await ftp.put(data, remote_path)
+
+        self._upload_cache[remote_path] = f"{local_crc:08x}"
+        return remote_crc != local_crc
+
     def _was_probably_rebooted_after_reconnection(self) -> bool:
         """Returns whether the UAV was probably rebooted recently, _assuming_
         that a reconnection event happened.
@@ -6,17 +6,21 @@ from collections import OrderedDict
 from contextlib import ExitStack
 from functools import partial
 from logging import Logger
-from typing import cast, Optional, TYPE_CHECKING
+from os import PathLike
+from typing import Any, Callable, cast, Iterable, Optional, TYPE_CHECKING, Union
 
 from flockwave.server.ext.base import UAVExtension
+from flockwave.server.model.commands import Progress
+from flockwave.server.model.log import FlightLogMetadata
 from flockwave.server.model.uav import UAV
 from flockwave.server.registries.errors import RegistryFull
+from flockwave.server.show.compiler import ShowCompiler
 from flockwave.server.utils import optional_int, overridden
 
 from .driver import MAVLinkDriver, MAVLinkUAV
 from .errors import InvalidSigningKeyError
+from .log_download import FleetLogDownloader
 from .network import MAVLinkNetwork
-from .tasks import check_uavs_alive
 from .types import (
     MAVLinkMessage,
     MAVLinkMessageMatcher,
@@ -64,6 +68,13 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
     def _create_driver(self):
         return MAVLinkDriver()
 
+    def exports(self) -> dict[str, Any]:
+        return {
+            "download_logs": self._download_logs,
+            "get_matcher_queue_depths": self._get_matcher_queue_depths,
+            "get_outbound_queue_stats": self._get_outbound_queue_stats,
+        }
+
     def configure_driver(self, driver: MAVLinkDriver, configuration):
         """Configures the driver that will manage the UAVs created by
         this extension.
@@ -79,11 +90,20 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
         """
         driver.broadcast_packet = self._broadcast_packet
         driver.create_device_tree_mutator = self.create_device_tree_mutation_context
+        driver.ftp_burst_read = bool(configuration.get("ftp_burst_read", False))
+        driver.ftp_window = max(int(configuration.get("ftp_window", 1)), 1)
         driver.gps_fix_hysteresis = float(configuration.get("gps_fix_hysteresis", 0.0))
         driver.log = self.log
+        driver.log_download_scheduler = FleetLogDownloader(
+            max_concurrency=int(configuration.get("log_download_concurrency", 8)),
+            bandwidth=configuration.get("log_download_bandwidth"),
+        )
         driver.mandatory_custom_mode = optional_int(configuration.get("custom_mode"))
         driver.run_in_background = self.run_in_background
         driver.send_packet = self._send_packet
+        driver.show_compiler = ShowCompiler(
+            max_workers=optional_int(configuration.get("show_compiler_workers"))
+        )
 
     async def run(self, app, configuration):
         networks = OrderedDict(
@@ -118,6 +138,9 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
         with ExitStack() as stack:
             stack.enter_context(overridden(self, _uavs=uavs, _networks=networks))
 
+            # Shut down the worker processes of the show compiler on exit
+            stack.callback(self._driver.show_compiler.close)
+
             # Connect the signals to our signal handlers
             stack.enter_context(
                 signals.use(
@@ -147,14 +170,17 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
                     for network in networks.values():
                         nursery.start_soon(partial(network.run, **kwds))
 
-                    # Create an additional task that periodically checks whether the UAVs
-                    # registered in the extension are still alive, and that sends
+                    # Create an additional task that declares UAVs disconnected
+                    # when their heartbeats cease to arrive, and that sends
                     # status summary signals to interested consumers (typically
                     # the sidekick extension)
                     nursery.start_soon(
-                        check_uavs_alive, uavs, status_summary_signal, self.log
+                        self._driver.liveness_tracker.run,
+                        status_summary_signal,
+                        self.log,
                     )
             finally:
+                self._driver.liveness_tracker.clear()
                 for uav in uavs:
                     app.object_registry.remove(uav)
 
@@ -177,6 +203,70 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
         for network in self._networks.values():
             await network.broadcast_packet(spec, channel)
 
+    async def _download_logs(
+        self,
+        jobs: Iterable[tuple[str, Union[int, str], Union[str, PathLike[str]]]],
+        *,
+        resume: bool = True,
+        on_progress: Optional[Callable[[MAVLinkUAV, int, Progress], None]] = None,
+    ) -> list[Union[Optional[FlightLogMetadata], Exception]]:
+        """Downloads logs from many UAVs managed by this extension
+        concurrently, writing them directly to files on the disk.
+
+        Parameters:
+            jobs: the logs to download; each item is a tuple consisting of a
+                UAV ID, the ID of a log on the UAV and the path of the file to
+                write the log to
+            resume: whether to resume earlier, interrupted downloads of the
+                logs
+            on_progress: optional function to call with the UAV, the log ID
+                and the progress information while a log is being downloaded
+
+        Returns:
+            the results of the downloads, in the same order as the jobs; see
+            `FleetLogDownloader.download()` for details
+        """
+        assert self._driver is not None
+
+        resolved_jobs: list[tuple[MAVLinkUAV, int, Union[str, PathLike[str]]]] = []
+        for uav_id, log_id, path in jobs:
+            try:
+                uav = self.app.object_registry.find_by_id(uav_id)
+            except KeyError:
+                uav = None
+            if not isinstance(uav, MAVLinkUAV):
+                raise RuntimeError(f"No MAVLink UAV with ID: {uav_id!r}")
+            try:
+                log_number = int(log_id)
+            except ValueError:
+                raise RuntimeError(f"Invalid log ID: {log_id!r}") from None
+            resolved_jobs.append((uav, log_number, path))
+
+        return await self._driver.log_download_scheduler.download(
+            resolved_jobs, resume=resume, on_progress=on_progress
+        )
+
+    def _get_matcher_queue_depths(self) -> dict[str, dict[str, int]]:
+        """Returns the number of tasks waiting for MAVLink messages in each
+        MAVLink network managed by the extension, broken down by message types
+        and keyed by network IDs.
+        """
+        return {
+            name: network.get_matcher_queue_depths()
+            for name, network in self._networks.items()
+        }
+
+    def _get_outbound_queue_stats(self) -> dict[str, Any]:
+        """Returns the depths of the outbound queues of the links of each
+        MAVLink network managed by the extension and the number of packets
+        dropped from them, keyed by network IDs.
+        """
+        return {
+            name: network.manager.get_outbound_queue_stats()
+            for name, network in self._networks.items()
+            if getattr(network, "manager", None) is not None
+        }
+
     def _get_network_specifications_from_configuration(
         self, configuration
     ) -> dict[str, MAVLinkNetworkSpecification]:
@@ -623,7 +713,13 @@ schema = {
             "propertyOrder": 5000,
         },
         # Advanced settings not included here:
+        # - ftp_burst_read
+        # - ftp_window
         # - gps_fix_hysteresis
+        # - log_download_bandwidth
+        # - log_download_concurrency
+        # - networks.*.outbound_queues
         # - packet_loss
+        # - show_compiler_workers
     }
 }
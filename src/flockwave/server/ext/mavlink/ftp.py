@@ -9,7 +9,15 @@ from itertools import cycle, islice
 from pathlib import PurePosixPath
 from random import randint
 from struct import Struct
-from trio import fail_after, move_on_after, TooSlowError, wrap_file
+from trio import (
+    current_time,
+    fail_after,
+    move_on_after,
+    open_nursery,
+    Semaphore,
+    TooSlowError,
+    wrap_file,
+)
 from typing import (
     AsyncIterable,
     AsyncIterator,
@@ -172,6 +180,8 @@ class MAVFTPMessage:
     offset: int = 0
     data: bytes = b""
     size: Optional[int] = None
+    req_opcode: int = 0
+    burst_complete: bool = False
 
     @classmethod
     def decode(cls, payload: bytes, expected_seq_no: Optional[int] = None):
@@ -206,6 +216,8 @@ class MAVFTPMessage:
                 offset=offset,
                 data=bytes(data[:size]),
                 size=size,
+                req_opcode=req_opcode,
+                burst_complete=bool(burst_complete),
             )
         else:
             raise SequenceNumberMismatch()
@@ -304,6 +316,11 @@ class MAVFTPSession:
         self._session_id = session_id
         self._sender = sender
 
+    @property
+    def id(self) -> int:
+        """The ID of the session."""
+        return self._session_id
+
     async def aclose(self) -> None:
         """Closes the session. The session object should not be used after
         calling this method.
@@ -388,7 +405,14 @@ class MAVFTPSession:
 
 
 class MAVFTP:
-    """A single MAVFTP connection to a PixHawk over a MAVLink connection."""
+    """A single MAVFTP connection to a PixHawk over a MAVLink connection.
+
+    Uploads may be pipelined by keeping multiple WRITE_FILE requests in flight
+    at the same time; each chunk is re-sent on its own if it is not
+    acknowledged in time. Downloads may use the BURST_READ_FILE opcode, where
+    the PixHawk streams the file without waiting for a request for each
+    chunk; chunks lost from the stream are requested again in a new burst.
+    """
 
     _closed: bool
     """Stores whether the MAVFTP connection is closed already."""
@@ -404,14 +428,40 @@ class MAVFTP:
     _seq: Iterator[int]
     """An iterator yielding sequence numbers for the connection."""
 
+    burst_read: bool
+    """Whether to download files with BURST_READ_FILE requests."""
+
+    window: int
+    """Maximum number of WRITE_FILE requests that may be in flight at the same
+    time during uploads.
+    """
+
     @classmethod
     def for_uav(cls, uav):
         """Constructs a MAVFTP connection object to the given UAV."""
         sender = partial(uav.driver.send_packet, target=uav)
-        return cls(sender)
+        return cls(
+            sender, window=uav.driver.ftp_window, burst_read=uav.driver.ftp_burst_read
+        )
+
+    def __init__(
+        self,
+        sender: Callable[[MAVFTPMessage], Awaitable[None]],
+        *,
+        window: int = 1,
+        burst_read: bool = False,
+    ):
+        """Constructor.
 
-    def __init__(self, sender: Callable[[MAVFTPMessage], Awaitable[None]]):
-        """Constructor."""
+        Parameters:
+            sender: function that can be called to send a MAVLink message
+                and wait for a matching response
+            window: maximum number of WRITE_FILE requests that may be in
+                flight at the same time during uploads; 1 means to wait for
+                the acknowledgment of each chunk before sending the next one
+            burst_read: whether to download files with BURST_READ_FILE
+                requests instead of requesting each chunk separately
+        """
         self._closed = False
         self._closing = False
 
@@ -419,6 +469,9 @@ class MAVFTP:
         self._seq = islice(cycle(range(65536)), randint(0, 65535), None)
         self._sender = sender
 
+        self.burst_read = bool(burst_read)
+        self.window = max(int(window), 1)
+
     async def aclose(self) -> None:
         """Closes the MAVFTP connection and instructs the PixHawk to close
         all open file handles.
@@ -471,6 +524,10 @@ class MAVFTP:
         reply = await self._send_and_wait(message)
 
         async with self._open_session(reply.session_id) as session:
+            if self.burst_read:
+                await self._read_in_bursts(session, fp)
+                return
+
             offset = 0
             got_eof = False
             while not got_eof:
@@ -562,14 +619,17 @@ class MAVFTP:
 
         expected_crc = 0
         async with self._open_session(reply.session_id) as session:
-            offset = 0
-            while True:
-                data = await fp.read(_MAVFTP_CHUNK_SIZE)
-                if data:
-                    offset += await session.write(data=data, offset=offset)
-                    expected_crc = crc32(data, expected_crc)
-                else:
-                    break
+            if self.window > 1:
+                expected_crc = await self._write_pipelined(session, fp)
+            else:
+                offset = 0
+                while True:
+                    data = await fp.read(_MAVFTP_CHUNK_SIZE)
+                    if data:
+                        offset += await session.write(data=data, offset=offset)
+                        expected_crc = crc32(data, expected_crc)
+                    else:
+                        break
 
         observed_crc = await self.crc32(remote_path)
         if observed_crc != expected_crc:
@@ -594,6 +654,151 @@ class MAVFTP:
         async with aclosing(session):
             yield session
 
+    async def _read_in_bursts(
+        self,
+        session: MAVFTPSession,
+        fp,
+        *,
+        timeout: float = 0.5,
+        retries: int = 120,
+    ) -> None:
+        """Downloads the file opened in the given session with BURST_READ_FILE
+        requests and writes its contents to the given async file-like object.
+
+        Each burst starts at the first byte that has not been received yet.
+        Chunks received after a gap in the stream are kept and written to the
+        file when the gap is filled by a later burst.
+
+        Parameters:
+            session: the session in which the file is open for reading
+            fp: async file-like object to write the downloaded file to
+            timeout: maximum number of seconds to wait for the next chunk in a
+                burst before requesting a new burst
+            retries: maximum number of consecutive bursts that may fail to
+                deliver new data before giving up
+        """
+        chunks: dict[int, bytes] = {}
+        offset = 0
+        eof_at: Optional[int] = None
+        retries_left = retries
+
+        while eof_at is None or offset < eof_at:
+            seq_no = next(self._seq)
+            message = MAVFTPMessage(
+                MAVFTPOpCode.BURST_READ_FILE,
+                session_id=session.id,
+                offset=offset,
+                size=_MAVFTP_CHUNK_SIZE,
+            )
+            encoded_message = message.encode(seq_no).ljust(251, b"\x00")
+            errors: list[MAVFTPMessage] = []
+            max_seq_offset = 0
+            received = False
+
+            with move_on_after(timeout) as scope:
+
+                def collect(message: MAVLinkMessage) -> bool:
+                    nonlocal eof_at, max_seq_offset, received
+
+                    payload = message.payload
+                    if len(payload) < _MAVFTPMessageStruct.size:
+                        return False
+
+                    reply = MAVFTPMessage.decode(payload)
+                    if (
+                        reply.session_id != session.id
+                        or reply.req_opcode != MAVFTPOpCode.BURST_READ_FILE
+                    ):
+                        return False
+
+                    reply_seq_no = payload[0] + (payload[1] << 8)
+                    max_seq_offset = max(
+                        max_seq_offset, (reply_seq_no - seq_no) % 65536
+                    )
+                    scope.deadline = current_time() + timeout
+
+                    if reply.is_nak:
+                        errors.append(reply)
+                        return True
+                    elif not reply.is_ack:
+                        return False
+
+                    if reply.offset >= offset and reply.offset not in chunks:
+                        chunks[reply.offset] = reply.data
+                        received = True
+                    if len(reply.data) < _MAVFTP_CHUNK_SIZE:
+                        eof_at = reply.offset + len(reply.data)
+
+                    return reply.burst_complete
+
+                await self._sender(
+                    spec.file_transfer_protocol(
+                        target_network=0, payload=encoded_message
+                    ),
+                    wait_for_response=spec.file_transfer_protocol(collect),
+                )
+
+            # Make sure that late replies from this burst will not be mistaken
+            # for replies to later requests
+            for _ in range(max_seq_offset):
+                next(self._seq)
+
+            # Write the chunks that are now contiguous with the data that we
+            # have written so far
+            while offset in chunks:
+                chunk = chunks.pop(offset)
+                if chunk:
+                    await fp.write(chunk)
+                    offset += len(chunk)
+                else:
+                    eof_at = offset
+
+            for error in errors:
+                if error.error_code == MAVFTPErrorCode.EOF:
+                    if eof_at is None and not chunks:
+                        eof_at = offset
+                else:
+                    error.raise_error()
+
+            if received:
+                retries_left = retries
+            elif eof_at is None or offset < eof_at:
+                if retries_left > 0:
+                    retries_left -= 1
+                else:
+                    raise TooSlowError("No data received for MAVFTP burst in time")
+
+    async def _write_pipelined(self, session: MAVFTPSession, fp) -> int:
+        """Writes the contents of the given async file-like object in the given
+        session, keeping at most `window` WRITE_FILE requests in flight. Chunks
+        that are not acknowledged in time are re-sent individually.
+
+        Returns:
+            the CRC32 checksum of the data that was written
+        """
+        crc = 0
+        offset = 0
+        slots = Semaphore(self.window)
+
+        async def write_chunk(data: bytes, offset: int) -> None:
+            try:
+                await session.write(data=data, offset=offset)
+            finally:
+                slots.release()
+
+        async with open_nursery() as nursery:
+            while True:
+                data = await fp.read(_MAVFTP_CHUNK_SIZE)
+                if not data:
+                    break
+
+                crc = crc32(data, crc)
+                await slots.acquire()
+                nursery.start_soon(write_chunk, data, offset)
+                offset += len(data)
+
+        return crc
+
     def _parents_of(self, path: FTPPath) -> Iterable[FTPPath]:
         path_as_str = path if isinstance(path, str) else path.decode("utf-8")
         for parent_path in reversed(PurePosixPath(path_as_str).parents):
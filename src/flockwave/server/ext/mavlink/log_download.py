@@ -1,15 +1,36 @@
 """Implementation of downloading logs via a MAVLink connection."""
 
+from __future__ import annotations
+
+from collections import defaultdict
+from contextlib import asynccontextmanager
 from functools import partial
+from json import dumps, loads
+from os import PathLike
 from trio import (
+    CancelScope,
     current_time,
     fail_after,
     move_on_after,
+    open_file,
     open_memory_channel,
+    open_nursery,
+    Path,
+    Semaphore,
+    sleep,
     TooSlowError,
 )
 from trio.abc import ReceiveChannel, SendChannel
-from typing import AsyncIterator, Callable, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Optional,
+    TYPE_CHECKING,
+    Union,
+)
 
 from flockwave.concurrency import aclosing, Future
 from flockwave.logger import Logger
@@ -23,7 +44,26 @@ from .types import (
 )
 from .utils import ChunkAssembler
 
-__all__ = ("MAVLinkLogDownloader",)
+if TYPE_CHECKING:
+    from .driver import MAVLinkUAV
+
+__all__ = ("BandwidthLimiter", "FleetLogDownloader", "MAVLinkLogDownloader")
+
+
+MAX_CHUNK_SIZE = 512 * 90
+"""Maximum number of bytes to request from the drone with a single
+``LOG_REQUEST_DATA`` message.
+
+We are requesting at most 512 LOG_DATA messages at once to let the wifi module
+also take care of other things while doing the download. Requesting the entire
+log at once has caused timeout problems with mavesp8266. The strategy adopted
+here is identical to what QGroundControl is doing.
+"""
+
+FLUSH_THRESHOLD = 256 * 1024
+"""Number of bytes to collect in memory during a streaming log download
+before they are written to the disk.
+"""
 
 
 def create_log_metadata_from_mavlink_message(
@@ -39,6 +79,98 @@ def create_log_metadata_from_mavlink_message(
     )
 
 
+async def _get_resumable_offset(
+    part_path: Path, info_path: Path, identity: dict[str, Any]
+) -> int:
+    """Returns the offset from which an earlier, interrupted download of a
+    log can be resumed.
+
+    Parameters:
+        part_path: the path of the temporary file of the download
+        info_path: the path of the file that stores the identity of the log
+            that the temporary file belongs to
+        identity: the identity of the log being downloaded
+
+    Returns:
+        the size of the temporary file if it belongs to the same log, zero
+        otherwise
+    """
+    try:
+        stored_identity = loads(await info_path.read_text())
+        offset = (await part_path.stat()).st_size
+    except (OSError, ValueError):
+        return 0
+
+    if stored_identity != identity or offset > identity["size"]:
+        # Not a partial download of this log; log IDs are reused by the
+        # drone after the logs are erased
+        return 0
+
+    return offset
+
+
+class BandwidthLimiter:
+    """Bandwidth limiter that can be shared between the log downloads running
+    on the same link to keep the total download rate of the link below a
+    given limit.
+
+    The limiter implements a token bucket. Each data request sent to a drone
+    takes as many tokens from the bucket as the number of bytes requested,
+    and the bucket is refilled at the given rate.
+    """
+
+    rate: float
+    """The maximum average download rate, in bytes per second."""
+
+    burst: float
+    """The maximum number of bytes that may be requested at once, i.e. the
+    capacity of the bucket.
+    """
+
+    _tat: float = 0.0
+    """Theoretical arrival time of the next request when the download rate is
+    exactly equal to the limit.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """Constructor.
+
+        Parameters:
+            rate: the maximum average download rate, in bytes per second
+            burst: the maximum number of bytes that may be requested at once;
+                `None` means to allow one second worth of data
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else self.rate
+
+        if self.burst <= 0:
+            raise ValueError("burst size must be positive")
+
+    @property
+    def chunk_size(self) -> int:
+        """The largest number of bytes that should be requested with a single
+        data request.
+        """
+        return max(int(self.burst), 1)
+
+    async def acquire(self, amount: int) -> None:
+        """Waits until the given number of bytes may be requested from the
+        link without exceeding the bandwidth limit.
+
+        Parameters:
+            amount: the number of bytes to request
+        """
+        now = current_time()
+        tat = max(self._tat, now)
+        self._tat = tat + amount / self.rate
+        delay = self._tat - self.burst / self.rate - now
+        if delay > 0:
+            await sleep(delay)
+
+
 class MAVLinkLogDownloader:
     """Object that can be used to download logs from a MAVLink drone via a
     MAVLink connection.
@@ -82,23 +214,50 @@ class MAVLinkLogDownloader:
         self, log_id: int
     ) -> AsyncIterator[Union[Progress, Optional[FlightLog]]]:
         """Retrieves a single log with the given ID from the drone."""
-        if self._log_being_downloaded is not None:
-            raise RuntimeError("Another log download is in progress")
+        async with self._use_message_channel_for_download(log_id) as rx:
+            async with aclosing(self._get_log_inner(log_id, rx)) as it:
+                async for item in it:
+                    yield item
 
-        if self._log_listing_future is not None:
-            raise RuntimeError(
-                "Cannot download log: log listing is currently being retrieved"
-            )
+    async def download_log(
+        self,
+        log_id: int,
+        path: Union[str, PathLike[str]],
+        *,
+        resume: bool = True,
+        limiter: Optional[BandwidthLimiter] = None,
+    ) -> AsyncIterator[Union[Progress, Optional[FlightLogMetadata]]]:
+        """Downloads a single log with the given ID from the drone and writes
+        it to a file as the chunks of the log arrive.
+
+        The log is written to a temporary file next to the target path first,
+        with a ``.part`` suffix appended to the name of the file. The temporary
+        file is renamed to the target path when the download is complete. Since
+        the chunks of the log are appended to the temporary file in order, an
+        interrupted download can be resumed from the end of the temporary file.
+        The ID, the size and the timestamp of the log are stored in another
+        file with a ``.part.json`` suffix; the download is resumed only if they
+        match the log being downloaded.
 
-        self._log_being_downloaded = log_id
-        self._message_channel, rx = open_memory_channel(128)
-        try:
-            async with aclosing(self._get_log_inner(log_id, rx)) as it:
+        Parameters:
+            log_id: the ID of the log to download
+            path: the path of the file to write the log to
+            resume: whether to resume an earlier, interrupted download of the
+                same log from the temporary file if it exists
+            limiter: optional bandwidth limiter that is consulted before each
+                data request sent to the drone
+
+        Yields:
+            progress information while the log is being downloaded, followed
+            by the metadata of the log when the download is complete, or
+            `None` if there is no log with the given ID
+        """
+        async with self._use_message_channel_for_download(log_id) as rx:
+            async with aclosing(
+                self._download_log_inner(log_id, rx, Path(path), resume, limiter)
+            ) as it:
                 async for item in it:
                     yield item
-        finally:
-            self._log_being_downloaded = None
-            self._message_channel = None
 
     async def get_log_list(self) -> list[FlightLogMetadata]:
         """Retrieves the list of logs from the drone.
@@ -132,18 +291,140 @@ class MAVLinkLogDownloader:
         if self._message_channel:
             self._message_channel.send_nowait(message)  # type: ignore
 
-    async def _get_log_inner(
-        self, log_id: int, rx: ReceiveChannel[MAVLinkMessage]
-    ) -> AsyncIterator[Union[Progress, Optional[FlightLog]]]:
+    async def _download_chunks(
+        self,
+        log_id: int,
+        rx: ReceiveChannel[MAVLinkMessage],
+        chunks: ChunkAssembler,
+        write: Callable[[bytes], Awaitable[None]],
+        limiter: Optional[BandwidthLimiter] = None,
+    ) -> AsyncIterator[Progress]:
+        """Downloads the missing chunks of a log from the drone, passing the
+        contiguous parts of the log to the given write function in order.
+
+        Parameters:
+            log_id: the ID of the log to download
+            rx: channel on which the ``LOG_DATA`` messages arrive
+            chunks: chunk assembler that keeps track of the parts of the log
+                that were downloaded already
+            write: async function to call with the contiguous parts of the
+                log
+            limiter: optional bandwidth limiter that is consulted before each
+                data request sent to the drone
+
+        Yields:
+            progress information while the log is being downloaded
+        """
         last_progress_at = current_time()
+        max_chunk_size = (
+            min(MAX_CHUNK_SIZE, limiter.chunk_size) if limiter else MAX_CHUNK_SIZE
+        )
+
+        while not chunks.done:
+            next_range = chunks.get_next_range(max_size=max_chunk_size)
+            if limiter:
+                await limiter.acquire(next_range.size)
 
-        # We are requesting at most 512 LOG_DATA messages at once to let the
-        # wifi module also take care of other things while doing the download.
-        # Requesting the entire log at once has caused timeout problems with
-        # mavesp8266. The strategy adopted here is identical to what
-        # QGroundControl is doing
-        MAX_CHUNK_SIZE = 512 * 90
+            response: Optional[MAVLinkMessage] = await self._send_and_wait(
+                spec.log_request_data(
+                    id=log_id, ofs=next_range.offset, count=next_range.size
+                ),
+                spec.log_data(),
+            )
+
+            # Process the response, and start processing any other LOG_DATA messages
+            # that we receive via the channel
+            while response is not None:
+                if response.get_type() == "LOG_DATA":
+                    if response.id != log_id:
+                        # ignore
+                        pass
+
+                    to_flush = chunks.add_chunk(
+                        response.ofs, bytes(response.data[: response.count])
+                    )
+                    if to_flush:
+                        await write(to_flush)
+
+                response = None
+                if not chunks.done_with(next_range):
+                    with move_on_after(3):
+                        response = await rx.receive()
+
+                now = current_time()
+                if now - last_progress_at > 0.1:
+                    yield Progress(
+                        percentage=round(chunks.percentage),
+                        message="Downloading log...",
+                    )
+                    last_progress_at = current_time()
+
+    async def _download_log_inner(
+        self,
+        log_id: int,
+        rx: ReceiveChannel[MAVLinkMessage],
+        path: Path,
+        resume: bool,
+        limiter: Optional[BandwidthLimiter],
+    ) -> AsyncIterator[Union[Progress, Optional[FlightLogMetadata]]]:
+        part_path = path.with_name(path.name + ".part")
+        info_path = path.with_name(path.name + ".part.json")
 
+        try:
+            metadata = await self._get_single_log_metadata(log_id, rx)
+            if not metadata:
+                yield None
+                return
+
+            if metadata.size is None:
+                raise RuntimeError("unknown log size")
+
+            identity = {
+                "id": log_id,
+                "size": metadata.size,
+                "timestamp": metadata.timestamp,
+            }
+            offset = (
+                await _get_resumable_offset(part_path, info_path, identity)
+                if resume
+                else 0
+            )
+            if not offset:
+                await info_path.write_text(dumps(identity))
+
+            buffer = bytearray()
+            async with await open_file(part_path, "ab" if offset else "wb") as fp:
+
+                async def write(data: bytes) -> None:
+                    buffer.extend(data)
+                    if len(buffer) >= FLUSH_THRESHOLD:
+                        await fp.write(bytes(buffer))
+                        buffer.clear()
+
+                try:
+                    chunks = ChunkAssembler(metadata.size, offset=offset)
+                    async with aclosing(
+                        self._download_chunks(log_id, rx, chunks, write, limiter)
+                    ) as it:
+                        async for progress in it:
+                            yield progress
+                finally:
+                    # Write the data that we have received so far even if the
+                    # download was interrupted so we can resume it later
+                    if buffer:
+                        with CancelScope(shield=True):
+                            await fp.write(bytes(buffer))
+
+        finally:
+            await self._sender(spec.log_request_end())
+
+        await part_path.replace(path)
+        await info_path.unlink(missing_ok=True)
+        yield metadata
+
+    async def _get_log_inner(
+        self, log_id: int, rx: ReceiveChannel[MAVLinkMessage]
+    ) -> AsyncIterator[Union[Progress, Optional[FlightLog]]]:
         try:
             # Get the size of the log first and create a chunk assembler
             metadata = await self._get_single_log_metadata(log_id, rx)
@@ -156,41 +437,15 @@ class MAVLinkLogDownloader:
 
             chunks = ChunkAssembler(metadata.size)
             log_data: list[bytes] = []
-            while not chunks.done:
-                next_range = chunks.get_next_range(max_size=MAX_CHUNK_SIZE)
-                response: Optional[MAVLinkMessage] = await self._send_and_wait(
-                    spec.log_request_data(
-                        id=log_id, ofs=next_range.offset, count=next_range.size
-                    ),
-                    spec.log_data(),
-                )
-
-                # Process the response, and start processing any other LOG_DATA messages
-                # that we receive via the channel
-                while response is not None:
-                    if response.get_type() == "LOG_DATA":
-                        if response.id != log_id:
-                            # ignore
-                            pass
 
-                        to_flush = chunks.add_chunk(
-                            response.ofs, bytes(response.data[: response.count])
-                        )
-                        if to_flush:
-                            log_data.append(to_flush)
+            async def write(data: bytes) -> None:
+                log_data.append(data)
 
-                    response = None
-                    if not chunks.done_with(next_range):
-                        with move_on_after(3):
-                            response = await rx.receive()
-
-                    now = current_time()
-                    if now - last_progress_at > 0.1:
-                        yield Progress(
-                            percentage=round(chunks.percentage),
-                            message="Downloading log...",
-                        )
-                        last_progress_at = current_time()
+            async with aclosing(
+                self._download_chunks(log_id, rx, chunks, write)
+            ) as it:
+                async for progress in it:
+                    yield progress
 
         finally:
             await self._sender(spec.log_request_end())
@@ -255,6 +510,30 @@ class MAVLinkLogDownloader:
         else:
             return None
 
+    @asynccontextmanager
+    async def _use_message_channel_for_download(
+        self, log_id: int
+    ) -> AsyncIterator[ReceiveChannel[MAVLinkMessage]]:
+        """Context manager that marks the log with the given ID as being
+        downloaded and opens a channel on which the messages related to the
+        download are fed while the context is active.
+        """
+        if self._log_being_downloaded is not None:
+            raise RuntimeError("Another log download is in progress")
+
+        if self._log_listing_future is not None:
+            raise RuntimeError(
+                "Cannot download log: log listing is currently being retrieved"
+            )
+
+        self._log_being_downloaded = log_id
+        self._message_channel, rx = open_memory_channel(128)
+        try:
+            yield rx
+        finally:
+            self._log_being_downloaded = None
+            self._message_channel = None
+
     async def _send_and_wait(
         self,
         message: MAVLinkMessageSpecification,
@@ -293,3 +572,127 @@ class MAVLinkLogDownloader:
                     continue
                 else:
                     raise TooSlowError("MAVLink mission operation timed out") from None
+
+
+class FleetLogDownloader:
+    """Object that downloads logs from many MAVLink drones concurrently,
+    writing them to files on the disk.
+
+    Logs of the same drone are downloaded one by one because a drone supports
+    only a single log download at a time. Logs of different drones are
+    downloaded concurrently, up to a given number of drones at the same time.
+    The download rate of the drones in the same MAVLink network can be capped
+    by a bandwidth limit that is shared between the downloads in the network.
+    """
+
+    bandwidth: Optional[float]
+    """Maximum total download rate of the drones in the same MAVLink
+    network, in bytes per second; `None` if there is no limit.
+    """
+
+    max_concurrency: int
+    """Maximum number of drones to download logs from at the same time."""
+
+    _limiters: dict[str, BandwidthLimiter]
+    """Bandwidth limiters of the MAVLink networks, keyed by network IDs."""
+
+    def __init__(self, *, max_concurrency: int = 8, bandwidth: Optional[float] = None):
+        """Constructor.
+
+        Parameters:
+            max_concurrency: maximum number of drones to download logs from at
+                the same time
+            bandwidth: maximum total download rate of the drones in the same
+                MAVLink network, in bytes per second; `None` if there is no
+                limit
+        """
+        self.bandwidth = float(bandwidth) if bandwidth else None
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self._limiters = {}
+
+    async def download(
+        self,
+        jobs: Iterable[tuple[MAVLinkUAV, int, Union[str, PathLike[str]]]],
+        *,
+        resume: bool = True,
+        on_progress: Optional[Callable[[MAVLinkUAV, int, Progress], None]] = None,
+    ) -> list[Union[Optional[FlightLogMetadata], Exception]]:
+        """Downloads the given logs.
+
+        Parameters:
+            jobs: the logs to download; each item is a tuple consisting of a
+                drone, the ID of a log on the drone and the path of the file
+                to write the log to
+            resume: whether to resume earlier, interrupted downloads of the
+                logs
+            on_progress: optional function to call with the drone, the log ID
+                and the progress information while a log is being downloaded
+
+        Returns:
+            the results of the downloads, in the same order as the jobs. Each
+            result is the metadata of the downloaded log, `None` if the log
+            did not exist, or the exception that caused the download to fail.
+        """
+        jobs = list(jobs)
+        results: list[Union[Optional[FlightLogMetadata], Exception]] = [None] * len(
+            jobs
+        )
+
+        jobs_by_uav: defaultdict[MAVLinkUAV, list[int]] = defaultdict(list)
+        for index, (uav, _, _) in enumerate(jobs):
+            jobs_by_uav[uav].append(index)
+
+        semaphore = Semaphore(self.max_concurrency)
+
+        async def download_from(uav: MAVLinkUAV, indices: list[int]) -> None:
+            async with semaphore:
+                limiter = self._get_limiter_for(uav)
+                for index in indices:
+                    _, log_id, path = jobs[index]
+                    try:
+                        results[index] = await self._download_single(
+                            uav, log_id, path, resume, limiter, on_progress
+                        )
+                    except Exception as ex:
+                        results[index] = ex
+
+        async with open_nursery() as nursery:
+            for uav, indices in jobs_by_uav.items():
+                nursery.start_soon(download_from, uav, indices)
+
+        return results
+
+    async def _download_single(
+        self,
+        uav: MAVLinkUAV,
+        log_id: int,
+        path: Union[str, PathLike[str]],
+        resume: bool,
+        limiter: Optional[BandwidthLimiter],
+        on_progress: Optional[Callable[[MAVLinkUAV, int, Progress], None]],
+    ) -> Optional[FlightLogMetadata]:
+        result: Optional[FlightLogMetadata] = None
+        async with aclosing(
+            uav.log_downloader.download_log(
+                log_id, path, resume=resume, limiter=limiter
+            )
+        ) as it:
+            async for item in it:
+                if isinstance(item, Progress):
+                    if on_progress:
+                        on_progress(uav, log_id, item)
+                else:
+                    result = item
+        return result
+
+    def _get_limiter_for(self, uav: MAVLinkUAV) -> Optional[BandwidthLimiter]:
+        if self.bandwidth is None:
+            return None
+
+        network_id = uav.network_id
+        limiter = self._limiters.get(network_id)
+        if limiter is None:
+            limiter = self._limiters[network_id] = BandwidthLimiter(
+                self.bandwidth, burst=min(self.bandwidth, MAX_CHUNK_SIZE)
+            )
+        return limiter
@@ -12,6 +12,7 @@ multiple independent MAVLink-based drone swarms.
 
 from collections import defaultdict
 from contextlib import contextmanager, ExitStack
+from functools import partial
 from logging import Logger
 from time import time_ns
 from trio import move_on_after, open_nursery, to_thread
@@ -30,7 +31,7 @@ from typing import (
 from flockwave.connections import Connection, create_connection, ListenerConnection
 from flockwave.concurrency import Future, race
 from flockwave.networking import find_interfaces_with_address
-from flockwave.server.comm import CommunicationManager
+from flockwave.server.comm import CommunicationManager, OutboundTrafficClass
 from flockwave.server.model import ConnectionPurpose
 from flockwave.server.utils import nop, overridden
 
@@ -73,8 +74,21 @@ HEARTBEAT_SPEC = (
     },
 )
 
+#: Traffic classes of outbound MAVLink messages in the outbound queues of the
+#: communication manager, keyed by MAVLink message types. Messages of other
+#: types belong to the default traffic class.
+TRAFFIC_CLASSES_BY_MESSAGE_TYPE: dict[str, str] = {
+    "COMMAND_INT": "command",
+    "COMMAND_LONG": "command",
+    "FILE_TRANSFER_PROTOCOL": "bulk",
+    "GPS_RTCM_DATA": "rtk",
+    "RC_CHANNELS_OVERRIDE": "rc",
+    "SET_MODE": "command",
+}
 
-Matchers = dict[str, list[tuple[Optional[int], MAVLinkMessageMatcher, Future]]]
+
+Matcher = tuple[MAVLinkMessageMatcher, Future]
+Matchers = dict[str, dict[Optional[int], list[Matcher]]]
 
 
 class MAVLinkNetwork:
@@ -97,12 +111,29 @@ class MAVLinkNetwork:
     Skybrush.
     """
 
+    _ignored_message_types: frozenset[str] = frozenset()
+    """Set of MAVLink message types that the network does not process unless
+    there is a matcher waiting for them. Frames of these types are dropped by
+    the MAVLink parsers before their payload is decoded.
+    """
+
     _matchers: Matchers
-    """Dictionary mapping MAVLink message types to lists of tuples consisting
-    of an optional MAVLink system ID, a MAVLink message matching criterion and a
+    """Dictionary mapping MAVLink message types and optional MAVLink system IDs
+    to lists of pairs consisting of a MAVLink message matching criterion and a
     future that will be resolved when a MAVLink message matching the criterion
-    is received from the given MAVLink system ID (or any system ID if no
-    system ID was specified).
+    is received from the given MAVLink system ID (or any system ID if the
+    system ID is `None`). Empty lists and dictionaries are removed eagerly.
+    """
+
+    _removed_matchers: Optional[set[int]] = None
+    """IDs of the matchers that were removed from the matcher table while the
+    matchers of an inbound message are being resolved; `None` if no message
+    is being processed.
+    """
+
+    _outbound_queues: dict[str, OutboundTrafficClass]
+    """Traffic classes of the outbound queues of the links of the network that
+    override the default ones.
     """
 
     _routing: dict[str, list[int]]
@@ -140,6 +171,7 @@ class MAVLinkNetwork:
             spec.id,
             system_id=spec.system_id,
             id_formatter=spec.id_format.format,
+            outbound_queues=spec.outbound_queues,
             packet_loss=spec.packet_loss,
             statustext_targets=spec.statustext_targets,
             routing=spec.routing,
@@ -160,6 +192,7 @@ class MAVLinkNetwork:
         *,
         system_id: int = 254,
         id_formatter: Callable[[int, str], str] = "{0}".format,
+        outbound_queues: Optional[dict[str, OutboundTrafficClass]] = None,
         packet_loss: float = 0,
         statustext_targets: Optional[frozenset[str]] = None,
         routing: Optional[dict[str, list[int]]] = None,
@@ -179,6 +212,9 @@ class MAVLinkNetwork:
             id_formatter: function that can be called with a MAVLink system ID
                 and the network ID, and that must return a string that will be
                 used for the drone with the given system ID on the network
+            outbound_queues: traffic classes of the outbound queues of the
+                links of the network that override the default ones, keyed by
+                the names of the traffic classes
             packet_loss: when larger than zero, simulates packet loss on the
                 network by randomly dropping received and sent MAVLink messages
             statustext_targets: specifies where to forward MAVLink status text
@@ -206,6 +242,7 @@ class MAVLinkNetwork:
         self._led_light_configuration_manager = MAVLinkLEDLightConfigurationManager(
             self
         )
+        self._outbound_queues = dict(outbound_queues or {})
         self._packet_loss = max(float(packet_loss), 0.0)
         self._routing = routing or {}
         self._scheduled_takeoff_manager = ScheduledTakeoffManager(self)
@@ -269,14 +306,21 @@ class MAVLinkNetwork:
                         pass
 
         future = Future()
-        item = (system_id, params, future)
-        matchers = self._matchers[type_str]
-
-        matchers.append(item)
+        item = (params, future)
+        self._matchers[type_str][system_id].append(item)
         try:
             yield future
         finally:
-            matchers.pop(matchers.index(item))
+            self._remove_matcher(type_str, system_id, item)
+
+    def get_matcher_queue_depths(self) -> dict[str, int]:
+        """Returns the number of pending `expect_packet()` waiters in this
+        network, broken down by MAVLink message type.
+        """
+        return {
+            type: sum(len(items) for items in by_system_id.values())
+            for type, by_system_id in (self._matchers or {}).items()
+        }
 
     @property
     def id(self) -> str:
@@ -351,6 +395,8 @@ class MAVLinkNetwork:
                 system_id=self._system_id,
                 signing=self._signing,
                 use_broadcast_rate_limiting=self._use_broadcast_rate_limiting,
+                message_filter=self._should_decode_message,
+                traffic_classes=self._outbound_queues,
             )
 
             # Warn the user about the simulated packet loss setting
@@ -379,9 +425,9 @@ class MAVLinkNetwork:
             self._register_connection_aliases(manager, connection_names, stack, log=log)
 
             # Set up a dictionary that will map from MAVLink message types that
-            # we are waiting for to lists of corresponding (predicate, future)
-            # pairs
-            matchers: Matchers = defaultdict(list)
+            # we are waiting for and system IDs to lists of corresponding
+            # (predicate, future) pairs
+            matchers: Matchers = defaultdict(partial(defaultdict, list))
 
             # Override some of our properties with the values we were called with
             stack.enter_context(
@@ -412,9 +458,10 @@ class MAVLinkNetwork:
                         tasks=[self._generate_heartbeats],
                     )
                 finally:
-                    for matcher in matchers.values():
-                        for _, _, future in matcher:
-                            future.cancel()
+                    for by_system_id in matchers.values():
+                        for items in by_system_id.values():
+                            for _, future in items:
+                                future.cancel()
 
                 # Cancel all tasks in this nursery as we are about to shut down
                 nursery.cancel_scope.cancel()
@@ -429,7 +476,11 @@ class MAVLinkNetwork:
             channel: specifies the channel that the packet should be sent on;
                 defaults to the primary channel of the network
         """
-        await self.manager.broadcast_packet(spec, destination=channel)
+        await self.manager.broadcast_packet(
+            spec,
+            destination=channel,
+            traffic_class=TRAFFIC_CLASSES_BY_MESSAGE_TYPE.get(spec[0], "default"),
+        )
 
     def enqueue_rc_override_packet(self, channels: list[int]) -> None:
         """Handles a list of a RC channels that the server wishes to forward
@@ -462,7 +513,7 @@ class MAVLinkNetwork:
             chan18_raw=channels[17],
         )
         self.manager.enqueue_broadcast_packet(
-            message, destination=Channel.RC, allow_failure=True
+            message, destination=Channel.RC, allow_failure=True, traffic_class="rc"
         )
 
     def enqueue_rtk_correction_packet(self, packet: bytes) -> None:
@@ -479,7 +530,10 @@ class MAVLinkNetwork:
         messages = []
         for message in self._rtk_correction_packet_encoder.encode(packet):
             self.manager.enqueue_broadcast_packet(
-                message, destination=Channel.RTK, allow_failure=True
+                message,
+                destination=Channel.RTK,
+                allow_failure=True,
+                traffic_class="rtk",
             )
             messages.append(message)
 
@@ -571,6 +625,7 @@ class MAVLinkNetwork:
             raise RuntimeError("UAV has no address in this network")
 
         destination = (channel or Channel.PRIMARY, address)
+        traffic_class = TRAFFIC_CLASSES_BY_MESSAGE_TYPE.get(spec[0], "default")
 
         if wait_for_response:
             response_type, response_fields = wait_for_response
@@ -579,7 +634,7 @@ class MAVLinkNetwork:
             ) as future:
                 # TODO(ntamas): in theory, we could be getting a matching packet
                 # _before_ we sent ours. Sort this out if it causes problems.
-                await self.manager.send_packet(spec, destination)
+                await self.manager.send_packet(spec, destination, traffic_class)
                 return await future.wait()
 
         elif wait_for_one_of:
@@ -598,10 +653,10 @@ class MAVLinkNetwork:
 
                 # Now send the message and wait for _any_ of the futures to
                 # succeed
-                await self.manager.send_packet(spec, destination)
+                await self.manager.send_packet(spec, destination, traffic_class)
                 return await race(tasks)
         else:
-            await self.manager.send_packet(spec, destination)
+            await self.manager.send_packet(spec, destination, traffic_class)
 
     def uavs(self) -> Iterable[MAVLinkUAV]:
         """Returns an iterator that iterates over the UAVs in this network.
@@ -706,6 +761,12 @@ class MAVLinkNetwork:
         autopilot_component_id = MAVComponent.AUTOPILOT1
         udp_bridge_id = MAVComponent.UDP_BRIDGE
 
+        # Let the MAVLink parsers drop messages that we would ignore anyway
+        # before they get decoded
+        self._ignored_message_types = frozenset(
+            type for type, handler in handlers.items() if handler is nop
+        )
+
         # Many third-party MAVLink-based drones do not respond to broadcast
         # messages sent to them with an IP address of 255.255.255.255 as they
         # listen to the subnet-specific broadcast address only (e.g., 192.168.0.255).
@@ -743,30 +804,11 @@ class MAVLinkNetwork:
                 )
                 broadcast_address_updated[connection_id] = True
 
-            # Resolve all futures that are waiting for this message
-            for system_id, params, future in self._matchers[type]:
-                # Check system ID early on and skip if it does not match
-                if system_id is not None and message.get_srcSystem() != system_id:
-                    continue
-
-                if future.done():
-                    # This may happen if we get multiple matching messages in
-                    # quick succession before the task waiting for the result
-                    # gets a chance of responding to them; in this case, we
-                    # have to ignore the message, otherwise we would be resolving
-                    # the future twice
-                    continue
-                elif callable(params):
-                    matched = params(message)
-                elif params is None:
-                    matched = True
-                else:
-                    matched = all(
-                        getattr(message, param_name, None) == param_value
-                        for param_name, param_value in params.items()
-                    )
-                if matched:
-                    future.set_result(message)
+            # Resolve all futures that are waiting for this message, either
+            # from this particular system ID or from any system ID
+            if type in self._matchers:
+                self._resolve_matchers(type, message.get_srcSystem(), message)
+                self._resolve_matchers(type, None, message)
 
             # Call the message handler if we have one
             handler = handlers.get(type)
@@ -783,6 +825,7 @@ class MAVLinkNetwork:
                     extra=self._log_extra_from_message(message),
                 )
                 handlers[type] = nop
+                self._ignored_message_types |= {type}
 
     def _handle_message_autopilot_version(
         self, message: MAVLinkMessage, *, connection_id: str, address: Any
@@ -1019,6 +1062,105 @@ class MAVLinkNetwork:
         if channels:
             log.info(f"Routing RC overrides to {channels}", extra=extra)
 
+    def _remove_matcher(
+        self, type: str, system_id: Optional[int], item: Matcher
+    ) -> None:
+        """Removes the given matcher from the matcher table if it is still
+        there, cleaning up empty entries of the table.
+        """
+        by_system_id = self._matchers.get(type) if self._matchers else None
+        items = by_system_id.get(system_id) if by_system_id else None
+        if items is None:
+            return
+
+        for index, existing_item in enumerate(items):
+            if existing_item is item:
+                del items[index]
+                if self._removed_matchers is not None:
+                    self._removed_matchers.add(id(item))
+                break
+
+        if not items:
+            del by_system_id[system_id]  # type: ignore
+            if not by_system_id:
+                del self._matchers[type]
+
+    def _resolve_matchers(
+        self, type: str, system_id: Optional[int], message: MAVLinkMessage
+    ) -> None:
+        """Resolves the futures of all matchers registered for the given
+        message type and system ID that match the given message, and removes
+        the resolved matchers from the matcher table.
+        """
+        by_system_id = self._matchers.get(type)
+        items = by_system_id.get(system_id) if by_system_id else None
+        if not items:
+            return
+
+        # Iterate over a copy; a matcher may be removed from the table while
+        # we are evaluating the others (e.g., from a callable matcher), in
+        # which case it must not be resolved any more
+        num_done = 0
+        nested = self._removed_matchers is not None
+        if not nested:
+            self._removed_matchers = set()
+        removed = self._removed_matchers
+        try:
+            for item in tuple(items):
+                params, future = item
+                if removed and id(item) in removed:
+                    continue
+                elif future.done():
+                    # This may happen if we get multiple matching messages in
+                    # quick succession before the task waiting for the result
+                    # gets a chance of responding to them; in this case, we
+                    # have to ignore the message, otherwise we would be
+                    # resolving the future twice
+                    num_done += 1
+                    continue
+                elif callable(params):
+                    matched = params(message)
+                elif params is None:
+                    matched = True
+                else:
+                    matched = all(
+                        getattr(message, param_name, None) == param_value
+                        for param_name, param_value in params.items()
+                    )
+                if matched:
+                    future.set_result(message)
+                    num_done += 1
+        finally:
+            if not nested:
+                self._removed_matchers = None
+
+        if num_done:
+            # Prune the futures that are done; the context managers created by
+            # expect_packet() will not find them any more, which is fine
+            items[:] = [item for item in items if not item[1].done()]
+            if not items:
+                if by_system_id.get(system_id) is items:
+                    del by_system_id[system_id]  # type: ignore
+                if not by_system_id and self._matchers.get(type) is by_system_id:
+                    del self._matchers[type]
+
+    def _should_decode_message(
+        self, type: str, system_id: int, component_id: int
+    ) -> bool:
+        """Decides whether a raw inbound MAVLink frame should be decoded, based
+        on the type, the source system ID and the source component ID in its
+        header.
+
+        This function mirrors the filtering rules of `_handle_inbound_messages()`
+        so the MAVLink parsers can skip unpacking the payload of messages that
+        would be ignored anyway.
+        """
+        if component_id != MAVComponent.AUTOPILOT1:
+            return component_id == MAVComponent.UDP_BRIDGE and type == "RADIO_STATUS"
+        return type not in self._ignored_message_types or bool(
+            self._matchers and self._matchers.get(type)
+        )
+
     async def _update_broadcast_address_of_channel_to_subnet(
         self, connection_id: str, address: tuple[str, int], timeout: float = 1
     ) -> None:
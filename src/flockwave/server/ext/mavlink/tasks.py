@@ -1,86 +1,228 @@
 """Background tasks related to the MAVLink extension."""
 
+from __future__ import annotations
+
 from collections import defaultdict
-from time import monotonic
-from trio_util import periodic
-from typing import Optional
+from heapq import heappop, heappush
+from itertools import count
+from math import inf
+from trio import current_time, Event, move_on_after, sleep
+from typing import Any, Optional, TYPE_CHECKING
 
-from .driver import MAVLinkUAV
-from .enums import MAVMessageType
+if TYPE_CHECKING:
+    from .driver import MAVLinkUAV
+    from .types import MAVLinkMessage
 
-__all__ = ("check_uavs_alive",)
+__all__ = ("UAVLivenessTracker",)
 
 
 def _create_state_summary() -> list[Optional[int]]:
     return [None] * 256
 
 
-async def check_uavs_alive(
-    uavs: list[MAVLinkUAV], signal, log, *, delay: float = 0.5, timeout: float = 5
-) -> None:
-    """Worker task that runs in the background and checks whether we are
-    receiving heartbeats for all the UAVs in the given UAV array. Updates the
-    `is_connected` flags of the UAVs accordingly.
-
-    Parameters:
-        uavs: the list of UAVs to check. THe list may be mutable; it is iterated
-            periodically so you can simply add or remove the UAVs you are
-            interested in from this list while the worker task is running.
-        signal: a signal that interested parties may subscribe to to receive a
-            periodic summary of the status of active UAVs. This is typically
-            meant for communication with Skybrush Sidekick.
-        delay: number of seconds to wait between consecutive checks
-        timeout: number of seconds to wait after a heartbeat to consider a UAV
-            as disconnected
+class UAVLivenessTracker:
+    """Object that keeps track of whether we are receiving heartbeats from the
+    UAVs of the MAVLink extension, and that maintains a summary of the status
+    of the UAVs in each MAVLink network.
+
+    The tracker is event-driven. Each heartbeat postpones the deadline of the
+    UAV that sent it. The deadlines are kept in a heap, and a UAV is declared
+    disconnected only when its deadline expires. A heartbeat moves a
+    disconnected UAV back to the connected state immediately.
+
+    Deadlines are postponed lazily: each UAV has at most one entry in the
+    heap, and an expired entry is pushed back with the current deadline of
+    the UAV if a heartbeat arrived in the meanwhile. This keeps heartbeat
+    processing constant-time and the heap no larger than the number of UAVs.
+
+    The status summary is a dictionary mapping network IDs (as strings) to
+    lists of 256 entries, one for each possible MAVLink system ID in the
+    network (although system ID 0 is reserved so it should not appear as a
+    valid MAVLink system ID, ever). Each entry may be `None` (meaning that the
+    drone is not present in the network) or the _largest_ (most severe) error
+    code for the drone with that ID; this may be zero if the drone has no
+    errors. The entry of a UAV is updated whenever the UAV reports a status
+    change, and the summary of a network is sent only if it has changed, or
+    periodically as a refresh. The lists are re-used in later invocations so
+    it is imperative that signal handlers do _not_ keep a reference to them;
+    they must copy the list if they need it later.
     """
-    state_summaries: dict[str, list[Optional[int]]] = defaultdict(_create_state_summary)
-
-    # TODO(ntamas): remove UAVs that have been disconnected for a long while?
-    async for _ in periodic(delay):
-        now = monotonic()
-        for uav in uavs:
-            heartbeat_age = uav.get_age_of_message(MAVMessageType.HEARTBEAT, now)
-            if uav.is_connected:
-                if heartbeat_age >= timeout:
-                    uav.notify_disconnection()
-            else:
-                if heartbeat_age < timeout:
-                    # UAV may still be in a sleep state so let's get the heartbeat
-                    # and test it
-                    message = uav.get_last_message(MAVMessageType.HEARTBEAT)
-                    uav.notify_reconnection(message)
-
-        if uavs and signal.receivers:
-            try:
-                send_state_summary_signal(uavs, signal, state_summaries)
-            except Exception:
-                log.exception("Failed to prepare UAV state summary")
-
-
-def send_state_summary_signal(
-    uavs: list[MAVLinkUAV], signal, summaries: dict[str, list[Optional[int]]]
-):
-    """Helper function that creates a status summary for the UAVs in the given
-    list, sorted by MAVLink network IDs, and emits the summaries to subscribers
-    of the given signal.
-
-    The status summary is a dictionary mapping network IDs (as strings) to lists
-    of 256 entries, one for each possible MAVLink system ID in the network
-    (although system ID 0 is reserved so it should not appear as a valid MAVLink
-    system ID, ever). Each entry may be `None` (meaning that the drone is not
-    present in the network) or the _largest_ (most severe) error code for the
-    drone with that ID; this may be zero if the drone has no errors. The lists
-    are re-used in later invocations so it is imperative that signal handlers
-    do _not_ keep a reference to them; they must copy the list if they need it
-    later.
+
+    timeout: float
+    """Number of seconds to wait after a heartbeat to consider a UAV as
+    disconnected.
+    """
+
+    _deadlines: dict[MAVLinkUAV, float]
+    """The current deadlines of the UAVs, keyed by the UAVs."""
+
+    _dirty: set[str]
+    """IDs of the networks whose summaries have changed since they were last
+    sent.
     """
-    for uav in uavs:
-        summary = summaries[uav.network_id]
+
+    _heap: list[tuple[float, int, MAVLinkUAV]]
+    """Heap of deadlines, with a tie-breaker counter in the middle. The
+    deadline of an entry may be earlier than the current deadline of its UAV.
+    """
+
+    _summaries: dict[str, list[Optional[int]]]
+    """The status summaries of the networks, keyed by network IDs."""
+
+    _wakeup: Optional[Event] = None
+    """Event that the background task of the tracker waits for when it needs
+    to be woken up earlier than the next deadline.
+    """
+
+    def __init__(self, timeout: float = 5):
+        """Constructor.
+
+        Parameters:
+            timeout: number of seconds to wait after a heartbeat to consider a
+                UAV as disconnected
+        """
+        self.timeout = float(timeout)
+
+        self._counter = count()
+        self._deadlines = {}
+        self._dirty = set()
+        self._heap = []
+        self._summaries = defaultdict(_create_state_summary)
+
+    def clear(self) -> None:
+        """Forgets all the UAVs and status summaries that the tracker knows
+        about.
+        """
+        self._deadlines.clear()
+        self._dirty.clear()
+        self._heap.clear()
+        self._summaries.clear()
+
+    def notify_heartbeat(
+        self, uav: MAVLinkUAV, message: MAVLinkMessage, now: Optional[float] = None
+    ) -> None:
+        """Notifies the tracker that a heartbeat was received from the given
+        UAV.
+
+        Parameters:
+            uav: the UAV that sent the heartbeat
+            message: the heartbeat message
+            now: the current time according to the Trio clock; `None`
+                means to query the clock
+        """
+        deadline = (current_time() if now is None else now) + self.timeout
+
+        if uav not in self._deadlines:
+            heappush(self._heap, (deadline, next(self._counter), uav))
+            if self._heap[0][2] is uav:
+                self._wake_up()
+        self._deadlines[uav] = deadline
+
+        if not uav.is_connected:
+            uav.notify_reconnection(message)
+            self.notify_status_changed(uav)
+
+    def notify_status_changed(self, uav: MAVLinkUAV) -> None:
+        """Notifies the tracker that the connection state or the error codes
+        of the given UAV may have changed, updating the status summary of the
+        network of the UAV if needed.
+        """
+        network_id, system_id = uav.network_id, uav.system_id
+        if not network_id or not 0 <= system_id < 256:
+            return
+
         if uav.is_connected:
-            errors = uav.status.errors
-            summary[uav.system_id] = max(errors, default=0)
+            value = max(uav.status.errors, default=0)
         else:
-            summary[uav.system_id] = None
+            value = None
+
+        summary = self._summaries[network_id]
+        if summary[system_id] != value:
+            summary[system_id] = value
+            if not self._dirty:
+                self._wake_up()
+            self._dirty.add(network_id)
+
+    def expire(self, now: Optional[float] = None) -> float:
+        """Processes the expired deadlines, declaring the corresponding UAVs
+        disconnected.
+
+        Parameters:
+            now: the current time according to the Trio clock; `None`
+                means to query the clock
+
+        Returns:
+            the next deadline in the heap, or infinity if the heap is empty
+        """
+        if now is None:
+            now = current_time()
+
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, _, uav = heappop(heap)
+            deadline = self._deadlines.get(uav)
+            if deadline is None:
+                continue
+            elif deadline > now:
+                # We have received a heartbeat since this entry was pushed
+                heappush(heap, (deadline, next(self._counter), uav))
+            else:
+                del self._deadlines[uav]
+                if uav.is_connected:
+                    uav.notify_disconnection()
+                    self.notify_status_changed(uav)
+
+        return heap[0][0] if heap else inf
+
+    async def run(
+        self, signal, log, *, delay: float = 0.5, refresh_interval: float = 1
+    ) -> None:
+        """Background task that declares UAVs disconnected when their
+        deadlines expire, and that sends the status summaries of the networks
+        to the subscribers of the given signal when they change.
+
+        Parameters:
+            signal: a signal that interested parties may subscribe to to
+                receive a summary of the status of active UAVs. This is
+                typically meant for communication with Skybrush Sidekick.
+            log: logger to use for logging errors
+            delay: minimum number of seconds between consecutive summaries
+            refresh_interval: number of seconds after which all the summaries
+                are sent again even if they have not changed
+        """
+        next_refresh_at = current_time() + refresh_interval
+
+        try:
+            while True:
+                now = current_time()
+                next_deadline = self.expire(now)
+
+                if now >= next_refresh_at:
+                    if self._summaries:
+                        self._dirty.update(self._summaries.keys())
+                    next_refresh_at = now + refresh_interval
+
+                if self._dirty and signal.receivers:
+                    try:
+                        self._send_summaries(signal)
+                    except Exception:
+                        log.exception("Failed to prepare UAV state summary")
+                    await sleep(delay)
+                    continue
+
+                self._wakeup = Event()
+                wait = min(next_deadline, next_refresh_at) - now
+                with move_on_after(max(wait, 0)):
+                    await self._wakeup.wait()
+        finally:
+            self._wakeup = None
+
+    def _send_summaries(self, signal: Any) -> None:
+        dirty = sorted(self._dirty)
+        self._dirty.clear()
+        for network_id in dirty:
+            signal.send(network_id, summary=self._summaries[network_id])
 
-    for network_id, summary in summaries.items():
-        signal.send(network_id, summary=summary)
+    def _wake_up(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
@@ -13,6 +13,11 @@ from typing import (
     Union,
 )
 
+from flockwave.server.comm import (
+    DEFAULT_OUTBOUND_TRAFFIC_CLASSES,
+    OutboundTrafficClass,
+)
+
 from .signing import MAVLinkSigningConfiguration
 
 __all__ = (
@@ -125,6 +130,12 @@ class MAVLinkNetworkSpecification:
     `create_connection()` function.
     """
 
+    outbound_queues: dict[str, OutboundTrafficClass] = field(default_factory=dict)
+    """Traffic classes of the outbound queues of the links of the network that
+    override the default traffic classes, keyed by the names of the traffic
+    classes.
+    """
+
     routing: dict[str, list[int]] = field(default_factory=dict)
     """Specifies where certain types of packets should be routed if the
     network has multiple connections.
@@ -176,6 +187,16 @@ class MAVLinkNetworkSpecification:
         if "connections" in obj:
             result.connections = obj["connections"]
 
+        if "outbound_queues" in obj and isinstance(obj["outbound_queues"], dict):
+            default = DEFAULT_OUTBOUND_TRAFFIC_CLASSES["default"]
+            result.outbound_queues = {
+                str(name): OutboundTrafficClass.from_json(
+                    value, DEFAULT_OUTBOUND_TRAFFIC_CLASSES.get(name, default)
+                )
+                for name, value in obj["outbound_queues"].items()
+                if isinstance(value, dict)
+            }
+
         if "packet_loss" in obj:
             result.packet_loss = float(obj["packet_loss"])
 
@@ -210,6 +231,9 @@ class MAVLinkNetworkSpecification:
             "id_offset": self.id_offset,
             "system_id": self.system_id,
             "connections": self.connections,
+            "outbound_queues": {
+                name: value.json for name, value in self.outbound_queues.items()
+            },
             "packet_loss": self.packet_loss,
             "routing": self.routing,
             "signing": self.signing,
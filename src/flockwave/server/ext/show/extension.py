@@ -3,11 +3,19 @@ from __future__ import annotations
 from contextlib import ExitStack
 from logging import Logger
 from math import inf
-from trio import fail_after, Nursery, open_nursery, sleep_forever, TooSlowError
+from trio import (
+    fail_after,
+    Nursery,
+    open_nursery,
+    Semaphore,
+    sleep_forever,
+    TooSlowError,
+)
 from trio_util import periodic
 from typing import Any, Optional
 
 from flockwave.concurrency import CancellableTaskGroup
+from flockwave.server.errors import NotSupportedError
 from flockwave.server.ext.base import Extension
 from flockwave.server.model.clock import Clock
 from flockwave.server.tasks import wait_for_dict_items, wait_until
@@ -15,6 +23,7 @@ from flockwave.server.tasks import wait_for_dict_items, wait_until
 from .clock import ClockSynchronizationHandler, ShowClock, ShowEndClock
 from .config import DroneShowConfiguration, LightConfiguration, StartMethod
 from .logging import ShowUploadLoggingMiddleware
+from .upload import compose_show, run_show_upload, ShowBlobStore
 
 __all__ = ("construct", "dependencies", "description")
 
@@ -28,6 +37,14 @@ class DroneShowExtension(Extension):
     emitted when the configuration of the LED lights on the drones changes. The
     latter two receive a keyword argument named `config` that contains the new
     configuration.
+
+    The extension also provides a bulk show upload API for large fleets. The
+    parts of the show that differ between drones are uploaded as
+    content-addressed blobs with `X-SHOW-BLOB` messages (`X-SHOW-BLOB-INF`
+    tells which blobs the server has already), and a single `X-SHOW-UPLOAD`
+    message then sends the parts shared by all drones together with the
+    blob references of each drone. The uploads are dispatched to the UAV
+    drivers concurrently, with one receipt per drone.
     """
 
     log: Logger
@@ -37,8 +54,10 @@ class DroneShowExtension(Extension):
     _end_clock: Optional[ShowEndClock]
     _end_clock_sync: ClockSynchronizationHandler
 
+    _blobs: ShowBlobStore
     _nursery: Optional[Nursery]
     _show_tasks: Optional[CancellableTaskGroup]
+    _upload_semaphore: Semaphore
 
     def __init__(self):
         super().__init__()
@@ -49,8 +68,10 @@ class DroneShowExtension(Extension):
         self._end_clock = None
         self._end_clock_sync = ClockSynchronizationHandler()
 
+        self._blobs = ShowBlobStore()
         self._nursery = None
         self._show_tasks = None
+        self._upload_semaphore = Semaphore(32)
 
         self._config = DroneShowConfiguration()
         self._lights = LightConfiguration()
@@ -97,6 +118,82 @@ class DroneShowExtension(Extension):
         except Exception as ex:
             return hub.acknowledge(message, outcome=False, reason=str(ex))
 
+    def handle_SHOW_BLOB(self, message, sender, hub):
+        body = message.body
+        hash, data, size = body.get("hash"), body.get("data"), body.get("size")
+        offset = body.get("offset", 0)
+
+        if (
+            not isinstance(hash, str)
+            or not isinstance(data, (str, bytes))
+            or not isinstance(size, int)
+            or not isinstance(offset, int)
+        ):
+            return hub.acknowledge(message, outcome=False, reason="Invalid blob chunk")
+
+        try:
+            complete = self._blobs.add_chunk(hash, data, offset=offset, size=size)
+        except ValueError as ex:
+            return hub.acknowledge(message, outcome=False, reason=str(ex))
+
+        return {"complete": complete}
+
+    def handle_SHOW_BLOB_INF(self, message, sender, hub):
+        hashes = message.body.get("hashes")
+        if not isinstance(hashes, list):
+            return hub.acknowledge(
+                message, outcome=False, reason="Blob hashes must be given in a list"
+            )
+
+        return {"missing": self._blobs.get_missing(hashes)}
+
+    def handle_SHOW_UPLOAD(self, message, sender, hub):
+        assert self.app is not None
+
+        common = message.body.get("common") or {}
+        specs = message.body.get("uavs")
+        if not isinstance(common, dict) or not isinstance(specs, dict):
+            return hub.acknowledge(message, outcome=False, reason="Invalid show upload")
+
+        response = hub.create_response_or_notification(body={}, in_response_to=message)
+
+        shows: dict[str, dict[str, Any]] = {}
+        for uav_id, spec in specs.items():
+            try:
+                if not isinstance(spec, dict):
+                    raise RuntimeError("Invalid show specification")
+                shows[uav_id] = compose_show(common, spec, self._blobs)
+            except RuntimeError as ex:
+                response.add_error(uav_id, str(ex))
+
+        cmd_manager = self.app.command_execution_manager
+        uavs_by_drivers = self.app.sort_uavs_by_drivers(shows.keys(), response)
+        for driver, uavs in uavs_by_drivers.items():
+            for uav in uavs:
+                try:
+                    results = driver.send_command(
+                        [uav], "__show_upload", kwds={"show": shows[uav.id]}
+                    )
+                    result = results[uav]
+                except (NotImplementedError, NotSupportedError):
+                    result = RuntimeError("Operation not supported")
+                except Exception as ex:
+                    self.log.exception(ex)
+                    result = RuntimeError(f"Unexpected error: {ex}")
+
+                if isinstance(result, Exception):
+                    response.add_error(uav.id, str(result))
+                else:
+                    receipt = cmd_manager.new(client_to_notify=sender.id)
+                    response.add_receipt(uav.id, receipt)
+                    response.when_sent(
+                        cmd_manager.mark_as_clients_notified,
+                        receipt.id,
+                        run_show_upload(result, self._upload_semaphore),
+                    )
+
+        return response
+
     async def run(self, app, configuration, logger):
         self._clock = ShowClock()
         self._end_clock = ShowEndClock()
@@ -106,8 +203,18 @@ class DroneShowExtension(Extension):
             "SHOW-LIGHTS": self.handle_SHOW_LIGHTS,
             "SHOW-SETCFG": self.handle_SHOW_SETCFG,
             "SHOW-SETLIGHTS": self.handle_SHOW_SETLIGHTS,
+            "X-SHOW-BLOB": self.handle_SHOW_BLOB,
+            "X-SHOW-BLOB-INF": self.handle_SHOW_BLOB_INF,
+            "X-SHOW-UPLOAD": self.handle_SHOW_UPLOAD,
         }
 
+        self._blobs = ShowBlobStore(
+            max_size=int(configuration.get("blob_cache_size", 256)) * 1024 * 1024
+        )
+        self._upload_semaphore = Semaphore(
+            max(1, int(configuration.get("max_concurrent_uploads", 32)))
+        )
+
         self._config.start_method = StartMethod(
             configuration.get("default_start_method", "rc")
         )
@@ -368,6 +475,26 @@ schema = {
             "options": {
                 "enum_titles": [StartMethod.RC.describe(), StartMethod.AUTO.describe()],
             },
-        }
+        },
+        "max_concurrent_uploads": {
+            "type": "integer",
+            "title": "Maximum number of concurrent show uploads",
+            "description": (
+                "Maximum number of drones that may receive their shows at the "
+                "same time during a bulk show upload"
+            ),
+            "minimum": 1,
+            "default": 32,
+        },
+        "blob_cache_size": {
+            "type": "integer",
+            "title": "Show part cache size (MB)",
+            "description": (
+                "Maximum total size of the show parts that are kept in memory "
+                "for bulk show uploads"
+            ),
+            "minimum": 1,
+            "default": 256,
+        },
     }
 }
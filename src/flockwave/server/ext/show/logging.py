@@ -85,6 +85,11 @@ class ShowUploadLoggingMiddleware:
                 kwds = message.body.get("kwds", {})
                 if isinstance(kwds, dict) and "show" in kwds:
                     return kwds["show"]
+        elif type == "X-SHOW-UPLOAD":
+            # Bulk uploads contain the parts shared by all drones only once
+            common = message.body.get("common")
+            if isinstance(common, dict):
+                return common
 
     @staticmethod
     def _get_show_fingerprint(show: dict[str, Any]) -> ShowFingerprint:
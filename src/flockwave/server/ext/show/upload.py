@@ -0,0 +1,362 @@
+"""Content-addressed storage for the parts of drone shows that are uploaded in
+bulk, and helper functions to assemble the shows of individual drones from
+these parts.
+
+A bulk show upload consists of two phases. First, the client uploads the parts
+of the show that differ between drones (typically the trajectories and the
+light programs) as _blobs_. Each blob is the UTF-8 encoded JSON representation
+of a show part, identified by the SHA-256 hash of its contents, and it may be
+sent in multiple chunks. Blobs that the server already has do not need to be
+uploaded again. Second, the client sends a single request that contains the
+parts shared by all drones (coordinate system, geofence, light defaults and
+so on) only once, and refers to the blobs of each drone by their hashes.
+"""
+
+from base64 import b64decode
+from hashlib import sha256
+from inspect import isawaitable
+from json import loads
+from time import monotonic
+from trio import move_on_after, Semaphore
+from typing import Any, AsyncIterator, Optional, Union
+
+from flockwave.server.model.commands import Progress
+from flockwave.server.utils import LastUpdatedOrderedDict
+
+__all__ = ("compose_show", "run_show_upload", "ShowBlobStore")
+
+
+class _PartialBlob:
+    """A blob whose chunks are still being received."""
+
+    size: int
+    """The total size of the blob, in bytes."""
+
+    chunks: dict[int, bytes]
+    """The chunks received so far, keyed by their offsets."""
+
+    received: int
+    """The total number of bytes received so far."""
+
+    updated_at: float
+    """The monotonic timestamp of the last chunk received."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.chunks = {}
+        self.received = 0
+        self.updated_at = monotonic()
+
+    def add(self, offset: int, data: bytes) -> None:
+        if offset < 0 or offset + len(data) > self.size:
+            raise ValueError("chunk is out of the bounds of the blob")
+
+        old_chunk = self.chunks.get(offset)
+        if old_chunk is not None:
+            self.received -= len(old_chunk)
+
+        self.chunks[offset] = data
+        self.received += len(data)
+        self.updated_at = monotonic()
+
+    @property
+    def complete(self) -> bool:
+        return self.received >= self.size
+
+    def to_bytes(self) -> bytes:
+        buffer = bytearray(self.size)
+        for offset, data in self.chunks.items():
+            buffer[offset : offset + len(data)] = data
+        return bytes(buffer)
+
+
+class ShowBlobStore:
+    """Content-addressed store of show parts.
+
+    Blobs are stored in their parsed form so each blob is decoded only once,
+    no matter how many drones refer to it. The store keeps at most a given
+    number of bytes worth of blobs, including the chunks of blobs that are
+    still being received; the least recently used blobs are evicted when the
+    limit is exceeded. Blobs whose chunks stop arriving are discarded after a
+    timeout.
+    """
+
+    max_size: int
+    """The maximum total size of the blobs in the store, in bytes, measured by
+    the size of their encoded representations.
+    """
+
+    partial_timeout: float
+    """Number of seconds after which a blob is discarded if no new chunks
+    arrived for it and it is still not complete.
+    """
+
+    _blobs: LastUpdatedOrderedDict[str, tuple[int, Any]]
+    """The complete blobs, mapping their hashes to their sizes and parsed
+    contents, in the order they were last used.
+    """
+
+    _partial: dict[str, _PartialBlob]
+    """The blobs whose chunks are still being received, keyed by their hashes,
+    in the order they were last updated.
+    """
+
+    _partial_size: int
+    """The total size of the chunks of the blobs still being received."""
+
+    _size: int
+    """The total size of the complete blobs in the store."""
+
+    def __init__(
+        self, max_size: int = 256 * 1024 * 1024, partial_timeout: float = 60
+    ):
+        """Constructor.
+
+        Parameters:
+            max_size: the maximum total size of the blobs in the store, in bytes
+            partial_timeout: number of seconds after which incomplete blobs
+                are discarded if no new chunks arrived for them
+        """
+        self.max_size = max_size
+        self.partial_timeout = partial_timeout
+
+        self._blobs = LastUpdatedOrderedDict()
+        self._partial = {}
+        self._partial_size = 0
+        self._size = 0
+
+    def __contains__(self, hash: str) -> bool:
+        return hash in self._blobs
+
+    def add(self, data: bytes) -> str:
+        """Adds a complete blob to the store.
+
+        Parameters:
+            data: the encoded representation of the blob
+
+        Returns:
+            the hash of the blob
+
+        Raises:
+            ValueError: if the blob is not valid JSON
+        """
+        hash = sha256(data).hexdigest()
+        self._store(hash, data)
+        return hash
+
+    def add_chunk(
+        self, hash: str, data: Union[bytes, str], *, offset: int = 0, size: int
+    ) -> bool:
+        """Adds a chunk of a blob to the store.
+
+        Parameters:
+            hash: the hash of the blob
+            data: the contents of the chunk; strings are assumed to be
+                base64-encoded
+            offset: the offset of the chunk within the blob
+            size: the total size of the blob
+
+        Returns:
+            whether the blob is now complete
+
+        Raises:
+            ValueError: if the chunk is invalid, the blob is too large, or the
+                blob is complete but its hash does not match the hash it was
+                uploaded with
+        """
+        if hash in self._blobs:
+            return True
+
+        if size < 0:
+            raise ValueError("blob size must not be negative")
+        if size > self.max_size:
+            raise ValueError("blob is too large")
+
+        if isinstance(data, str):
+            data = b64decode(data)
+
+        self._expire_partial_blobs()
+
+        partial = self._partial.pop(hash, None)
+        if partial is None or partial.size != size:
+            if partial is not None:
+                self._partial_size -= partial.received
+            partial = _PartialBlob(size)
+
+        # Re-insert the blob to keep the dict in the order of last updates
+        self._partial[hash] = partial
+        received = partial.received
+        try:
+            partial.add(offset, data)
+        finally:
+            self._partial_size += partial.received - received
+
+        if not partial.complete:
+            self._evict(keep=hash)
+            return False
+
+        self._remove_partial(hash)
+        data = partial.to_bytes()
+        if sha256(data).hexdigest() != hash:
+            raise ValueError("blob contents do not match its hash")
+
+        self._store(hash, data)
+        return True
+
+    def clear(self) -> None:
+        """Removes all the blobs from the store."""
+        self._blobs.clear()
+        self._partial.clear()
+        self._partial_size = 0
+        self._size = 0
+
+    def get(self, hash: str) -> Any:
+        """Returns the parsed contents of the blob with the given hash.
+
+        Raises:
+            KeyError: if there is no complete blob with the given hash
+        """
+        entry = self._blobs[hash]
+        self._blobs.move_to_end(hash)
+        return entry[1]
+
+    def get_missing(self, hashes: list[str]) -> list[str]:
+        """Returns the hashes from the given list that do not refer to complete
+        blobs in the store.
+        """
+        return [hash for hash in hashes if hash not in self._blobs]
+
+    def _store(self, hash: str, data: bytes) -> None:
+        if hash in self._blobs:
+            self._blobs.move_to_end(hash)
+            return
+
+        try:
+            value = loads(data)
+        except ValueError:
+            raise ValueError("blob is not a valid JSON document") from None
+
+        self._blobs[hash] = len(data), value
+        self._size += len(data)
+        self._evict()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Evicts the least recently used complete blobs, then the least
+        recently updated incomplete blobs, until the total size of the store
+        is within its limit. The most recently used complete blob and the
+        incomplete blob with the given hash are never evicted.
+        """
+        while self._size + self._partial_size > self.max_size:
+            if len(self._blobs) > 1:
+                _, (size, _) = self._blobs.popitem(last=False)
+                self._size -= size
+            else:
+                hash = next((hash for hash in self._partial if hash != keep), None)
+                if hash is None:
+                    break
+                self._remove_partial(hash)
+
+    def _expire_partial_blobs(self) -> None:
+        """Discards the incomplete blobs that received no new chunks for a
+        while.
+        """
+        threshold = monotonic() - self.partial_timeout
+        expired = [
+            hash
+            for hash, partial in self._partial.items()
+            if partial.updated_at < threshold
+        ]
+        for hash in expired:
+            self._remove_partial(hash)
+
+    def _remove_partial(self, hash: str) -> None:
+        partial = self._partial.pop(hash, None)
+        if partial is not None:
+            self._partial_size -= partial.received
+
+
+def compose_show(
+    common: dict[str, Any], spec: dict[str, Any], store: ShowBlobStore
+) -> dict[str, Any]:
+    """Composes the show specification of a single drone from the parts shared
+    by all drones and the parts specific to the drone.
+
+    The show is a shallow copy of the shared parts, updated with the blobs
+    referred to by the drone and then with the inline parts of the drone.
+
+    Parameters:
+        common: the parts of the show shared by all drones
+        spec: the parts of the show specific to the drone. The ``blobs`` key
+            maps keys of the show specification to the hashes of the blobs
+            to use for them; all the other keys are copied to the show
+            specification as is.
+        store: the store to look up the blobs in
+
+    Returns:
+        the show specification of the drone
+
+    Raises:
+        RuntimeError: if the drone refers to a blob that is not in the store
+    """
+    show = dict(common)
+
+    blobs = spec.get("blobs") or {}
+    if not isinstance(blobs, dict):
+        raise RuntimeError("blob references must be given in an object")
+
+    for key, hash in blobs.items():
+        try:
+            show[key] = store.get(hash)
+        except (KeyError, TypeError):
+            raise RuntimeError(f"Show part {key!r} was not uploaded") from None
+
+    show.update((key, value) for key, value in spec.items() if key != "blobs")
+    return show
+
+
+async def run_show_upload(
+    result: Any, semaphore: Semaphore, *, progress_interval: float = 5
+) -> AsyncIterator[Any]:
+    """Runs the upload of the show of a single drone when the given semaphore
+    allows it, posting progress reports while the upload is waiting for its
+    turn or is running.
+
+    Parameters:
+        result: the result of the show upload command of the UAV driver; the
+            upload is awaited if it is an awaitable
+        semaphore: semaphore that limits the number of concurrent uploads
+        progress_interval: number of seconds between consecutive progress
+            reports while the upload is waiting for its turn
+
+    Yields:
+        progress reports, followed by the result of the upload if it is not
+        `None`
+    """
+    if not isawaitable(result):
+        if result is not None:
+            yield result
+        return
+
+    started = False
+    try:
+        while True:
+            with move_on_after(progress_interval):
+                await semaphore.acquire()
+                break
+            yield Progress(percentage=0, message="Waiting for upload slot")
+
+        try:
+            yield Progress(percentage=0, message="Uploading")
+            started = True
+            value: Optional[Any] = await result
+        finally:
+            semaphore.release()
+    finally:
+        if not started:
+            close = getattr(result, "close", None)
+            if close:
+                close()
+
+    yield Progress.done("Uploaded")
+    if value is not None:
+        yield value
@@ -23,11 +23,15 @@ from typing import (
 from urllib.parse import parse_qs
 
 from flockwave.encoders.json import create_json_encoder
-from flockwave.server.model import Client, CommunicationChannel
+from flockwave.server.message_hub import MessageEncodingCache
+from flockwave.server.model import Client, CommunicationChannel, FlockwaveMessage
+from flockwave.server.utils.wire_formats import create_msgpack_encoder
 from flockwave.networking import format_socket_address
 
 from .vendor.socketio_v4 import TrioServer as TrioServerForSocketIOV4
 from .vendor.socketio_v5 import TrioServer as TrioServerForSocketIOV5
+from .vendor.socketio_v5.msgpack_packet import MsgPackPacket
+from .vendor.socketio_v5.packet import EVENT
 
 if TYPE_CHECKING:
     from flockwave.server.app import SkybrushServer
@@ -78,21 +82,88 @@ class SocketIOChannel(CommunicationChannel):
 ############################################################################
 
 
+def _is_flockwave_event(data: Any) -> bool:
+    """Returns whether the given Socket.IO event payload is a Flockwave message
+    being sent to a client.
+    """
+    return (
+        isinstance(data, list)
+        and len(data) == 2
+        and data[0] == "fw"
+        and isinstance(data[1], FlockwaveMessage)
+    )
+
+
 class JSONEncoder:
-    def __init__(self):
+    def __init__(self, cache: Optional[MessageEncodingCache] = None):
+        """Constructor.
+
+        Parameters:
+            cache: optional cache that the encoder can use to share the
+                encoded representation of broadcast messages between the
+                Socket.IO clients
+        """
         self.encoder = create_json_encoder()
         self.parser = JSONDecoder()
+        self.cache = cache
 
     def dumps(self, obj, *args, **kwds):
+        # Socket.IO encodes events emitted to a room separately for each
+        # participant; the cache ensures that Flockwave messages being
+        # broadcast are encoded only once
+        if self.cache is not None and _is_flockwave_event(obj):
+            return self.cache.encode(obj[1], "socketio-json", self._dumps_fw_event)
+        else:
+            return self._dumps(obj)
+
+    def _dumps(self, obj) -> str:
         # There is an unnecessary back-and-forth UTF-8 encoding here because
         # create_json_encoder() and create_json_parser() return raw bytes,
         # but TrioServer needs strings
         return self.encoder(obj).decode("utf-8")
 
+    def _dumps_fw_event(self, message: FlockwaveMessage) -> str:
+        return self._dumps(["fw", message])
+
     def loads(self, data, *args, **kwds):
         return self.parser.decode(data)
 
 
+def create_msgpack_packet_class(
+    cache: Optional[MessageEncodingCache] = None,
+) -> type[MsgPackPacket]:
+    """Creates a Socket.IO packet class that encodes packets with MessagePack
+    and that knows how to encode Flockwave messages.
+
+    Parameters:
+        cache: optional cache that the packet class can use to share the
+            encoded representation of broadcast messages between the
+            Socket.IO clients
+    """
+    encoder = create_msgpack_encoder()
+
+    class FlockwaveMsgPackPacket(MsgPackPacket):
+        def encode(self):
+            # Socket.IO encodes events emitted to a room separately for each
+            # participant; the cache ensures that Flockwave messages being
+            # broadcast are encoded only once
+            if (
+                cache is not None
+                and self.packet_type == EVENT
+                and self.id is None
+                and self.namespace == "/"
+                and _is_flockwave_event(self.data)
+            ):
+                return cache.encode(self.data[1], "socketio-msgpack", self._encode)
+            else:
+                return self._encode()
+
+        def _encode(self, *args):
+            return encoder(self._to_dict())
+
+    return FlockwaveMsgPackPacket
+
+
 ############################################################################
 
 
@@ -103,15 +174,22 @@ class SocketIOProtocol(Enum):
 
     channel_id: str
     server_class: Callable
+    serializer: str
     expected_engine_io_query_param: list[str]
 
     def __new__(
-        cls, value: str, channel_id: str, server_class: Callable, engine_io_version: int
+        cls,
+        value: str,
+        channel_id: str,
+        server_class: Callable,
+        engine_io_version: int,
+        serializer: str = "default",
     ):
         obj = object.__new__(cls)
         obj._value_ = value
         obj.channel_id = channel_id
         obj.server_class = server_class
+        obj.serializer = serializer
         obj.expected_engine_io_query_param = [str(engine_io_version)]
         return obj
 
@@ -128,17 +206,30 @@ class SocketIOProtocol(Enum):
 
         For Socket.IO and Engine.IO, we simply need to check the `EIO` query
         parameter of the request. Socket.IO v4 is based on Engine.IO v3 so
-        `EIO=3`. Socket.IO v5 is based on Engine.IO v5 so `EIO=4`.
+        `EIO=3`. Socket.IO v5 is based on Engine.IO v5 so `EIO=4`. Clients
+        that wish to use MessagePack instead of JSON must also add
+        `serializer=msgpack` to the query parameters of the request.
         """
         query_string = environ.get("QUERY_STRING")
         if query_string:
             query = parse_qs(query_string)
-            return query.get("EIO") == self.expected_engine_io_query_param
+            serializer = query.get("serializer", ["default"])
+            return (
+                query.get("EIO") == self.expected_engine_io_query_param
+                and serializer == [self.serializer]
+            )
         else:
             return False
 
     SOCKETIO_V4 = ("socketio-v4", "sio", TrioServerForSocketIOV4, 3)
     SOCKETIO_V5 = ("socketio-v5", "sio5", TrioServerForSocketIOV5, 4)
+    SOCKETIO_V5_MSGPACK = (
+        "socketio-v5-msgpack",
+        "sio5+msgpack",
+        TrioServerForSocketIOV5,
+        4,
+        "msgpack",
+    )
 
 
 def get_enabled_protocols(
@@ -155,7 +246,11 @@ def get_enabled_protocols(
         protocols = None
 
     result: list[SocketIOProtocol] = []
-    for protocol_code in protocols or ("socketio-v4", "socketio-v5"):
+    for protocol_code in protocols or (
+        "socketio-v4",
+        "socketio-v5",
+        "socketio-v5-msgpack",
+    ):
         try:
             protocol = SocketIOProtocol.from_string(protocol_code)
             result.append(protocol)
@@ -238,8 +333,14 @@ class SocketIOCommunicationHandler:
 
     @contextmanager
     def use(self) -> Iterator:
+        cache = self._app.message_hub.encoding_cache
+        if self._protocol.serializer == "msgpack":
+            kwds = {"serializer": create_msgpack_packet_class(cache=cache)}
+        else:
+            kwds = {"json": JSONEncoder(cache=cache)}
+
         server = self._protocol.server_class(
-            json=JSONEncoder(), async_mode="asgi", cors_allowed_origins="*"
+            async_mode="asgi", cors_allowed_origins="*", **kwds
         )
 
         server.on("connect")(self._handle_connection)
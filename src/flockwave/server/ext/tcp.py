@@ -11,6 +11,7 @@ from contextlib import ExitStack
 from functools import partial
 from json import JSONDecodeError
 from logging import Logger
+from msgpack.exceptions import UnpackException
 from trio import (
     aclose_forcefully,
     BrokenResourceError,
@@ -23,16 +24,16 @@ from trio import (
 from typing import Any, Optional
 
 from flockwave.channels import ParserChannel
-from flockwave.encoders.json import create_json_encoder
-from flockwave.parsers.json import create_json_parser
+from flockwave.server.message_hub import RequestScheduler
 from flockwave.server.model import Client, CommunicationChannel
 from flockwave.server.ports import get_port_number_for_service
 from flockwave.networking import format_socket_address, get_socket_address
 from flockwave.server.utils import overridden
 from flockwave.server.utils.networking import serve_tcp_and_log_errors
+from flockwave.server.utils.wire_formats import negotiate_wire_format, WireFormat
 
 app = None
-encoder = create_json_encoder()
+encoders = {wire_format: wire_format.create_encoder() for wire_format in WireFormat}
 log: Optional[Logger] = None
 
 
@@ -44,12 +45,18 @@ class TCPChannel(CommunicationChannel):
     client_ref: Optional["weakref.ref[Client]"]
     lock: Lock
 
+    wire_format: WireFormat
+    """The wire format that the client uses; detected from the first bytes
+    that the client sends.
+    """
+
     def __init__(self):
         """Constructor."""
         self.address = None
         self.client_ref = None
         self.lock = Lock()
         self.stream = None
+        self.wire_format = WireFormat.JSON
 
     def bind_to(self, client: Client) -> None:
         """Binds the communication channel to the given client.
@@ -84,12 +91,19 @@ class TCPChannel(CommunicationChannel):
             self.stream = self.client_ref().stream
             self.client_ref = None
 
+        # Broadcast messages are encoded only once and then shared between
+        # all the channels that use the same wire format
+        wire_format = self.wire_format
+        data = app.message_hub.encoding_cache.encode(
+            message, wire_format.value, encoders[wire_format]
+        )
+
         async with self.lock:
             # Locking is needed, otherwise we could be running into problems
             # if a message was sent only partially but the message hub is
             # already trying to send another one (since the message hub
             # dispatches each message in a separate task)
-            await self.stream.send_all(encoder(message))
+            await self.stream.send_all(data)
 
     def _erase_stream(self, ref) -> None:
         self.stream = None
@@ -139,23 +153,30 @@ async def handle_connection(stream, *, limit):
     address = socket.getpeername()
 
     client_id = "tcp://{0}:{1}".format(*address)
-    handler = partial(handle_message, limit=limit)
-    parser = create_json_parser()
 
     with app.client_registry.use(client_id, "tcp") as client:
         client.stream = stream
         async with open_nursery() as nursery:
-            channel = ParserChannel(reader=stream.receive_some, parser=parser)
+            scheduler = RequestScheduler(
+                partial(handle_message, client=client, limit=limit), nursery=nursery
+            )
             try:
+                # Messages are sent in JSON until the client tells us which
+                # wire format it is using with its first message
+                wire_format, reader = await negotiate_wire_format(stream)
+                client.channel.wire_format = wire_format  # type: ignore
+
+                parser = wire_format.create_parser()
+                channel = ParserChannel(reader=reader, parser=parser)
                 async for line in channel:
-                    nursery.start_soon(handler, line, client)
+                    await scheduler.submit(line)
             except BrokenResourceError:
                 # This is okay, the other side closed the connection
                 pass
             except ClosedResourceError:
                 # This is okay, we closed the connection
                 pass
-            except JSONDecodeError as ex:
+            except (JSONDecodeError, UnpackException) as ex:
                 # Parse error, probably trying to connect via WebSocket.
                 if log:
                     log.error(f"Parse error: {ex}")
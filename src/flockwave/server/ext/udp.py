@@ -66,7 +66,8 @@ class UDPChannel(CommunicationChannel):
 
     async def send(self, message):
         """Inherited."""
-        await self.sock.sendto(encoder(message), self.address)
+        data = app.message_hub.encoding_cache.encode(message, "json", encoder)
+        await self.sock.sendto(data, self.address)
 
 
 ############################################################################
@@ -16,14 +16,14 @@ from typing import Optional
 
 from flockwave.channels import ParserChannel
 from flockwave.connections import serve_unix
-from flockwave.encoders.json import create_json_encoder
-from flockwave.parsers.json import create_json_parser
+from flockwave.server.message_hub import RequestScheduler
 from flockwave.server.model import CommunicationChannel
 from flockwave.server.utils import overridden
+from flockwave.server.utils.wire_formats import negotiate_wire_format, WireFormat
 
 
 app = None
-encoder = create_json_encoder()
+encoders = {wire_format: wire_format.create_encoder() for wire_format in WireFormat}
 log = None
 path = None
 
@@ -38,6 +38,7 @@ class UnixDomainSocketChannel(CommunicationChannel):
         self.client_ref = None
         self.stream = None
         self.lock = Lock()
+        self.wire_format = WireFormat.JSON
 
     def bind_to(self, client):
         """Binds the communication channel to the given client.
@@ -69,12 +70,17 @@ class UnixDomainSocketChannel(CommunicationChannel):
             self.stream = self.client_ref().stream
             self.client_ref = None
 
+        wire_format = self.wire_format
+        data = app.message_hub.encoding_cache.encode(
+            message, wire_format.value, encoders[wire_format]
+        )
+
         async with self.lock:
             # Locking is needed, otherwise we could be running into problems
             # if a message was sent only partially but the message hub is
             # already trying to send another one (since the message hub
             # dispatches each message in a separate task)
-            await self.stream.send_all(encoder(message))
+            await self.stream.send_all(data)
 
     def _erase_stream(self, ref):
         self.stream = None
@@ -121,16 +127,22 @@ async def handle_connection(stream, *, limit):
     address = socket.getsockname()
 
     client_id = f"unix:{address}"
-    handler = partial(handle_message, limit=limit)
 
     with app.client_registry.use(client_id, "unix") as client:
         client.stream = stream
+
+        # Messages are sent in JSON until the client tells us which wire format
+        # it is using with its first message
+        wire_format, reader = await negotiate_wire_format(stream)
+        client.channel.wire_format = wire_format  # type: ignore
+
         async with open_nursery() as nursery:
-            channel = ParserChannel(
-                reader=stream.receive_some, parser=create_json_parser()
+            channel = ParserChannel(reader=reader, parser=wire_format.create_parser())
+            scheduler = RequestScheduler(
+                partial(handle_message, client=client, limit=limit), nursery=nursery
             )
             async for message in channel:
-                nursery.start_soon(handler, message, client)
+                await scheduler.submit(message)
 
 
 async def handle_connection_safely(stream, *, limit):
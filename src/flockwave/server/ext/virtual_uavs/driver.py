@@ -8,9 +8,9 @@ from hashlib import sha1 as firmware_hash
 from math import atan2, cos, hypot, sin
 from random import random, randint, choice
 from time import monotonic
-from trio import CancelScope, sleep
+from trio import CancelScope, sleep, sleep_forever
 from trio_util import periodic
-from typing import Any, Callable, NoReturn, Optional, Union
+from typing import Any, Callable, NoReturn, Optional, TYPE_CHECKING, Union
 
 from flockwave.concurrency import delayed
 from flockwave.ext.manager import ExtensionAPIProxy
@@ -47,6 +47,8 @@ from .battery import VirtualBattery
 from .fw_upload import FIRMWARE_UPDATE_TARGET_ID
 from .lights import DefaultLightController
 
+if TYPE_CHECKING:
+    from .swarm import VirtualUAVSwarm
 
 __all__ = ("VirtualUAVDriver",)
 
@@ -565,6 +567,7 @@ class VirtualUAV(UAVBase):
         mutate: Callable,
         notify: Callable[[], None],
         spawn: Callable,
+        swarm: Optional[VirtualUAVSwarm] = None,
     ) -> str:
         """Simulates a single boot session of the virtual UAV.
 
@@ -574,6 +577,10 @@ class VirtualUAV(UAVBase):
                 dispatched about the UAV
             spawn: function to call when the UAV wishes to spawn a background
                 task
+            swarm: optional swarm simulation engine. When it is given, the UAV
+                joins the swarm while it is running and the swarm takes care of
+                stepping the simulation and dispatching status updates;
+                `delay`, `mutate` and `notify` are ignored in this case.
 
         Returns:
             `"shutdown"` if the user requested the UAV to shut down;
@@ -596,11 +603,15 @@ class VirtualUAV(UAVBase):
         try:
             with CancelScope() as scope:
                 self._request_shutdown = scope.cancel
-                async for _ in periodic(delay):
-                    with mutate() as mutator:
-                        self.step(mutator=mutator, dt=delay)
+                if swarm is not None:
+                    with swarm.use(self):
+                        await sleep_forever()
+                else:
+                    async for _ in periodic(delay):
+                        with mutate() as mutator:
+                            self.step(mutator=mutator, dt=delay)
 
-                    notify()
+                        notify()
 
             return self._shutdown_reason or "shutdown"
         finally:
@@ -632,13 +643,7 @@ class VirtualUAV(UAVBase):
             mutator (DeviceTreeMutator): the mutator object that should be
                 used by the UAV to update its channel nodes
         """
-        state = self._state
-
-        # Update the target of the drone if it is currently following a
-        # predefined trajectory and it is not landing or landed
-        if state is VirtualUAVState.TAKEOFF or state is VirtualUAVState.AIRBORNE:
-            if self._trajectory_player and self._mission_started_at is not None:
-                self._update_target_from_trajectory()
+        state, hold_altitude = self._begin_step()
 
         # Do we have a target?
         if self._target_xyz is not None:
@@ -652,11 +657,7 @@ class VirtualUAV(UAVBase):
             # During the takeoff phase, if we are flying a mission and the
             # takeoff time has not been reached yet, we are not allowed to
             # move in the Z direction either
-            dz = self._target_xyz.z - self._position_xyz.z
-            if state is VirtualUAVState.TAKEOFF and self._trajectory_player:
-                t = self.elapsed_time_in_mission
-                if t is not None and self._trajectory_player.is_before_takeoff(t):
-                    dz = 0
+            dz = 0 if hold_altitude else self._target_xyz.z - self._position_xyz.z
 
             angle = atan2(dy, dx)
             dist_xy = hypot(dx, dy)
@@ -702,24 +703,104 @@ class VirtualUAV(UAVBase):
             self._position_xyz.y += displacement_y
             self._position_xyz.z += displacement_z
 
-            # If we are above the takeoff altitude minus some threshold and
-            # we are in the TAKEOFF stage, move to being airborne. Also, if
-            # we are landing and we are very close to the ground, consider
-            # ourselves as landed.
-            eps = 0.2
-            if state is VirtualUAVState.TAKEOFF:
-                if self._position_xyz.z > max(eps, self.takeoff_altitude - eps):
-                    self.state = VirtualUAVState.AIRBORNE
-            elif state is VirtualUAVState.LANDING:
-                if dist_z < eps * 0.5:
-                    self.state = VirtualUAVState.LANDED
-                    self._mission_started_at = None
-                    self.target = None
-            elif state is VirtualUAVState.AIRBORNE:
-                # If we have reached the target, we can clear it
-                if dist_xy < eps and dist_z < eps:
-                    self.target = None
+            self._update_state_after_movement(state, dist_xy, dist_z)
+
+        self._end_step(dt, mutator)
+
+    def stop_trajectory(self) -> None:
+        """Prevents the UAV from following its pre-defined trajectory if it is
+        currently following one. No-op if the UAV is not following a predefined
+        trajectory.
+
+        Also makes the UAV "forget" its current trajectory.
+        """
+        if self._trajectory_player:
+            self._trajectory = None
+            self._trajectory_player = None
+            self._trajectory_transformation = None
 
+    def takeoff(self) -> None:
+        """Starts a simulated take-off with the virtual UAV."""
+        if self.state != VirtualUAVState.LANDED:
+            return
+
+        if not self.armed:
+            return
+
+        self._mission_started_at = monotonic()
+
+        if self._target_xyz is None:
+            self._target_xyz = self._position_xyz.copy()
+        self._target_xyz.z = self.takeoff_altitude
+
+        self.state = VirtualUAVState.TAKEOFF
+
+    def _begin_step(self) -> tuple[VirtualUAVState, bool]:
+        """Prepares the UAV for the next simulation step by updating its target
+        from its trajectory if needed.
+
+        Returns:
+            the state of the UAV at the beginning of the step, and whether the
+            UAV must hold its altitude during the step because it is waiting
+            for the takeoff time of its trajectory
+        """
+        state = self._state
+        hold_altitude = False
+
+        # Update the target of the drone if it is currently following a
+        # predefined trajectory and it is not landing or landed
+        if state is VirtualUAVState.TAKEOFF or state is VirtualUAVState.AIRBORNE:
+            if self._trajectory_player and self._mission_started_at is not None:
+                self._update_target_from_trajectory()
+
+        if state is VirtualUAVState.TAKEOFF and self._trajectory_player:
+            t = self.elapsed_time_in_mission
+            if t is not None and self._trajectory_player.is_before_takeoff(t):
+                hold_altitude = True
+
+        return state, hold_altitude
+
+    def _update_state_after_movement(
+        self, state: VirtualUAVState, dist_xy: float, dist_z: float
+    ) -> None:
+        """Updates the state of the UAV after it has moved towards its target
+        in a simulation step.
+
+        Parameters:
+            state: the state of the UAV at the beginning of the step
+            dist_xy: the horizontal distance of the UAV from its target at the
+                beginning of the step
+            dist_z: the vertical distance of the UAV from its target at the
+                beginning of the step
+        """
+        # If we are above the takeoff altitude minus some threshold and
+        # we are in the TAKEOFF stage, move to being airborne. Also, if
+        # we are landing and we are very close to the ground, consider
+        # ourselves as landed.
+        eps = 0.2
+        if state is VirtualUAVState.TAKEOFF:
+            if self._position_xyz.z > max(eps, self.takeoff_altitude - eps):
+                self.state = VirtualUAVState.AIRBORNE
+        elif state is VirtualUAVState.LANDING:
+            if dist_z < eps * 0.5:
+                self.state = VirtualUAVState.LANDED
+                self._mission_started_at = None
+                self.target = None
+        elif state is VirtualUAVState.AIRBORNE:
+            # If we have reached the target, we can clear it
+            if dist_xy < eps and dist_z < eps:
+                self.target = None
+
+    def _end_step(self, dt: float, mutator=None) -> None:
+        """Finishes a simulation step of the UAV after its position and
+        velocity were updated: updates the battery, the error codes, the
+        status of the UAV and its sensors.
+
+        Parameters:
+            dt: the time that has passed, in seconds.
+            mutator: the mutator object that should be used by the UAV to
+                update its channel nodes
+        """
         # Calculate our coordinates in flat Earth
         self._position_flat.x = self._position_xyz.x
         self._position_flat.y = self._position_xyz.y
@@ -807,34 +888,6 @@ class VirtualUAV(UAVBase):
                 {"lat": position.lat, "lon": position.lon, "value": observed_count},
             )
 
-    def stop_trajectory(self) -> None:
-        """Prevents the UAV from following its pre-defined trajectory if it is
-        currently following one. No-op if the UAV is not following a predefined
-        trajectory.
-
-        Also makes the UAV "forget" its current trajectory.
-        """
-        if self._trajectory_player:
-            self._trajectory = None
-            self._trajectory_player = None
-            self._trajectory_transformation = None
-
-    def takeoff(self) -> None:
-        """Starts a simulated take-off with the virtual UAV."""
-        if self.state != VirtualUAVState.LANDED:
-            return
-
-        if not self.armed:
-            return
-
-        self._mission_started_at = monotonic()
-
-        if self._target_xyz is None:
-            self._target_xyz = self._position_xyz.copy()
-        self._target_xyz.z = self.takeoff_altitude
-
-        self.state = VirtualUAVState.TAKEOFF
-
     def _initialize_device_tree_node(self, node: ObjectNode) -> None:
         self.battery = VirtualBattery(report_percentage=self.use_battery_percentage)
         self.battery.register_in_device_tree(node)
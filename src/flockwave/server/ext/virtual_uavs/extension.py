@@ -5,7 +5,7 @@ from contextlib import contextmanager
 from functools import partial
 from random import uniform
 from trio import open_nursery, sleep, sleep_forever
-from typing import Callable, Iterator
+from typing import Callable, Iterator, Optional
 
 from flockwave.gps.vectors import (
     FlatEarthCoordinate,
@@ -19,6 +19,7 @@ from ..base import UAVExtension
 from .driver import VirtualUAV, VirtualUAVDriver
 from .fw_upload import FIRMWARE_UPDATE_TARGET_ID
 from .placement import place_drones
+from .swarm import VirtualUAVSwarm, is_swarm_simulation_supported
 
 
 __all__ = ("construct", "dependencies")
@@ -34,6 +35,11 @@ class VirtualUAVProviderExtension(UAVExtension[VirtualUAVDriver]):
     simulated status updates to the UAVs.
     """
 
+    _swarm: Optional[VirtualUAVSwarm] = None
+    """Batched simulation engine that steps all the running UAVs together;
+    `None` if each UAV is simulated in its own task.
+    """
+
     uavs: list["VirtualUAV"]
     """The list of virtual UAVs managed by this extension."""
 
@@ -60,6 +66,18 @@ class VirtualUAVProviderExtension(UAVExtension[VirtualUAVDriver]):
         # Set the status updater thread frequency
         self.delay = configuration.get("delay", 1)
 
+        # Decide whether to simulate all the UAVs together in a single
+        # vectorized update per tick
+        self._swarm = None
+        if configuration.get("batched_simulation", False):
+            if is_swarm_simulation_supported():
+                self._swarm = VirtualUAVSwarm()
+            elif self.log:
+                self.log.warning(
+                    "Batched simulation requires NumPy; falling back to "
+                    "simulating each UAV separately"
+                )
+
         # Get the center of the home positions
         if "origin" not in configuration and "center" in configuration:
             if self.log:
@@ -172,6 +190,7 @@ class VirtualUAVProviderExtension(UAVExtension[VirtualUAVDriver]):
                     mutate=self.create_device_tree_mutation_context,
                     notify=updater,
                     spawn=spawn,
+                    swarm=self._swarm,
                 )
 
                 # If we need to restart, let's restart after a short delay.
@@ -205,6 +224,16 @@ class VirtualUAVProviderExtension(UAVExtension[VirtualUAVDriver]):
         the UAVs periodically.
         """
         async with open_nursery() as nursery:
+            if self._swarm is not None:
+                nursery.start_soon(
+                    partial(
+                        self._swarm.run,
+                        self._delay,
+                        mutate=self.create_device_tree_mutation_context,
+                        notify=app.request_to_send_UAV_INF_message_for,
+                    )
+                )
+
             for uav in self.uavs:
                 nursery.start_soon(self.simulate_uav, uav, nursery.start_soon)
 
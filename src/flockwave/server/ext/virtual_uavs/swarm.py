@@ -0,0 +1,259 @@
+"""Batched simulation engine that steps all the running virtual UAVs together
+in a single vectorized update per tick.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from trio_util import periodic
+from typing import Callable, Iterable, Iterator, Sequence, TYPE_CHECKING
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .driver import VirtualUAVState
+
+if TYPE_CHECKING:
+    from .driver import VirtualUAV
+
+
+__all__ = ("VirtualUAVSwarm", "is_swarm_simulation_supported")
+
+
+def is_swarm_simulation_supported() -> bool:
+    """Returns whether the batched swarm simulation engine can be used in the
+    current Python environment. The engine requires NumPy.
+    """
+    return np is not None
+
+
+class VirtualUAVSwarm:
+    """Simulation engine that steps a group of virtual UAVs together.
+
+    Individual UAVs join the swarm while they are running (i.e. between boot
+    and shutdown). The positions, velocities and kinematic limits of the UAVs
+    in the swarm are stored in NumPy arrays with one row per UAV; these arrays
+    are the source of truth of the kinematic state while the UAVs are in the
+    swarm, and they are copied back to the UAV objects after each tick so the
+    status reports of the UAVs remain up-to-date. In every tick, the engine
+    moves all the UAVs that have a target in a single vectorized update, then
+    updates the device tree of all the UAVs in a single mutation context and
+    requests a single UAV-INF notification for all of them.
+
+    The kinematic model is identical to the one in `VirtualUAV.step()`. The
+    kinematic limits of a UAV are captured when it joins the swarm.
+    """
+
+    _uavs: list[VirtualUAV]
+    """The UAVs that are currently running; the index of each UAV in this list
+    is the index of its row in the state arrays.
+    """
+
+    _indices: dict[VirtualUAV, int]
+    """Dictionary mapping the UAVs in the swarm to their row indices."""
+
+    _position: np.ndarray
+    """The positions of the UAVs in the swarm, one row per UAV."""
+
+    _velocity: np.ndarray
+    """The velocities of the UAVs in the swarm, one row per UAV."""
+
+    _limits: np.ndarray
+    """The maximum horizontal acceleration, horizontal velocity, vertical
+    acceleration and vertical velocity of the UAVs in the swarm, one row per
+    UAV.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        assert np is not None
+
+        self._uavs = []
+        self._indices = {}
+        self._position = np.zeros((0, 3))
+        self._velocity = np.zeros((0, 3))
+        self._limits = np.zeros((0, 4))
+
+    async def run(
+        self,
+        delay: float,
+        *,
+        mutate: Callable,
+        notify: Callable[[Iterable[str]], None],
+    ) -> None:
+        """Runs the simulation of the swarm.
+
+        Parameters:
+            delay: number of seconds to wait between consecutive simulation
+                steps and status updates
+            mutate: function that returns a device tree mutation context when
+                called with no arguments
+            notify: function to call with the IDs of the UAVs when new status
+                information should be dispatched about them
+        """
+        async for _ in periodic(delay):
+            if not self._uavs:
+                continue
+
+            with mutate() as mutator:
+                self.step(dt=delay, mutator=mutator)
+
+            notify([uav.id for uav in self._uavs])
+
+    def step(self, dt: float, mutator=None) -> None:
+        """Simulates a single step of all the UAVs in the swarm.
+
+        Parameters:
+            dt: the time that has passed, in seconds
+            mutator: the mutator object that should be used by the UAVs to
+                update their channel nodes
+        """
+        uavs = list(self._uavs)
+        steps = [uav._begin_step() for uav in uavs]
+        moving = [
+            (index, state, hold_altitude)
+            for index, (uav, (state, hold_altitude)) in enumerate(zip(uavs, steps))
+            if uav._target_xyz is not None
+        ]
+        if moving:
+            self._move_towards_targets(moving, dt)
+
+        for uav in uavs:
+            uav._end_step(dt, mutator)
+
+    @contextmanager
+    def use(self, uav: VirtualUAV) -> Iterator[None]:
+        """Context manager that adds the given UAV to the swarm when entering
+        the context and removes it when exiting.
+        """
+        self._add(uav)
+        try:
+            yield
+        finally:
+            self._remove(uav)
+
+    def _add(self, uav: VirtualUAV) -> None:
+        """Adds the given UAV to the swarm, taking its current kinematic state
+        from the UAV object.
+        """
+        if uav in self._indices:
+            return
+
+        p, v = uav._position_xyz, uav._velocity_xyz
+        limits = (
+            uav.max_acceleration_xy,
+            uav.max_velocity_xy,
+            uav.max_acceleration_z,
+            uav.max_velocity_z,
+        )
+
+        self._indices[uav] = len(self._uavs)
+        self._uavs.append(uav)
+        self._position = np.vstack((self._position, (p.x, p.y, p.z)))
+        self._velocity = np.vstack((self._velocity, (v.x, v.y, v.z)))
+        self._limits = np.vstack((self._limits, limits))
+
+    def _remove(self, uav: VirtualUAV) -> None:
+        """Removes the given UAV from the swarm, copying its kinematic state
+        back to the UAV object.
+        """
+        index = self._indices.pop(uav, None)
+        if index is None:
+            return
+
+        self._write_back(uav, index)
+
+        # Move the last row into the place of the removed one
+        last = len(self._uavs) - 1
+        if index != last:
+            moved = self._uavs[index] = self._uavs[last]
+            self._indices[moved] = index
+            for array in (self._position, self._velocity, self._limits):
+                array[index] = array[last]
+
+        self._uavs.pop()
+        self._position = self._position[:last]
+        self._velocity = self._velocity[:last]
+        self._limits = self._limits[:last]
+
+    def _write_back(self, uav: VirtualUAV, index: int) -> None:
+        """Copies the kinematic state of the UAV at the given row index from
+        the state arrays to the UAV object.
+        """
+        pos, vel = self._position[index].tolist(), self._velocity[index].tolist()
+        uav._position_xyz.x, uav._position_xyz.y, uav._position_xyz.z = pos
+        uav._velocity_xyz.x, uav._velocity_xyz.y, uav._velocity_xyz.z = vel
+
+    def _move_towards_targets(
+        self, items: Sequence[tuple[int, VirtualUAVState, bool]], dt: float
+    ) -> None:
+        """Moves the given UAVs towards their targets in a single vectorized
+        update.
+
+        Parameters:
+            items: tuples consisting of the row index of a UAV that has a
+                target, its state at the beginning of the step and whether it
+                must hold its altitude
+            dt: the time that has passed, in seconds
+        """
+        indices = np.array([item[0] for item in items], dtype=np.intp)
+        uavs = [self._uavs[index] for index in indices.tolist()]
+
+        position = self._position[indices]
+        velocity = self._velocity[indices]
+        limits = self._limits[indices]
+        target = np.array(
+            [(t.x, t.y, t.z) for t in (uav._target_xyz for uav in uavs)]  # type: ignore
+        )
+        airborne = np.array([item[1] is VirtualUAVState.AIRBORNE for item in items])
+        hold_altitude = np.array([item[2] for item in items])
+
+        # We aim for the target in the XY plane only if we are airborne, and
+        # we may not move in the Z direction before the takeoff time
+        delta = target - position
+        dx = np.where(airborne, delta[:, 0], 0.0)
+        dy = np.where(airborne, delta[:, 1], 0.0)
+        dz = np.where(hold_altitude, 0.0, delta[:, 2])
+
+        angle = np.arctan2(dy, dx)
+        dist_xy = np.hypot(dx, dy)
+        dist_xy[dist_xy < 1e-6] = 0
+        dist_z = np.abs(dz)
+
+        reachable_velocity_xy = np.minimum(
+            np.hypot(velocity[:, 0], velocity[:, 1]) + limits[:, 0] * dt,
+            limits[:, 1],
+        )
+        displacement_xy = np.minimum(dist_xy, dt * reachable_velocity_xy)
+
+        displacement = np.empty_like(position)
+        displacement[:, 0] = np.cos(angle) * displacement_xy
+        displacement[:, 1] = np.sin(angle) * displacement_xy
+
+        descending = np.maximum.reduce(
+            [
+                dz,
+                dt * np.maximum(velocity[:, 2] - limits[:, 2] * dt, -limits[:, 3]),
+                -position[:, 2],
+            ]
+        )
+        ascending = np.minimum(
+            dz, dt * np.minimum(velocity[:, 2] + limits[:, 2] * dt, limits[:, 3])
+        )
+        displacement[:, 2] = np.where(
+            dz < 0, descending, np.where(dz > 0, ascending, 0.0)
+        )
+
+        velocity = displacement / dt if dt > 0 else np.zeros_like(displacement)
+        position += displacement
+
+        self._position[indices] = position
+        self._velocity[indices] = velocity
+
+        for uav, (index, state, _), d_xy, d_z in zip(
+            uavs, items, dist_xy.tolist(), dist_z.tolist()
+        ):
+            self._write_back(uav, index)
+            uav._update_state_after_movement(state, d_xy, d_z)
@@ -1,20 +1,281 @@
 """Extension that provides weather station related commands to the server, and
 allow weather station providers to register themselves.
+
+Weather providers are called concurrently, each with its own timeout and with
+its own weather object. The results of the providers are then merged in the
+order of their priorities. The results of WTH-AT queries are cached for each
+geohash tile and time bucket so repeated queries for the same site are
+answered from the cache.
 """
 
+from contextlib import ExitStack
 from inspect import isawaitable
-from trio import sleep_forever
+from trio import current_time, Event, move_on_after, open_nursery, sleep_forever
+from typing import Any, Awaitable, Callable, Hashable, Optional
 
 from flockwave.gps.vectors import GPSCoordinate
 from flockwave.server.message_hub import MessageHub
 from flockwave.server.model.client import Client
 from flockwave.server.model.messages import FlockwaveMessage, FlockwaveResponse
-from flockwave.server.model.weather import Weather
+from flockwave.server.model.weather import Weather, WeatherProvider
 from flockwave.server.registries import find_in_registry, WeatherProviderRegistry
+from flockwave.server.utils import overridden
+
+__all__ = ("collect_weather", "WeatherCache")
+
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+"""Alphabet of the base32 encoding used by geohashes."""
+
+_OWN_FIELDS = ("position", "timestamp")
+"""Fields of a weather object that are not provided by weather providers."""
+
+
+def _geohash(lat: float, lon: float, precision: int) -> str:
+    """Returns the geohash of the given coordinate with the given number of
+    characters.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars: list[str] = []
+    value, num_bits, is_lon = 0, 0, True
+
+    while len(chars) < precision:
+        bounds, coord = (lon_range, lon) if is_lon else (lat_range, lat)
+        mid = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+
+        is_lon = not is_lon
+        num_bits += 1
+        if num_bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            value, num_bits = 0, 0
+
+    return "".join(chars)
+
+
+class WeatherCache:
+    """Cache for the results of weather queries, keyed by geohash tiles and
+    time buckets.
+
+    Cached entries expire after a fixed time-to-live. Since all entries have
+    the same time-to-live, the entries expire in the order they were added so
+    expired entries are evicted from the front of the cache when a new entry
+    is added. Concurrent queries for the same key are coalesced; only the
+    first one is executed, the others wait for its result.
+    """
+
+    precision: int
+    """Number of characters in the geohashes of the tiles. Six characters
+    correspond to tiles of about 1.2 km x 0.6 km.
+    """
+
+    time_bucket: float
+    """Length of the time buckets, in seconds."""
+
+    ttl: float
+    """Number of seconds after which cached entries expire. Zero disables the
+    cache.
+    """
+
+    _entries: dict[Hashable, tuple[float, dict[str, Any]]]
+    """The cached entries, mapping keys to their expiry times and to the JSON
+    representations of the weather objects, in the order of their expiry.
+    """
+
+    _pending: dict[Hashable, Event]
+    """Events that are set when the queries currently running for the
+    corresponding keys are finished.
+    """
+
+    def __init__(
+        self, *, precision: int = 6, time_bucket: float = 60, ttl: float = 60
+    ):
+        """Constructor.
+
+        Parameters:
+            precision: number of characters in the geohashes of the tiles
+            time_bucket: length of the time buckets, in seconds
+            ttl: number of seconds after which cached entries expire
+        """
+        self.precision = precision
+        self.time_bucket = time_bucket
+        self.ttl = ttl
+
+        self._entries = {}
+        self._pending = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Returns whether the cache stores anything."""
+        return self.ttl > 0
+
+    def clear(self) -> None:
+        """Removes all the entries from the cache."""
+        self._entries.clear()
+
+    def get(self, key: Hashable) -> Optional[dict[str, Any]]:
+        """Returns the cached entry for the given key, or `None` if the key is
+        not in the cache or its entry has expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        elif entry[0] <= current_time():
+            del self._entries[key]
+            return None
+        else:
+            return entry[1]
+
+    async def get_or_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[dict[str, Any]]]
+    ) -> dict[str, Any]:
+        """Returns the cached entry for the given key, calling the given
+        fetcher function if the key is not in the cache.
+
+        Parameters:
+            key: the key to look up
+            fetch: async function that returns the entry to store in the cache
+                for the key. It is called at most once at any given time for
+                the same key.
+
+        Returns:
+            the entry for the given key
+        """
+        if not self.enabled:
+            return await fetch()
+
+        while True:
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+
+            event = self._pending.get(key)
+            if event is None:
+                break
+
+            await event.wait()
+
+        self._pending[key] = event = Event()
+        try:
+            entry = await fetch()
+            self.put(key, entry)
+            return entry
+        finally:
+            del self._pending[key]
+            event.set()
+
+    def key_for(
+        self, position: GPSCoordinate, timestamp: float, *args: Hashable
+    ) -> Hashable:
+        """Returns the cache key for the given position and timestamp.
+
+        Parameters:
+            position: the position of the query
+            timestamp: the timestamp of the query
+            args: additional components of the key
+
+        Returns:
+            the cache key
+        """
+        return (
+            _geohash(position.lat, position.lon, self.precision),
+            int(timestamp // self.time_bucket),
+            *args,
+        )
+
+    def put(self, key: Hashable, entry: dict[str, Any]) -> None:
+        """Stores an entry in the cache and evicts the expired entries.
+
+        Parameters:
+            key: the key of the entry
+            entry: the entry to store
+        """
+        now = current_time()
+
+        entries = self._entries
+        entries.pop(key, None)
+        entries[key] = (now + self.ttl, entry)
+
+        while entries:
+            key = next(iter(entries))
+            if entries[key][0] > now:
+                break
+            del entries[key]
+
 
 #: Registry containing the registered weather providers by ID
 registry = WeatherProviderRegistry()
 
+#: Cache of the results of WTH-AT queries
+cache = WeatherCache()
+
+log = None
+
+#: Number of seconds to wait for a single weather provider
+timeout: float = 2
+
+
+async def collect_weather(
+    weather: Weather,
+    position: Optional[GPSCoordinate],
+    ids: Optional[list[str]] = None,
+) -> None:
+    """Calls the registered weather providers concurrently and merges their
+    results into the given weather object.
+
+    Each provider gets a separate weather object with the same position and
+    timestamp, and the results are merged in ascending order of priority so
+    the results of providers with higher priorities take precedence.
+    Providers that fail or that do not finish in time are ignored.
+
+    Parameters:
+        weather: the weather object to extend
+        position: the position to pass to the providers
+        ids: the IDs of the providers to call; `None` means to call all of them
+    """
+    providers = [
+        (id, provider)
+        for id, provider in registry.iter_by_priority()
+        if ids is None or id in ids
+    ]
+    results: list[Optional[Weather]] = [None] * len(providers)
+
+    async def call(index: int, id: str, provider: WeatherProvider) -> None:
+        result = Weather(position=position, timestamp=weather.timestamp)
+        try:
+            with move_on_after(timeout) as scope:
+                outcome = provider(result, position)
+                if isawaitable(outcome):
+                    await outcome
+        except Exception:
+            if log:
+                log.exception(f"Weather provider {id!r} failed")
+            return
+
+        if scope.cancelled_caught:
+            if log:
+                log.warning(f"Weather provider {id!r} timed out")
+        else:
+            results[index] = result
+
+    async with open_nursery() as nursery:
+        for index, (id, provider) in enumerate(providers):
+            nursery.start_soon(call, index, id, provider)
+
+    json = weather.json
+    for result in results:
+        if result is not None:
+            json.update(
+                (key, value)
+                for key, value in result.json.items()
+                if key not in _OWN_FIELDS
+            )
+
 
 async def handle_WTH_AT(message: FlockwaveMessage, sender: Client, hub: MessageHub):
     body = {}
@@ -27,11 +288,17 @@ async def handle_WTH_AT(message: FlockwaveMessage, sender: Client, hub: MessageH
     if registry.num_entries > 0:
         gps_coordinate = GPSCoordinate.from_json(position)
         weather = Weather(position=gps_coordinate)
-        # TODO(ntamas): use priorities and ordering!
-        for provider in registry:
-            result = provider(weather, gps_coordinate)
-            if isawaitable(result):
-                await result
+
+        async def fetch() -> dict[str, Any]:
+            await collect_weather(weather, gps_coordinate)
+            return {
+                key: value
+                for key, value in weather.json.items()
+                if key not in _OWN_FIELDS
+            }
+
+        key = cache.key_for(gps_coordinate, weather.timestamp, tuple(registry.ids))
+        weather.json.update(await cache.get_or_fetch(key, fetch))
         body["weather"] = weather
 
     return body
@@ -45,19 +312,21 @@ async def handle_WTH_INF(
     body = {"status": statuses, "type": "WTH-INF"}
     response = hub.create_response_or_notification(body=body, in_response_to=message)
 
-    for station_id in message.get_ids():
-        provider = find_in_registry(
-            registry,
-            station_id,
-            response=response,
-            failure_reason="No such weather provider",
-        )
-        if provider:
-            weather = Weather()
-            result = provider(weather, None)
-            if isawaitable(result):
-                await result
-            statuses[station_id] = weather
+    async def query(station_id: str) -> None:
+        weather = Weather()
+        await collect_weather(weather, None, [station_id])
+        statuses[station_id] = weather
+
+    async with open_nursery() as nursery:
+        for station_id in message.get_ids():
+            provider = find_in_registry(
+                registry,
+                station_id,
+                response=response,
+                failure_reason="No such weather provider",
+            )
+            if provider:
+                nursery.start_soon(query, station_id)
 
     return response
 
@@ -66,18 +335,80 @@ def handle_WTH_LIST(message: FlockwaveMessage, sender: Client, hub: MessageHub):
     return {"ids": list(registry.ids)}
 
 
-async def run(app):
-    """Unloads the extension."""
-    with app.message_hub.use_message_handlers(
-        {
-            "WTH-AT": handle_WTH_AT,
-            "WTH-INF": handle_WTH_INF,
-            "WTH-LIST": handle_WTH_LIST,
-        }
-    ):
+async def run(app, configuration, logger):
+    """Runs the extension."""
+    weather_cache = WeatherCache(
+        precision=int(configuration.get("cache_precision", 6)),
+        time_bucket=float(configuration.get("cache_time_bucket", 60)),
+        ttl=float(configuration.get("cache_ttl", 60)),
+    )
+
+    with ExitStack() as stack:
+        stack.enter_context(
+            overridden(
+                globals(),
+                cache=weather_cache,
+                log=logger,
+                timeout=float(configuration.get("timeout", 2)),
+            )
+        )
+        stack.enter_context(
+            app.message_hub.use_message_handlers(
+                {
+                    "WTH-AT": handle_WTH_AT,
+                    "WTH-INF": handle_WTH_INF,
+                    "WTH-LIST": handle_WTH_LIST,
+                }
+            )
+        )
         await sleep_forever()
 
 
 description = "Basic support for weather stations"
 exports = {"add_provider": registry.add, "use_provider": registry.use}
-schema = {}
+schema = {
+    "properties": {
+        "timeout": {
+            "type": "number",
+            "title": "Provider timeout",
+            "description": (
+                "Number of seconds to wait for a single weather provider. "
+                "Providers that do not respond in time are ignored."
+            ),
+            "minimum": 0,
+            "default": 2,
+        },
+        "cache_ttl": {
+            "type": "number",
+            "title": "Cache lifetime",
+            "description": (
+                "Number of seconds for which the results of weather queries "
+                "are cached. Zero disables the cache."
+            ),
+            "minimum": 0,
+            "default": 60,
+        },
+        "cache_precision": {
+            "type": "integer",
+            "title": "Cache tile size",
+            "description": (
+                "Number of geohash characters that identify a cache tile. "
+                "Larger values mean smaller tiles; six characters correspond "
+                "to tiles of about 1.2 km x 0.6 km."
+            ),
+            "minimum": 1,
+            "maximum": 12,
+            "default": 6,
+        },
+        "cache_time_bucket": {
+            "type": "number",
+            "title": "Cache time bucket",
+            "description": (
+                "Length of the time intervals, in seconds, within which weather "
+                "queries for the same tile share their results."
+            ),
+            "minimum": 1,
+            "default": 60,
+        },
+    }
+}
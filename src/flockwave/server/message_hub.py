@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from abc import ABCMeta, abstractmethod
-from collections import defaultdict
+from collections import defaultdict, deque
 from contextlib import contextmanager, ExitStack
 from dataclasses import dataclass, field
 from functools import partial
@@ -19,10 +19,13 @@ from trio import (
     MemoryReceiveChannel,
     MemorySendChannel,
     move_on_after,
+    Nursery,
     open_memory_channel,
     open_nursery,
+    Semaphore,
     sleep,
 )
+from trio.lowlevel import ParkingLot
 from typing import (
     Any,
     AsyncIterator,
@@ -40,6 +43,7 @@ from typing import (
 
 from flockwave.connections import ConnectionState
 from flockwave.concurrency import AsyncBundler
+from flockwave.spec.schema import get_message_schema
 
 from .logger import log as base_log
 from .middleware import RequestMiddleware, ResponseMiddleware
@@ -50,6 +54,7 @@ from .model import (
     FlockwaveMessageBuilder,
     FlockwaveNotification,
     FlockwaveResponse,
+    MessageValidator,
 )
 from .registries import ChannelTypeRegistry, ClientRegistry
 from .types import Disposer
@@ -63,11 +68,14 @@ from .message_handlers import (
 
 __all__ = (
     "ConnectionStatusMessageRateLimiter",
+    "DeltaUAVMessageRateLimiter",
     "UAVMessageRateLimiter",
+    "MessageEncodingCache",
     "MessageHandler",
     "MessageHandlerResponse",
     "MessageHub",
     "RateLimiters",
+    "RequestScheduler",
     "create_generic_INF_or_PROPS_message_factory",
     "create_multi_object_message_handler",
 )
@@ -91,6 +99,24 @@ handled by the handler or not, or a dictionary that is turned into a message).
 """
 
 T = TypeVar("T")
+U = TypeVar("U")
+
+BARRIER_MESSAGE_TYPES = frozenset({"AUTH-REQ"})
+"""Message types that are processed by RequestScheduler_ only after all the
+messages submitted before them have been processed, and that must finish
+before any further message is processed.
+"""
+
+MESSAGE_LANES = {"DEV-LISTSUB": "DEV-SUB", "DEV-SUB": "DEV-SUB", "DEV-UNSUB": "DEV-SUB"}
+"""Mapping from message types to the lanes of RequestScheduler_ where the
+messages are processed one by one, in the order they were submitted. Message
+types not listed here are processed concurrently with each other.
+"""
+
+_PENDING = object()
+"""Marker object for responses of message handlers that are not available
+yet.
+"""
 
 
 class MessageValidationError(RuntimeError):
@@ -109,8 +135,9 @@ class Request:
     message: FlockwaveMessage
 
     #: The client that will receive the message; `None` means that it is a
-    #: broadcast
-    to: Optional[Union[str, Client]] = None
+    #: broadcast. Tuples are used for multicast messages that are sent to
+    #: multiple clients but not all of them.
+    to: Optional[Union[str, Client, tuple[Union[str, Client], ...]]] = None
 
     #: Another, optional message that this message responds to
     in_response_to: Optional[FlockwaveMessage] = None
@@ -118,10 +145,21 @@ class Request:
     #: Whether the request has been fulfilled
     fulfilled: bool = False
 
+    #: Whether the message could not be delivered to its recipient. Set only
+    #: for messages targeted to a single client.
+    failed: bool = False
+
     #: Event that will be dispatched when the request is processed by the
     #: outbound queue of the message hub. Constructed lazily.
     event: Optional[Event] = None
 
+    def notify_failed(self) -> None:
+        """Marks the request as processed, with a failure to deliver the
+        message to its recipient.
+        """
+        self.failed = True
+        self.notify_sent()
+
     def notify_sent(self) -> None:
         """Marks the request as fulfilled."""
         self.fulfilled = True
@@ -140,6 +178,81 @@ class Request:
         await self.event.wait()
 
 
+class MessageEncodingCache:
+    """Cache that stores the encoded representations of messages that are
+    being broadcast to multiple clients at the same time.
+
+    Communication channels that share the same wire format may ask the cache
+    to encode a message with a given encoder. When the message is currently
+    being broadcast by the message hub, the encoded representation is
+    calculated only once for each encoding and shared between the channels.
+    For all other messages, the cache simply calls the encoder.
+
+    Entries are keyed by the identity of the message and the name of the
+    encoding. Entries are removed when the broadcast finishes, so the cache
+    never holds on to messages that are not being sent any more.
+    """
+
+    _entries: dict[int, dict[str, Any]]
+    """Dictionary mapping the IDs of messages being broadcast to dictionaries
+    that map encoding names to the encoded representations of the messages.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self._entries = {}
+
+    def encode(self, message: Any, encoding: str, encoder: Callable[[Any], U]) -> U:
+        """Encodes the given message with the given encoder, returning the
+        cached representation if the message has already been encoded with
+        the same encoding during the current broadcast.
+
+        Parameters:
+            message: the message to encode
+            encoding: the name of the encoding; channels using the same name
+                must use encoders that produce identical output
+            encoder: the encoder to call when the message is not in the cache
+
+        Returns:
+            the encoded message
+        """
+        entry = self._entries.get(id(message))
+        if entry is None:
+            return encoder(message)
+
+        try:
+            return entry[encoding]
+        except KeyError:
+            result = entry[encoding] = encoder(message)
+            return result
+
+    @property
+    def num_entries(self) -> int:
+        """Returns the number of messages currently registered in the cache."""
+        return len(self._entries)
+
+    @contextmanager
+    def shared(self, message: Any) -> Iterator[None]:
+        """Context manager that registers the given message in the cache
+        while the execution is in the context, allowing channels to share the
+        encoded representations of the message.
+
+        The caller must keep a reference to the message while it is in the
+        context to ensure that its identity is not reused.
+        """
+        key = id(message)
+        if key in self._entries:
+            # Nested usage; the outermost context manages the entry
+            yield
+            return
+
+        self._entries[key] = {}
+        try:
+            yield
+        finally:
+            del self._entries[key]
+
+
 class MessageHub:
     """Central entity in a Flockwave server that handles incoming messages
     and prepares outbound messages for dispatch.
@@ -177,6 +290,7 @@ class MessageHub:
     _broadcast_methods: Optional[list[Callable[[FlockwaveMessage], Awaitable[None]]]]
     _channel_type_registry: Optional[ChannelTypeRegistry]
     _client_registry: Optional[ClientRegistry]
+    _encoding_cache: MessageEncodingCache
     _handlers_by_type: defaultdict[Optional[str], list[MessageHandler]]
     _log_messages: bool
     _message_builder: FlockwaveMessageBuilder
@@ -184,6 +298,7 @@ class MessageHub:
     _response_middleware: list[ResponseMiddleware]
     _queue_rx: MemoryReceiveChannel
     _queue_tx: MemorySendChannel
+    _validator: MessageValidator
 
     def __init__(self):
         """Constructor."""
@@ -194,7 +309,9 @@ class MessageHub:
         self._broadcast_methods = None
         self._channel_type_registry = None
         self._client_registry = None
+        self._encoding_cache = MessageEncodingCache()
         self._log_messages = False
+        self._validator = MessageValidator(get_message_schema())
 
         self._queue_tx, self._queue_rx = open_memory_channel(4096)
 
@@ -310,6 +427,20 @@ class MessageHub:
                 self._invalidate_broadcast_methods, sender=self._client_registry
             )
 
+    @property
+    def encoding_cache(self) -> MessageEncodingCache:
+        """Cache that communication channels may use to share the encoded
+        representations of broadcast messages with each other.
+        """
+        return self._encoding_cache
+
+    @property
+    def validator(self) -> MessageValidator:
+        """Validator that the hub uses to validate incoming messages. Exposes
+        the validation timing histograms of the message types.
+        """
+        return self._validator
+
     def create_notification(self, body: Any = None) -> FlockwaveNotification:
         """Creates a new Flockwave notification to be sent by the server.
 
@@ -386,6 +517,33 @@ class MessageHub:
         # ends up in the queue; it may be dropped
         self._queue_tx.send_nowait(Request(message))
 
+    def enqueue_multicast_message(
+        self, message: FlockwaveNotification, to: Iterable[Union[str, Client]]
+    ) -> None:
+        """Enqueues a notification in this message hub to be sent later to
+        multiple clients.
+
+        The encoded representation of the notification is shared between the
+        communication channels of the recipients, just like for broadcast
+        messages.
+
+        Note that this function may drop messages if they are enqueued too
+        fast. Use `multicast_message()` if you want to block until the message
+        is actually in the queue.
+
+        Parameters:
+            message: the notification to enqueue
+            to: the Client_ objects that represent the recipients of the
+                message, or their IDs
+        """
+        assert isinstance(
+            message, FlockwaveNotification
+        ), "only notifications may be multicast"
+
+        # Don't return the request here because it is not guaranteed that it
+        # ends up in the queue; it may be dropped
+        self._queue_tx.send_nowait(Request(message, to=tuple(to)))
+
     def enqueue_message(
         self,
         message: Union[FlockwaveMessage, dict[str, Any]],
@@ -580,17 +738,20 @@ class MessageHub:
         Returns:
             whether the message was handled by at least one handler
         """
-        # TODO(ntamas): right now the handlers are executed in sequence so
-        # one handler could arbitrarily delay the ones coming later in the
-        # queue
+        # Handlers are called in the order they were registered, but the
+        # awaitables returned from the handlers are awaited concurrently so
+        # one handler cannot delay the ones coming later in the queue.
+        # Responses are still dispatched in the order of the handlers.
 
         message_type = message.body["type"]
         all_handlers = chain(
             self._handlers_by_type.get(message_type, ()), self._handlers_by_type[None]
         )
 
-        handled = False
-        for handler in all_handlers:
+        responses: list[Any] = []
+        pending: list[tuple[int, MessageHandler, Awaitable[Any]]] = []
+
+        for index, handler in enumerate(all_handlers):
             try:
                 response = handler(message, sender, self)
             except Exception:
@@ -602,39 +763,109 @@ class MessageHub:
                 response = None
 
             if isawaitable(response):
-                try:
-                    response = await response
-                except Exception:
-                    log.exception(
-                        "Error while waiting for response from handler "
-                        "{0!r} for incoming message; proceeding with "
-                        "next handler (if any)".format(handler)
-                    )
-                    response = None
-
-            if response is True:
-                # Message was handled by the handler
-                handled = True
-            elif response is False or response is None:
-                # Message was rejected by the handler, nothing to do
-                pass
-            elif isinstance(response, (dict, FlockwaveResponse)):
-                # Handler returned a dict or a response; we must enqueue it
-                # for later dispatch. (We cannot send it immediately due to
-                # ordering constraints; e.g., async operation notifications
-                # must be sent later than the initial responses because the
-                # latter contain the receipt IDs that the former ones refer to).
-                self.enqueue_message(response, to=sender, in_response_to=message)
-                handled = True
+                pending.append((index, handler, response))
+                response = _PENDING
+
+            responses.append(response)
+
+        handled = False
+        next_index = 0
+
+        def dispatch_ready_responses() -> None:
+            nonlocal handled, next_index
+            while next_index < len(responses):
+                response = responses[next_index]
+                if response is _PENDING:
+                    break
+                if self._dispatch_handler_response(response, message, sender):
+                    handled = True
+                next_index += 1
+
+        async def wait_for(
+            index: int, handler: MessageHandler, response: Awaitable[Any]
+        ) -> None:
+            try:
+                responses[index] = await response
+            except Exception:
+                log.exception(
+                    "Error while waiting for response from handler "
+                    "{0!r} for incoming message; proceeding with "
+                    "next handler (if any)".format(handler)
+                )
+                responses[index] = None
+            dispatch_ready_responses()
+
+        dispatch_ready_responses()
+
+        if len(pending) == 1:
+            await wait_for(*pending[0])
+        elif pending:
+            async with open_nursery() as nursery:
+                for args in pending:
+                    nursery.start_soon(wait_for, *args)
 
         return handled
 
+    def _dispatch_handler_response(
+        self, response: Any, message: FlockwaveMessage, sender: Client
+    ) -> bool:
+        """Processes the response of a single message handler to an incoming
+        message.
+
+        Returns:
+            whether the message was handled by the handler
+        """
+        if response is True:
+            # Message was handled by the handler
+            return True
+        elif response is False or response is None:
+            # Message was rejected by the handler, nothing to do
+            return False
+        elif isinstance(response, (dict, FlockwaveResponse)):
+            # Handler returned a dict or a response; we must enqueue it
+            # for later dispatch. (We cannot send it immediately due to
+            # ordering constraints; e.g., async operation notifications
+            # must be sent later than the initial responses because the
+            # latter contain the receipt IDs that the former ones refer to).
+            self.enqueue_message(response, to=sender, in_response_to=message)
+            return True
+        else:
+            return False
+
     def _invalidate_broadcast_methods(self, *args, **kwds):
         """Invalidates the list of methods to call when the message hub
         wishes to broadcast a message to all the connected clients.
         """
         self._broadcast_methods = None
 
+    async def multicast_message(
+        self,
+        message: FlockwaveNotification,
+        to: Iterable[Union[str, Client]],
+    ) -> Request:
+        """Sends a notification from this message hub to multiple clients.
+
+        The encoded representation of the notification is shared between the
+        communication channels of the recipients, just like for broadcast
+        messages.
+
+        Parameters:
+            message: the notification to send
+            to: the Client_ objects that represent the recipients of the
+                message, or their IDs
+
+        Returns:
+            the request object that identifies this message in the outbound
+            message queue. It can be used to wait until the message is delivered
+        """
+        assert isinstance(
+            message, FlockwaveNotification
+        ), "only notifications may be multicast"
+
+        request = Request(message, to=tuple(to))
+        await self._queue_tx.send(request)  # type: ignore
+        return request
+
     def on(self, *args: str) -> Callable[[MessageHandler], MessageHandler]:
         """Decorator factory function that allows one to register a message
         handler on a MessageHub_ with the following syntax::
@@ -781,13 +1012,21 @@ class MessageHub:
         """
         async with open_nursery() as nursery, self._queue_rx:
             async for request in self._queue_rx:
-                if request.to:
+                if isinstance(request.to, tuple):
+                    nursery.start_soon(
+                        self._multicast_message,
+                        request.message,
+                        request.to,
+                        request.notify_sent,
+                    )
+                elif request.to:
                     nursery.start_soon(
                         self._send_message,
                         request.message,
                         request.to,
                         request.in_response_to,
                         request.notify_sent,
+                        request.notify_failed,
                     )
                 else:
                     nursery.start_soon(
@@ -978,7 +1217,11 @@ class MessageHub:
             MessageValidationError: if the message could not have been decoded
         """
         try:
-            return FlockwaveMessage.from_json(message)  # type: ignore
+            # Validate the message against the part of the schema that belongs
+            # to its type only; this is much faster than validating it against
+            # the full message schema in FlockwaveMessage.from_json()
+            self._validator.validate(message)
+            return FlockwaveMessage.from_json(message, validate=False)  # type: ignore
         except ValidationError:
             # We should not re-raise directly from here because on Python 3.x
             # we would get a very long stack trace that includes the original
@@ -1019,9 +1262,14 @@ class MessageHub:
                     break
                 message = next_message  # type: ignore
             else:
-                # Message passed through all middleware
+                # Message passed through all middleware. Send it to all the
+                # clients concurrently so a slow client does not hold up the
+                # others, and let the channels share the encoded message
                 failures = 0
-                for func in self._broadcast_methods:
+                broadcast_methods = self._broadcast_methods
+
+                async def send_with(func) -> None:
+                    nonlocal failures
                     try:
                         await func(message)
                     except (BrokenResourceError, ClosedResourceError):
@@ -1030,6 +1278,14 @@ class MessageHub:
                     except Exception:
                         failures += 1
 
+                with self._encoding_cache.shared(message):
+                    if len(broadcast_methods) == 1:
+                        await send_with(broadcast_methods[0])
+                    else:
+                        async with open_nursery() as nursery:
+                            for func in broadcast_methods:
+                                nursery.start_soon(send_with, func)
+
                 if failures > 0:
                     log.error(
                         f"Error while broadcasting message to {failures} client(s)"
@@ -1037,12 +1293,26 @@ class MessageHub:
 
         done()
 
+    async def _multicast_message(
+        self,
+        message: FlockwaveNotification,
+        recipients: tuple[Union[str, Client], ...],
+        done: Callable[[], None],
+    ) -> None:
+        with self._encoding_cache.shared(message):
+            async with open_nursery() as nursery:
+                for recipient in recipients:
+                    nursery.start_soon(self._send_message, message, recipient)
+
+        done()
+
     async def _send_message(
         self,
         message: FlockwaveMessage,
         to: Union[str, Client],
         in_response_to: Optional[FlockwaveMessage] = None,
         done: Optional[Callable[[], None]] = None,
+        failed: Optional[Callable[[], None]] = None,
     ):
         assert (
             self._client_registry is not None
@@ -1055,7 +1325,9 @@ class MessageHub:
                 log.warning(
                     "Client is gone; not sending message", extra={"id": str(to)}
                 )
-                if done:
+                if failed:
+                    failed()
+                elif done:
                     done()
                 return
         else:
@@ -1069,6 +1341,8 @@ class MessageHub:
                 next_message = None
             if next_message is None:
                 # Message dropped by middleware
+                if failed:
+                    failed()
                 break
             message = next_message
         else:
@@ -1079,10 +1353,14 @@ class MessageHub:
                 log.warning(
                     "Client is gone; not sending message", extra={"id": client.id}
                 )
+                if failed:
+                    failed()
             except Exception:
                 log.exception(
                     "Error while sending message to client", extra={"id": client.id}
                 )
+                if failed:
+                    failed()
             else:
                 if hasattr(message, "_notify_sent"):
                     message._notify_sent()  # type: ignore
@@ -1129,6 +1407,150 @@ class MessageHub:
 ##############################################################################
 
 
+class RequestScheduler:
+    """Scheduler that processes the incoming messages of a single client
+    concurrently while preserving the order of the messages that depend on
+    each other.
+
+    Most messages are processed concurrently, each in its own task, so a slow
+    request does not stall the other requests of the same client, not even
+    the ones with the same type. Messages whose types are listed in
+    `MESSAGE_LANES` are assigned to lanes instead; messages in the same lane
+    are processed one by one, in the order they were submitted, so their
+    responses are also sent in that order. Messages of some types (see
+    `BARRIER_MESSAGE_TYPES`) act as barriers: they are processed only after
+    all the messages submitted before them have been processed, and no
+    further messages are processed until they are finished.
+
+    The number of messages being processed or waiting in a lane is limited;
+    `submit()` blocks when the limit is reached, providing backpressure to the
+    reader of the connection of the client.
+    """
+
+    _handler: Callable[[Any], Awaitable[Any]]
+    """Async function that processes a single message."""
+
+    _idle: ParkingLot
+    """Parking lot for tasks waiting for all pending messages to be
+    processed.
+    """
+
+    _lanes: dict[str, deque[Any]]
+    """Messages waiting to be processed, keyed by lanes. The first message in
+    each lane is the one being processed.
+    """
+
+    _nursery: Nursery
+    """Nursery in which the messages are processed."""
+
+    _num_pending: int
+    """Number of messages being processed or waiting to be processed."""
+
+    _slots: Semaphore
+    """Semaphore that limits the number of pending messages."""
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        *,
+        nursery: Nursery,
+        max_pending: int = 64,
+    ):
+        """Constructor.
+
+        Parameters:
+            handler: async function to call with a single message to process
+                it, typically a partial application of
+                `MessageHub.handle_incoming_message()`
+            nursery: nursery in which the messages are processed
+            max_pending: maximum number of messages being processed or waiting
+                to be processed in a lane
+        """
+        self._handler = handler
+        self._idle = ParkingLot()
+        self._lanes = {}
+        self._nursery = nursery
+        self._num_pending = 0
+        self._slots = Semaphore(max(int(max_pending), 1))
+
+    @property
+    def num_pending(self) -> int:
+        """Number of messages being processed or waiting to be processed."""
+        return self._num_pending
+
+    async def submit(self, message: Any) -> None:
+        """Submits a message for processing.
+
+        Blocks until there is room for the message in the scheduler. Barrier
+        messages are processed before this function returns.
+
+        Parameters:
+            message: the raw message to process
+        """
+        type = self._get_type(message)
+
+        if type is None or type in BARRIER_MESSAGE_TYPES:
+            while self._num_pending > 0:
+                await self._idle.park()
+            await self._process(message)
+            return
+
+        await self._slots.acquire()
+        self._num_pending += 1
+
+        lane = MESSAGE_LANES.get(type)
+        if lane is None:
+            self._nursery.start_soon(self._run_single, message)
+            return
+
+        queue = self._lanes.get(lane)
+        if queue is None:
+            self._lanes[lane] = deque((message,))
+            self._nursery.start_soon(self._run_lane, lane)
+        else:
+            queue.append(message)
+
+    @staticmethod
+    def _get_type(message: Any) -> Optional[str]:
+        """Returns the type of the given raw message, or `None` if the message
+        has no valid type.
+        """
+        body = message.get("body") if isinstance(message, dict) else None
+        type = body.get("type") if isinstance(body, dict) else None
+        return type if isinstance(type, str) else None
+
+    def _notify_processed(self) -> None:
+        self._num_pending -= 1
+        self._slots.release()
+        if self._num_pending == 0:
+            self._idle.unpark_all()
+
+    async def _process(self, message: Any) -> None:
+        try:
+            await self._handler(message)
+        except Exception:
+            log.exception("Unexpected error while processing incoming message")
+
+    async def _run_lane(self, lane: str) -> None:
+        queue = self._lanes[lane]
+        try:
+            while queue:
+                try:
+                    await self._process(queue[0])
+                finally:
+                    queue.popleft()
+                    self._notify_processed()
+        finally:
+            if self._lanes.get(lane) is queue:
+                del self._lanes[lane]
+
+    async def _run_single(self, message: Any) -> None:
+        try:
+            await self._process(message)
+        finally:
+            self._notify_processed()
+
+
 class RateLimiter(metaclass=ABCMeta):
     """Abstract base class for rate limiter objects."""
 
@@ -1229,6 +1651,291 @@ class UAVMessageRateLimiter(RateLimiter):
                 await sleep(self.delay)
 
 
+class StatusDeltaEncoder:
+    """Object that keeps track of the status information of UAVs that was
+    last sent to a single client, and that turns full status snapshots into
+    deltas that contain only the fields that changed since the last message.
+
+    Full snapshots (keyframes) are produced periodically so the client can
+    re-synchronize its state even if it lost some of the earlier deltas.
+    """
+
+    keyframe_interval: float
+    """Number of seconds between consecutive keyframes."""
+
+    _baselines: dict[str, dict[str, Any]]
+    """Dictionary mapping object IDs to the last known status information of
+    the object on the client side.
+    """
+
+    _last_keyframe_at: Optional[float]
+    """Timestamp of the last keyframe that was produced, according to the
+    monotonic clock; `None` if no keyframe was produced yet.
+    """
+
+    _pending: Optional[tuple[dict[str, dict[str, Any]], Optional[float]]]
+    """The baselines and the keyframe timestamp produced by the last call to
+    encode() that were not committed yet.
+    """
+
+    def __init__(self, keyframe_interval: float = 5.0):
+        """Constructor.
+
+        Parameters:
+            keyframe_interval: number of seconds between consecutive
+                keyframes
+        """
+        self.keyframe_interval = keyframe_interval
+        self._baselines = {}
+        self._last_keyframe_at = None
+        self._pending = None
+
+    def commit(self) -> None:
+        """Commits the baselines produced by the last call to encode(), marking
+        the status information encoded there as successfully sent to the
+        client. This is a no-op if there is nothing to commit.
+        """
+        if self._pending is not None:
+            baselines, last_keyframe_at = self._pending
+            self._pending = None
+            self._baselines.update(baselines)
+            if last_keyframe_at is not None:
+                self._last_keyframe_at = last_keyframe_at
+
+    def encode(
+        self, statuses: dict[str, Any], keyframe: bool = False, *, commit: bool = True
+    ) -> tuple[dict[str, Any], bool]:
+        """Encodes the given status information relative to the status
+        information that was sent to the client the last time.
+
+        Parameters:
+            statuses: dictionary mapping object IDs to their full status
+                information, converted to plain JSON with `_to_plain_json()`.
+                The status objects are stored as baselines without copying
+                so they must not be modified later.
+            keyframe: whether to force a keyframe
+            commit: whether to treat the encoded status information as sent
+                to the client immediately. When it is `False`, the caller must
+                call commit() after the message was sent successfully, or
+                rollback() if it could not be sent; the next message is
+                encoded relative to the old baselines until then.
+
+        Returns:
+            the encoded status information and whether it is a delta. Deltas
+            map object IDs to dictionaries containing the changed fields only;
+            fields that were removed since the last message are mapped to
+            `None`. Objects without changes are omitted from deltas.
+        """
+        now = monotonic()
+        baselines: dict[str, dict[str, Any]] = {}
+        result = {}
+
+        if (
+            keyframe
+            or self._last_keyframe_at is None
+            or now - self._last_keyframe_at >= self.keyframe_interval
+        ):
+            for object_id, status in statuses.items():
+                result[object_id] = baselines[object_id] = status
+            self._pending = baselines, now
+            is_delta = False
+
+        else:
+            for object_id, current in statuses.items():
+                baseline = self._baselines.get(object_id)
+                baselines[object_id] = current
+
+                if baseline is None:
+                    result[object_id] = current
+                    continue
+
+                changes = {
+                    key: value
+                    for key, value in current.items()
+                    if key not in baseline or baseline[key] != value
+                }
+                for key in baseline:
+                    if key not in current:
+                        changes[key] = None
+
+                if changes:
+                    result[object_id] = changes
+
+            self._pending = baselines, None
+            is_delta = True
+
+        if commit:
+            self.commit()
+
+        return result, is_delta
+
+    def forget(self, object_id: str) -> None:
+        """Forgets the status information of the object with the given ID
+        so the next message will contain the full status of the object.
+        """
+        self._baselines.pop(object_id, None)
+
+    def rollback(self) -> None:
+        """Discards the baselines produced by the last call to encode(),
+        marking the status information encoded there as not sent to the
+        client. The next message will contain the same changes again. This is
+        a no-op if there is nothing to roll back.
+        """
+        self._pending = None
+
+
+def _to_plain_json(value: Any) -> Any:
+    """Converts a model object or a value containing model objects to a
+    plain JSON-like representation consisting of dicts, lists and scalars
+    only, copying mutable containers along the way.
+    """
+    if isinstance(value, dict):
+        return {key: _to_plain_json(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_to_plain_json(item) for item in value]
+    elif isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    elif hasattr(value, "json"):
+        return _to_plain_json(value.json)
+    else:
+        return value
+
+
+@dataclass
+class DeltaUAVMessageRateLimiter(UAVMessageRateLimiter):
+    """Rate limiter for UAV-related status messages that behaves like
+    UAVMessageRateLimiter_ but that can also send delta-encoded messages to
+    clients that explicitly asked for them.
+
+    Clients that did not opt in to delta encoding receive the full message
+    created by the factory function. Clients that opted in receive messages
+    where the mapping under the key given in ``key`` contains only the fields
+    that changed since the last message sent to the same client; these
+    messages have a ``delta`` key set to ``True`` in the body. Full snapshots
+    are sent to these clients periodically, according to the keyframe
+    interval. At most one delta-encoded message is in flight for each client;
+    changes are accumulated until the previous message was delivered so the
+    messages cannot overtake each other in the outbound queue of the hub.
+    """
+
+    hub: Optional[MessageHub] = None
+    key: str = "status"
+    keyframe_interval: float = 5.0
+
+    _encoders: dict[str, StatusDeltaEncoder] = field(default_factory=dict)
+    _in_flight: dict[str, Request] = field(default_factory=dict)
+
+    def is_delta_mode_enabled_for(self, client: Union[str, Client]) -> bool:
+        """Returns whether the given client asked for delta-encoded messages."""
+        client_id = client.id if isinstance(client, Client) else client
+        return client_id in self._encoders
+
+    def set_delta_mode_for(self, client: Union[str, Client], enabled: bool) -> None:
+        """Enables or disables delta-encoded messages for the given client.
+
+        Enabling the delta mode for a client that already uses it forces the
+        next message sent to the client to be a keyframe.
+        """
+        client_id = client.id if isinstance(client, Client) else client
+        if enabled:
+            self._encoders[client_id] = StatusDeltaEncoder(self.keyframe_interval)
+        else:
+            self._encoders.pop(client_id, None)
+            self._in_flight.pop(client_id, None)
+
+    async def run(self, dispatcher, nursery):
+        self.bundler.clear()
+        async with self.bundler.iter() as bundle_iterator:
+            async for bundle in bundle_iterator:
+                try:
+                    await self._dispatch(dispatcher, self.factory(bundle))
+                except Exception:
+                    log.exception(
+                        f"Error while dispatching messages from {self.name} factory"
+                    )
+                await sleep(self.delay)
+
+    async def _dispatch(self, dispatcher, message: FlockwaveMessage) -> None:
+        hub = self.hub
+        registry = hub.client_registry if hub else None
+        if not self._encoders or hub is None or registry is None:
+            await dispatcher(message)
+            return
+
+        # Forget about clients that have disconnected in the meanwhile
+        gone = [client_id for client_id in self._encoders if client_id not in registry]
+        for client_id in gone:
+            del self._encoders[client_id]
+            self._in_flight.pop(client_id, None)
+
+        other_client_ids = [
+            client_id for client_id in registry.ids if client_id not in self._encoders
+        ]
+        if other_client_ids:
+            await hub.multicast_message(message, to=other_client_ids)
+
+        message_type = message.get_type()
+        statuses = {
+            object_id: _to_plain_json(status)
+            for object_id, status in (message.body.get(self.key) or {}).items()
+        }
+
+        # Iterate over a copy; clients may turn delta mode on or off while we
+        # are waiting for the messages to be queued
+        for client_id, encoder in list(self._encoders.items()):
+            if not self._settle_in_flight_message(client_id, encoder):
+                # Previous message not delivered yet; the changes accumulate
+                # and are sent later so deltas cannot overtake each other
+                continue
+
+            encoded, is_delta = encoder.encode(statuses, commit=False)
+            if is_delta and not encoded:
+                encoder.commit()
+                continue
+
+            body = {self.key: encoded, "type": message_type}
+            if is_delta:
+                body["delta"] = True
+
+            try:
+                request = await hub.send_message(
+                    hub.create_notification(body), to=client_id
+                )
+            except Exception:
+                # The baseline is not committed so the next message to this
+                # client will contain these changes again
+                log.exception(
+                    f"Error while sending delta-encoded message to {client_id}"
+                )
+                encoder.rollback()
+            else:
+                self._in_flight[client_id] = request
+
+    def _settle_in_flight_message(
+        self, client_id: str, encoder: StatusDeltaEncoder
+    ) -> bool:
+        """Checks whether the last delta-encoded message sent to the given
+        client was processed by the message hub, and commits or rolls back
+        the baselines of the encoder of the client depending on whether the
+        message was delivered.
+
+        Returns:
+            whether a new message may be sent to the client
+        """
+        request = self._in_flight.get(client_id)
+        if request is None:
+            return True
+        if not request.fulfilled:
+            return False
+
+        del self._in_flight[client_id]
+        if request.failed:
+            encoder.rollback()
+        else:
+            encoder.commit()
+        return True
+
+
 class ConnectionStatusMessageRateLimiter(RateLimiter):
     """Specialized rate limiter for CONN-INF (connection status) messages.
 
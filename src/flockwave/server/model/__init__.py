@@ -22,6 +22,7 @@ from .identifiers import default_id_generator
 from .messages import FlockwaveMessage, FlockwaveNotification, FlockwaveResponse
 from .object import ModelObject
 from .uav import PassiveUAVDriver, UAVStatusInfo, UAVDriver, UAV, UAVBase
+from .validation import MessageValidator
 from .weather import Weather
 from .world import World
 
@@ -32,6 +33,7 @@ __all__ = (
     "FlockwaveMessageBuilder",
     "FlockwaveNotification",
     "FlockwaveResponse",
+    "MessageValidator",
     "UAVStatusInfo",
     "UAVDriver",
     "UAV",
@@ -160,11 +160,22 @@ class DeviceTreeNodeBase(metaclass=ModelMeta):
     path string was not calculated yet.
     """
 
+    _values: Optional[dict[str, Any]]
+    """Cached result of ``collect_channel_values()`` for this node. ``None``
+    means that the cache is invalid and the values must be collected again.
+
+    The cache of a node is valid only if the caches of all the nodes in its
+    subtree are valid, too. The cached dictionaries are never modified in
+    place; they are replaced with new ones when they become invalid so they
+    can be shared safely between messages that are waiting to be sent.
+    """
+
     def __init__(self):
         """Constructor."""
         self._subscribers = None
         self._parent = None
         self._path = None
+        self._values = None
 
     def collect_channel_values(self) -> dict[str, Any]:
         """Creates a Python dictionary that maps the IDs of the children of
@@ -176,12 +187,22 @@ class DeviceTreeNodeBase(metaclass=ModelMeta):
           - every other node ``node`` will be mapped to the result of
             ``node.collect_channel_values()``, recursively
 
+        The result is cached until the value of a channel in the subtree of
+        this node changes, or until the structure of the subtree changes.
+        When the cache is rebuilt, only the children whose own cache became
+        invalid are collected again. The caller must not modify the returned
+        dictionary.
+
         Returns:
             a Python dictionary constructed as described above
         """
-        return {
-            key: child.collect_channel_values() for key, child in self.children.items()
-        }
+        values = self._values
+        if values is None:
+            values = self._values = {
+                key: child.collect_channel_values()
+                for key, child in self.iterchildren()
+            }
+        return values
 
     def count_subscriptions_of(self, client: Client) -> int:
         """Count how many times the given client is subscribed to changes
@@ -345,6 +366,8 @@ class DeviceTreeNodeBase(metaclass=ModelMeta):
         node._parent = self
         node._path = None
 
+        self._invalidate_values()
+
         return node
 
     def _dispose(self) -> None:
@@ -353,12 +376,25 @@ class DeviceTreeNodeBase(metaclass=ModelMeta):
         """
         self._parent = None
         self._path = None
+        self._values = None
 
         if hasattr(self, "children"):
             for child in self.children.values():
                 child._dispose()
             self.children = {}
 
+    def _invalidate_values(self) -> None:
+        """Invalidates the cached channel values of this node and all its
+        parents.
+        """
+        node = self
+        while node is not None:
+            if node._values is None and node is not self:
+                # The caches of the remaining parents are invalid already
+                break
+            node._values = None
+            node = node._parent
+
     def _remove_child(self, node: C) -> C:
         """Removes the given child node from this node.
 
@@ -394,6 +430,7 @@ class DeviceTreeNodeBase(metaclass=ModelMeta):
             raise ValueError(f"no child exists with the given ID: {id!r}") from None
         node._parent = None
         node._path = None
+        self._invalidate_values()
         return node
 
     def _subscribe(self, client: Client) -> None:
@@ -456,10 +493,11 @@ class ChannelNode(DeviceTreeNodeBase, Generic[T]):
 
     value: T
     """The value of the channel. Modifying this property will modify the value but
-    _not_ notify any interested parties that the channel value was modified. Use
-    the context manager returned by the ``create_mutator()`` method of the
-    device tree instead if you want to notify interested parties about your
-    modifications.
+    _not_ notify any interested parties that the channel value was modified, and
+    it will _not_ invalidate the cached channel values of the parent nodes
+    either. Use the context manager returned by the ``create_mutator()`` method
+    of the device tree instead if you want to notify interested parties about
+    your modifications.
     """
 
     def __init__(
@@ -921,6 +959,7 @@ class DeviceTreeMutator:
             return
 
         node.value = new_value
+        node._invalidate_values()
         self._updated_nodes.add(node)
 
 
@@ -1049,21 +1088,26 @@ class DeviceTreeSubscriptionManager:
                 response.add_error(path, "No such device tree path")  # type: ignore
             return None
 
-    def _notify_subscriber(self, subscriber: Client, channel_values: Any) -> None:
-        """Notifies a single subscriber about the change in channel values
-        in the subtree of a node that the subscriber is subscribed to.
+    def _notify_subscribers(
+        self, subscribers: list[Client], channel_values: Any
+    ) -> None:
+        """Notifies one or more subscribers about the change in channel values
+        in the subtrees of the nodes that the subscribers are subscribed to.
 
         Parameters:
-            subscriber: the client that has to be notified
-            channel_values: object containing the channel values
-                of all the channels in the subtree of the node, organized
-                in exactly the same way as the tree itself is organized
-                under the node
+            subscribers: the clients that have to be notified
+            channel_values: object mapping the paths of the nodes to the
+                channel values of all the channels in the subtree of the
+                node, organized in exactly the same way as the tree itself
+                is organized under the node
         """
         body = {"values": channel_values, "type": "DEV-INF"}
         message = self._message_hub.create_notification(body)
 
-        self._message_hub.enqueue_message(message, to=subscriber)
+        if len(subscribers) == 1:
+            self._message_hub.enqueue_message(message, to=subscribers[0])
+        else:
+            self._message_hub.enqueue_multicast_message(message, to=subscribers)
 
     def _on_client_removed(self, sender: "ClientRegistry", client: Client) -> None:
         """Handler called when a client disconnected from the server."""
@@ -1081,21 +1125,32 @@ class DeviceTreeSubscriptionManager:
         for node in nodes:
             visited_nodes.update(node.iterparents(include_self=True))
 
-        # Now, we need to construct the messages to be sent, for each
-        # subscriber that was affected. Different subscribers may get
-        # different messages so we need to build a message for each
-        # subscriber.
-        messages_by_subscribers = defaultdict(dict)
+        # Now, we need to find out which of the affected nodes each subscriber
+        # is subscribed to. The channel values of each node are collected
+        # only once; collect_channel_values() re-collects only those parts
+        # of the subtree that have changed since the last call.
+        values_by_path: dict[str, Any] = {}
+        paths_by_subscriber: defaultdict[Client, list[str]] = defaultdict(list)
         for node in visited_nodes:
             if node.has_subscribers:
                 path = node.path
-                channel_values = node.collect_channel_values()
+                values_by_path[path] = node.collect_channel_values()
                 for subscriber in node.itersubscribers():
-                    messages_by_subscribers[subscriber][path] = channel_values
+                    paths_by_subscriber[subscriber].append(path)
+
+        # Different subscribers may get different messages, but subscribers
+        # that are subscribed to the same set of affected nodes get the same
+        # message, which is built only once
+        subscribers_by_paths: defaultdict[frozenset[str], list[Client]] = (
+            defaultdict(list)
+        )
+        for subscriber, paths in paths_by_subscriber.items():
+            subscribers_by_paths[frozenset(paths)].append(subscriber)
 
         # Now we can send the messages
-        for subscriber, message in messages_by_subscribers.items():
-            self._notify_subscriber(subscriber, message)
+        for paths, subscribers in subscribers_by_paths.items():
+            channel_values = {path: values_by_path[path] for path in paths}
+            self._notify_subscribers(subscribers, channel_values)
 
     def _on_device_tree_structure_changed(self, sender: DeviceTree):
         found: list[DeviceTreePath] = []
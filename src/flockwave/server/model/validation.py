@@ -0,0 +1,345 @@
+"""Type-dispatched validation of raw Flockwave messages against the Flockwave
+message schema.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Mapping
+from jsonschema import ValidationError
+from jsonschema.validators import validator_for
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+__all__ = ("MessageValidator", "ValidationTimingHistogram")
+
+
+MAX_CACHED_VALIDATORS = 1024
+"""Maximum number of message types for which the validator keeps a compiled
+schema. Messages of further types are validated against the full schema.
+"""
+
+_NO_MATCH = object()
+"""Marker object returned from the schema specialization functions when no
+alternative of a schema can match the given message type.
+"""
+
+_UNKNOWN_TYPE = "*"
+"""Histogram key used for messages whose type is missing, or whose type did
+not fit in the validator cache.
+"""
+
+
+class ValidationTimingHistogram:
+    """Histogram of the time it took to validate messages, with logarithmic
+    bucket boundaries from 10 microseconds to 100 milliseconds.
+    """
+
+    bounds: tuple[float, ...] = (
+        1e-5,
+        2e-5,
+        5e-5,
+        1e-4,
+        2e-4,
+        5e-4,
+        1e-3,
+        2e-3,
+        5e-3,
+        1e-2,
+        2e-2,
+        5e-2,
+        1e-1,
+    )
+    """Upper bounds of the buckets of the histogram, in seconds, inclusive.
+    There is an extra bucket at the end for longer durations.
+    """
+
+    counts: list[int]
+    """Number of samples in each bucket."""
+
+    total: float
+    """Sum of all the durations added to the histogram, in seconds."""
+
+    def __init__(self):
+        """Constructor."""
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+
+    def add(self, duration: float) -> None:
+        """Adds a new validation duration to the histogram.
+
+        Parameters:
+            duration: the duration to add, in seconds
+        """
+        self.counts[bisect_left(self.bounds, duration)] += 1
+        self.total += duration
+
+    @property
+    def count(self) -> int:
+        """The number of samples in the histogram."""
+        return sum(self.counts)
+
+    @property
+    def json(self) -> dict[str, Any]:
+        """Returns a JSON representation of the histogram."""
+        count = self.count
+        return {
+            "bounds": list(self.bounds),
+            "counts": list(self.counts),
+            "count": count,
+            "mean": self.total / count if count else 0.0,
+        }
+
+
+class MessageValidator:
+    """Validator for raw Flockwave messages that validates each message only
+    against the part of the Flockwave message schema that belongs to the type
+    of the message.
+
+    The Flockwave message schema lists the schemas of all the message bodies
+    as alternatives; validating a message against the full schema means
+    trying all of them. This class creates a specialized copy of the schema
+    for each message type when the type is first seen, keeping only those
+    alternatives of the message body that may match the type, and compiles a
+    validator for the specialized schema. Alternatives are removed only if
+    the `type` property of the alternative is constrained to a different
+    value, so the result of the validation is the same as with the full
+    schema.
+
+    The validator also keeps track of the time spent on validating the
+    messages of each type.
+    """
+
+    _full_validator: Optional[Callable[[Any], None]] = None
+    """Validator for the full message schema; compiled lazily."""
+
+    _histograms: dict[str, ValidationTimingHistogram]
+    """Validation timing histograms, keyed by message types."""
+
+    _schema: Any
+    """The full Flockwave message schema."""
+
+    _validators: dict[str, Callable[[Any], None]]
+    """Compiled validators of the specialized schemas, keyed by message
+    types.
+    """
+
+    def __init__(self, schema: Any):
+        """Constructor.
+
+        Parameters:
+            schema: the full Flockwave message schema
+        """
+        self._histograms = {}
+        self._schema = schema
+        self._validators = {}
+
+    def get_timing_histograms(self) -> dict[str, ValidationTimingHistogram]:
+        """Returns the validation timing histograms of the message types seen
+        so far, keyed by message types.
+        """
+        return dict(self._histograms)
+
+    def reset_timing_histograms(self) -> None:
+        """Clears the validation timing histograms."""
+        self._histograms.clear()
+
+    def validate(self, message: Any) -> None:
+        """Validates the given raw Flockwave message.
+
+        Parameters:
+            message: the raw message, decoded from JSON but not validated yet
+
+        Raises:
+            ValidationError: if the message does not match the Flockwave
+                message schema
+        """
+        body = message.get("body") if isinstance(message, dict) else None
+        type = body.get("type") if isinstance(body, dict) else None
+
+        validator: Optional[Callable[[Any], None]]
+        if isinstance(type, str):
+            validator = self._validators.get(type)
+            if validator is None:
+                validator = self._get_validator_for_type(type)
+        else:
+            validator = self._get_full_validator()
+
+        key = type if type in self._validators else _UNKNOWN_TYPE
+        started_at = perf_counter()
+        try:
+            validator(message)
+        finally:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = ValidationTimingHistogram()
+            histogram.add(perf_counter() - started_at)
+
+    def _get_full_validator(self) -> Callable[[Any], None]:
+        if self._full_validator is None:
+            self._full_validator = _compile(self._schema)
+        return self._full_validator
+
+    def _get_validator_for_type(self, type: str) -> Callable[[Any], None]:
+        """Returns a validator for messages of the given type, compiling and
+        caching it if needed.
+        """
+        schema = _specialize_message_schema(self._schema, type)
+        if schema is _NO_MATCH:
+            validator = _create_rejector(type)
+        elif schema is self._schema:
+            validator = self._get_full_validator()
+        else:
+            validator = _compile(schema)
+
+        if len(self._validators) < MAX_CACHED_VALIDATORS:
+            self._validators[type] = validator
+
+        return validator
+
+
+def _compile(schema: Any) -> Callable[[Any], None]:
+    """Compiles a validator function for the given JSON schema."""
+    return validator_for(schema)(schema).validate
+
+
+def _create_rejector(type: str) -> Callable[[Any], None]:
+    """Creates a validator function that rejects every message; used for
+    message types that do not match any of the alternatives in the schema.
+    """
+
+    def validate(message: Any) -> None:
+        raise ValidationError(f"no schema exists for message type {type!r}")
+
+    return validate
+
+
+def _resolve(node: Any, root: Any) -> Any:
+    """Resolves a local JSON reference in the given schema node, returning
+    the node itself if it is not a reference or if it cannot be resolved.
+    """
+    for _ in range(16):
+        ref = node.get("$ref") if isinstance(node, Mapping) else None
+        if not isinstance(ref, str) or not ref.startswith("#"):
+            return node
+
+        target = root
+        for part in ref[1:].split("/"):
+            if not part:
+                continue
+            part = part.replace("~1", "/").replace("~0", "~")
+            if isinstance(target, Mapping) and part in target:
+                target = target[part]
+            elif isinstance(target, list) and part.isdigit():
+                index = int(part)
+                if index >= len(target):
+                    return node
+                target = target[index]
+            else:
+                return node
+        node = target
+
+    return node
+
+
+def _may_match_type(node: Any, type: str, root: Any, depth: int = 0) -> bool:
+    """Returns whether the given schema node (an alternative of the message
+    body) may match a message body with the given type. Returns `True` if
+    this cannot be decided.
+    """
+    node = _resolve(node, root)
+    if not isinstance(node, Mapping) or depth > 16:
+        return True
+
+    properties = node.get("properties")
+    if isinstance(properties, Mapping):
+        type_schema = _resolve(properties.get("type"), root)
+        if isinstance(type_schema, Mapping):
+            if "const" in type_schema and type_schema["const"] != type:
+                return False
+            enum = type_schema.get("enum")
+            if isinstance(enum, list) and type not in enum:
+                return False
+
+    members = node.get("allOf")
+    if isinstance(members, list) and not all(
+        _may_match_type(member, type, root, depth + 1) for member in members
+    ):
+        return False
+
+    for key in ("oneOf", "anyOf"):
+        members = node.get(key)
+        if isinstance(members, list) and not any(
+            _may_match_type(member, type, root, depth + 1) for member in members
+        ):
+            return False
+
+    return True
+
+
+def _specialize_body_schema(node: Any, type: str, root: Any) -> Any:
+    """Specializes the schema of a message body to the given message type by
+    removing those alternatives of the schema that cannot match the type.
+
+    Returns:
+        the specialized schema, the original schema if it could not be
+        specialized, or `_NO_MATCH` if no message body of the given type can
+        match the schema
+    """
+    node = _resolve(node, root)
+    if not isinstance(node, Mapping):
+        return node
+
+    result = None
+
+    for key in ("oneOf", "anyOf"):
+        members = node.get(key)
+        if isinstance(members, list):
+            filtered = [
+                member for member in members if _may_match_type(member, type, root)
+            ]
+            if not filtered:
+                return _NO_MATCH
+            if len(filtered) < len(members):
+                result = result if result is not None else dict(node)
+                result[key] = filtered
+
+    members = node.get("allOf")
+    if isinstance(members, list):
+        specialized = [_specialize_body_schema(m, type, root) for m in members]
+        if any(member is _NO_MATCH for member in specialized):
+            return _NO_MATCH
+        if any(new is not old for new, old in zip(specialized, members)):
+            result = result if result is not None else dict(node)
+            result["allOf"] = specialized
+
+    return result if result is not None else node
+
+
+def _specialize_message_schema(schema: Any, type: str) -> Any:
+    """Specializes the full Flockwave message schema to the given message
+    type.
+
+    Returns:
+        the specialized schema, the original schema if it could not be
+        specialized, or `_NO_MATCH` if no message of the given type can match
+        the schema
+    """
+    if not isinstance(schema, Mapping):
+        return schema
+
+    properties = schema.get("properties")
+    if not isinstance(properties, Mapping) or "body" not in properties:
+        return schema
+
+    body = properties["body"]
+    specialized = _specialize_body_schema(body, type, schema)
+    if specialized is _NO_MATCH:
+        return _NO_MATCH
+    elif specialized is _resolve(body, schema):
+        return schema
+
+    result = dict(schema)
+    result["properties"] = dict(properties)
+    result["properties"]["body"] = specialized
+    return result
@@ -20,14 +20,29 @@ class WeatherProviderRegistry(RegistryBase[WeatherProvider]):
 
     The registry allows us to quickly retrieve a weather provider by its
     identifier.
+
+    Each provider has a priority. When the results of multiple providers
+    conflict, the result of the provider with the higher priority wins; ties
+    are broken in favour of the provider that was registered later.
     """
 
-    def add(self, provider: WeatherProvider, *, id: str) -> Disposer:
+    _priorities: dict[str, int]
+    """The priorities of the registered providers, keyed by their IDs."""
+
+    def __init__(self):
+        """Constructor."""
+        super().__init__()
+        self._priorities = {}
+
+    def add(
+        self, provider: WeatherProvider, *, id: str, priority: int = 0
+    ) -> Disposer:
         """Registers a weather provider in the registry.
 
         Parameters:
             provider: the weather provider to register
             id: the identifier that the provider will be accessible with
+            priority: the priority of the provider
 
         Returns:
             a disposer function that can be called with no arguments to
@@ -41,8 +56,20 @@ class WeatherProviderRegistry(RegistryBase[WeatherProvider]):
         if old_provider is not None and old_provider != provider:
             raise KeyError(f"Weather provider ID already taken: {id}")
         self._entries[id] = provider
+        self._priorities[id] = priority
         return partial(self.remove_by_id, id)
 
+    def iter_by_priority(self) -> Iterator[tuple[str, WeatherProvider]]:
+        """Iterates over the IDs and the providers in the registry in
+        ascending order of priority, and in the order of registration within
+        the same priority. The results of the providers must be applied in
+        this order so the ones yielded later take precedence.
+        """
+        priorities = self._priorities
+        ids = sorted(self._entries, key=priorities.__getitem__)
+        for id in ids:
+            yield id, self._entries[id]
+
     def remove_by_id(self, id: str) -> Optional[WeatherProvider]:
         """Removes the weather provider with the given ID from the registry.
 
@@ -56,10 +83,13 @@ class WeatherProviderRegistry(RegistryBase[WeatherProvider]):
             the weather provider that was deregistered, or ``None`` if no weather
             provider was registered with the given ID
         """
+        self._priorities.pop(id, None)
         return self._entries.pop(id, None)
 
     @contextmanager
-    def use(self, provider: WeatherProvider, *, id: str) -> Iterator[WeatherProvider]:
+    def use(
+        self, provider: WeatherProvider, *, id: str, priority: int = 0
+    ) -> Iterator[WeatherProvider]:
         """Temporarily adds a new weather provider, hands control back to the
         caller in a context, and then removes the weather provider when the
         caller exits the context.
@@ -67,11 +97,12 @@ class WeatherProviderRegistry(RegistryBase[WeatherProvider]):
         Parameters:
             provider: the weather provider to add
             id: the identifier that the provider will be accessible with
+            priority: the priority of the provider
 
         Yields:
             the weather provider that was added
         """
-        disposer = self.add(provider, id=id)
+        disposer = self.add(provider, id=id, priority=priority)
         try:
             yield provider
         finally:
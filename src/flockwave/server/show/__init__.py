@@ -2,6 +2,7 @@
 Skybrush-related file formats, until we find a better place for them.
 """
 
+from .compiled import CompiledTrajectory, CompiledTrajectoryGroup
 from .flight_area import get_flight_area_configuration_from_show_specification
 from .formats import SkybrushBinaryShowFile
 from .geofence import get_geofence_configuration_from_show_specification
@@ -23,6 +24,8 @@ from .specification import (
 from .trajectory import TrajectorySpecification
 
 __all__ = (
+    "CompiledTrajectory",
+    "CompiledTrajectoryGroup",
     "get_altitude_reference_from_show_specification",
     "get_coordinate_system_from_show_specification",
     "get_drone_count_from_show_specification",
@@ -0,0 +1,339 @@
+"""Compiled, vectorized representation of Skybrush trajectories that can be
+evaluated at many time instants or for many drones in a single call.
+
+The classes in this module require NumPy.
+"""
+
+from __future__ import annotations
+
+from math import comb
+from typing import Iterable, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from flockwave.server.errors import NotSupportedError
+
+from .trajectory import TrajectorySegment, TrajectorySpecification
+
+__all__ = ("CompiledTrajectory", "CompiledTrajectoryGroup")
+
+
+def _ensure_numpy() -> None:
+    if np is None:
+        raise NotSupportedError("compiled trajectories require NumPy")
+
+
+def _bezier_to_power_basis_matrix(degree: int):
+    """Returns the matrix that converts the control points of a Bezier curve
+    of the given degree to the coefficients of the same curve in the power
+    basis, in increasing order of powers.
+    """
+    result = np.zeros((degree + 1, degree + 1))
+    for k in range(degree + 1):
+        for i in range(k + 1):
+            result[k, i] = comb(degree, k) * comb(k, i) * (-1) ** (k - i)
+    return result
+
+
+def _compile_segments(
+    trajectory: TrajectorySpecification,
+) -> tuple[list[float], list[TrajectorySegment], int]:
+    """Extracts the segments of a trajectory, the absolute start times of the
+    segments (plus the end time of the last one) and the maximum degree of the
+    segments.
+    """
+    takeoff_time = trajectory.takeoff_time
+    segments = list(trajectory.iter_segments(absolute=False))
+    start_times = [segment.start_time + takeoff_time for segment in segments]
+    if segments:
+        start_times.append(segments[-1].end_time + takeoff_time)
+    degree = max((len(segment.points) - 1 for segment in segments), default=0)
+    return start_times, segments, degree
+
+
+def _fill_coefficients(out, segments: Iterable[TrajectorySegment]) -> None:
+    """Fills the given coefficient array of shape (S, D + 1, 3) with the power
+    basis coefficients of the given segments. Segments of lower degree than D
+    are padded with zero coefficients.
+    """
+    matrices = {}
+    for index, segment in enumerate(segments):
+        degree = len(segment.points) - 1
+        matrix = matrices.get(degree)
+        if matrix is None:
+            matrix = matrices[degree] = _bezier_to_power_basis_matrix(degree)
+        out[index, : degree + 1, :] = matrix @ np.array(segment.points, dtype=float)
+
+
+def _evaluate(coeffs, indices, ratios, durations=None):
+    """Evaluates the polynomials with the given coefficients at the given
+    ratios using Horner's scheme.
+
+    Parameters:
+        coeffs: coefficient array of shape (S, D + 1, 3)
+        indices: segment indices to evaluate, array of shape (Q,)
+        ratios: ratios within the segments, array of shape (Q,)
+        durations: when not `None`, the derivative of the polynomials is
+            evaluated instead and divided by these durations (array of shape
+            (Q,)) to obtain velocities
+
+    Returns:
+        array of shape (Q, 3)
+    """
+    selected = coeffs[indices]
+    degree = selected.shape[1] - 1
+    u = ratios[:, None]
+
+    if durations is None:
+        result = selected[:, degree, :].copy()
+        for k in range(degree - 1, -1, -1):
+            result *= u
+            result += selected[:, k, :]
+    else:
+        if degree < 1:
+            return np.zeros((len(indices), 3))
+        result = degree * selected[:, degree, :]
+        for k in range(degree - 1, 0, -1):
+            result *= u
+            result += k * selected[:, k, :]
+        result /= durations[:, None]
+
+    return result
+
+
+class CompiledTrajectory:
+    """Trajectory of a single drone, compiled into arrays of polynomial
+    coefficients for fast, vectorized evaluation.
+
+    The positions returned from this object are identical (up to floating-point
+    rounding errors) to the ones returned from a TrajectoryPlayer_ for the same
+    trajectory, but many time instants can be evaluated in a single call and
+    no per-segment state is kept between calls.
+    """
+
+    _coeffs: "np.ndarray"
+    """Array of shape (S, D + 1, 3) that contains the coefficients of the
+    segments in the power basis, in increasing order of powers, where S is the
+    number of segments and D is the maximum degree of the segments.
+    """
+
+    _start_times: "np.ndarray"
+    """Array of shape (S + 1,) that contains the absolute start times of the
+    segments, followed by the end time of the last segment.
+    """
+
+    def __init__(self, trajectory: TrajectorySpecification):
+        """Constructor.
+
+        Parameters:
+            trajectory: the trajectory specification to compile
+        """
+        _ensure_numpy()
+
+        start_times, segments, degree = _compile_segments(trajectory)
+
+        self._takeoff_time = trajectory.takeoff_time
+        self._start_times = np.array(start_times, dtype=float)
+        self._coeffs = np.zeros((len(segments), degree + 1, 3))
+        _fill_coefficients(self._coeffs, segments)
+
+    @property
+    def end_time(self) -> float:
+        """The absolute time when the trajectory ends."""
+        if self.num_segments:
+            return float(self._start_times[-1])
+        else:
+            return self._takeoff_time
+
+    @property
+    def num_segments(self) -> int:
+        """The number of segments in the trajectory."""
+        return self._coeffs.shape[0]
+
+    @property
+    def takeoff_time(self) -> float:
+        """The takeoff time of the trajectory, in seconds."""
+        return self._takeoff_time
+
+    def is_before_takeoff(self, time: float) -> bool:
+        """Returns whether the given timestamp is before the takeoff time of
+        the mission.
+        """
+        return time < self._takeoff_time
+
+    def position_at(self, time: Union[float, "np.ndarray"]) -> "np.ndarray":
+        """Returns the positions where the drone should be at the given
+        timestamps when flying the trajectory.
+
+        Parameters:
+            time: a single timestamp or an array of timestamps
+
+        Returns:
+            an array of shape (3,) for a single timestamp or an array of shape
+            (N, 3) for N timestamps
+        """
+        return self._evaluate(time, velocity=False)
+
+    def velocity_at(self, time: Union[float, "np.ndarray"]) -> "np.ndarray":
+        """Returns the velocities of the drone at the given timestamps when
+        flying the trajectory. The velocity is zero before the start and after
+        the end of the trajectory.
+
+        Parameters:
+            time: a single timestamp or an array of timestamps
+
+        Returns:
+            an array of shape (3,) for a single timestamp or an array of shape
+            (N, 3) for N timestamps
+        """
+        return self._evaluate(time, velocity=True)
+
+    def _evaluate(self, time, velocity: bool):
+        times = np.asarray(time, dtype=float)
+        scalar = times.ndim == 0
+        times = times.reshape(-1)
+
+        if self.num_segments == 0:
+            result = np.zeros((len(times), 3))
+        else:
+            start_times = self._start_times
+            indices = np.searchsorted(start_times, times, side="right") - 1
+            inside = (times >= start_times[0]) & (times <= start_times[-1])
+            np.clip(indices, 0, self.num_segments - 1, out=indices)
+
+            durations = start_times[indices + 1] - start_times[indices]
+            ratios = np.clip((times - start_times[indices]) / durations, 0.0, 1.0)
+
+            if velocity:
+                result = _evaluate(self._coeffs, indices, ratios, durations)
+                result[~inside] = 0.0
+            else:
+                result = _evaluate(self._coeffs, indices, ratios)
+
+        return result[0] if scalar else result
+
+
+class CompiledTrajectoryGroup:
+    """Trajectories of a group of drones, compiled into a single table of
+    polynomial coefficients so the positions or velocities of all the drones
+    can be evaluated at a given time instant in a single call.
+    """
+
+    _coeffs: "np.ndarray"
+    """Array of shape (S, D + 1, 3) that contains the coefficients of the
+    segments of all the trajectories in the power basis, where S is the total
+    number of segments and D is the maximum degree of the segments.
+    """
+
+    _first_segment: "np.ndarray"
+    """Array of shape (M,) that contains the index of the first segment of each
+    trajectory in the coefficient table.
+    """
+
+    _num_segments: "np.ndarray"
+    """Array of shape (M,) that contains the number of segments of each
+    trajectory.
+    """
+
+    _start_times: "np.ndarray"
+    """Array of shape (S,) that contains the absolute start time of each
+    segment in the coefficient table.
+    """
+
+    _end_times: "np.ndarray"
+    """Array of shape (S,) that contains the absolute end time of each segment
+    in the coefficient table.
+    """
+
+    def __init__(self, trajectories: Iterable[TrajectorySpecification]):
+        """Constructor.
+
+        Parameters:
+            trajectories: the trajectory specifications of the drones
+        """
+        _ensure_numpy()
+
+        compiled = [_compile_segments(trajectory) for trajectory in trajectories]
+        degree = max((item[2] for item in compiled), default=0)
+        num_segments = [len(item[1]) for item in compiled]
+
+        self._num_segments = np.array(num_segments, dtype=np.intp)
+        self._first_segment = np.zeros(len(compiled), dtype=np.intp)
+        if len(compiled) > 1:
+            np.cumsum(self._num_segments[:-1], out=self._first_segment[1:])
+
+        total = int(self._num_segments.sum())
+        self._coeffs = np.zeros((total, degree + 1, 3))
+        self._start_times = np.zeros(total)
+        self._end_times = np.zeros(total)
+
+        for (start_times, segments, _), offset, count in zip(
+            compiled, self._first_segment.tolist(), num_segments
+        ):
+            if count:
+                _fill_coefficients(self._coeffs[offset : offset + count], segments)
+                self._start_times[offset : offset + count] = start_times[:-1]
+                self._end_times[offset : offset + count] = start_times[1:]
+
+    def __len__(self) -> int:
+        return len(self._num_segments)
+
+    def positions_at(self, time: float) -> "np.ndarray":
+        """Returns the positions where the drones should be at the given time
+        instant.
+
+        Returns:
+            an array of shape (M, 3) where M is the number of drones
+        """
+        return self._evaluate(time, velocity=False)
+
+    def velocities_at(self, time: float) -> "np.ndarray":
+        """Returns the velocities of the drones at the given time instant.
+
+        Returns:
+            an array of shape (M, 3) where M is the number of drones
+        """
+        return self._evaluate(time, velocity=True)
+
+    def _evaluate(self, time: float, velocity: bool):
+        result = np.zeros((len(self), 3))
+
+        has_segments = self._num_segments > 0
+        if not has_segments.any():
+            return result
+
+        first = self._first_segment[has_segments]
+        last = first + self._num_segments[has_segments] - 1
+
+        # Find the index of the last segment that starts at or before the given
+        # time for each drone; this is a vectorized binary search over the
+        # per-drone ranges of the segment table
+        low, high = first, last + 1
+        while True:
+            active = low < high
+            if not active.any():
+                break
+            mid = (low + high) // 2
+            go_right = active & (self._start_times[np.minimum(mid, last)] <= time)
+            low = np.where(go_right, mid + 1, low)
+            high = np.where(active & ~go_right, mid, high)
+
+        indices = low - 1
+        inside = (indices >= first) & (time <= self._end_times[last])
+        np.clip(indices, first, last, out=indices)
+
+        start_times = self._start_times[indices]
+        durations = self._end_times[indices] - start_times
+        ratios = np.clip((time - start_times) / durations, 0.0, 1.0)
+
+        if velocity:
+            values = _evaluate(self._coeffs, indices, ratios, durations)
+            values[~inside] = 0.0
+        else:
+            values = _evaluate(self._coeffs, indices, ratios)
+
+        result[has_segments] = values
+        return result
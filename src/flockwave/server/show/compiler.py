@@ -0,0 +1,179 @@
+"""Compilation of per-drone show specifications into Skybrush binary show
+files, in a pool of worker processes and with caching.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from hashlib import sha256
+from json import dumps
+from multiprocessing import get_all_start_methods, get_context
+from multiprocessing.context import BaseContext
+from trio import to_thread
+from typing import Optional
+
+from flockwave.concurrency import Future
+
+from .formats import create_skybrush_binary_show_file
+from .lights import get_light_program_from_show_specification
+from .rth_plan import get_rth_plan_from_show_specification
+from .specification import (
+    ShowSpecification,
+    get_trajectory_from_show_specification,
+    get_yaw_setpoints_from_show_specification,
+)
+
+__all__ = ("ShowCompiler", "compile_show_specification")
+
+
+def compile_show_specification(show: ShowSpecification) -> bytes:
+    """Compiles the show specification of a single drone into the contents of
+    a Skybrush binary show file, synchronously.
+
+    Parameters:
+        show: the show specification of a single drone
+
+    Returns:
+        the contents of the Skybrush binary show file
+    """
+    trajectory = get_trajectory_from_show_specification(show)
+    light_program = get_light_program_from_show_specification(show)
+    rth_plan = get_rth_plan_from_show_specification(show)
+    yaw_setpoints = get_yaw_setpoints_from_show_specification(show)
+    return create_skybrush_binary_show_file(
+        trajectory, light_program, rth_plan=rth_plan, yaw_setpoints=yaw_setpoints
+    )
+
+
+def get_show_specification_hash(show: ShowSpecification) -> str:
+    """Returns a content hash of the given show specification that can be used
+    as a cache key.
+    """
+    encoded = dumps(show, sort_keys=True, separators=(",", ":"), default=str)
+    return sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ShowCompiler:
+    """Object that compiles per-drone show specifications into Skybrush binary
+    show files in a pool of worker processes so the event loop is not blocked
+    by the encoding, and that caches the compiled show files by the content
+    hash of the show specification so retries and repeated uploads of the same
+    show do not need to encode the show again.
+
+    Concurrent requests to compile the same show specification are merged.
+    """
+
+    _cache: OrderedDict[str, bytes]
+    """Cache of compiled show files, keyed by the content hashes of the show
+    specifications, in least-recently-used order.
+    """
+
+    _executor: Optional[Executor] = None
+    """Executor that runs the compilation jobs; created lazily."""
+
+    _pending: dict[str, Future[bytes]]
+    """Futures of the compilation jobs that are currently running, keyed by
+    the content hashes of the show specifications.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, cache_size: int = 1024):
+        """Constructor.
+
+        Parameters:
+            max_workers: maximum number of worker processes to use; `None`
+                means to use the default of ProcessPoolExecutor_; zero means
+                to compile shows in a worker thread instead of a process
+            cache_size: maximum number of compiled show files to keep in the
+                cache
+        """
+        self._cache = OrderedDict()
+        self._cache_size = max(int(cache_size), 0)
+        self._max_workers = max_workers
+        self._pending = {}
+
+    async def compile(self, show: ShowSpecification) -> bytes:
+        """Compiles the given per-drone show specification into a Skybrush
+        binary show file, returning a cached result if the same show
+        specification has been compiled recently.
+
+        Parameters:
+            show: the show specification of a single drone
+
+        Returns:
+            the contents of the Skybrush binary show file
+        """
+        # Hashing needs to serialize the entire show specification so we do
+        # it in a worker thread
+        key = await to_thread.run_sync(get_show_specification_hash, show)
+
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+            return result
+
+        future = self._pending.get(key)
+        if future is not None:
+            return await future.wait()
+
+        self._pending[key] = future = Future()
+        try:
+            await future.call(self._compile_in_executor, show)
+        finally:
+            del self._pending[key]
+
+        result = future.result()
+        if self._cache_size > 0:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+        return result
+
+    def clear(self) -> None:
+        """Clears the cache of compiled show files."""
+        self._cache.clear()
+
+    def close(self) -> None:
+        """Shuts down the worker processes of the compiler. The compiler may
+        still be used after this call; new workers are started on demand.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _compile_in_executor(self, show: ShowSpecification) -> bytes:
+        """Compiles the given show specification in the executor of the
+        compiler, falling back to a worker thread if worker processes cannot be
+        used on this platform.
+        """
+        try:
+            job = self._get_executor().submit(compile_show_specification, show)
+        except (BrokenProcessPool, NotImplementedError, OSError):
+            self.close()
+            self._max_workers = 0
+            job = self._get_executor().submit(compile_show_specification, show)
+
+        return await to_thread.run_sync(job.result, abandon_on_cancel=True)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._max_workers == 0:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._max_workers, mp_context=_get_mp_context()
+                )
+        return self._executor
+
+
+def _get_mp_context() -> BaseContext:
+    """Returns the multiprocessing context to use for the worker processes of
+    the show compiler.
+
+    Worker processes must not be forked directly from the server process
+    because the forked child would inherit the state of the event loop, the
+    open sockets and the locks held by other threads. We use a fork server
+    where it is available and spawn fresh interpreters elsewhere.
+    """
+    method = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+    return get_context(method)
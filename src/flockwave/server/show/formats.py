@@ -1,5 +1,6 @@
 """Classes representing various Skybrush show file formats."""
 
+from collections import defaultdict
 from enum import IntEnum, IntFlag
 from functools import partial
 from io import BytesIO, SEEK_END
@@ -19,6 +20,11 @@ from typing import (
     Union,
 )
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from flockwave.concurrency import aclosing
 
 from .rth_plan import RTHAction, RTHPlan, RTHPlanEntry
@@ -26,7 +32,7 @@ from .trajectory import TrajectorySegment, TrajectorySpecification
 from .utils import crc32_mavftp as crc32, encode_variable_length_integer, Point
 from .yaw import YawSetpointList
 
-__all__ = ("SkybrushBinaryShowFile",)
+__all__ = ("SkybrushBinaryShowFile", "create_skybrush_binary_show_file")
 
 
 _SKYBRUSH_BINARY_FILE_MARKER: bytes = b"skyb"
@@ -227,13 +233,7 @@ class SkybrushBinaryShowFile:
         if seekable:
             await self._fp.seek(0, SEEK_END)
 
-        if len(body) >= 65536:
-            raise ValueError(
-                f"body too large; maximum allowed length is 65535 bytes, got {len(body)}"
-            )
-
-        header = self._header_struct.pack(type, len(body))
-        await self._fp.write(header)
+        await self._fp.write(_encode_block_header(type, body))
         await self._fp.write(body)
 
     async def add_comment(
@@ -266,16 +266,8 @@ class SkybrushBinaryShowFile:
         Parameters:
             plan: the RTH plan to add
         """
-        scaling_factor = rth_plan.propose_scaling_factor()
-        if scaling_factor >= 128:
-            raise RuntimeError(
-                "RTH plan covers too large an area for a Skybrush binary show file"
-            )
-
-        encoder = RTHPlanEncoder(scaling_factor)
-
         return await self.add_block(
-            SkybrushBinaryFormatBlockType.RTH_PLAN, encoder.encode(rth_plan)
+            SkybrushBinaryFormatBlockType.RTH_PLAN, _encode_rth_plan_block(rth_plan)
         )
 
     async def add_trajectory(self, trajectory: TrajectorySpecification) -> None:
@@ -285,23 +277,9 @@ class SkybrushBinaryShowFile:
         Parameters:
             trajectory: the trajectory to add
         """
-        scaling_factor = trajectory.propose_scaling_factor()
-        if scaling_factor >= 128:
-            raise RuntimeError(
-                "Trajectory covers too large an area for a Skybrush binary show file"
-            )
-
-        chunks = [bytes([scaling_factor])]  # MSB is reserved as zero
-        encoder = SegmentEncoder(scaling_factor)
-
-        # .skyb files need absolute timestamps so we need to add a constant
-        # segment in front if the takeoff time is nonzero; that's why we have
-        # absolute=True here
-        segments = trajectory.iter_segments(max_length=65, absolute=True)
-        chunks.extend(encoder.iter_encode_multiple_segments(segments))
-
         return await self.add_block(
-            SkybrushBinaryFormatBlockType.TRAJECTORY, b"".join(chunks)
+            SkybrushBinaryFormatBlockType.TRAJECTORY,
+            _encode_trajectory_block(trajectory),
         )
 
     async def add_yaw_setpoints(self, setpoints: YawSetpointList) -> None:
@@ -311,11 +289,9 @@ class SkybrushBinaryShowFile:
         Parameters:
             setpoints: the yaw setpoint list to add
         """
-
-        encoder = YawSetpointEncoder()
-
         return await self.add_block(
-            SkybrushBinaryFormatBlockType.YAW_CONTROL, encoder.encode(setpoints)
+            SkybrushBinaryFormatBlockType.YAW_CONTROL,
+            YawSetpointEncoder().encode(setpoints),
         )
 
     async def blocks(
@@ -525,6 +501,105 @@ class SkybrushBinaryShowFile:
             await self._fp.seek(position)
 
 
+def create_skybrush_binary_show_file(
+    trajectory: TrajectorySpecification,
+    light_program: bytes,
+    *,
+    rth_plan: Optional[RTHPlan] = None,
+    yaw_setpoints: Optional[YawSetpointList] = None,
+) -> bytes:
+    """Creates the contents of a version 2 Skybrush binary show file with a
+    CRC32 checksum, synchronously.
+
+    The result is identical to the contents of an in-memory
+    SkybrushBinaryShowFile_ to which the same blocks were added in the same
+    order and then finalized. Unlike SkybrushBinaryShowFile_, this function
+    does not need an async context so it can be called from worker threads or
+    processes.
+
+    Parameters:
+        trajectory: the trajectory to add to the show file
+        light_program: the light program to add, encoded in Skybrush format
+        rth_plan: optional RTH plan to add to the show file
+        yaw_setpoints: optional yaw setpoints to add to the show file
+    """
+    blocks: list[tuple[SkybrushBinaryFormatBlockType, bytes]] = [
+        (
+            SkybrushBinaryFormatBlockType.TRAJECTORY,
+            _encode_trajectory_block(trajectory),
+        ),
+        (SkybrushBinaryFormatBlockType.LIGHT_PROGRAM, light_program),
+    ]
+    if rth_plan:
+        blocks.append(
+            (SkybrushBinaryFormatBlockType.RTH_PLAN, _encode_rth_plan_block(rth_plan))
+        )
+    if yaw_setpoints:
+        blocks.append(
+            (
+                SkybrushBinaryFormatBlockType.YAW_CONTROL,
+                YawSetpointEncoder().encode(yaw_setpoints),
+            )
+        )
+
+    header = _SKYBRUSH_BINARY_FILE_HEADER[2]
+    chunks = [header]
+    for type, body in blocks:
+        chunks.append(_encode_block_header(type, body))
+        chunks.append(body)
+
+    # The CRC32 checksum occupies the last four bytes of the header and it is
+    # calculated with these bytes set to zero
+    result = bytearray(b"".join(chunks))
+    crc_start = len(header) - 4
+    result[crc_start : crc_start + 4] = crc32(result, 0).to_bytes(
+        4, "little", signed=False
+    )
+    return bytes(result)
+
+
+def _encode_block_header(type: SkybrushBinaryFormatBlockType, body: bytes) -> bytes:
+    """Encodes the header of a block with the given type and body in a Skybrush
+    binary show file.
+    """
+    if len(body) >= 65536:
+        raise ValueError(
+            f"body too large; maximum allowed length is 65535 bytes, got {len(body)}"
+        )
+    return SkybrushBinaryShowFile._header_struct.pack(type, len(body))
+
+
+def _encode_rth_plan_block(rth_plan: RTHPlan) -> bytes:
+    """Encodes the body of an RTH plan block in a Skybrush binary show file."""
+    scaling_factor = rth_plan.propose_scaling_factor()
+    if scaling_factor >= 128:
+        raise RuntimeError(
+            "RTH plan covers too large an area for a Skybrush binary show file"
+        )
+
+    return RTHPlanEncoder(scaling_factor).encode(rth_plan)
+
+
+def _encode_trajectory_block(trajectory: TrajectorySpecification) -> bytes:
+    """Encodes the body of a trajectory block in a Skybrush binary show file."""
+    scaling_factor = trajectory.propose_scaling_factor()
+    if scaling_factor >= 128:
+        raise RuntimeError(
+            "Trajectory covers too large an area for a Skybrush binary show file"
+        )
+
+    chunks = [bytes([scaling_factor])]  # MSB is reserved as zero
+    encoder = SegmentEncoder(scaling_factor)
+
+    # .skyb files need absolute timestamps so we need to add a constant
+    # segment in front if the takeoff time is nonzero; that's why we have
+    # absolute=True here
+    segments = trajectory.iter_segments(max_length=65, absolute=True)
+    chunks.append(encoder.encode_multiple_segments(segments))
+
+    return b"".join(chunks)
+
+
 class SegmentEncoder:
     """Encoder class for trajectory segments in the Skybrush binary show file
     format.
@@ -533,6 +608,16 @@ class SegmentEncoder:
     _point_struct: ClassVar[Struct] = Struct("<hhhh")
     _header_struct: ClassVar[Struct] = Struct("<BH")
 
+    _batch_threshold: ClassVar[int] = 16
+    """Minimum number of segments for which encode_multiple_segments() uses
+    the vectorized NumPy encoder instead of encoding the segments one by one.
+    """
+
+    _formats_by_degree: ClassVar[dict[int, int]] = {1: 1, 3: 2, 7: 3}
+    """Mapping from the degrees of the supported non-constant curves to the
+    format codes used in the segment headers.
+    """
+
     _scale: float
 
     def __init__(self, scale: float = 1):
@@ -611,12 +696,23 @@ class SegmentEncoder:
         end point of the previous segment, therefore we will only encode the
         start point of the first segment.
 
+        Long sequences of segments are encoded in a single batch with NumPy if
+        it is available. The result is identical to the one produced by
+        iter_encode_multiple_segments().
+
         Args:
             segments: the segments to encode
 
         Returns:
             the encoded representation of the segments
         """
+        if np is not None:
+            segments = list(segments)
+            if len(segments) >= self._batch_threshold:
+                result = self._encode_multiple_segments_batch(segments)
+                if result is not None:
+                    return result
+
         return b"".join(self.iter_encode_multiple_segments(segments))
 
     def iter_encode_multiple_segments(
@@ -677,6 +773,112 @@ class SegmentEncoder:
         # TODO(ntamas): convert 4-5-6D curves to 7D ones
         raise NotImplementedError(f"{len(xs)}D curves not implemented yet")
 
+    def _encode_multiple_segments_batch(
+        self, segments: Sequence[TrajectorySegment]
+    ) -> Optional[bytes]:
+        """Vectorized implementation of encode_multiple_segments() with NumPy.
+
+        The segments are grouped by the number of their control points; each
+        group is scaled and classified in a single step and the headers and
+        the coordinates of all the segments are then scattered into a single
+        output buffer.
+
+        Returns:
+            the encoded representation of the segments, or `None` if at least
+            one of the segments cannot be encoded. In this case the caller
+            should fall back to the segment-by-segment encoder so the user
+            receives the same exception as with the non-vectorized version.
+        """
+        assert np is not None
+
+        if not segments:
+            return b""
+
+        num_segments = len(segments)
+        durations = np.floor(
+            np.array([segment.duration for segment in segments], dtype=float) * 1000
+        )
+        if not ((durations >= 0) & (durations <= 65535)).all():
+            return None
+
+        groups: defaultdict[int, list[int]] = defaultdict(list)
+        for index, segment in enumerate(segments):
+            groups[len(segment.points)].append(index)
+
+        # Format codes, number of encoded coordinates and the coordinates
+        # themselves for each segment and each axis
+        formats = np.zeros((num_segments, 3), dtype=np.intp)
+        counts = np.zeros((num_segments, 3), dtype=np.intp)
+        values = np.zeros((num_segments, 3, 7), dtype=np.int64)
+
+        for num_points, indices in groups.items():
+            if num_points < 1:
+                return None
+
+            points = np.array([segments[i].points for i in indices], dtype=float)
+
+            # Rounding with trunc() is equivalent to int() in _scale_point()
+            scaled = points[:, :, :3] * self._scale
+            if not np.isfinite(scaled).all():
+                return None
+
+            # Shape of coords is (segments, axes, points)
+            coords = np.trunc(scaled).transpose(0, 2, 1)
+            first, coords = coords[:, :, :1], coords[:, :, 1:]
+            varying = (coords != first).any(axis=2)
+            if not varying.any():
+                continue
+
+            degree = num_points - 1
+            if degree == 2:
+                # Promote quadratic Bezier curves to cubic ones. np.round()
+                # rounds half to even, just like round() in Python
+                coords = np.round(
+                    np.stack(
+                        (
+                            (first[:, :, 0] + 2 * coords[:, :, 0]) / 3,
+                            (2 * coords[:, :, 0] + coords[:, :, 1]) / 3,
+                            coords[:, :, 1],
+                        ),
+                        axis=2,
+                    )
+                )
+                degree = 3
+
+            code = self._formats_by_degree.get(degree)
+            if code is None:
+                return None
+
+            in_range = (coords >= -32768) & (coords <= 32767)
+            if not (in_range | ~varying[:, :, None]).all():
+                return None
+
+            rows = np.array(indices, dtype=np.intp)
+            formats[rows] = np.where(varying, code, 0)
+            counts[rows] = np.where(varying, degree, 0)
+            values[rows, :, :degree] = np.where(varying[:, :, None], coords, 0)
+
+        headers = formats[:, 0] | (formats[:, 1] << 2) | (formats[:, 2] << 4)
+        lengths = 3 + 2 * counts.sum(axis=1)
+        starts = np.cumsum(lengths) - lengths
+        total_length = int(lengths.sum())
+
+        # Scatter the headers first, then fill the remaining bytes with the
+        # little-endian representation of the coordinates, in the same order
+        # as they appear in the segments
+        result = np.zeros(total_length, dtype=np.uint8)
+        is_header = np.zeros(total_length, dtype=bool)
+        durations = durations.astype(np.intp)
+        result[starts] = headers
+        result[starts + 1] = durations & 0xFF
+        result[starts + 2] = durations >> 8
+        is_header[starts] = is_header[starts + 1] = is_header[starts + 2] = True
+
+        used = np.arange(values.shape[2]) < counts[:, :, None]
+        result[~is_header] = values[used].astype("<i2").view(np.uint8)
+
+        return self.encode_point(segments[0].start) + result.tobytes()
+
     def _scale_point(self, point: Point) -> tuple[int, int, int]:
         # We always need to round with int() here, we cannot use round(). The
         # reason is that the scaling factor was determined in a way that it is
@@ -0,0 +1,161 @@
+"""Wire formats that the server may use to exchange Flockwave messages with
+clients over stream-based communication channels.
+"""
+
+from __future__ import annotations
+
+from enum import Enum
+from msgpack import Packer, Unpacker
+from trio.abc import ReceiveStream
+from typing import Any, Awaitable, Callable, Optional
+
+from flockwave.encoders.json import create_json_encoder
+from flockwave.parsers.json import create_json_parser
+
+__all__ = (
+    "create_msgpack_encoder",
+    "create_msgpack_parser",
+    "negotiate_wire_format",
+    "WireFormat",
+)
+
+
+_JSON_WHITESPACE = b" \t\r\n"
+"""Bytes that may precede the first JSON message in a stream."""
+
+
+class WireFormat(Enum):
+    """Enum representing the wire formats that the server supports on
+    stream-based communication channels.
+
+    The value of each item is also used as the name of the encoding in the
+    message encoding cache of the message hub so channels using the same wire
+    format can share the encoded representations of broadcast messages.
+    """
+
+    JSON = "json"
+    """Newline-delimited JSON; the default wire format."""
+
+    MSGPACK = "msgpack"
+    """Consecutive MessagePack-encoded objects without any delimiters."""
+
+    @classmethod
+    def detect(cls, data: bytes) -> Optional[WireFormat]:
+        """Detects the wire format of a stream from the first bytes sent by
+        the client.
+
+        JSON messages start with an opening brace, optionally preceded by
+        whitespace. MessagePack-encoded messages start with a map marker byte.
+
+        Returns:
+            the detected wire format, or `None` if the given bytes consist of
+            whitespace only and more bytes are needed
+        """
+        data = data.lstrip(_JSON_WHITESPACE)
+        if not data:
+            return None
+        elif 0x80 <= data[0] <= 0x8F or data[0] in (0xDE, 0xDF):
+            return cls.MSGPACK
+        else:
+            return cls.JSON
+
+    def create_encoder(self) -> Callable[[Any], bytes]:
+        """Creates an encoder function that encodes Flockwave messages in this
+        wire format.
+        """
+        if self is WireFormat.MSGPACK:
+            return create_msgpack_encoder()
+        else:
+            return create_json_encoder()
+
+    def create_parser(self) -> Callable[[bytes], list[Any]]:
+        """Creates a parser function that can be fed with chunks of a stream
+        in this wire format, and that returns the messages completed by each
+        chunk.
+        """
+        if self is WireFormat.MSGPACK:
+            return create_msgpack_parser()
+        else:
+            return create_json_parser()
+
+
+def _to_msgpack_compatible(obj: Any) -> Any:
+    """Converts objects that MessagePack cannot encode natively to plain
+    objects, the same way as the JSON encoder of the server would.
+    """
+    json = getattr(obj, "json", None)
+    if json is not None:
+        return json
+
+    to_json = getattr(obj, "to_json", None)
+    if callable(to_json):
+        return to_json()
+
+    if isinstance(obj, Enum):
+        return obj.value
+
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    raise TypeError(f"Object of type {type(obj).__name__} cannot be encoded")
+
+
+def create_msgpack_encoder() -> Callable[[Any], bytes]:
+    """Creates an encoder function that encodes Flockwave messages and other
+    objects with MessagePack.
+    """
+    return Packer(default=_to_msgpack_compatible, use_bin_type=True).pack
+
+
+def create_msgpack_parser() -> Callable[[bytes], list[Any]]:
+    """Creates a parser function that can be fed with chunks of a stream of
+    MessagePack-encoded objects, and that returns the objects completed by
+    each chunk.
+    """
+    unpacker = Unpacker(raw=False)
+
+    def parse(data: bytes) -> list[Any]:
+        unpacker.feed(data)
+        return list(unpacker)
+
+    return parse
+
+
+async def negotiate_wire_format(
+    stream: ReceiveStream,
+) -> tuple[WireFormat, Callable[[], Awaitable[bytes]]]:
+    """Waits for the first bytes from the client on the given stream and
+    detects the wire format that the client uses.
+
+    Parameters:
+        stream: the stream to read from
+
+    Returns:
+        the detected wire format, and a reader function that returns the bytes
+        consumed from the stream during the detection first, followed by the
+        rest of the stream. The wire format is JSON if the stream was closed
+        before anything else was received.
+    """
+    received: list[bytes] = []
+    while True:
+        data = await stream.receive_some()
+        if not data:
+            wire_format = WireFormat.JSON
+            break
+
+        received.append(data)
+        wire_format = WireFormat.detect(data)
+        if wire_format is WireFormat.MSGPACK:
+            # Whitespace is not valid between MessagePack objects
+            received = [data.lstrip(_JSON_WHITESPACE)]
+            break
+        elif wire_format is not None:
+            break
+
+    async def reader() -> bytes:
+        if received:
+            return received.pop(0)
+        else:
+            return await stream.receive_some()
+
+    return wire_format, reader
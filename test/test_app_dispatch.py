@@ -0,0 +1,80 @@
+from pytest import raises
+from trio import move_on_after, open_nursery, sleep, sleep_forever
+
+from flockwave.server.app import _SharedDriverCall, _wait_for_result_of_uav
+
+
+async def collect(gen):
+    return [item async for item in gen]
+
+
+async def test_per_uav_results(nursery):
+    async def driver_call():
+        await sleep(0.1)
+        return {"a": 1, "b": RuntimeError("failed"), "c": sleep(0.1)}
+
+    call = _SharedDriverCall(driver_call(), num_consumers=4)
+    nursery.start_soon(call.run)
+
+    assert await collect(_wait_for_result_of_uav(call, "a")) == [1]
+    assert await collect(_wait_for_result_of_uav(call, "c")) == [None]
+    with raises(RuntimeError, match="failed"):
+        await collect(_wait_for_result_of_uav(call, "b"))
+    with raises(RuntimeError, match="No result"):
+        await collect(_wait_for_result_of_uav(call, "d"))
+
+
+async def test_common_result_and_exception(nursery):
+    async def driver_call():
+        return 42
+
+    call = _SharedDriverCall(driver_call(), num_consumers=2)
+    nursery.start_soon(call.run)
+    assert await collect(_wait_for_result_of_uav(call, "a")) == [42]
+    assert await collect(_wait_for_result_of_uav(call, "b")) == [42]
+
+    async def failing_driver_call():
+        raise ValueError("unexpected")
+
+    call = _SharedDriverCall(failing_driver_call(), num_consumers=1)
+    nursery.start_soon(call.run)
+    with raises(ValueError, match="unexpected"):
+        await collect(_wait_for_result_of_uav(call, "a"))
+
+
+async def test_cancelled_call_resolves_receipts(autojump_clock):
+    call = _SharedDriverCall(sleep_forever(), num_consumers=2)
+
+    async with open_nursery() as nursery:
+        nursery.start_soon(call.run)
+        await sleep(1)
+        nursery.cancel_scope.cancel()
+
+    with raises(RuntimeError, match="cancelled"):
+        await collect(_wait_for_result_of_uav(call, "a"))
+
+
+async def test_call_is_cancelled_when_all_receipts_are_gone(autojump_clock):
+    finished = []
+
+    async def driver_call():
+        try:
+            await sleep_forever()
+        finally:
+            finished.append(True)
+
+    call = _SharedDriverCall(driver_call(), num_consumers=2)
+
+    async with open_nursery() as nursery:
+        nursery.start_soon(call.run)
+
+        with move_on_after(1):
+            await collect(_wait_for_result_of_uav(call, "a"))
+        await sleep(1)
+        assert not finished
+
+        with move_on_after(1):
+            await collect(_wait_for_result_of_uav(call, "b"))
+
+    assert finished
+    assert call.future.done()
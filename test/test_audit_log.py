@@ -0,0 +1,122 @@
+from pytest import approx, fixture
+from trio import current_time, sleep
+from typing import Sequence
+
+from flockwave.server.ext.audit_log import AuditLogExtension, Entry, NullStorage
+
+
+class RecordingStorage(NullStorage):
+    """Storage backend that records the batches written to it."""
+
+    def __init__(self, delay: float = 0):
+        self.batches = []
+        self.delay = delay
+
+    async def put(self, entries: Sequence[Entry]) -> None:
+        await sleep(self.delay)
+        self.batches.append((current_time(), [entry.type for entry in entries]))
+
+
+@fixture
+def extension(tmp_path) -> AuditLogExtension:
+    result = AuditLogExtension()
+    result.get_data_dir = lambda: tmp_path
+    result.configure(
+        {
+            "high_throughput": True,
+            "batch_size": 4,
+            "flush_interval": 1,
+            "max_pending": 8,
+            "max_buffered": 16,
+        }
+    )
+    result._storage = RecordingStorage()
+    return result
+
+
+def test_configuration(extension: AuditLogExtension):
+    assert extension.high_throughput
+    assert extension.batch_size == 4
+    assert extension.flush_interval == 1
+    assert extension.max_pending == 8
+    assert extension.max_buffered == 16
+
+    extension.configure({})
+    assert not extension.high_throughput
+    assert extension.batch_size == extension.max_buffered
+    assert extension._entries.maxlen == extension.max_buffered
+
+
+async def test_batching(extension: AuditLogExtension, nursery, autojump_clock):
+    storage = extension._storage
+    nursery.start_soon(extension._run_batched_writer)
+
+    # A full batch is written immediately
+    for index in range(4):
+        extension.append("test", str(index))
+    await sleep(0.1)
+    assert storage.batches == [(0, ["0", "1", "2", "3"])]
+
+    # Partial batches are written after the flush interval, counted from the
+    # arrival of the first entry
+    extension.append("test", "4")
+    await sleep(0.6)
+    extension.append("test", "5")
+    await sleep(0.3)
+    assert len(storage.batches) == 1
+    await sleep(0.2)
+    assert storage.batches[1:] == [(approx(1.1), ["4", "5"])]
+
+    # Entries arriving in a burst are written in full batches
+    for index in range(6, 16):
+        extension.append("test", str(index))
+    await sleep(0.1)
+    assert [types for _, types in storage.batches[2:]] == [
+        [str(index) for index in range(start, min(start + 4, 16))]
+        for start in (6, 10, 14)
+    ]
+
+
+async def test_max_pending(extension: AuditLogExtension, nursery, autojump_clock):
+    storage = extension._storage = RecordingStorage(delay=1)
+    appended = []
+
+    async def producer():
+        for index in range(12):
+            await extension.append_async("test", str(index))
+            appended.append((current_time(), index))
+
+    nursery.start_soon(producer)
+    await sleep(0.1)
+
+    # The producer is suspended when there are too many pending entries
+    assert len(appended) == 8
+    assert len(extension._entries) == 8
+
+    nursery.start_soon(extension._run_batched_writer)
+    await sleep(10)
+
+    assert [index for _, index in appended] == list(range(12))
+    assert appended[8][0] == approx(1.1)
+    assert [types for _, types in storage.batches] == [
+        [str(index) for index in range(start, start + 4)] for start in (0, 4, 8)
+    ]
+    assert extension.num_dropped == 0
+
+
+async def test_overflow(extension: AuditLogExtension):
+    storage = extension._storage
+
+    # Synchronous producers are not suspended; the oldest entries are dropped
+    # when the hard limit is reached
+    for index in range(20):
+        extension.append("test", str(index))
+
+    assert len(extension._entries) == 16
+    assert extension.num_dropped == 4
+
+    await extension.flush()
+    assert [types for _, types in storage.batches] == [
+        [str(index) for index in range(start, start + 4)] for start in (4, 8, 12, 16)
+    ]
+    assert extension._num_dropped_reported == 4
@@ -0,0 +1,101 @@
+from trio import open_nursery, sleep
+
+from flockwave.server.comm import (
+    CommunicationManager,
+    DEFAULT_OUTBOUND_TRAFFIC_CLASSES,
+    OutboundQueue,
+    OutboundTrafficClass,
+)
+
+
+class FakeChannel:
+    broadcast_address = "*"
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, item):
+        await sleep(self.delay)
+        self.sent.append(item)
+
+
+async def test_outbound_queue_priorities(autojump_clock):
+    queue = OutboundQueue(DEFAULT_OUTBOUND_TRAFFIC_CLASSES)
+    queue.put_nowait("ftp", "bulk")
+    queue.put_nowait("rtk", "rtk")
+    queue.put_nowait("heartbeat")
+    queue.put_nowait("command", "command")
+    queue.put_nowait("rc", "rc")
+    queue.put_nowait("other", "no-such-class")
+
+    assert len(queue) == 6
+    assert [await queue.get() for _ in range(6)] == [
+        "rc",
+        "command",
+        "heartbeat",
+        "other",
+        "rtk",
+        "ftp",
+    ]
+
+
+async def test_outbound_queue_drop_policies(autojump_clock):
+    queue = OutboundQueue(
+        {
+            "default": OutboundTrafficClass(priority=0, capacity=2),
+            "rc": OutboundTrafficClass(
+                priority=1, capacity=2, max_age=1, drop_oldest=True
+            ),
+        }
+    )
+
+    assert queue.put_nowait(1) and queue.put_nowait(2)
+    assert not queue.put_nowait(3)
+    for value in "abc":
+        assert queue.put_nowait(value, "rc")
+
+    assert queue.stats == {
+        "default": {"depth": 2, "dropped": 1, "expired": 0},
+        "rc": {"depth": 2, "dropped": 1, "expired": 0},
+    }
+
+    assert await queue.get() == 1
+    await sleep(2)
+    queue.put_nowait("d", "rc")
+    assert [await queue.get() for _ in range(2)] == [2, "d"]
+    assert queue.stats["rc"] == {"depth": 0, "dropped": 2, "expired": 1}
+
+
+async def test_slow_link_does_not_block_other_links(autojump_clock):
+    manager = CommunicationManager(channel_factory=None)  # type: ignore
+    manager.log = None  # type: ignore
+    manager.add(object(), name="slow")
+    manager.add(object(), name="fast")
+    slow, fast = FakeChannel(delay=10), FakeChannel()
+    manager._entries_by_name["slow"][0].channel = slow  # type: ignore
+    manager._entries_by_name["fast"][0].channel = fast  # type: ignore
+
+    async with open_nursery() as nursery:
+        nursery.start_soon(manager._run_outbound_links)
+        await sleep(0.1)
+
+        with manager.with_alias("_rtk", targets=["slow", "fast"]):
+            for index in range(5):
+                await manager.send_packet(index, ("slow", "addr"))
+                await manager.send_packet(index, ("fast", "addr"))
+            await manager.broadcast_packet("bcast", destination="_rtk")
+            await sleep(1)
+
+            assert fast.sent == [(index, "addr") for index in range(5)] + [
+                ("bcast", "*")
+            ]
+            assert slow.sent == []
+
+            await sleep(100)
+            assert slow.sent == fast.sent
+
+        assert manager.get_outbound_queue_stats()["slow"]["default"]["depth"] == 0
+        nursery.cancel_scope.cancel()
+
+    assert manager.get_outbound_queue_stats() == {}
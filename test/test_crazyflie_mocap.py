@@ -0,0 +1,113 @@
+from aiocflib.crtp.crtpstack import CRTPPort
+from aiocflib.crazyflie.localization import (
+    GenericLocalizationCommand,
+    Localization,
+    LocalizationChannel,
+)
+from aiocflib.utils.addressing import RadioAddressSpace
+from aiocflib.utils.quaternion import QuaternionXYZW
+from pytest import fixture
+
+from flockwave.server.ext.crazyflie.mocap import CrazyflieMocapFrameHandler
+from flockwave.server.ext.motion_capture.frame import MotionCaptureFrame
+
+
+class FakeDriver:
+    def __init__(self):
+        self.addresses = []
+        self.uav_address_map_version = 0
+
+    def add(self, uav_id, address_space, index):
+        self.addresses.append((uav_id, address_space, index))
+        self.uav_address_map_version += 1
+
+    def iter_uav_addresses(self):
+        return iter(self.addresses)
+
+
+@fixture
+def spaces() -> list[RadioAddressSpace]:
+    return [
+        RadioAddressSpace.from_uri("bradio://0/80/2M/E7E7E7E7", length=64),
+        RadioAddressSpace.from_uri("bradio://1/90/2M/E7E7E7E7", length=64),
+    ]
+
+
+def create_frame(count: int, with_attitude: bool = False) -> MotionCaptureFrame:
+    frame = MotionCaptureFrame(timestamp=0, items=[])
+    for index in range(count):
+        frame.add_item(
+            str(index),
+            (index * 0.1, -index * 0.2, 1.5),
+            (0.5, 0.5, -0.5, 0.5) if with_attitude else None,
+        )
+    return frame
+
+
+def test_packets_match_aiocflib_encoding():
+    packets = []
+    handler = CrazyflieMocapFrameHandler(
+        FakeDriver(), lambda *args: packets.append(args)  # type: ignore
+    )
+
+    handler.notify_frame(create_frame(10))
+    positions = [(index, (index * 0.1, -index * 0.2, 1.5)) for index in range(10)]
+    assert packets == [
+        (
+            CRTPPort.LOCALIZATION,
+            LocalizationChannel.POSITION_PACKED,
+            Localization.encode_external_position_packed(positions[start:end]),
+        )
+        for start, end in ((0, 4), (4, 8), (8, 10))
+    ]
+
+    packets.clear()
+    handler.notify_frame(create_frame(3, with_attitude=True))
+    quat = QuaternionXYZW(0.5, -0.5, 0.5, 0.5)
+    poses = [(index, (index * 0.1, -index * 0.2, 1.5), quat) for index in range(3)]
+    assert [packet[1:] for packet in packets] == [
+        (
+            LocalizationChannel.GENERIC,
+            bytes([GenericLocalizationCommand.EXT_POSE_PACKED])
+            + Localization.encode_external_pose_packed(poses[start:end]),
+        )
+        for start, end in ((0, 2), (2, 3))
+    ]
+
+
+def test_packets_are_routed_by_address_space(spaces):
+    driver = FakeDriver()
+    packets = [[], []]
+    handlers = [
+        CrazyflieMocapFrameHandler(
+            driver,  # type: ignore
+            lambda *args, index=index: packets[index].append(args[2]),
+            address_space=space,
+        )
+        for index, space in enumerate(spaces)
+    ]
+
+    driver.add("00", spaces[0], 0)
+    driver.add("01", spaces[1], 1)
+
+    frame = create_frame(3)
+    for handler in handlers:
+        handler.notify_frame(frame)
+
+    # Drone 2 is not known yet so it is sent everywhere
+    assert [[packet[::7] for packet in items] for items in packets] == [
+        [b"\x00\x02"],
+        [b"\x01\x02"],
+    ]
+
+    # Once drone 2 appears on the second radio, it is sent only there
+    driver.add("cf2", spaces[1], 2)
+    packets[0].clear()
+    packets[1].clear()
+    for handler in handlers:
+        handler.notify_frame(frame)
+
+    assert [[packet[::7] for packet in items] for items in packets] == [
+        [b"\x00"],
+        [b"\x01\x02"],
+    ]
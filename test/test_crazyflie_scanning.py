@@ -0,0 +1,129 @@
+from contextlib import aclosing
+from trio import current_time, open_nursery, sleep
+
+from flockwave.server.ext.crazyflie.extension import CrazyflieDronesExtension
+from flockwave.server.ext.crazyflie.scanning import AdaptiveScheduler
+
+ADDRESSES = [f"radio://0/80/2M/E7E7E7E7{index:02X}" for index in range(4)]
+
+
+async def run_scheduler(
+    scheduler, responding, *, until, scan_duration=0, processing_time=0
+):
+    """Runs the given scheduler until the given time, and returns the list of
+    scans that the scheduler requested, along with the times when they were
+    requested.
+    """
+    scans = []
+    gen = scheduler.run(lambda priority: ADDRESSES)
+    async with aclosing(gen):
+        async for targets in gen:
+            now = current_time()
+            if now >= until:
+                break
+
+            scans.append((round(now, 3), targets))
+            await sleep(scan_duration)
+            scheduler.notify_scanned(
+                targets,
+                [target for target in targets if target in responding],
+                scan_duration,
+            )
+            await sleep(processing_time)
+
+    return scans
+
+
+async def test_exponential_backoff(autojump_clock):
+    scheduler = AdaptiveScheduler(
+        batch_size=8, min_delay=1, max_delay=4, airtime_budget=1
+    )
+    scans = await run_scheduler(scheduler, ADDRESSES[:1], until=15)
+
+    times_of = {
+        address: [time for time, targets in scans if address in targets]
+        for address in ADDRESSES[:2]
+    }
+    assert times_of[ADDRESSES[0]] == list(range(15))
+    assert times_of[ADDRESSES[1]] == [0, 1, 3, 7, 11]
+
+    stats = scheduler.statistics[ADDRESSES[1]]
+    assert stats.num_scans == 5
+    assert stats.num_responses == 0
+    assert stats.num_consecutive_misses == 5
+    assert stats.delay == 4
+
+    stats = scheduler.statistics[ADDRESSES[0]]
+    assert stats.num_scans == stats.num_responses == 15
+
+
+async def test_lost_addresses_are_prioritized(autojump_clock):
+    scheduler = AdaptiveScheduler(
+        batch_size=1, min_delay=1, max_delay=100, airtime_budget=1
+    )
+    updated = []
+    scheduler.on_statistics_updated = updated.extend
+
+    async with open_nursery() as nursery:
+
+        async def lose_drone():
+            await sleep(50)
+            scheduler.notify_lost(ADDRESSES[2])
+            scheduler.wake_up()
+
+        nursery.start_soon(lose_drone)
+        scans = await run_scheduler(scheduler, (), until=56)
+
+    assert (50, [ADDRESSES[2]]) in scans
+    assert [time for time, targets in scans if time > 50] == [51, 52, 53, 54, 55]
+    assert all(targets == [ADDRESSES[2]] for time, targets in scans if time >= 50)
+    assert scheduler.statistics[ADDRESSES[2]].num_consecutive_misses == 6
+    assert updated[-1].address == ADDRESSES[2]
+
+
+async def test_airtime_budget(autojump_clock):
+    scheduler = AdaptiveScheduler(
+        batch_size=1, min_delay=0, max_delay=0, airtime_budget=0.25
+    )
+    scans = await run_scheduler(scheduler, ADDRESSES, until=20, scan_duration=0.5)
+
+    assert [time for time, _ in scans] == [0, 2, 4, 6, 8, 10, 12, 14, 16, 18]
+    assert scheduler.num_batches == len(scans)
+    assert scheduler.airtime == 5
+
+
+async def test_airtime_excludes_processing_of_results(autojump_clock):
+    scheduler = AdaptiveScheduler(
+        batch_size=1, min_delay=0, max_delay=0, airtime_budget=0.25
+    )
+    scans = await run_scheduler(
+        scheduler, ADDRESSES, until=20, scan_duration=0.5, processing_time=1
+    )
+
+    # The airtime and the cooldown after each scan are based on the time
+    # spent by the radio only, not on the time spent on processing the results
+    assert [time for time, _ in scans] == [0, 3, 6, 9, 12, 15, 18]
+    assert scheduler.airtime == 3.5
+
+
+async def test_scan_statistics_of_connection(autojump_clock):
+    scheduler = AdaptiveScheduler(
+        batch_size=8, min_delay=1, max_delay=4, airtime_budget=1
+    )
+    extension = CrazyflieDronesExtension()
+    extension._scan_schedulers["Crazyradio0"] = scheduler
+    await run_scheduler(scheduler, ADDRESSES[:1], until=15, scan_duration=0.5)
+
+    # Statistics are available for addresses without drones as well
+    stats = extension.exports()["get_scan_statistics"]()
+    assert list(stats) == ["Crazyradio0"]
+    assert stats["Crazyradio0"]["batches"] == scheduler.num_batches > 0
+    assert stats["Crazyradio0"]["airtime"] == scheduler.num_batches * 0.5
+    assert set(stats["Crazyradio0"]["addresses"]) == set(ADDRESSES)
+
+    address_stats = stats["Crazyradio0"]["addresses"]
+    assert address_stats[ADDRESSES[0]]["misses"] == 0
+    assert address_stats[ADDRESSES[0]]["scans"] > 0
+    assert address_stats[ADDRESSES[1]]["responses"] == 0
+    assert address_stats[ADDRESSES[1]]["misses"] > 0
+    assert address_stats[ADDRESSES[1]]["delay"] == 4
@@ -2,10 +2,15 @@ import gzip
 import sys
 
 from json import load
+from os import environ
 from pathlib import Path
+from pytest import importorskip, mark
+from random import Random
+from timeit import repeat
 
 from flockwave.server.ext.crazyflie.trajectory import (
     encode_trajectory,
+    to_poly4d_sequence,
     TrajectoryEncoding,
 )
 from flockwave.server.show.trajectory import TrajectorySpecification
@@ -126,3 +131,56 @@ def test_show_5cf_demo():
     trajectory = TrajectorySpecification(drone["settings"]["trajectory"])
     data = encode_trajectory(trajectory, encoding=TrajectoryEncoding.COMPRESSED)
     assert data == expected
+
+
+def create_random_trajectory(rng: Random, count: int) -> TrajectorySpecification:
+    return TrajectorySpecification(
+        {
+            "version": 1,
+            "points": [
+                [index * 0.5, [rng.uniform(-10, 10) for _ in range(3)], []]
+                for index in range(count)
+            ],
+        }
+    )
+
+
+def encode_poly4d_sequence_one_by_one(polys) -> bytes:
+    return b"".join(poly.encode() for poly in polys)
+
+
+def test_poly4d_batch_encoding():
+    importorskip("numpy")
+
+    with gzip.open(fixture_dir / "show_5cf_demo.json.gz") as fp:
+        show = load(fp)
+
+    for drone in show["swarm"]["drones"]:
+        trajectory = TrajectorySpecification(drone["settings"]["trajectory"])
+        polys = to_poly4d_sequence(trajectory)
+        assert encode_trajectory(trajectory) == encode_poly4d_sequence_one_by_one(
+            polys
+        )
+
+    trajectory = create_random_trajectory(Random(42), 2000)
+    expected = encode_poly4d_sequence_one_by_one(to_poly4d_sequence(trajectory))
+    assert encode_trajectory(trajectory) == expected
+
+
+@mark.skipif(
+    not environ.get("SKYBRUSH_BENCHMARKS"),
+    reason="set SKYBRUSH_BENCHMARKS=1 to run benchmarks",
+)
+def test_poly4d_batch_encoding_benchmark():
+    importorskip("numpy")
+
+    trajectory = create_random_trajectory(Random(42), 20000)
+    scalar = min(
+        repeat(
+            lambda: encode_poly4d_sequence_one_by_one(to_poly4d_sequence(trajectory)),
+            number=1,
+            repeat=3,
+        )
+    )
+    batch = min(repeat(lambda: encode_trajectory(trajectory), number=1, repeat=3))
+    assert batch < scalar
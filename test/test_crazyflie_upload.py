@@ -0,0 +1,55 @@
+from trio import current_time, open_nursery, sleep
+
+from flockwave.server.ext.crazyflie.upload import ShowUploadScheduler
+
+
+async def test_uploads_are_queued_per_radio(autojump_clock):
+    scheduler = ShowUploadScheduler(max_uploads_per_radio=2)
+    finished_at = {}
+
+    async def upload(uav_id: str, radio: int, address_space: str):
+        async with scheduler.use_radio(radio, address_space):
+            await sleep(1)
+            finished_at[uav_id] = round(current_time())
+
+    uploads = [(f"a{index}", 0, "a") for index in range(3)]
+    uploads += [("b0", 0, "b"), ("a3", 0, "a")]
+    uploads += [(f"c{index}", 1, "c") for index in range(4)]
+
+    async with open_nursery() as nursery:
+        # Radio 0 serves two address spaces, radio 1 serves one
+        for args in uploads:
+            nursery.start_soon(upload, *args)
+            await sleep(0.01)
+
+    # Uploads in the same address space share the radio; the address space
+    # of the radio changes only when all uploads in the old one are finished
+    assert finished_at["a0"] == finished_at["a1"] == 1
+    assert finished_at["a2"] == finished_at["a3"] == 2
+    assert finished_at["b0"] == 3
+
+    # Uploads through the other radio run concurrently
+    assert sorted(finished_at[f"c{index}"] for index in range(4)) == [1, 1, 2, 2]
+    assert scheduler.get_queue_length(0) == 0
+
+
+async def test_cancelled_upload_leaves_the_queue(autojump_clock):
+    scheduler = ShowUploadScheduler(max_uploads_per_radio=1)
+    started = []
+
+    async def upload(uav_id: str):
+        async with scheduler.use_radio(0):
+            started.append(uav_id)
+            await sleep(1)
+
+    async with open_nursery() as nursery:
+        nursery.start_soon(upload, "first")
+        await sleep(0.1)
+        async with open_nursery() as inner:
+            inner.start_soon(upload, "second")
+            await sleep(0.1)
+            assert scheduler.get_queue_length(0) == 2
+            inner.cancel_scope.cancel()
+        nursery.start_soon(upload, "third")
+
+    assert started == ["first", "third"]
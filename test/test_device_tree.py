@@ -0,0 +1,46 @@
+from flockwave.server.model.devices import DeviceTree, ObjectNode
+
+
+def create_tree() -> DeviceTree:
+    tree = DeviceTree()
+    for id in ("01", "02"):
+        node = tree.root.add_child(id, ObjectNode())
+        device = node.add_device("battery")
+        device.add_channel("voltage", float, initial_value=12.0)
+        device.add_channel("charging", bool)
+    return tree
+
+
+def test_channel_values_are_cached():
+    tree = create_tree()
+
+    values = tree.root.collect_channel_values()
+    assert values == {
+        "01": {"battery": {"voltage": 12.0, "charging": False}},
+        "02": {"battery": {"voltage": 12.0, "charging": False}},
+    }
+    assert tree.root.collect_channel_values() is values
+
+    with tree.create_mutator() as mutator:
+        mutator.update("/01/battery/voltage", 11.5)
+
+    new_values = tree.root.collect_channel_values()
+    assert new_values is not values
+    assert new_values["01"]["battery"]["voltage"] == 11.5
+    assert values["01"]["battery"]["voltage"] == 12.0
+
+    # The subtree that did not change is re-used
+    assert new_values["02"] is values["02"]
+
+
+def test_channel_value_cache_follows_structure_changes():
+    tree = create_tree()
+    values = tree.root.collect_channel_values()
+
+    device = tree.resolve("/02/battery")
+    device.add_channel("current", float)  # type: ignore
+    assert tree.root.collect_channel_values()["02"]["battery"]["current"] == 0.0
+
+    tree.root.remove_child_by_id("01")
+    assert set(tree.root.collect_channel_values()) == {"02"}
+    assert set(values) == {"01", "02"}
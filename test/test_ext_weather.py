@@ -0,0 +1,83 @@
+from trio import current_time, open_nursery, sleep
+from types import SimpleNamespace
+
+from flockwave.server.ext import weather as ext
+from flockwave.server.ext.weather import _geohash, collect_weather, WeatherCache
+from flockwave.server.model.weather import Weather
+
+from pytest import fixture
+
+
+@fixture
+def registry():
+    registry = ext.registry
+    for id in list(registry.ids):
+        registry.remove_by_id(id)
+    yield registry
+    for id in list(registry.ids):
+        registry.remove_by_id(id)
+
+
+def create_provider(key, value, delay=0):
+    async def provider(weather, position):
+        await sleep(delay)
+        weather.json[key] = value
+
+    return provider
+
+
+def test_geohash():
+    assert _geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert _geohash(-25.382708, -49.265506, 5) == "6gkzw"
+
+
+async def test_providers_are_merged_by_priority(registry, autojump_clock):
+    registry.add(create_provider("kpIndex", 1, delay=1), id="a", priority=1)
+    registry.add(create_provider("kpIndex", 2, delay=1), id="b")
+    registry.add(create_provider("magneticVector", 3, delay=1), id="c")
+    registry.add(create_provider("kpIndex", 4, delay=10), id="slow", priority=2)
+
+    weather = Weather(timestamp=0)
+    started_at = current_time()
+    await collect_weather(weather, None)
+
+    # Providers run concurrently and the slow one times out
+    assert current_time() - started_at == ext.timeout
+    assert weather.json["kpIndex"] == 1
+    assert weather.json["magneticVector"] == 3
+
+
+async def test_cache_coalesces_queries(autojump_clock):
+    cache = WeatherCache(ttl=60, time_bucket=60)
+    calls = []
+
+    async def fetch():
+        calls.append(current_time())
+        await sleep(1)
+        return {"kpIndex": len(calls)}
+
+    position = SimpleNamespace(lat=47.4733, lon=19.0612)
+    nearby = SimpleNamespace(lat=47.4745, lon=19.0605)
+    results = []
+
+    async def query(position):
+        key = cache.key_for(position, 30)
+        results.append(await cache.get_or_fetch(key, fetch))
+
+    async with open_nursery() as nursery:
+        for _ in range(10):
+            nursery.start_soon(query, position)
+            nursery.start_soon(query, nearby)
+
+    assert len(calls) == 1
+    assert results == [{"kpIndex": 1}] * 20
+
+    # A different time bucket is a miss
+    assert cache.get(cache.key_for(position, 90)) is None
+
+    # Entries are evicted after their TTL expires
+    await sleep(60)
+    cache.put("other", {})
+    assert len(cache._entries) == 1
+    await query(position)
+    assert len(calls) == 2
@@ -0,0 +1,134 @@
+from pytest import importorskip
+
+from flockwave.server.ext.mavlink.comm import _SKIPPED, get_mavlink_factory
+from flockwave.server.ext.mavlink.enums import MAVComponent
+from flockwave.server.ext.mavlink.network import MAVLinkNetwork
+
+importorskip("flockwave.protocols.mavlink.dialects.v20.ardupilotmega")
+
+
+def create_sender(system_id: int, component_id: int = MAVComponent.AUTOPILOT1):
+    return get_mavlink_factory(system_id=system_id, component_id=component_id)()
+
+
+def create_packets(*, mavlink1: bool = False) -> tuple[bytes, list[tuple]]:
+    """Creates a byte stream consisting of multiple MAVLink packets of different
+    types and from different senders, along with the type, the system ID and
+    the component ID of each packet.
+    """
+    first, second = create_sender(1), create_sender(2)
+    bridge = create_sender(2, MAVComponent.UDP_BRIDGE)
+
+    messages = [
+        (first, first.heartbeat_encode(2, 3, 81, 4, 3)),
+        (first, first.attitude_encode(1000, 0.1, 0.2, 0.3, 0, 0, 0)),
+        (second, second.sys_status_encode(0, 0, 0, 500, 12600, -1, 87, *[0] * 6)),
+        (bridge, bridge.radio_status_encode(200, 190, 100, 10, 20, 0, 0)),
+        (second, second.heartbeat_encode(2, 3, 89, 4, 4)),
+        (first, first.attitude_encode(2000, 0.4, 0.5, 0.6, 0, 0, 0)),
+        (first, first.heartbeat_encode(2, 3, 81, 5, 4)),
+    ]
+
+    data = b"".join(
+        message.pack(sender, force_mavlink1=mavlink1) for sender, message in messages
+    )
+    headers = [
+        (message.get_type(), sender.srcSystem, sender.srcComponent)
+        for sender, message in messages
+    ]
+    return data, headers
+
+
+def only_heartbeats_and_radio_status(type: str, system_id: int, component_id: int):
+    return type == "HEARTBEAT" or (
+        type == "RADIO_STATUS" and component_id == MAVComponent.UDP_BRIDGE
+    )
+
+
+def parse(link, data: bytes, chunk_size: int) -> list:
+    result = []
+    for index in range(0, len(data), chunk_size):
+        result.extend(link.parse_buffer(data[index : index + chunk_size]) or ())
+    return result
+
+
+def test_message_filter_with_real_parser():
+    for mavlink1 in (False, True):
+        data, headers = create_packets(mavlink1=mavlink1)
+        seen = []
+
+        def message_filter(type: str, system_id: int, component_id: int) -> bool:
+            seen.append((type, system_id, component_id))
+            return only_heartbeats_and_radio_status(type, system_id, component_id)
+
+        # Feed the stream in chunks of different sizes to check that the
+        # parser stays in sync even if a skipped frame is split across chunks
+        for chunk_size in (len(data), 1, 7, 13):
+            seen.clear()
+            link = get_mavlink_factory(message_filter=message_filter)()
+            parsed = parse(link, data, chunk_size)
+
+            assert seen == headers
+            assert len(parsed) == len(headers)
+            assert [message is _SKIPPED for message in parsed] == [
+                False,
+                True,
+                True,
+                False,
+                False,
+                True,
+                False,
+            ]
+
+            messages = [message for message in parsed if message is not _SKIPPED]
+            assert [message.get_type() for message in messages] == [
+                "HEARTBEAT",
+                "RADIO_STATUS",
+                "HEARTBEAT",
+                "HEARTBEAT",
+            ]
+            assert [message.get_srcSystem() for message in messages] == [1, 2, 2, 1]
+            assert [messages[index].base_mode for index in (0, 2, 3)] == [81, 89, 81]
+            assert messages[1].rssi == 200
+            assert messages[-1].custom_mode == 5
+            assert link.total_receive_errors == 0
+
+
+def test_parser_without_message_filter():
+    data, headers = create_packets()
+    link = get_mavlink_factory()()
+    parsed = parse(link, data, 5)
+
+    assert _SKIPPED not in parsed
+    assert [
+        (message.get_type(), message.get_srcSystem(), message.get_srcComponent())
+        for message in parsed
+    ] == headers
+
+
+def test_message_filter_of_network():
+    data, _ = create_packets()
+    network = MAVLinkNetwork("test")
+    network._ignored_message_types = frozenset({"ATTITUDE", "SYS_STATUS"})
+    network._matchers = {}
+
+    def decoded_types() -> list[str]:
+        link = get_mavlink_factory(message_filter=network._should_decode_message)()
+        return [
+            message.get_type()
+            for message in parse(link, data, 11)
+            if message is not _SKIPPED
+        ]
+
+    assert decoded_types() == ["HEARTBEAT", "RADIO_STATUS", "HEARTBEAT", "HEARTBEAT"]
+
+    # Ignored messages are decoded while someone is waiting for them
+    network._matchers = {"ATTITUDE": {1: [object()]}}
+    assert decoded_types() == [
+        "HEARTBEAT",
+        "ATTITUDE",
+        "RADIO_STATUS",
+        "HEARTBEAT",
+        "ATTITUDE",
+        "HEARTBEAT",
+    ]
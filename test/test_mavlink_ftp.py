@@ -0,0 +1,122 @@
+from random import Random
+from struct import Struct
+from trio import sleep, sleep_forever
+from types import SimpleNamespace
+
+from flockwave.server.ext.mavlink.ftp import MAVFTP, MAVFTPOpCode
+from flockwave.server.show.utils import crc32_mavftp as crc32
+
+from pytest import raises
+
+header = Struct("<HBBBBBxI")
+
+
+class FakeMAVFTPServer:
+    """Minimal MAVFTP server with a lossy link that answers the requests of
+    a MAVFTP client.
+    """
+
+    def __init__(self, loss: float = 0, seed: int = 42):
+        self.files = {}
+        self.sessions = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.loss = loss
+        self.opcodes = []
+        self.ignore_writes = False
+        self._random = Random(seed)
+
+    def _is_lost(self) -> bool:
+        return self._random.random() < self.loss
+
+    def _reply(self, seq, session, opcode, req_opcode, offset=0, data=b"", burst=0):
+        payload = header.pack(
+            (seq + 1) % 65536, session, opcode, len(data), req_opcode, burst, offset
+        )
+        return SimpleNamespace(payload=payload + data)
+
+    def _handle(self, payload: bytes):
+        seq, session, opcode, size, _, _, offset = header.unpack(payload[:12])
+        data = payload[12 : 12 + size]
+        self.opcodes.append(opcode)
+
+        ack = MAVFTPOpCode.ACK
+        if opcode == MAVFTPOpCode.CREATE_FILE:
+            self.files[data] = bytearray()
+            self.sessions[1] = data
+            return [self._reply(seq, 1, ack, opcode)]
+        elif opcode == MAVFTPOpCode.OPEN_FILE_RO:
+            self.sessions[1] = data
+            return [self._reply(seq, 1, ack, opcode)]
+        elif opcode == MAVFTPOpCode.WRITE_FILE and not self.ignore_writes:
+            contents = self.files[self.sessions[session]]
+            if len(contents) < offset + len(data):
+                contents.extend(bytes(offset + len(data) - len(contents)))
+            contents[offset : offset + len(data)] = data
+            return [self._reply(seq, session, ack, opcode)]
+        elif opcode == MAVFTPOpCode.CALC_FILE_CRC32:
+            value = crc32(bytes(self.files[data]))
+            return [self._reply(seq, 0, ack, opcode, data=value.to_bytes(4, "little"))]
+        elif opcode == MAVFTPOpCode.BURST_READ_FILE:
+            contents = self.files[self.sessions[session]]
+            if offset >= len(contents):
+                nak = bytes([6])
+                return [self._reply(seq, session, MAVFTPOpCode.NAK, opcode, data=nak)]
+            replies = []
+            for index, start in enumerate(range(offset, len(contents), 239)):
+                chunk = bytes(contents[start : start + 239])
+                is_last = start + 239 >= len(contents)
+                reply = self._reply(
+                    seq + index, session, ack, opcode, start, chunk, int(is_last)
+                )
+                replies.append(reply)
+            return replies
+        else:
+            return [self._reply(seq, session, ack, opcode)]
+
+    async def send(self, spec, wait_for_response):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await sleep(0.02)
+            if self._is_lost():
+                await sleep_forever()
+
+            _, matcher = wait_for_response
+            for reply in self._handle(spec[1]["payload"]):
+                await sleep(0.005)
+                if not self._is_lost() and matcher(reply):
+                    return reply
+
+            await sleep_forever()
+        finally:
+            self.in_flight -= 1
+
+
+async def test_pipelined_upload(autojump_clock):
+    data = Random(1).randbytes(239 * 40 + 17)
+    server = FakeMAVFTPServer(loss=0.1)
+    ftp = MAVFTP(server.send, window=8)  # type: ignore
+
+    await ftp.put(data, "/show.skyb")
+    assert bytes(server.files[b"show.skyb"]) == data
+    assert 1 < server.max_in_flight <= 8
+
+    # CRC mismatches are still detected
+    server.ignore_writes = True
+    with raises(RuntimeError, match="CRC mismatch"):
+        await ftp.put(data, "/show.skyb")
+
+
+async def test_burst_download(autojump_clock):
+    for size in (0, 239 * 10, 239 * 40 + 17):
+        data = Random(size).randbytes(size)
+        server = FakeMAVFTPServer(loss=0.1)
+        server.files[b"log.bin"] = bytearray(data)
+
+        ftp = MAVFTP(server.send, burst_read=True)  # type: ignore
+        assert await ftp.get("/log.bin") == data
+
+        num_bursts = server.opcodes.count(MAVFTPOpCode.BURST_READ_FILE)
+        assert MAVFTPOpCode.READ_FILE not in server.opcodes
+        assert num_bursts < max(size // 239, 1) or size == 0
@@ -0,0 +1,90 @@
+from trio import open_nursery, sleep
+from types import SimpleNamespace
+
+from flockwave.server.ext.mavlink.tasks import UAVLivenessTracker
+
+
+class FakeUAV:
+    def __init__(self, network_id: str, system_id: int):
+        self.is_connected = False
+        self.network_id = network_id
+        self.system_id = system_id
+        self.status = SimpleNamespace(errors=[])
+        self.transitions = []
+
+    def notify_disconnection(self):
+        self.is_connected = False
+        self.transitions.append("disconnected")
+
+    def notify_reconnection(self, heartbeat):
+        self.is_connected = True
+        self.transitions.append("connected")
+
+
+class FakeSignal:
+    def __init__(self):
+        self.receivers = [object()]
+        self.sent = []
+
+    def send(self, network_id, summary):
+        self.sent.append((network_id, list(summary)))
+
+
+def test_deadlines():
+    tracker = UAVLivenessTracker(timeout=5)
+    uavs = [FakeUAV("mav", 1), FakeUAV("mav", 2)]
+
+    for uav in uavs:
+        tracker.notify_heartbeat(uav, None, now=0)
+    assert [uav.transitions for uav in uavs] == [["connected"], ["connected"]]
+
+    # Heartbeats of the first UAV keep on arriving
+    for now in range(1, 9):
+        tracker.notify_heartbeat(uavs[0], None, now=now)
+        assert tracker.expire(now) == (5 if now < 5 else 10)
+
+    assert uavs[0].transitions == ["connected"]
+    assert uavs[1].transitions == ["connected", "disconnected"]
+
+    assert tracker.expire(13) == float("inf")
+    assert uavs[0].transitions == ["connected", "disconnected"]
+
+    tracker.notify_heartbeat(uavs[1], None, now=20)
+    assert uavs[1].transitions == ["connected", "disconnected", "connected"]
+
+
+async def test_summaries(autojump_clock):
+    tracker = UAVLivenessTracker()
+    signal = FakeSignal()
+    uav = FakeUAV("mav", 3)
+
+    async with open_nursery() as nursery:
+        nursery.start_soon(tracker.run, signal, None)
+        await sleep(0.1)
+        assert signal.sent == []
+
+        tracker.notify_heartbeat(uav, None)
+        await sleep(0.1)
+        assert len(signal.sent) == 1
+        assert signal.sent[-1][0] == "mav"
+        assert signal.sent[-1][1][:5] == [None, None, None, 0, None]
+
+        # Unrelated updates do not trigger a new summary
+        tracker.notify_status_changed(uav)
+        await sleep(0.5)
+        assert len(signal.sent) == 1
+
+        uav.status.errors = [2, 7]
+        tracker.notify_status_changed(uav)
+        await sleep(0.1)
+        assert len(signal.sent) == 2
+        assert signal.sent[-1][1][3] == 7
+
+        # Summaries are refreshed periodically; the UAV disconnects after
+        # five seconds without heartbeats
+        await sleep(10)
+        assert signal.sent[-1][1][3] is None
+        assert 10 <= len(signal.sent) <= 14
+        assert uav.transitions == ["connected", "disconnected"]
+
+        nursery.cancel_scope.cancel()
@@ -0,0 +1,135 @@
+from json import dumps
+from trio import current_time
+from types import SimpleNamespace
+
+from flockwave.server.ext.mavlink.log_download import (
+    BandwidthLimiter,
+    FleetLogDownloader,
+    MAVLinkLogDownloader,
+)
+
+from pytest import fixture
+
+
+class FakeDrone:
+    """Fake drone that serves a single log via the MAVLink log protocol."""
+
+    def __init__(self, data: bytes, network_id: str = "mav", time_utc: int = 0):
+        self.data = data
+        self.network_id = network_id
+        self.time_utc = time_utc
+        self.requests = []
+        self.log_downloader = MAVLinkLogDownloader(self.send)
+
+    def _log_data(self, offset: int) -> SimpleNamespace:
+        chunk = self.data[offset : offset + 90]
+        return SimpleNamespace(
+            id=1,
+            ofs=offset,
+            count=len(chunk),
+            data=chunk,
+            get_type=lambda: "LOG_DATA",
+        )
+
+    async def send(self, spec, wait_for_response=None):
+        type, fields = spec
+        if type == "LOG_REQUEST_LIST":
+            return SimpleNamespace(
+                id=1,
+                num_logs=1,
+                size=len(self.data),
+                time_utc=self.time_utc,
+                get_type=lambda: "LOG_ENTRY",
+            )
+        elif type == "LOG_REQUEST_DATA":
+            self.requests.append((fields["ofs"], fields["count"]))
+            end = min(fields["ofs"] + fields["count"], len(self.data))
+            replies = [self._log_data(ofs) for ofs in range(fields["ofs"], end, 90)]
+            for reply in replies[1:]:
+                self.log_downloader.handle_message_log_data(reply)
+            return replies[0]
+
+
+@fixture
+def data() -> bytes:
+    return bytes(range(256)) * 40
+
+
+async def test_download_to_file(data, tmp_path):
+    drone = FakeDrone(data)
+    path = tmp_path / "log.bin"
+
+    items = [item async for item in drone.log_downloader.download_log(1, path)]
+    assert items[-1].size == len(data)
+    assert path.read_bytes() == data
+    assert not (tmp_path / "log.bin.part").exists()
+    assert not (tmp_path / "log.bin.part.json").exists()
+
+
+async def test_download_resumes_partial_file(data, tmp_path):
+    drone = FakeDrone(data, time_utc=1700000000)
+    path = tmp_path / "log.bin"
+    (tmp_path / "log.bin.part").write_bytes(data[:1000])
+    (tmp_path / "log.bin.part.json").write_text(
+        dumps({"id": 1, "size": len(data), "timestamp": 1700000000})
+    )
+
+    async for _ in drone.log_downloader.download_log(1, path):
+        pass
+
+    assert drone.requests[0] == (1000, len(data) - 1000)
+    assert path.read_bytes() == data
+    assert not (tmp_path / "log.bin.part.json").exists()
+
+
+async def test_download_does_not_resume_partial_file_of_other_log(data, tmp_path):
+    path = tmp_path / "log.bin"
+    stale = bytes(1000)
+
+    # Partial file without identity, partial file of an older log with the
+    # same ID and size, and partial file of a log of a different size
+    for identity in (
+        None,
+        {"id": 1, "size": len(data), "timestamp": 1600000000},
+        {"id": 1, "size": len(data) + 1, "timestamp": 1700000000},
+    ):
+        drone = FakeDrone(data, time_utc=1700000000)
+        (tmp_path / "log.bin.part").write_bytes(stale)
+        if identity is not None:
+            (tmp_path / "log.bin.part.json").write_text(dumps(identity))
+
+        async for _ in drone.log_downloader.download_log(1, path):
+            pass
+
+        assert drone.requests[0][0] == 0
+        assert path.read_bytes() == data
+        assert not (tmp_path / "log.bin.part.json").exists()
+
+
+async def test_fleet_download_with_bandwidth_limit(data, tmp_path, autojump_clock):
+    drones = [FakeDrone(data), FakeDrone(data), FakeDrone(data, network_id="other")]
+    jobs = [
+        (drone, 1, tmp_path / f"log{index}.bin") for index, drone in enumerate(drones)
+    ]
+    downloader = FleetLogDownloader(bandwidth=2048)
+
+    started_at = current_time()
+    results = await downloader.download(jobs)
+    elapsed = current_time() - started_at
+
+    assert [result.size for result in results] == [len(data)] * 3  # type: ignore
+    for _, _, path in jobs:
+        assert path.read_bytes() == data
+
+    # Two drones share a 2 KB/s link so downloading 20 KB takes about 10
+    # seconds; the drones may send a bit more than what we asked for because
+    # the chunks are 90 bytes long
+    assert 8 <= elapsed < 10
+
+
+async def test_bandwidth_limiter(autojump_clock):
+    limiter = BandwidthLimiter(100, burst=50)
+    started_at = current_time()
+    for _ in range(10):
+        await limiter.acquire(50)
+    assert current_time() - started_at == 4.5
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import partial
+from pytest import fixture
+from types import SimpleNamespace
+
+from flockwave.server.ext.mavlink.network import MAVLinkNetwork
+
+
+def create_message(type: str, system_id: int, **kwds):
+    return SimpleNamespace(
+        get_type=lambda: type, get_srcSystem=lambda: system_id, **kwds
+    )
+
+
+@fixture
+def network() -> MAVLinkNetwork:
+    result = MAVLinkNetwork("test")
+    result._matchers = defaultdict(partial(defaultdict, list))
+    return result
+
+
+def resolve(network: MAVLinkNetwork, message) -> None:
+    # Mimics what _handle_inbound_messages() does with an inbound message
+    type = message.get_type()
+    if type in network._matchers:
+        network._resolve_matchers(type, message.get_srcSystem(), message)
+        network._resolve_matchers(type, None, message)
+
+
+def test_resolve_matchers(network: MAVLinkNetwork):
+    with ExitStack() as stack:
+        any_ack = stack.enter_context(network.expect_packet("COMMAND_ACK"))
+        ack_of_1 = stack.enter_context(
+            network.expect_packet("COMMAND_ACK", {"command": 400}, system_id=1)
+        )
+        ack_of_2 = stack.enter_context(
+            network.expect_packet("COMMAND_ACK", system_id=2)
+        )
+        param = stack.enter_context(
+            network.expect_packet(
+                "PARAM_VALUE", lambda message: message.param_id == "FOO"
+            )
+        )
+
+        assert network.get_matcher_queue_depths() == {
+            "COMMAND_ACK": 3,
+            "PARAM_VALUE": 1,
+        }
+
+        message = create_message("COMMAND_ACK", 1, command=176)
+        resolve(network, message)
+        assert any_ack.done() and any_ack.result() is message
+        assert not ack_of_1.done()
+        assert not ack_of_2.done()
+
+        message = create_message("COMMAND_ACK", 1, command=400)
+        resolve(network, message)
+        assert ack_of_1.done() and ack_of_1.result() is message
+        assert not ack_of_2.done()
+
+        resolve(network, create_message("PARAM_VALUE", 3, param_id="BAR"))
+        assert not param.done()
+        resolve(network, create_message("PARAM_VALUE", 3, param_id="FOO"))
+        assert param.done()
+
+        # Resolved matchers are pruned from the table
+        assert network.get_matcher_queue_depths() == {"COMMAND_ACK": 1}
+        assert set(network._matchers["COMMAND_ACK"]) == {2}
+
+    # Exiting the context managers cleans up the table
+    assert network.get_matcher_queue_depths() == {}
+    assert not network._matchers
+
+
+def test_remove_matcher(network: MAVLinkNetwork):
+    with network.expect_packet("HEARTBEAT", system_id=5):
+        with network.expect_packet("HEARTBEAT", system_id=5):
+            assert network.get_matcher_queue_depths() == {"HEARTBEAT": 2}
+        assert network.get_matcher_queue_depths() == {"HEARTBEAT": 1}
+
+        # Removing a matcher that is not in the table is a no-op
+        item = (None, None)
+        network._remove_matcher("HEARTBEAT", 5, item)
+        network._remove_matcher("HEARTBEAT", 6, item)
+        network._remove_matcher("ATTITUDE", 5, item)
+        assert network.get_matcher_queue_depths() == {"HEARTBEAT": 1}
+
+    assert not network._matchers
+
+    # Matchers that were already resolved and pruned can be removed safely
+    with network.expect_packet("HEARTBEAT") as future:
+        resolve(network, create_message("HEARTBEAT", 1))
+        assert future.done()
+        assert not network._matchers
+    assert not network._matchers
+
+    # Matchers can be removed safely after the network stopped running
+    with network.expect_packet("HEARTBEAT"):
+        network._matchers = None
+    assert network.get_matcher_queue_depths() == {}
+
+
+def test_remove_matcher_during_resolution(network: MAVLinkNetwork):
+    stack = ExitStack()
+    calls = []
+
+    def remove_others(message) -> bool:
+        # Removes all the other matchers while the matchers are being resolved
+        calls.append(message)
+        stack.close()
+        return True
+
+    with network.expect_packet("HEARTBEAT", remove_others) as future:
+        others = [
+            stack.enter_context(network.expect_packet("HEARTBEAT"))
+            for _ in range(3)
+        ]
+
+        message = create_message("HEARTBEAT", 1)
+        resolve(network, message)
+
+        assert calls == [message]
+        assert future.done() and future.result() is message
+        assert not any(other.done() for other in others)
+        assert not network._matchers
+
+    assert not network._matchers
+
+    # Same as above, but the removal empties the table for the system ID
+    # before the matcher that triggers it is resolved
+    with network.expect_packet("HEARTBEAT", system_id=1) as future:
+        removed = stack.enter_context(
+            network.expect_packet("HEARTBEAT", remove_others, system_id=1)
+        )
+        with network.expect_packet("HEARTBEAT", system_id=1):
+            pass
+
+        resolve(network, create_message("HEARTBEAT", 1))
+        assert future.done()
+        assert removed.done()
+        assert not network._matchers
@@ -0,0 +1,168 @@
+from pytest import fixture, raises
+from types import SimpleNamespace
+
+from flockwave.server.ext.mavlink.driver import MAVLinkUAV
+from flockwave.server.ext.mavlink.ftp import MAVFTP, OperationNotAcknowledgedError
+from flockwave.server.show.utils import crc32_mavftp as crc32
+
+
+class FakeFTP:
+    def __init__(self):
+        self.files = {}
+        self.uploads = []
+
+    async def crc32(self, path):
+        if path not in self.files:
+            raise OperationNotAcknowledgedError(10)
+        return crc32(self.files[path])
+
+    async def put(self, data, path):
+        self.uploads.append(path)
+        self.files[path] = data
+
+    async def aclose(self):
+        pass
+
+
+async def test_identical_show_files_are_not_uploaded_again():
+    uav = MAVLinkUAV("01", driver=None)  # type: ignore
+    ftp = FakeFTP()
+    path = "/collmot/show.skyb"
+
+    assert await uav._upload_file_if_changed(ftp, b"show", path)  # type: ignore
+    assert not await uav._upload_file_if_changed(ftp, b"show", path)  # type: ignore
+    assert ftp.uploads == [path]
+
+    # A different show is uploaded, but the rest of the cache is kept because
+    # the drone still had the file that we uploaded earlier
+    uav._upload_cache["origin"] = "origin"
+    assert await uav._upload_file_if_changed(ftp, b"other", path)  # type: ignore
+    assert uav._upload_cache["origin"] == "origin"
+
+    # Someone else modified the file on the drone so the cache is cleared
+    ftp.files[path] = b"modified"
+    assert await uav._upload_file_if_changed(ftp, b"other", path)  # type: ignore
+    assert "origin" not in uav._upload_cache
+    assert ftp.files[path] == b"other"
+
+
+class FakeShowCompiler:
+    async def compile(self, show):
+        return repr(show["trajectory"]).encode("utf-8")
+
+
+def create_show(lat: float = 47.5, geofence_altitude: float = 50) -> dict:
+    return {
+        "amslReference": None,
+        "coordinateSystem": {
+            "type": "nwu",
+            "origin": [19.0, lat],
+            "orientation": "0",
+        },
+        "geofence": {"version": 1, "maxAltitude": geofence_altitude},
+        "trajectory": [1, 2, 3],
+    }
+
+
+@fixture
+def uav(monkeypatch) -> tuple[MAVLinkUAV, FakeFTP, list]:
+    ftp = FakeFTP()
+    calls = []
+
+    async def configure_show_origin(*args, **kwds):
+        calls.append("origin")
+
+    async def configure_geofence(geofence):
+        calls.append("geofence")
+
+    async def reload_show():
+        calls.append("reload")
+
+    monkeypatch.setattr(MAVFTP, "for_uav", lambda uav: ftp)
+
+    driver = SimpleNamespace(
+        liveness_tracker=SimpleNamespace(notify_status_changed=lambda uav: None),
+        mandatory_custom_mode=None,
+        run_in_background=lambda *args, **kwds: None,
+        show_compiler=FakeShowCompiler(),
+    )
+    uav = MAVLinkUAV("01", driver=driver)  # type: ignore
+    uav._configure_show_origin = configure_show_origin  # type: ignore
+    uav.configure_geofence = configure_geofence  # type: ignore
+    uav.reload_show = reload_show  # type: ignore
+
+    return uav, ftp, calls
+
+
+async def test_show_origin_and_geofence_are_not_sent_again(uav):
+    uav, ftp, calls = uav
+
+    await uav.upload_show(create_show())
+    assert calls == ["origin", "geofence", "reload"]
+    assert len(ftp.uploads) == 1
+
+    # Same show again; only the reload command is sent
+    calls.clear()
+    await uav.upload_show(create_show())
+    assert calls == ["reload"]
+    assert len(ftp.uploads) == 1
+
+    # Changing the origin or the geofence re-sends only the one that changed
+    calls.clear()
+    await uav.upload_show(create_show(lat=47.6))
+    assert calls == ["origin", "reload"]
+
+    calls.clear()
+    await uav.upload_show(create_show(lat=47.6, geofence_altitude=80))
+    assert calls == ["geofence", "reload"]
+    assert len(ftp.uploads) == 1
+
+
+async def test_show_origin_and_geofence_are_sent_again_after_reboot(uav):
+    uav, ftp, calls = uav
+    show = create_show()
+
+    await uav.upload_show(show)
+    uav._handle_reboot()
+
+    calls.clear()
+    await uav.upload_show(show)
+    assert calls == ["origin", "geofence", "reload"]
+
+    # The show file is uploaded again as well, unless the CRC check shows
+    # that the drone still has it
+    assert len(ftp.uploads) == 1
+
+
+async def test_show_origin_and_geofence_are_sent_again_after_disconnection(uav):
+    uav, ftp, calls = uav
+    show = create_show()
+
+    await uav.upload_show(show)
+    uav.notify_disconnection()
+
+    calls.clear()
+    await uav.upload_show(show)
+    assert calls == ["origin", "geofence", "reload"]
+
+
+async def test_failed_parts_of_show_upload_are_sent_again(uav):
+    uav, _, calls = uav
+    show = create_show()
+
+    async def configure_geofence(geofence):
+        calls.append("geofence")
+        if fail:
+            raise RuntimeError("geofence upload failed")
+
+    uav.configure_geofence = configure_geofence  # type: ignore
+
+    fail = True
+    with raises(RuntimeError):
+        await uav.upload_show(show)
+    assert calls == ["origin", "geofence"]
+
+    calls.clear()
+    fail = False
+    await uav.upload_show(show)
+    assert calls == ["geofence", "reload"]
@@ -0,0 +1,86 @@
+from jsonschema import ValidationError
+from jsonschema.validators import validator_for
+from pytest import fixture, raises
+
+from flockwave.server.model.validation import MessageValidator
+
+TYPES = ["OBJ-LIST", "UAV-INF", "UAV-TAKEOFF", "X-DBG-REQ"]
+
+
+@fixture
+def schema():
+    result = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {
+            "id": {"type": "string"},
+            "body": {"$ref": "#/definitions/body"},
+        },
+        "required": ["id", "body"],
+        "definitions": {
+            "body": {
+                "type": "object",
+                "oneOf": [{"$ref": f"#/definitions/{type}"} for type in TYPES[:3]]
+                + [
+                    {
+                        "allOf": [
+                            {"properties": {"type": {"enum": ["SYS-PING", "SYS-VER"]}}},
+                            {"required": ["type"]},
+                        ]
+                    }
+                ],
+            }
+        },
+    }
+    for type in TYPES[:3]:
+        result["definitions"][type] = {
+            "type": "object",
+            "properties": {
+                "type": {"const": type},
+                "ids": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["type", "ids"],
+        }
+    return result
+
+
+def test_validator_matches_full_schema(schema):
+    full_validator = validator_for(schema)(schema)
+    validator = MessageValidator(schema)
+
+    messages = [
+        {"id": "1", "body": {"type": type, "ids": ["a", "b"]}} for type in TYPES
+    ] + [
+        {"id": "2", "body": {"type": "UAV-INF", "ids": [1]}},
+        {"id": "3", "body": {"type": "UAV-INF"}},
+        {"id": "4", "body": {"type": "SYS-PING"}},
+        {"id": "5", "body": {"type": "SYS-VER", "foo": "bar"}},
+        {"id": "6", "body": {"ids": []}},
+        {"id": "7"},
+    ]
+
+    for message in messages:
+        if full_validator.is_valid(message):
+            validator.validate(message)
+        else:
+            with raises(ValidationError):
+                validator.validate(message)
+
+
+def test_validation_timing_histograms(schema):
+    validator = MessageValidator(schema)
+    for _ in range(5):
+        validator.validate({"id": "1", "body": {"type": "UAV-INF", "ids": []}})
+    with raises(ValidationError):
+        validator.validate({"id": "2", "body": {"type": "X-DBG-REQ"}})
+    with raises(ValidationError):
+        validator.validate({"id": "3"})
+
+    histograms = validator.get_timing_histograms()
+    assert sorted(histograms) == ["*", "UAV-INF", "X-DBG-REQ"]
+    assert histograms["UAV-INF"].count == 5
+    assert histograms["UAV-INF"].json["count"] == 5
+    assert histograms["X-DBG-REQ"].count == 1
+
+    validator.reset_timing_histograms()
+    assert validator.get_timing_histograms() == {}
@@ -1,7 +1,17 @@
 from pytest_trio import trio_fixture
 from trio import sleep
+from types import SimpleNamespace
 
-from flockwave.server.message_hub import BatchMessageRateLimiter, UAVMessageRateLimiter
+import flockwave.server.message_hub
+
+from flockwave.server.message_hub import (
+    BatchMessageRateLimiter,
+    DeltaUAVMessageRateLimiter,
+    MessageHub,
+    Request,
+    StatusDeltaEncoder,
+    UAVMessageRateLimiter,
+)
 
 
 @trio_fixture
@@ -137,3 +147,227 @@ class TestUAVMessageRateLimiter:
         await sleep(1)
 
         assert result == [(1, 2), (1, 2, 3, 4), (3, 4, 5), (3, 4, 6)]
+
+
+class TestStatusDeltaEncoder:
+    def test_deltas_and_keyframes(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(flockwave.server.message_hub, "monotonic", lambda: now[0])
+
+        encoder = StatusDeltaEncoder(keyframe_interval=5)
+        assert encoder.encode({"1": {"mode": "land", "heading": 0}}) == (
+            {"1": {"mode": "land", "heading": 0}},
+            False,
+        )
+
+        # Only the changed fields are sent; removed fields are mapped to None
+        now[0] = 101
+        assert encoder.encode({"1": {"mode": "pos"}, "2": {"mode": "land"}}) == (
+            {"1": {"mode": "pos", "heading": None}, "2": {"mode": "land"}},
+            True,
+        )
+        assert encoder.encode({"1": {"mode": "pos"}}) == ({}, True)
+
+        # Periodic keyframe
+        now[0] = 105
+        assert encoder.encode({"1": {"mode": "pos"}}) == ({"1": {"mode": "pos"}}, False)
+
+        # Forced keyframe
+        now[0] = 106
+        assert encoder.encode({"1": {"mode": "pos"}}, keyframe=True) == (
+            {"1": {"mode": "pos"}},
+            False,
+        )
+
+    def test_uncommitted_changes_are_sent_again(self):
+        encoder = StatusDeltaEncoder(keyframe_interval=3600)
+        encoder.encode({"1": {"mode": "land"}})
+
+        assert encoder.encode({"1": {"mode": "pos"}}, commit=False) == (
+            {"1": {"mode": "pos"}},
+            True,
+        )
+        assert encoder.encode({"1": {"mode": "pos"}}, commit=False) == (
+            {"1": {"mode": "pos"}},
+            True,
+        )
+        encoder.commit()
+        assert encoder.encode({"1": {"mode": "pos"}}) == ({}, True)
+
+
+class FakeHub:
+    def __init__(self, client_ids):
+        self.client_registry = FakeRegistry(client_ids)
+        self.sent = []
+        self.on_send = None
+        self.pending = {}
+
+    def create_notification(self, body):
+        return body
+
+    async def multicast_message(self, message, to):
+        for client_id in to:
+            self.sent.append((client_id, message.body))
+
+    async def send_message(self, message, to):
+        await sleep(0.01)
+        request = Request(message, to=to)
+        if self.on_send:
+            self.on_send(to, request)
+        if to in self.pending:
+            self.pending[to].append(request)
+        elif not request.fulfilled:
+            self.sent.append((to, message))
+            request.notify_sent()
+        return request
+
+
+class FakeRegistry:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __contains__(self, client_id):
+        return client_id in self.ids
+
+
+def create_status_message(statuses):
+    return SimpleNamespace(
+        body={"status": statuses, "type": "UAV-INF"}, get_type=lambda: "UAV-INF"
+    )
+
+
+def get_sent_statuses(hub, client_id):
+    return [body["status"] for to, body in hub.sent if to == client_id]
+
+
+class TestDeltaUAVMessageRateLimiter:
+    def create_limiter(self, client_ids):
+        hub = FakeHub(client_ids)
+        limiter = DeltaUAVMessageRateLimiter(
+            factory=create_status_message, hub=hub, keyframe_interval=3600
+        )
+        return limiter, hub
+
+    async def test_full_snapshots_for_clients_without_delta_mode(self):
+        limiter, hub = self.create_limiter(["a", "b"])
+        limiter.set_delta_mode_for("b", True)
+
+        async def dispatcher(message):
+            raise AssertionError("dispatcher should not be called")
+
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 1}}))
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 2}}))
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 2}}))
+
+        full = {"status": {"1": {"x": 2}}, "type": "UAV-INF"}
+        assert [body for client_id, body in hub.sent if client_id == "a"][-1] == full
+        assert len([client_id for client_id, _ in hub.sent if client_id == "a"]) == 3
+        assert [body for client_id, body in hub.sent if client_id == "b"] == [
+            {"status": {"1": {"x": 1}}, "type": "UAV-INF"},
+            {"status": {"1": {"x": 2}}, "type": "UAV-INF", "delta": True},
+        ]
+
+    async def test_delta_mode_changes_during_dispatch(self, autojump_clock):
+        limiter, hub = self.create_limiter(["a", "b", "c"])
+        limiter.set_delta_mode_for("a", True)
+        limiter.set_delta_mode_for("b", True)
+
+        def on_send(client_id, request):
+            if client_id == "a":
+                limiter.set_delta_mode_for("c", True)
+                limiter.set_delta_mode_for("b", False)
+
+        hub.on_send = on_send
+
+        async def dispatcher(message):
+            pass
+
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 1}}))
+        assert [client_id for client_id, _ in hub.sent] == ["c", "a", "b"]
+
+    async def test_failed_sends_are_retried(self, autojump_clock):
+        limiter, hub = self.create_limiter(["a"])
+        limiter.set_delta_mode_for("a", True)
+
+        async def dispatcher(message):
+            pass
+
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 1}}))
+
+        # The hub queues the message but fails to deliver it later
+        def fail(client_id, request):
+            request.notify_failed()
+
+        hub.on_send = fail
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 2}}))
+
+        hub.on_send = None
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 2}}))
+        assert hub.sent[-1] == (
+            "a",
+            {"status": {"1": {"x": 2}}, "type": "UAV-INF", "delta": True},
+        )
+
+        # Delivered changes are not sent again
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 2}}))
+        assert len(hub.sent) == 2
+
+    async def test_one_message_in_flight_per_client(self, autojump_clock):
+        limiter, hub = self.create_limiter(["a", "b"])
+        limiter.set_delta_mode_for("a", True)
+        limiter.set_delta_mode_for("b", True)
+
+        async def dispatcher(message):
+            pass
+
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 1}}))
+
+        # Messages to "a" are queued but not delivered yet
+        hub.pending["a"] = []
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 2}}))
+        (request,) = hub.pending.pop("a")
+
+        # The client is skipped while its previous message is in flight
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 3}}))
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 4}}))
+        assert get_sent_statuses(hub, "a") == [{"1": {"x": 1}}]
+
+        # Once delivered, the next message contains the accumulated changes
+        hub.sent.append(("a", request.message))
+        request.notify_sent()
+        await limiter._dispatch(dispatcher, create_status_message({"1": {"x": 5}}))
+        assert get_sent_statuses(hub, "a") == [
+            {"1": {"x": 1}},
+            {"1": {"x": 2}},
+            {"1": {"x": 5}},
+        ]
+        assert get_sent_statuses(hub, "b") == [
+            {"1": {"x": 1}},
+            {"1": {"x": 2}},
+            {"1": {"x": 3}},
+            {"1": {"x": 4}},
+            {"1": {"x": 5}},
+        ]
+
+
+async def test_hub_reports_delivery_failures():
+    delivered = []
+
+    async def send(message):
+        if message == "fail":
+            raise RuntimeError("send failed")
+        delivered.append(message)
+
+    hub = MessageHub()
+    client = SimpleNamespace(id="a", channel=SimpleNamespace(send=send))
+    hub._client_registry = {"a": client}
+
+    for message, to in [("ok", "a"), ("fail", "a"), ("ok", "gone")]:
+        request = Request(message, to=to)
+        await hub._send_message(
+            message, to, done=request.notify_sent, failed=request.notify_failed
+        )
+        assert request.fulfilled
+        assert request.failed == (message == "fail" or to == "gone")
+
+    assert delivered == ["ok"]
@@ -0,0 +1,87 @@
+from trio import current_time, open_nursery, sleep
+
+from flockwave.server.message_hub import RequestScheduler
+
+
+def create_message(type: str, id: str) -> dict:
+    return {"id": id, "body": {"type": type}}
+
+
+async def test_request_scheduler_lanes(autojump_clock):
+    events = []
+
+    async def handler(message):
+        id = message["id"]
+        events.append(("start", id))
+        await sleep(10 if id.startswith("slow") else 1)
+        events.append(("end", id))
+
+    async with open_nursery() as nursery:
+        scheduler = RequestScheduler(handler, nursery=nursery)
+        await scheduler.submit(create_message("DEV-SUB", "slow-sub"))
+        await scheduler.submit(create_message("DEV-UNSUB", "unsub"))
+        await scheduler.submit(create_message("DEV-LISTSUB", "listsub"))
+        await scheduler.submit(create_message("UAV-INF", "fast"))
+
+    # DEV-SUB, DEV-UNSUB and DEV-LISTSUB share the same lane and are processed
+    # in order, without holding up other messages
+    assert events.index(("end", "slow-sub")) < events.index(("start", "unsub"))
+    assert events.index(("end", "unsub")) < events.index(("start", "listsub"))
+    assert events.index(("end", "fast")) < events.index(("end", "slow-sub"))
+
+
+async def test_slow_request_does_not_delay_others(autojump_clock):
+    finished_at = {}
+
+    async def handler(message):
+        id = message["id"]
+        await sleep(100 if id == "slow" else 1)
+        finished_at[id] = current_time()
+
+    async with open_nursery() as nursery:
+        scheduler = RequestScheduler(handler, nursery=nursery)
+        await scheduler.submit(create_message("UAV-PARAM", "slow"))
+        await scheduler.submit(create_message("UAV-PARAM", "param"))
+        await scheduler.submit(create_message("OBJ-CMD", "cmd"))
+        await scheduler.submit(create_message("UAV-INF", "inf"))
+
+    assert finished_at == {"param": 1, "cmd": 1, "inf": 1, "slow": 100}
+
+    # A slow request takes only one slot so the others still go through
+    finished_at.clear()
+    started_at = current_time()
+    async with open_nursery() as nursery:
+        scheduler = RequestScheduler(handler, nursery=nursery, max_pending=2)
+        await scheduler.submit(create_message("UAV-PARAM", "slow"))
+        for index in range(5):
+            await scheduler.submit(create_message("UAV-PARAM", str(index)))
+
+    elapsed = {id: time - started_at for id, time in finished_at.items()}
+    assert [elapsed[str(index)] for index in range(5)] == [1, 2, 3, 4, 5]
+    assert elapsed["slow"] == 100
+
+
+async def test_request_scheduler_barrier_and_backpressure(autojump_clock):
+    events = []
+
+    async def handler(message):
+        events.append(("start", message["id"]))
+        await sleep(1)
+        events.append(("end", message["id"]))
+
+    async with open_nursery() as nursery:
+        scheduler = RequestScheduler(handler, nursery=nursery, max_pending=2)
+        for index in range(3):
+            await scheduler.submit(create_message(f"TYPE-{index}", str(index)))
+            assert scheduler.num_pending <= 2
+        await scheduler.submit(create_message("AUTH-REQ", "auth"))
+        assert scheduler.num_pending == 0
+        await scheduler.submit(create_message("TYPE-0", "after"))
+
+    # The third message had to wait for a free slot
+    assert events.index(("end", "0")) < events.index(("start", "2"))
+
+    # The barrier waited for everything before it and blocked everything after
+    auth_start = events.index(("start", "auth"))
+    assert all(events.index(("end", id)) < auth_start for id in "012")
+    assert events.index(("end", "auth")) < events.index(("start", "after"))
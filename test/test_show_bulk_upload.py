@@ -0,0 +1,149 @@
+from base64 import b64encode
+from hashlib import sha256
+from json import dumps
+from pytest import raises
+from trio import current_time, open_nursery, Semaphore, sleep
+
+from flockwave.server.ext.show import upload
+from flockwave.server.ext.show.upload import (
+    compose_show,
+    run_show_upload,
+    ShowBlobStore,
+)
+from flockwave.server.model.commands import Progress
+
+
+def test_blob_chunks_can_arrive_in_any_order():
+    store = ShowBlobStore()
+    data = dumps({"points": list(range(100))}).encode("utf-8")
+    hash = sha256(data).hexdigest()
+
+    assert store.get_missing([hash]) == [hash]
+    chunks = [
+        (offset, data[offset : offset + 64]) for offset in range(0, len(data), 64)
+    ]
+    for offset, chunk in reversed(chunks[1:]):
+        assert not store.add_chunk(hash, chunk, offset=offset, size=len(data))
+
+    encoded = b64encode(chunks[0][1]).decode("ascii")
+    assert store.add_chunk(hash, encoded, offset=0, size=len(data))
+    assert store.get_missing([hash]) == []
+    assert store.get(hash) == {"points": list(range(100))}
+
+
+def test_blob_with_wrong_hash_is_rejected():
+    store = ShowBlobStore()
+    with raises(ValueError):
+        store.add_chunk("0" * 64, b"{}", size=2)
+    assert "0" * 64 not in store
+
+
+def test_least_recently_used_blobs_are_evicted():
+    store = ShowBlobStore(max_size=10)
+    first = store.add(b"[1, 2, 3]")
+    second = store.add(b"[4, 5, 6]")
+    assert first not in store
+    assert second in store
+
+
+def test_too_large_blobs_are_rejected():
+    store = ShowBlobStore(max_size=10)
+    with raises(ValueError, match="too large"):
+        store.add_chunk("0" * 64, b"[1, 2", size=11)
+    with raises(ValueError, match="negative"):
+        store.add_chunk("0" * 64, b"[1, 2", size=-1)
+    assert not store._partial
+
+
+def test_partial_blobs_count_towards_size_limit():
+    store = ShowBlobStore(max_size=20)
+    first = store.add(b"[1, 2, 3]")
+    second = store.add(b"[4, 5, 6]")
+
+    # Incomplete blobs evict the least recently used complete blobs
+    data = b"[7, 8, 9, 10]"
+    hash = sha256(data).hexdigest()
+    assert not store.add_chunk(hash, data[:5], size=len(data))
+    assert first not in store
+    assert second in store
+    assert store._partial_size == 5
+
+    # ...and the least recently updated incomplete blobs, except the one
+    # being uploaded
+    other = b"[11, 12, 13, 14, 15]"
+    other_hash = sha256(other).hexdigest()
+    assert not store.add_chunk(other_hash, other[:12], size=len(other))
+    assert second in store
+    assert hash not in store._partial
+    assert store._partial_size == 12
+
+    assert store.add_chunk(other_hash, other[12:], offset=12, size=len(other))
+    assert store.get(other_hash) == [11, 12, 13, 14, 15]
+    assert second not in store
+    assert store._partial_size == 0
+    assert store._size == len(other)
+
+
+def test_stale_partial_blobs_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(upload, "monotonic", lambda: now[0])
+
+    store = ShowBlobStore(partial_timeout=60)
+    data = b"[1, 2, 3]"
+    hash = sha256(data).hexdigest()
+
+    assert not store.add_chunk(hash, data[:4], size=len(data))
+    now[0] += 50
+    assert not store.add_chunk("0" * 64, b"[", size=2)
+    assert hash in store._partial
+
+    # The first blob is discarded when another chunk arrives after it expired
+    now[0] += 20
+    assert not store.add_chunk("1" * 64, b"[", size=2)
+    assert hash not in store._partial
+    assert "0" * 64 in store._partial
+    assert store._partial_size == 2
+
+    # Its upload has to start from scratch
+    assert not store.add_chunk(hash, data[4:], offset=4, size=len(data))
+    assert store.add_chunk(hash, data[:4], size=len(data))
+    assert store.get(hash) == [1, 2, 3]
+
+
+def test_compose_show():
+    store = ShowBlobStore()
+    trajectory = store.add(b'{"points": []}')
+    common = {"coordinateSystem": {"type": "nwu"}, "lights": None}
+
+    show = compose_show(common, {"blobs": {"trajectory": trajectory}, "home": 1}, store)
+    assert show == {
+        "coordinateSystem": {"type": "nwu"},
+        "lights": None,
+        "trajectory": {"points": []},
+        "home": 1,
+    }
+    assert show["coordinateSystem"] is common["coordinateSystem"]
+
+    with raises(RuntimeError, match="lights"):
+        compose_show(common, {"blobs": {"lights": "missing"}}, store)
+
+
+async def test_uploads_are_limited_by_semaphore(autojump_clock):
+    semaphore = Semaphore(2)
+    finished_at = []
+
+    async def upload():
+        await sleep(1)
+        finished_at.append(current_time())
+        return "ok"
+
+    async def consume():
+        items = [item async for item in run_show_upload(upload(), semaphore)]
+        assert isinstance(items[-2], Progress) and items[-2].percentage == 100
+        assert items[-1] == "ok"
+
+    async with open_nursery() as nursery:
+        for _ in range(5):
+            nursery.start_soon(consume)
+
+    assert finished_at == [1, 1, 2, 2, 3]
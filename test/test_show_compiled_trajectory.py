@@ -0,0 +1,111 @@
+import gzip
+import sys
+
+from json import load
+from pathlib import Path
+from pytest import approx, fixture, importorskip
+
+from flockwave.server.show.player import TrajectoryPlayer
+from flockwave.server.show.trajectory import TrajectorySpecification
+
+np = importorskip("numpy")
+
+from flockwave.server.show.compiled import (  # noqa: E402
+    CompiledTrajectory,
+    CompiledTrajectoryGroup,
+)
+
+fixture_dir = Path(str(sys.modules[__name__].__file__)).parent / "fixtures"
+
+
+@fixture
+def bezier_trajectory() -> TrajectorySpecification:
+    return TrajectorySpecification(
+        {
+            "version": 1,
+            "points": [
+                [0, [0, 0, 0], []],
+                [6, [0, 3, 0], [[0, 0, 0], [-0.6, 2, 0]]],
+                [12, [3, 3, 0], [[0.6, 4, 0], [2.4, 4, 0]]],
+                [18, [3, 0, 0], [[3.6, 2, 0], [3, 0, 0]]],
+                [20, [2, 1, 2], []],
+                [25, [0, 0, 5], [[2, 2, 3], [1, 5, 5], [-1, 2, 4], [0, 1, 6]]],
+            ],
+            "takeoffTime": 3,
+        }
+    )
+
+
+@fixture
+def show_trajectories() -> list[TrajectorySpecification]:
+    with gzip.open(fixture_dir / "show_5cf_demo.json.gz") as fp:
+        show = load(fp)
+
+    return [
+        TrajectorySpecification(drone["settings"]["trajectory"])
+        for drone in show["swarm"]["drones"]
+    ]
+
+
+def test_compiled_trajectory_empty():
+    trajectory = CompiledTrajectory(
+        TrajectorySpecification({"version": 1, "points": []})
+    )
+
+    assert trajectory.num_segments == 0
+    assert tuple(trajectory.position_at(4)) == (0, 0, 0)
+    assert trajectory.position_at([-2, 1, 8]).tolist() == [[0, 0, 0]] * 3
+    assert trajectory.velocity_at([-2, 1, 8]).tolist() == [[0, 0, 0]] * 3
+
+
+def test_compiled_trajectory_matches_player(bezier_trajectory):
+    player = TrajectoryPlayer(bezier_trajectory)
+    trajectory = CompiledTrajectory(bezier_trajectory)
+
+    times = np.linspace(-2, 32, 1001)
+    expected = [player.position_at(t) for t in times]
+    observed = trajectory.position_at(times)
+
+    assert observed.shape == (len(times), 3)
+    for exp, obs in zip(expected, observed.tolist()):
+        assert obs == approx(exp, abs=1e-9)
+
+    assert trajectory.position_at(10.5).tolist() == approx([51 / 80, 3 + 9 / 16, 0])
+    assert trajectory.is_before_takeoff(2.5)
+    assert not trajectory.is_before_takeoff(3)
+    assert trajectory.end_time == 28
+
+
+def test_compiled_trajectory_velocity(bezier_trajectory):
+    player = TrajectoryPlayer(bezier_trajectory)
+    trajectory = CompiledTrajectory(bezier_trajectory)
+
+    # Compare the velocities with finite differences of the player positions
+    h = 1e-5
+    for t in np.linspace(3.01, 27.99, 251):
+        before, after = player.position_at(t - h), player.position_at(t + h)
+        expected = [(a - b) / (2 * h) for a, b in zip(after, before)]
+        assert trajectory.velocity_at(t).tolist() == approx(expected, abs=1e-4)
+
+    assert trajectory.velocity_at([0, 2.9, 29, 100]).tolist() == [[0, 0, 0]] * 4
+
+
+def test_compiled_trajectory_group_matches_player(show_trajectories):
+    trajectories = [
+        *show_trajectories,
+        TrajectorySpecification({"version": 1, "points": []}),
+    ]
+    players = [TrajectoryPlayer(trajectory) for trajectory in trajectories]
+    compiled = [CompiledTrajectory(trajectory) for trajectory in trajectories]
+    group = CompiledTrajectoryGroup(trajectories)
+
+    assert len(group) == len(trajectories)
+
+    for t in np.linspace(-5, 200, 411):
+        positions = group.positions_at(t).tolist()
+        velocities = group.velocities_at(t).tolist()
+        for player, single, position, velocity in zip(
+            players, compiled, positions, velocities
+        ):
+            assert position == approx(player.position_at(t), abs=1e-9)
+            assert velocity == approx(single.velocity_at(t).tolist(), abs=1e-9)
@@ -1,6 +1,9 @@
 import struct
 
-from pytest import fixture, raises
+from os import environ
+from random import Random
+from pytest import fixture, importorskip, mark, raises
+from timeit import repeat
 
 from flockwave.server.show.formats import (
     RTHPlanEncoder,
@@ -10,9 +13,13 @@ from flockwave.server.show.formats import (
     SkybrushBinaryShowFile,
     SkybrushBinaryFormatBlockType,
     YawSetpointEncoder,
+    create_skybrush_binary_show_file,
 )
 from flockwave.server.show.rth_plan import RTHAction, RTHPlan, RTHPlanEntry
-from flockwave.server.show.trajectory import TrajectorySegment
+from flockwave.server.show.trajectory import (
+    TrajectorySegment,
+    TrajectorySpecification,
+)
 from flockwave.server.show.yaw import YawSetpointList
 
 
@@ -268,6 +275,89 @@ class TestSegmentEncoder:
             b" \x88\x13 N\x00\x00\x00\x00"
         )
 
+    @staticmethod
+    def create_random_segments(count: int) -> list[TrajectorySegment]:
+        rng = Random(42)
+
+        def random_point():
+            return tuple(
+                rng.choice((rng.uniform(-30, 30), 0.5, -1.5)) for _ in range(3)
+            )
+
+        segments = []
+        for index in range(count):
+            points = [random_point() for _ in range(rng.choice((1, 2, 3, 4, 4, 8)))]
+            if index % 3 == 0:
+                # Keep the Z coordinate constant
+                points = [(x, y, points[0][2]) for x, y, _ in points]
+            segments.append(
+                TrajectorySegment(t=index, duration=rng.uniform(0, 65), points=points)
+            )
+
+        return segments
+
+    def test_encode_multiple_segments_batch(self):
+        importorskip("numpy")
+
+        segments = self.create_random_segments(2000)
+        for scale in (1, 3, 7):
+            encoder = SegmentEncoder(scale=scale)
+            expected = b"".join(encoder.iter_encode_multiple_segments(segments))
+            assert encoder.encode_multiple_segments(segments) == expected
+
+    @mark.skipif(
+        not environ.get("SKYBRUSH_BENCHMARKS"),
+        reason="set SKYBRUSH_BENCHMARKS=1 to run benchmarks",
+    )
+    def test_encode_multiple_segments_batch_benchmark(self):
+        importorskip("numpy")
+
+        # Benchmark the vectorized encoder against the segment-by-segment one
+        segments = self.create_random_segments(20000)
+        encoder = SegmentEncoder(scale=3)
+        scalar = min(
+            repeat(
+                lambda: b"".join(encoder.iter_encode_multiple_segments(segments)),
+                number=1,
+                repeat=3,
+            )
+        )
+        batch = min(
+            repeat(
+                lambda: encoder.encode_multiple_segments(segments),
+                number=1,
+                repeat=3,
+            )
+        )
+        assert batch < scalar
+
+    def test_encode_multiple_segments_batch_errors(self):
+        importorskip("numpy")
+
+        encoder = SegmentEncoder()
+        segments = [
+            TrajectorySegment(t=index, duration=1, points=[(0, 0, 0), (0, 0, 1)])
+            for index in range(32)
+        ]
+
+        segments[20] = TrajectorySegment(
+            t=20, duration=1, points=[(0, 0, 0), (0, 0, 40)]
+        )
+        with raises(OverflowError):
+            encoder.encode_multiple_segments(segments)
+
+        # 5D curves are not supported yet
+        points = [(0, 0, 0), (0, 0, 1), (0, 0, 1), (0, 0, 2), (0, 0, 3), (0, 0, 3)]
+        segments[20] = TrajectorySegment(t=20, duration=1, points=points)
+        with raises(NotImplementedError):
+            encoder.encode_multiple_segments(segments)
+
+        segments[20] = TrajectorySegment(
+            t=20, duration=66, points=[(0, 0, 0), (0, 0, 1)]
+        )
+        with raises(RuntimeError, match="trajectory segment must be"):
+            encoder.encode_multiple_segments(segments)
+
 
 class TestSkybrushBinaryFileFormat:
     async def test_reading_blocks_version_1(self):
@@ -387,6 +477,34 @@ class TestSkybrushBinaryFileFormat:
             with raises(RuntimeError):
                 await f.add_rth_plan(too_large_plan)
 
+    async def test_creating_show_file_synchronously(self, plan: RTHPlan):
+        trajectory = TrajectorySpecification(
+            {
+                "version": 1,
+                "points": [
+                    [0, [0, 0, 0], []],
+                    [10, [0, 0, 10], []],
+                    [20, [5, 5, 10], [[0, 5, 10], [5, 0, 10]]],
+                    [100, [5, 5, 0], []],
+                ],
+                "takeoffTime": 5,
+            }
+        )
+        light_program = b"\x01\x02\x03"
+        setpoints = YawSetpointList(setpoints=[(10, 30), (20, 90), (25, -90)])
+
+        async with SkybrushBinaryShowFile.create_in_memory() as f:
+            await f.add_trajectory(trajectory)
+            await f.add_light_program(light_program)
+            await f.add_rth_plan(plan)
+            await f.add_yaw_setpoints(setpoints)
+            await f.finalize()
+            expected = f.get_contents()
+
+        assert expected == create_skybrush_binary_show_file(
+            trajectory, light_program, rth_plan=plan, yaw_setpoints=setpoints
+        )
+
 
 class TestRTHPlanEncoder:
     async def test_encoding_basic_plan(self, plan: RTHPlan):
@@ -0,0 +1,58 @@
+from enum import Enum
+from msgpack import packb
+from trio.testing import memory_stream_pair
+
+from flockwave.server.utils.wire_formats import (
+    create_msgpack_encoder,
+    create_msgpack_parser,
+    negotiate_wire_format,
+    WireFormat,
+)
+
+
+class Color(Enum):
+    RED = "red"
+
+
+class Model:
+    @property
+    def json(self):
+        return {"color": Color.RED, "tags": {"a"}}
+
+
+def test_detect():
+    assert WireFormat.detect(b"") is None
+    assert WireFormat.detect(b" \r\n") is None
+    assert WireFormat.detect(b'  {"id": 1}') is WireFormat.JSON
+    assert WireFormat.detect(packb({"id": 1})) is WireFormat.MSGPACK
+    assert WireFormat.detect(packb({str(i): i for i in range(20)})) is (
+        WireFormat.MSGPACK
+    )
+
+
+def test_msgpack_roundtrip():
+    encoder = create_msgpack_encoder()
+    parser = create_msgpack_parser()
+
+    data = encoder({"id": "1", "body": Model()}) + encoder({"id": "2"})
+    assert parser(data[:5]) == []
+    assert parser(data[5:]) == [
+        {"id": "1", "body": {"color": "red", "tags": ["a"]}},
+        {"id": "2"},
+    ]
+
+
+async def test_negotiation():
+    client, server = memory_stream_pair()
+
+    await client.send_all(b"\n")
+    await client.send_all(packb({"id": "1"}))
+    wire_format, reader = await negotiate_wire_format(server)
+    assert wire_format is WireFormat.MSGPACK
+
+    await client.send_all(packb({"id": "2"}))
+    parser = wire_format.create_parser()
+    messages = []
+    while len(messages) < 2:
+        messages.extend(parser(await reader()))
+    assert messages == [{"id": "1"}, {"id": "2"}]
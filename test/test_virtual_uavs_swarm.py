@@ -0,0 +1,114 @@
+from flockwave.gps.vectors import GPSCoordinate
+from pytest import approx, fixture, importorskip
+
+from flockwave.server.ext.virtual_uavs.driver import (
+    VirtualUAV,
+    VirtualUAVDriver,
+    VirtualUAVState,
+)
+from flockwave.server.ext.virtual_uavs.swarm import VirtualUAVSwarm
+
+importorskip("numpy")
+
+HOME = GPSCoordinate(lat=47.4733, lon=19.0611, ahl=0)
+
+
+@fixture
+def driver() -> VirtualUAVDriver:
+    return VirtualUAVDriver()
+
+
+def create_uav(driver: VirtualUAVDriver, id: str, index: int) -> VirtualUAV:
+    uav = driver.create_uav(id, home=HOME)
+    uav.armed = True
+    uav.battery.voltage = 12.4
+    uav.max_velocity_xy = 5 + index
+    uav.max_acceleration_z = 1 + index * 0.5
+    return uav
+
+
+def get_kinematic_state(uav: VirtualUAV) -> tuple:
+    p, v = uav._position_xyz, uav._velocity_xyz
+    return (p.x, p.y, p.z), (v.x, v.y, v.z)
+
+
+def command(uav: VirtualUAV, index: int, tick: int) -> None:
+    """Sends the commands of a simple scripted flight to the given UAV; the
+    flights of the UAVs differ in their timing and their targets.
+    """
+    if tick == index:
+        uav.takeoff()
+    elif tick == 40 + index:
+        uav.target_xyz = (10 * (index - 2), 5 * index, 4 + index)
+    elif tick == 80 + 3 * index:
+        uav.hold_position()
+    elif tick == 100 + 5 * index:
+        uav.land()
+
+
+def test_swarm_step_matches_scalar_step(driver: VirtualUAVDriver):
+    num_uavs, dt = 5, 0.1
+
+    scalar_uavs = [create_uav(driver, f"S{i}", i) for i in range(num_uavs)]
+    swarm_uavs = [create_uav(driver, f"B{i}", i) for i in range(num_uavs)]
+
+    swarm = VirtualUAVSwarm()
+    for uav in swarm_uavs:
+        swarm._add(uav)
+
+    seen_states = set()
+    for tick in range(250):
+        for index, (scalar, batched) in enumerate(zip(scalar_uavs, swarm_uavs)):
+            command(scalar, index, tick)
+            command(batched, index, tick)
+
+        for uav in scalar_uavs:
+            uav.step(dt)
+        swarm.step(dt)
+
+        for scalar, batched in zip(scalar_uavs, swarm_uavs):
+            p, v = get_kinematic_state(scalar)
+            bp, bv = get_kinematic_state(batched)
+            assert bp == approx(p, abs=1e-9)
+            assert bv == approx(v, abs=1e-9)
+            assert batched.state is scalar.state
+            assert (batched.target_xyz is None) == (scalar.target_xyz is None)
+            assert batched.battery.voltage == approx(scalar.battery.voltage)
+            seen_states.add(scalar.state)
+
+    # Make sure that the scenario went through all the states
+    assert seen_states == set(VirtualUAVState)
+    assert all(uav.state is VirtualUAVState.LANDED for uav in swarm_uavs)
+
+
+def test_swarm_membership(driver: VirtualUAVDriver):
+    uavs = [create_uav(driver, f"B{i}", 0) for i in range(3)]
+    swarm = VirtualUAVSwarm()
+
+    with swarm.use(uavs[0]), swarm.use(uavs[2]):
+        with swarm.use(uavs[1]):
+            for uav in uavs:
+                uav.takeoff()
+            for _ in range(10):
+                swarm.step(0.1)
+
+            assert swarm._position.shape == (3, 3)
+            height = uavs[1]._position_xyz.z
+            assert height > 0
+
+        # The UAV that left the swarm keeps its state and is not stepped
+        # any more; the rows of the remaining UAVs are kept intact
+        assert swarm._position.shape == (2, 3)
+        swarm.step(0.1)
+        assert uavs[1]._position_xyz.z == height
+        assert uavs[0]._position_xyz.z == approx(uavs[2]._position_xyz.z)
+        assert uavs[0]._position_xyz.z > height
+
+        # The UAV continues from where it left off when it rejoins
+        with swarm.use(uavs[1]):
+            assert swarm._position[swarm._indices[uavs[1]], 2] == height
+            swarm.step(0.1)
+            assert uavs[1]._position_xyz.z > height
+
+    assert not swarm._uavs
+    assert swarm._position.shape == (0, 3)